@@ -0,0 +1,343 @@
+"""
+跨模态关联图
+
+混合召回需要判断文本、图片、表格结果之间是否相关。原先每次查询都把每个结果与其他类型的全部结果
+逐对比较文本、元数据和关键词，入库时写入的related_images/related_tables也始终为空。
+
+AssociationGraph在写入向量库时按文档预先计算文本分块、表格和图片之间的稀疏关联：
+- 位置接近：同一页权重1.0，相隔d页（不超过page_window）权重1/(1+d)
+- 向量相似：分块向量（文本text_embedding、表格table_embedding、图片description_embedding）的余弦相似度
+- 边权重 = proximity_weight * 位置接近 + (1 - proximity_weight) * 余弦相似度，
+  只保留不同类型、位置接近或相似度不低于min_similarity的边，每个节点最多max_neighbors条
+
+节点键为元数据中的chunk_id（同一图片的visual/description两条记录共用一个节点），没有时使用docstore文档ID。
+文档的分块新增或删除时标记该文档，保存向量库时只重新计算这些文档；与主索引一起保存为association_graph.json。
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable, Hashable
+
+import numpy as np
+
+# 关联图文件名（位于langchain_faiss_index目录下）
+ASSOCIATION_GRAPH_FILE_NAME = 'association_graph.json'
+
+# 关联图文件格式版本
+ASSOCIATION_GRAPH_VERSION = 1
+
+# 默认关联图配置（vector_store.association_graph）
+DEFAULT_ASSOCIATION_GRAPH_CONFIG = {
+    'enabled': True,
+    'max_neighbors': 8,         # 每个节点保留的最大邻居数
+    'min_similarity': 0.5,      # 不在相邻页面时建立关联所需的最低余弦相似度
+    'page_window': 1,           # 视为位置接近的最大页码差
+    'proximity_weight': 0.5     # 位置接近在边权重中的占比
+}
+
+# 各内容类型计算相似度使用的向量字段（按优先级）
+ASSOCIATION_VECTOR_FIELDS = {
+    'text': ('text_embedding',),
+    'table': ('table_embedding', 'text_embedding'),
+    'image': ('description_embedding',)
+}
+
+# 相似度矩阵分块计算的行数
+_BLOCK_ROWS = 512
+
+
+def association_key(metadata: Dict[str, Any], doc_id: str = '') -> str:
+    """
+    分块在关联图中的节点键
+
+    :param metadata: 分块元数据
+    :param doc_id: docstore文档ID（元数据中没有chunk_id时使用）
+    :return: 节点键
+    """
+    return (metadata or {}).get('chunk_id') or doc_id
+
+
+def _page_number(metadata: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(metadata.get('page_number'))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_document_graph(documents: List[Tuple[str, Any]],
+                         get_vector: Callable[[Dict[str, Any], str], Optional[List[float]]],
+                         graph_config: Dict[str, Any]) -> Dict[str, List[List[Any]]]:
+    """
+    计算一个文档内各分块的跨类型关联
+
+    :param documents: 该文档全部分块的[(文档ID, 文档)]列表
+    :param get_vector: 按(元数据, 向量字段)读取分块向量的函数
+    :param graph_config: 关联图配置
+    :return: {节点键: [[邻居节点键, 权重], ...]}（按权重降序）
+    """
+    keys: List[str] = []
+    types: List[str] = []
+    pages: List[float] = []
+    vectors: List[Optional[np.ndarray]] = []
+    positions: Dict[str, int] = {}
+    for doc_id, doc in documents:
+        metadata = getattr(doc, 'metadata', None) or {}
+        chunk_type = metadata.get('chunk_type')
+        if chunk_type not in ASSOCIATION_VECTOR_FIELDS:
+            continue
+        key = association_key(metadata, doc_id)
+        if key not in positions:
+            positions[key] = len(keys)
+            keys.append(key)
+            types.append(chunk_type)
+            page = _page_number(metadata)
+            pages.append(float(page) if page is not None else np.nan)
+            vectors.append(None)
+        position = positions[key]
+        if vectors[position] is None:
+            for field in ASSOCIATION_VECTOR_FIELDS[chunk_type]:
+                vector = get_vector(metadata, field)
+                if vector:
+                    vectors[position] = np.asarray(vector, dtype=np.float32)
+                    break
+
+    if len(set(types)) < 2:
+        return {}
+
+    # 向量矩阵（L2归一化；缺少向量或维度与多数不一致的分块只按位置关联）
+    dimensions = [vector.shape[0] for vector in vectors if vector is not None]
+    dimension = max(set(dimensions), key=dimensions.count) if dimensions else 0
+    matrix = np.zeros((len(keys), dimension), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None and vector.shape[0] == dimension:
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                matrix[i] = vector / norm
+
+    type_codes = np.asarray([list(ASSOCIATION_VECTOR_FIELDS).index(t) for t in types])
+    page_array = np.asarray(pages, dtype=np.float32)
+    max_neighbors = max(int(graph_config['max_neighbors']), 1)
+    min_similarity = float(graph_config['min_similarity'])
+    page_window = float(graph_config['page_window'])
+    proximity_weight = float(graph_config['proximity_weight'])
+
+    graph: Dict[str, List[List[Any]]] = {}
+    for start in range(0, len(keys), _BLOCK_ROWS):
+        end = min(start + _BLOCK_ROWS, len(keys))
+        similarity = np.clip(matrix[start:end] @ matrix.T, 0.0, 1.0) if dimension else \
+            np.zeros((end - start, len(keys)), dtype=np.float32)
+        distance = np.abs(page_array[start:end, None] - page_array[None, :])
+        near = np.nan_to_num(distance, nan=np.inf) <= page_window
+        proximity = np.where(near, 1.0 / (1.0 + np.nan_to_num(distance, nan=0.0)), 0.0)
+        weights = proximity_weight * proximity + (1.0 - proximity_weight) * similarity
+        valid = (type_codes[start:end, None] != type_codes[None, :]) & (near | (similarity >= min_similarity))
+        weights = np.where(valid, weights, 0.0)
+
+        for row in range(end - start):
+            candidates = np.flatnonzero(weights[row] > 0)
+            if not len(candidates):
+                continue
+            if len(candidates) > max_neighbors:
+                candidates = candidates[np.argpartition(-weights[row][candidates], max_neighbors - 1)[:max_neighbors]]
+            candidates = candidates[np.argsort(-weights[row][candidates], kind='stable')]
+            graph[keys[start + row]] = [[keys[j], round(float(weights[row][j]), 4)] for j in candidates]
+    return graph
+
+
+class AssociationGraph:
+    """
+    跨模态关联图
+
+    功能：
+    - 按节点键查询其他类型的关联分块及权重
+    - 分块新增或删除时标记所属文档，refresh时只重新计算被标记的文档
+    - 与主索引一起保存/加载（association_graph.json），文件缺失或与docstore不一致时从docstore重建
+    """
+
+    def __init__(self, graph_config: Dict[str, Any] = None):
+        """
+        初始化关联图
+
+        :param graph_config: 关联图配置（可选，结构同DEFAULT_ASSOCIATION_GRAPH_CONFIG）
+        """
+        self.config = dict(DEFAULT_ASSOCIATION_GRAPH_CONFIG)
+        self.config.update(graph_config or {})
+        # 文档名 -> {节点键: [[邻居节点键, 权重], ...]}
+        self._documents: Dict[str, Dict[str, List[List[Any]]]] = {}
+        # 节点键 -> {邻居节点键: 权重}
+        self._neighbors: Dict[str, Dict[str, float]] = {}
+        self._dirty_documents = set()
+        # 内存中的关联图是否与磁盘文件不一致
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._neighbors)
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用关联图"""
+        return bool(self.config.get('enabled', True))
+
+    def neighbors(self, key: Hashable) -> Dict[str, float]:
+        """
+        查询节点的关联分块
+
+        :param key: 节点键
+        :return: {邻居节点键: 权重}（只读）；不存在时返回空字典
+        """
+        return self._neighbors.get(key, {})
+
+    def mark_dirty(self, metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """
+        标记分块发生变化的文档
+
+        :param metadatas: 新增或删除的文档元数据
+        """
+        if not self.enabled:
+            return
+        for metadata in metadatas:
+            if metadata and metadata.get('chunk_type') in ASSOCIATION_VECTOR_FIELDS:
+                self._dirty_documents.add(metadata.get('document_name', ''))
+
+    def _set_document(self, document_name: str, graph: Dict[str, List[List[Any]]]):
+        """替换一个文档的关联（先移除该文档原有节点）"""
+        for key in self._documents.pop(document_name, {}):
+            self._neighbors.pop(key, None)
+        if graph:
+            self._documents[document_name] = graph
+            for key, neighbors in graph.items():
+                self._neighbors[key] = {neighbor: weight for neighbor, weight in neighbors}
+
+    def refresh(self, get_documents: Callable[[str], List[Tuple[str, Any]]],
+                get_vector: Callable[[Dict[str, Any], str], Optional[List[float]]]) -> int:
+        """
+        重新计算被标记的文档
+
+        :param get_documents: 按文档名返回全部分块[(文档ID, 文档)]的函数
+        :param get_vector: 按(元数据, 向量字段)读取分块向量的函数
+        :return: 重新计算的文档数量
+        """
+        if not self._dirty_documents:
+            return 0
+
+        refreshed = 0
+        for document_name in sorted(self._dirty_documents):
+            try:
+                graph = build_document_graph(get_documents(document_name), get_vector, self.config)
+            except Exception as e:
+                logging.warning(f"计算跨模态关联失败: {document_name}, 错误: {e}")
+                graph = {}
+            self._set_document(document_name, graph)
+            refreshed += 1
+
+        self._dirty_documents.clear()
+        self.dirty = True
+        logging.info(f"跨模态关联图已更新 {refreshed} 个文档，共 {len(self._neighbors)} 个节点")
+        return refreshed
+
+    def rebuild(self, docstore: Any, get_vector: Callable[[Dict[str, Any], str], Optional[List[float]]]) -> int:
+        """
+        遍历docstore重新计算全部文档
+
+        :param docstore: LangChain docstore
+        :param get_vector: 按(元数据, 向量字段)读取分块向量的函数
+        :return: 节点数量
+        """
+        self.clear()
+        if not self.enabled:
+            return 0
+        groups: Dict[str, List[Tuple[str, Any]]] = {}
+        for doc_id, doc in docstore._dict.items():
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
+            if metadata.get('chunk_type') in ASSOCIATION_VECTOR_FIELDS:
+                groups.setdefault(metadata.get('document_name', ''), []).append((doc_id, doc))
+
+        self._dirty_documents = set(groups)
+        self.refresh(lambda document_name: groups.get(document_name, []), get_vector)
+        return len(self._neighbors)
+
+    def clear(self):
+        """清空关联图"""
+        self._documents = {}
+        self._neighbors = {}
+        self._dirty_documents = set()
+        self.dirty = True
+
+    def save(self, folder_path: str, document_count: int) -> bool:
+        """
+        保存到association_graph.json
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数（加载时用于校验一致性）
+        :return: 是否保存成功
+        """
+        try:
+            graph_path = os.path.join(folder_path, ASSOCIATION_GRAPH_FILE_NAME)
+            tmp_path = graph_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': ASSOCIATION_GRAPH_VERSION,
+                    'document_count': document_count,
+                    'saved_at': time.time(),
+                    'config': self.config,
+                    'documents': self._documents
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, graph_path)
+            self.dirty = False
+            return True
+
+        except Exception as e:
+            logging.error(f"保存跨模态关联图失败: {e}")
+            return False
+
+    def load(self, folder_path: str, document_count: int) -> bool:
+        """
+        从association_graph.json加载
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数
+        :return: 是否加载成功；文件不存在、版本或配置不符、与docstore不一致时返回False
+        """
+        graph_path = os.path.join(folder_path, ASSOCIATION_GRAPH_FILE_NAME)
+        if not os.path.exists(graph_path):
+            return False
+        try:
+            with open(graph_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"读取跨模态关联图失败: {e}")
+            return False
+
+        if data.get('version') != ASSOCIATION_GRAPH_VERSION:
+            logging.warning(f"跨模态关联图版本不匹配: {data.get('version')}")
+            return False
+        if data.get('config') != self.config:
+            logging.warning("跨模态关联图配置已变化")
+            return False
+        if data.get('document_count') != document_count:
+            logging.warning(f"跨模态关联图与docstore不一致: 关联图={data.get('document_count')}, docstore={document_count}")
+            return False
+
+        self.clear()
+        for document_name, graph in data.get('documents', {}).items():
+            self._set_document(document_name, graph)
+        self.dirty = False
+        logging.info(f"跨模态关联图加载成功，共 {len(self._neighbors)} 个节点")
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取关联图状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'enabled': self.enabled,
+            'documents': len(self._documents),
+            'nodes': len(self._neighbors),
+            'edges': sum(len(neighbors) for neighbors in self._neighbors.values()),
+            'pending_documents': len(self._dirty_documents),
+            'dirty': self.dirty
+        }
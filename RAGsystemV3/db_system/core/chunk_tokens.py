@@ -0,0 +1,461 @@
+"""
+分块词项向量
+
+召回评分阶段（文本相似度、表格结构匹配、跨类型相关性、多样性关键词）原先对每个候选结果的
+全文调用jieba分词，同一分块在每次请求中都会被重新切分。ChunkTokenStore在写入向量库时对每个分块
+分词一次，按字段保存紧凑的词项向量：
+- content：候选结果的content文本（文本正文、图片增强描述、表格增强信息）
+- title：表格标题
+- keywords：content的TF-IDF关键词（jieba.analyse.extract_tags，前20个）
+
+词项ID为词的64位哈希（无需维护词表，查询时对查询词同样取哈希即可比较），每个向量保存
+按ID排序的词项ID数组、词频数组和词频向量的模。评分时对较短的一方逐个二分查找较长的一方，
+查询与分块的比较耗时与查询长度成正比。
+
+与主索引一起保存为chunk_tokens.npz，文件缺失、与docstore不一致或分词规则（用户词典）变化时从docstore重建。
+"""
+
+import os
+import re
+import json
+import math
+import time
+import bisect
+import hashlib
+import logging
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterable
+
+import numpy as np
+
+from .tokenizer import get_tokenizer, tokenize, STOP_WORDS, JIEBA_AVAILABLE
+from .table_artifacts import build_table_content_text
+
+# 分块词项向量文件名（位于langchain_faiss_index目录下）
+CHUNK_TOKENS_FILE_NAME = 'chunk_tokens.npz'
+
+# 分块词项向量文件格式版本
+CHUNK_TOKENS_VERSION = 1
+
+# 默认分块词项向量配置（vector_store.chunk_tokens）
+DEFAULT_CHUNK_TOKENS_CONFIG = {
+    'enabled': True
+}
+
+# 每个分块保存的字段
+CHUNK_TOKEN_FIELDS = ('content', 'title', 'keywords')
+
+# 每个分块保存的关键词数量
+KEYWORD_TOP_K = 20
+
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def build_candidate_content(metadata: Dict[str, Any], page_content: str = '') -> str:
+    """
+    生成候选结果的content文本：图片优先使用增强描述，文本优先使用metadata中的正文，表格使用增强表格信息
+
+    :param metadata: 分块元数据
+    :param page_content: 文档page_content
+    :return: content文本
+    """
+    chunk_type = metadata.get('chunk_type', '')
+    if chunk_type == 'image' and 'enhanced_description' in metadata:
+        return metadata['enhanced_description']
+    if chunk_type == 'text' and 'text' in metadata:
+        return metadata['text']
+    if chunk_type == 'table':
+        return build_table_content_text(metadata)
+    return page_content
+
+
+def term_id(term: str) -> int:
+    """
+    词项ID（64位哈希）
+
+    :param term: 词
+    :return: 词项ID
+    """
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def scoring_terms(text: str) -> List[str]:
+    """
+    评分用分词：去除HTML标签后按jieba精确模式分词（保留停用词，去除标点和空白）
+
+    :param text: 文本
+    :return: 词列表
+    """
+    return tokenize(_HTML_TAG_PATTERN.sub(' ', text or ''), search_mode=False, remove_stop_words=False)
+
+
+def extract_keywords(text: str, top_k: int = KEYWORD_TOP_K) -> List[str]:
+    """
+    提取TF-IDF关键词（jieba不可用时取长度大于1的非停用词）
+
+    :param text: 文本
+    :param top_k: 关键词数量
+    :return: 关键词列表
+    """
+    text = _HTML_TAG_PATTERN.sub(' ', text or '')
+    if JIEBA_AVAILABLE:
+        return [keyword.lower() for keyword in get_tokenizer().extract_tags(text, top_k)]
+    return [term for term in dict.fromkeys(scoring_terms(text)) if len(term) > 1 and term not in STOP_WORDS][:top_k]
+
+
+class TokenVector:
+    """
+    词项向量：按ID排序的词项ID数组、对应的词频数组和词频向量的模
+    """
+
+    __slots__ = ('ids', 'tfs', 'norm')
+
+    def __init__(self, ids: array, tfs: array, norm: float = None):
+        """
+        初始化词项向量
+
+        :param ids: 升序排列的词项ID数组（array('Q')）
+        :param tfs: 词频数组（array('I')）
+        :param norm: 词频向量的模（为None时计算）
+        """
+        self.ids = ids
+        self.tfs = tfs
+        self.norm = math.sqrt(sum(tf * tf for tf in tfs)) if norm is None else norm
+
+    @classmethod
+    def from_terms(cls, terms: Iterable[str]) -> 'TokenVector':
+        """
+        由词列表生成词项向量
+
+        :param terms: 词列表（保留重复）
+        :return: 词项向量
+        """
+        counts: Dict[int, int] = {}
+        for term, count in Counter(terms).items():
+            key = term_id(term)
+            counts[key] = counts.get(key, 0) + count
+        ids = sorted(counts)
+        return cls(array('Q', ids), array('I', (counts[key] for key in ids)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def common(self, other: 'TokenVector') -> List[tuple]:
+        """
+        共有词项的词频（遍历较短的向量，在较长的向量中二分查找）
+
+        :param other: 另一个词项向量
+        :return: [(本向量词频, 另一向量词频)]
+        """
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        pairs = []
+        large_ids = large.ids
+        size = len(large_ids)
+        for term, tf in zip(small.ids, small.tfs):
+            pos = bisect.bisect_left(large_ids, term)
+            if pos < size and large_ids[pos] == term:
+                pairs.append((tf, large.tfs[pos]))
+        if small is other:
+            pairs = [(b, a) for a, b in pairs]
+        return pairs
+
+    def contains(self, term: int) -> bool:
+        """
+        是否包含词项
+
+        :param term: 词项ID
+        :return: 是否包含
+        """
+        pos = bisect.bisect_left(self.ids, term)
+        return pos < len(self.ids) and self.ids[pos] == term
+
+
+def jaccard_similarity(vector1: TokenVector, vector2: TokenVector) -> float:
+    """
+    词项集合的Jaccard相似度
+
+    :param vector1: 词项向量1
+    :param vector2: 词项向量2
+    :return: 相似度 (0.0-1.0)
+    """
+    if not len(vector1) or not len(vector2):
+        return 0.0
+    intersection = len(vector1.common(vector2))
+    return intersection / (len(vector1) + len(vector2) - intersection)
+
+
+def cosine_similarity(vector1: TokenVector, vector2: TokenVector) -> float:
+    """
+    词频向量的余弦相似度
+
+    :param vector1: 词项向量1
+    :param vector2: 词项向量2
+    :return: 相似度 (0.0-1.0)
+    """
+    if not vector1.norm or not vector2.norm:
+        return 0.0
+    numerator = sum(tf1 * tf2 for tf1, tf2 in vector1.common(vector2))
+    return max(0.0, min(1.0, numerator / (vector1.norm * vector2.norm)))
+
+
+def overlap_similarity(vector1: TokenVector, vector2: TokenVector) -> float:
+    """
+    词面相似度：Jaccard相似度与词频余弦相似度的平均值（没有共有词项时为0）
+
+    :param vector1: 词项向量1
+    :param vector2: 词项向量2
+    :return: 相似度 (0.0-1.0)
+    """
+    if not len(vector1) or not len(vector2):
+        return 0.0
+    pairs = vector1.common(vector2)
+    if not pairs:
+        return 0.0
+    jaccard = len(pairs) / (len(vector1) + len(vector2) - len(pairs))
+    cosine = sum(tf1 * tf2 for tf1, tf2 in pairs) / (vector1.norm * vector2.norm)
+    return max(0.0, min(1.0, (jaccard + cosine) / 2))
+
+
+@lru_cache(maxsize=4096)
+def text_token_vector(text: str) -> TokenVector:
+    """
+    查询时对任意文本（查询、文档名、未预计算的内容）分词，结果按文本缓存
+
+    :param text: 文本
+    :return: 词项向量
+    """
+    return TokenVector.from_terms(scoring_terms(text))
+
+
+@lru_cache(maxsize=4096)
+def text_keyword_vector(text: str) -> TokenVector:
+    """
+    查询时提取任意文本的关键词词项向量（未预计算的内容），结果按文本缓存
+
+    :param text: 文本
+    :return: 关键词词项向量
+    """
+    return TokenVector.from_terms(extract_keywords(text))
+
+
+class ChunkTokenStore:
+    """
+    分块词项向量存储
+
+    功能：
+    - 写入向量库时为每个分块生成content/title词项向量和关键词词项ID
+    - 按docstore文档ID查询
+    - 与主索引一起保存/加载（chunk_tokens.npz），文件缺失或与docstore不一致时从docstore重建
+    """
+
+    def __init__(self, tokens_config: Dict[str, Any] = None):
+        """
+        初始化分块词项向量存储
+
+        :param tokens_config: 分块词项向量配置（可选，结构同DEFAULT_CHUNK_TOKENS_CONFIG）
+        """
+        self.config = dict(DEFAULT_CHUNK_TOKENS_CONFIG)
+        self.config.update(tokens_config or {})
+        # 文档ID -> {字段: 词项向量}
+        self._vectors: Dict[str, Dict[str, TokenVector]] = {}
+        # 内存中的数据是否与磁盘文件不一致
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用分块词项向量"""
+        return bool(self.config.get('enabled', True))
+
+    def get(self, doc_id: str, field: str = 'content') -> Optional[TokenVector]:
+        """
+        查询分块的词项向量
+
+        :param doc_id: docstore文档ID
+        :param field: 字段（content/title/keywords）
+        :return: 词项向量；不存在时返回None
+        """
+        vectors = self._vectors.get(doc_id)
+        return vectors.get(field) if vectors else None
+
+    def add_documents(self, doc_ids: List[str], metadatas: List[Optional[Dict[str, Any]]],
+                      page_contents: List[str] = None):
+        """
+        为新增文档生成词项向量（相同content只分词一次）
+
+        :param doc_ids: docstore文档ID列表
+        :param metadatas: 元数据列表（与doc_ids一一对应）
+        :param page_contents: page_content列表（可选）
+        """
+        if not self.enabled:
+            return
+        contents = [
+            build_candidate_content(metadata or {}, page_contents[i] if page_contents else '') or ''
+            for i, metadata in enumerate(metadatas[:len(doc_ids)])
+        ]
+        # 相同content只分词一次，content分词批量进行（入库批量较大时使用并行分词）
+        unique_contents = list(dict.fromkeys(contents))
+        content_terms = get_tokenizer().tokenize_batch(
+            [_HTML_TAG_PATTERN.sub(' ', content) for content in unique_contents],
+            search_mode=False, remove_stop_words=False
+        )
+        computed: Dict[str, Dict[str, TokenVector]] = {
+            content: {
+                'content': TokenVector.from_terms(terms),
+                'keywords': TokenVector.from_terms(extract_keywords(content))
+            }
+            for content, terms in zip(unique_contents, content_terms)
+        }
+        for doc_id, metadata, content in zip(doc_ids, metadatas, contents):
+            metadata = metadata or {}
+            vectors = dict(computed[content])
+            title = metadata.get('table_title', metadata.get('title', '')) if metadata.get('chunk_type') == 'table' else ''
+            if title and isinstance(title, str):
+                vectors['title'] = TokenVector.from_terms(scoring_terms(title))
+            self._vectors[doc_id] = vectors
+        self.dirty = True
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        """
+        删除文档的词项向量
+
+        :param doc_ids: docstore文档ID
+        """
+        removed = 0
+        for doc_id in doc_ids:
+            if self._vectors.pop(doc_id, None) is not None:
+                removed += 1
+        if removed:
+            self.dirty = True
+
+    def rebuild(self, docstore: Any) -> int:
+        """
+        遍历docstore重新生成全部词项向量
+
+        :param docstore: LangChain docstore
+        :return: 文档数量
+        """
+        start_time = time.time()
+        self.clear()
+        if not self.enabled:
+            return 0
+        doc_ids, metadatas, page_contents = [], [], []
+        for doc_id, doc in docstore._dict.items():
+            doc_ids.append(doc_id)
+            metadatas.append(doc.metadata if hasattr(doc, 'metadata') else None)
+            page_contents.append(getattr(doc, 'page_content', ''))
+        self.add_documents(doc_ids, metadatas, page_contents)
+        logging.info(f"分块词项向量重建完成，共 {len(self._vectors)} 个文档，耗时 {time.time() - start_time:.2f}s")
+        return len(self._vectors)
+
+    def clear(self):
+        """清空全部词项向量"""
+        self._vectors = {}
+        self.dirty = True
+
+    def save(self, folder_path: str, document_count: int) -> bool:
+        """
+        保存到chunk_tokens.npz（各字段的词项ID和词频拼接为连续数组，按偏移量切分）
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数（加载时用于校验一致性）
+        :return: 是否保存成功
+        """
+        try:
+            doc_ids = list(self._vectors)
+            arrays = {}
+            for field in CHUNK_TOKEN_FIELDS:
+                offsets = [0]
+                ids = array('Q')
+                tfs = array('I')
+                for doc_id in doc_ids:
+                    vector = self._vectors[doc_id].get(field)
+                    if vector is not None:
+                        ids.extend(vector.ids)
+                        tfs.extend(vector.tfs)
+                    offsets.append(len(ids))
+                arrays[f'{field}_ids'] = np.frombuffer(ids, dtype=np.uint64) if ids else np.zeros(0, dtype=np.uint64)
+                arrays[f'{field}_tfs'] = np.frombuffer(tfs, dtype=np.uint32) if tfs else np.zeros(0, dtype=np.uint32)
+                arrays[f'{field}_offsets'] = np.asarray(offsets, dtype=np.int64)
+                arrays[f'{field}_present'] = np.asarray(
+                    [field in self._vectors[doc_id] for doc_id in doc_ids], dtype=np.bool_
+                )
+            header = {
+                'version': CHUNK_TOKENS_VERSION,
+                'document_count': document_count,
+                'tokenizer': get_tokenizer().signature(),
+                'saved_at': time.time(),
+                'doc_ids': doc_ids
+            }
+            arrays['header'] = np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+            tokens_path = os.path.join(folder_path, CHUNK_TOKENS_FILE_NAME)
+            tmp_path = tokens_path + '.tmp.npz'
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, tokens_path)
+            self.dirty = False
+            return True
+
+        except Exception as e:
+            logging.error(f"保存分块词项向量失败: {e}")
+            return False
+
+    def load(self, folder_path: str, document_count: int) -> bool:
+        """
+        从chunk_tokens.npz加载
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数
+        :return: 是否加载成功；文件不存在、版本不符、与docstore不一致或分词规则变化时返回False
+        """
+        tokens_path = os.path.join(folder_path, CHUNK_TOKENS_FILE_NAME)
+        if not os.path.exists(tokens_path):
+            return False
+        try:
+            with np.load(tokens_path) as data:
+                header = json.loads(data['header'].tobytes().decode('utf-8'))
+                if header.get('version') != CHUNK_TOKENS_VERSION:
+                    logging.warning(f"分块词项向量版本不匹配: {header.get('version')}")
+                    return False
+                if header.get('document_count') != document_count:
+                    logging.warning(f"分块词项向量与docstore不一致: 文件={header.get('document_count')}, docstore={document_count}")
+                    return False
+                if header.get('tokenizer') != get_tokenizer().signature():
+                    logging.warning("分词规则已变化，分块词项向量需要重新生成")
+                    return False
+
+                doc_ids = header.get('doc_ids', [])
+                vectors: Dict[str, Dict[str, TokenVector]] = {doc_id: {} for doc_id in doc_ids}
+                for field in CHUNK_TOKEN_FIELDS:
+                    ids = array('Q', data[f'{field}_ids'].astype(np.uint64, copy=False).tobytes())
+                    tfs = array('I', data[f'{field}_tfs'].astype(np.uint32, copy=False).tobytes())
+                    offsets = data[f'{field}_offsets'].tolist()
+                    present = data[f'{field}_present'].tolist()
+                    for i, doc_id in enumerate(doc_ids):
+                        if present[i]:
+                            start, end = offsets[i], offsets[i + 1]
+                            vectors[doc_id][field] = TokenVector(ids[start:end], tfs[start:end])
+        except Exception as e:
+            logging.error(f"读取分块词项向量失败: {e}")
+            return False
+
+        self._vectors = vectors
+        self.dirty = False
+        logging.info(f"分块词项向量加载成功，共 {len(self._vectors)} 个文档")
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取存储状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'enabled': self.enabled,
+            'documents': len(self._vectors),
+            'dirty': self.dirty
+        }
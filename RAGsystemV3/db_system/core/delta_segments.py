@@ -0,0 +1,297 @@
+"""
+向量存储增量段
+
+增量写入不再触发主索引和docstore的整体重写（LSM式布局）：
+- 新向量写入内存中的活动增量段，保存时落盘为deltas/<段名>/下的小型LangChain FAISS索引
+  （index.faiss + index.pkl，即该段的docstore分片）和该段的向量文件行
+- 查询同时搜索主索引和各增量段并合并结果
+- 删除的文档以docstore ID墓碑记录在manifest中，查询时排除，compact时物理删除
+- compact时将增量段并入主索引并整体重写一次，随后删除增量段
+
+deltas/manifest.json记录各段信息及生成时主索引的向量数，主索引被重写后旧的增量段自动失效。
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Set
+
+from .index_partitions import IndexPartitionManager
+
+# 增量段目录名（位于langchain_faiss_index目录下）
+DELTA_DIR_NAME = 'deltas'
+
+# 增量段manifest文件名
+DELTA_MANIFEST_FILE_NAME = 'manifest.json'
+
+# manifest格式版本
+DELTA_MANIFEST_VERSION = 1
+
+# 默认增量段配置
+DEFAULT_DELTA_CONFIG = {
+    'enabled': True,
+    'max_segments': 8,         # 增量段数量超过该值时自动compact
+    'max_delta_ratio': 0.2     # 增量向量数超过主索引该比例时自动compact
+}
+
+
+class DeltaSegment:
+    """
+    单个增量段
+
+    包装一个小型LangChain FAISS实例，记录该段向量在向量文件中的行号范围。
+    """
+
+    def __init__(self, name: str, vector_store: Any, embedding_start: int = 0,
+                 embedding_count: int = 0, persisted: bool = False):
+        """
+        初始化增量段
+
+        :param name: 段名（即目录名）
+        :param vector_store: LangChain FAISS实例
+        :param embedding_start: 该段向量文件的起始行号
+        :param embedding_count: 该段向量文件的行数
+        :param persisted: 是否已落盘（落盘后不再写入）
+        """
+        self.name = name
+        self.vector_store = vector_store
+        self.embedding_start = embedding_start
+        self.embedding_count = embedding_count
+        self.persisted = persisted
+
+    @property
+    def size(self) -> int:
+        """段内向量数量"""
+        return self.vector_store.index.ntotal
+
+    def iter_entries(self) -> Tuple[List[Any], List[Dict[str, Any]], List[str]]:
+        """
+        读取段内的全部向量、元数据和docstore ID（按索引位置顺序）
+
+        :return: (向量列表, 元数据列表, 文档ID列表)
+        """
+        if self.size == 0:
+            return [], [], []
+        all_vectors = self.vector_store.index.reconstruct_n(0, self.size)
+        vectors, metadatas, doc_ids = [], [], []
+        for position in range(self.size):
+            doc_id = self.vector_store.index_to_docstore_id.get(position)
+            if doc_id is None:
+                continue
+            doc = self.vector_store.docstore.search(doc_id)
+            vectors.append(all_vectors[position])
+            metadatas.append(doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {})
+            doc_ids.append(doc_id)
+        return vectors, metadatas, doc_ids
+
+
+class DeltaSegmentStore:
+    """
+    增量段管理
+
+    功能：
+    - 维护增量段列表，最后一个未落盘的段为活动段
+    - 为全部增量段维护独立的(chunk_type, vector_type)分区（flat，常驻内存）
+    - 维护已删除文档的墓碑（docstore ID）
+    - 读写deltas/manifest.json
+    - 判断是否需要compact
+    """
+
+    def __init__(self, filter_fields: List[str] = None, delta_config: Dict[str, Any] = None):
+        """
+        初始化增量段管理
+
+        :param filter_fields: 分区位图预过滤字段（与主索引分区一致）
+        :param delta_config: 增量段配置（可选）
+        """
+        self.config = dict(DEFAULT_DELTA_CONFIG)
+        self.config.update(delta_config or {})
+        self.segments: List[DeltaSegment] = []
+        self.partition_manager = IndexPartitionManager(filter_fields=filter_fields)
+        # 已删除文档的docstore ID（主索引和增量段中均可能存在）
+        self.tombstones: Set[str] = set()
+        self.tombstones_dirty = False
+        # 增量段生成时主索引的向量数和向量文件行数，用于加载时的一致性检查
+        self.base_ntotal = 0
+        self.base_embeddings = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用增量段"""
+        return bool(self.config.get('enabled', True))
+
+    @property
+    def total_vectors(self) -> int:
+        """全部增量段的向量数量"""
+        return sum(segment.size for segment in self.segments)
+
+    @property
+    def active_segment(self) -> Optional[DeltaSegment]:
+        """未落盘的活动段（不存在时返回None）"""
+        if self.segments and not self.segments[-1].persisted:
+            return self.segments[-1]
+        return None
+
+    def clear(self, base_ntotal: int = 0, base_embeddings: int = 0):
+        """
+        清空增量段（主索引重写或重新加载时调用）
+
+        :param base_ntotal: 主索引向量数
+        :param base_embeddings: 主向量文件行数
+        """
+        self.drop_segments()
+        self.tombstones = set()
+        self.tombstones_dirty = False
+        self.base_ntotal = base_ntotal
+        self.base_embeddings = base_embeddings
+
+    def drop_segments(self):
+        """移除全部增量段（已合并到内存中的主索引，墓碑保留）"""
+        self.segments = []
+        self.partition_manager.clear()
+
+    def add_tombstones(self, doc_ids: Set[str]):
+        """
+        记录已删除文档的墓碑
+
+        :param doc_ids: docstore文档ID集合
+        """
+        new_ids = set(doc_ids) - self.tombstones
+        if new_ids:
+            self.tombstones.update(new_ids)
+            self.tombstones_dirty = True
+
+    def new_segment_name(self) -> str:
+        """
+        生成新的段名（按时间排序）
+
+        :return: 段名
+        """
+        return f"segment_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    def add_segment(self, segment: DeltaSegment):
+        """
+        登记增量段，并将段内已有向量加入增量分区
+
+        :param segment: 增量段
+        """
+        self.segments.append(segment)
+        vectors, metadatas, doc_ids = segment.iter_entries()
+        if vectors:
+            self.partition_manager.add_vectors(vectors, metadatas, doc_ids)
+
+    def needs_compaction(self) -> bool:
+        """
+        判断是否需要自动compact
+
+        :return: 是否需要
+        """
+        if not self.segments and not self.tombstones:
+            return False
+        if len(self.segments) > self.config.get('max_segments', DEFAULT_DELTA_CONFIG['max_segments']):
+            return True
+        ratio = self.config.get('max_delta_ratio', DEFAULT_DELTA_CONFIG['max_delta_ratio'])
+        return self.total_vectors + len(self.tombstones) > ratio * max(self.base_ntotal, 1)
+
+    def segment_path(self, folder_path: str, segment: DeltaSegment) -> str:
+        """
+        获取增量段目录
+
+        :param folder_path: 主索引目录
+        :param segment: 增量段
+        :return: 增量段目录
+        """
+        return os.path.join(folder_path, DELTA_DIR_NAME, segment.name)
+
+    def save_manifest(self, folder_path: str) -> bool:
+        """
+        写入manifest（只记录已落盘的段，段文件须先写完）
+
+        :param folder_path: 主索引目录
+        :return: 是否保存成功
+        """
+        try:
+            delta_dir = os.path.join(folder_path, DELTA_DIR_NAME)
+            os.makedirs(delta_dir, exist_ok=True)
+            manifest = {
+                'version': DELTA_MANIFEST_VERSION,
+                'base_ntotal': self.base_ntotal,
+                'base_embeddings': self.base_embeddings,
+                'saved_at': time.time(),
+                'segments': [
+                    {
+                        'name': segment.name,
+                        'count': segment.size,
+                        'embedding_start': segment.embedding_start,
+                        'embedding_count': segment.embedding_count
+                    }
+                    for segment in self.segments if segment.persisted
+                ],
+                'tombstones': sorted(self.tombstones)
+            }
+            manifest_path = os.path.join(delta_dir, DELTA_MANIFEST_FILE_NAME)
+            tmp_path = manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, manifest_path)
+            self.tombstones_dirty = False
+            return True
+
+        except Exception as e:
+            logging.error(f"保存增量段manifest失败: {e}")
+            return False
+
+    def read_manifest(self, folder_path: str, base_ntotal: int, base_embeddings: int) -> Dict[str, Any]:
+        """
+        读取仍然有效的manifest
+
+        :param folder_path: 主索引目录
+        :param base_ntotal: 当前主索引向量数
+        :param base_embeddings: 当前主向量文件行数
+        :return: manifest（包含segments和tombstones）；不存在、版本不符或已随主索引重写而失效时为空字典
+        """
+        manifest_path = os.path.join(folder_path, DELTA_DIR_NAME, DELTA_MANIFEST_FILE_NAME)
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logging.error(f"读取增量段manifest失败: {e}")
+            return {}
+
+        if manifest.get('version') != DELTA_MANIFEST_VERSION:
+            logging.warning(f"增量段manifest版本不匹配: {manifest.get('version')}")
+            return {}
+        if manifest.get('base_ntotal') != base_ntotal or manifest.get('base_embeddings') != base_embeddings:
+            logging.warning(f"增量段与主索引不一致（主索引已重写），忽略增量段: manifest={manifest.get('base_ntotal')}, 主索引={base_ntotal}")
+            return {}
+        return manifest
+
+    def remove_files(self, folder_path: str):
+        """
+        删除磁盘上的全部增量段
+
+        :param folder_path: 主索引目录
+        """
+        delta_dir = os.path.join(folder_path, DELTA_DIR_NAME)
+        if os.path.exists(delta_dir):
+            shutil.rmtree(delta_dir, ignore_errors=True)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取增量段状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'enabled': self.enabled,
+            'segment_count': len(self.segments),
+            'total_vectors': self.total_vectors,
+            'pending_vectors': self.active_segment.size if self.active_segment else 0,
+            'tombstones': len(self.tombstones),
+            'base_ntotal': self.base_ntotal
+        }
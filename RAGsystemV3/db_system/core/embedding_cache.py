@@ -0,0 +1,338 @@
+"""
+查询向量缓存
+
+缓存查询文本的embedding结果，避免相同查询重复调用embedding API：
+- 进程内LRU缓存，键为(输入类型:模型名, 规范化后的文本)；同一文本作为查询和作为文档的向量不同
+  （如DashScope的text_type），输入类型不同的向量互不混用
+- 可选的SQLite磁盘缓存，进程重启后仍然有效
+- 统计命中/未命中次数
+
+CachedEmbeddings包装LangChain Embeddings对象，只有embed_query/embed_queries经过缓存
+（embed_queries中未命中的查询合并为一次底层调用）；embed_documents用于入库，
+直接调用底层模型，避免语料分块占满内存缓存和磁盘缓存。
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+from .embedding_providers import embed_queries
+
+# 默认查询向量缓存配置
+DEFAULT_EMBEDDING_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 10000,      # 内存LRU缓存的最大条目数
+    'disk_cache': {
+        'enabled': False,
+        'path': None           # SQLite文件路径，为空时使用向量数据库目录下的query_embedding_cache.sqlite
+    }
+}
+
+# 默认磁盘缓存文件名
+DISK_CACHE_FILE_NAME = 'query_embedding_cache.sqlite'
+
+# 缓存条目的输入类型（查询向量）
+QUERY_INPUT_TYPE = 'query'
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化缓存键中的文本：NFKC归一（全角转半角等）、合并空白、去除首尾空白
+
+    :param text: 原始文本
+    :return: 规范化后的文本
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    查询向量缓存
+
+    功能：
+    - 内存LRU缓存，超过max_entries时淘汰最久未使用的条目
+    - 可选的磁盘缓存（SQLite），内存未命中时查询磁盘，写入时同时写入磁盘
+    - 线程安全
+    - 命中/未命中统计
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_EMBEDDING_CACHE_CONFIG['max_entries'], disk_path: str = None):
+        """
+        初始化查询向量缓存
+
+        :param max_entries: 内存LRU缓存的最大条目数
+        :param disk_path: 磁盘缓存的SQLite文件路径（可选，为空时不启用磁盘缓存）
+        """
+        self.max_entries = max(int(max_entries), 1)
+        self.disk_path = disk_path
+        self._entries: 'OrderedDict[Tuple[str, str], List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'disk_hits': 0,
+            'evictions': 0
+        }
+        if disk_path:
+            self._open_disk_cache(disk_path)
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], default_dir: str = None) -> Optional['QueryEmbeddingCache']:
+        """
+        根据配置创建缓存
+
+        :param cache_config: 缓存配置（结构同DEFAULT_EMBEDDING_CACHE_CONFIG）
+        :param default_dir: 磁盘缓存的默认目录（配置中未指定路径时使用）
+        :return: 缓存实例；配置未启用时返回None
+        """
+        config = dict(DEFAULT_EMBEDDING_CACHE_CONFIG)
+        config.update(cache_config or {})
+        if not config.get('enabled', True):
+            return None
+
+        disk_path = None
+        disk_config = config.get('disk_cache') or {}
+        if disk_config.get('enabled', False):
+            disk_path = disk_config.get('path')
+            if not disk_path and default_dir:
+                disk_path = os.path.join(default_dir, DISK_CACHE_FILE_NAME)
+        return cls(max_entries=config.get('max_entries', DEFAULT_EMBEDDING_CACHE_CONFIG['max_entries']),
+                   disk_path=disk_path)
+
+    def _open_disk_cache(self, disk_path: str):
+        """
+        打开磁盘缓存，失败时只使用内存缓存
+
+        :param disk_path: SQLite文件路径
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(disk_path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                'model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, '
+                'PRIMARY KEY (model, text))'
+            )
+            self._conn.commit()
+            logging.info(f"查询向量磁盘缓存: {disk_path}")
+        except Exception as e:
+            logging.warning(f"打开查询向量磁盘缓存失败，仅使用内存缓存: {e}")
+            self._conn = None
+
+    @staticmethod
+    def _key(model: str, text: str, input_type: str) -> Tuple[str, str]:
+        """缓存键：(输入类型:模型名, 规范化后的文本)"""
+        return f'{input_type}:{model}', normalize_text(text)
+
+    def get(self, model: str, text: str, input_type: str = QUERY_INPUT_TYPE) -> Optional[List[float]]:
+        """
+        查询缓存
+
+        :param model: 模型名
+        :param text: 文本
+        :param input_type: 输入类型（默认query）
+        :return: 向量；未命中时返回None
+        """
+        key = self._key(model, text, input_type)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return vector
+
+            vector = self._read_disk(key)
+            if vector is not None:
+                self._store_memory(key, vector)
+                self.stats['hits'] += 1
+                self.stats['disk_hits'] += 1
+                return vector
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, model: str, text: str, vector: List[float], input_type: str = QUERY_INPUT_TYPE):
+        """
+        写入缓存（同时写入磁盘缓存）
+
+        :param model: 模型名
+        :param text: 文本
+        :param vector: 向量
+        :param input_type: 输入类型（默认query）
+        """
+        key = self._key(model, text, input_type)
+        vector = list(vector)
+        with self._lock:
+            self._store_memory(key, vector)
+            self._write_disk(key, vector)
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], List[float]],
+                       input_type: str = QUERY_INPUT_TYPE) -> List[float]:
+        """
+        查询缓存，未命中时调用compute生成向量并写入缓存
+
+        :param model: 模型名
+        :param text: 文本
+        :param compute: 向量生成函数，参数为原始文本
+        :param input_type: 输入类型（默认query，compute须生成同一类型的向量）
+        :return: 向量
+        """
+        vector = self.get(model, text, input_type)
+        if vector is None:
+            vector = compute(text)
+            self.put(model, text, vector, input_type)
+        return vector
+
+    def _store_memory(self, key: Tuple[str, str], vector: List[float]):
+        """写入内存LRU缓存并淘汰超出容量的条目（调用方持有锁）"""
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _read_disk(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        """读取磁盘缓存（调用方持有锁）"""
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                'SELECT vector FROM query_embeddings WHERE model = ? AND text = ?', key
+            ).fetchone()
+            if row is None:
+                return None
+            return array('d', row[0]).tolist()
+        except Exception as e:
+            logging.warning(f"读取查询向量磁盘缓存失败: {e}")
+            return None
+
+    def _write_disk(self, key: Tuple[str, str], vector: List[float]):
+        """写入磁盘缓存（调用方持有锁）"""
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO query_embeddings (model, text, vector) VALUES (?, ?, ?)',
+                (key[0], key[1], array('d', vector).tobytes())
+            )
+            self._conn.commit()
+        except Exception as e:
+            logging.warning(f"写入查询向量磁盘缓存失败: {e}")
+
+    def clear(self, include_disk: bool = False):
+        """
+        清空缓存
+
+        :param include_disk: 是否同时清空磁盘缓存
+        """
+        with self._lock:
+            self._entries.clear()
+            if include_disk and self._conn is not None:
+                try:
+                    self._conn.execute('DELETE FROM query_embeddings')
+                    self._conn.commit()
+                except Exception as e:
+                    logging.warning(f"清空查询向量磁盘缓存失败: {e}")
+
+    def close(self):
+        """关闭磁盘缓存"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取缓存状态
+
+        :return: 状态信息字典
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_cache': self.disk_path if self._conn is not None else None,
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'disk_hits': self.stats['disk_hits'],
+                'evictions': self.stats['evictions'],
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带查询向量缓存的Embeddings包装
+
+    对外接口与被包装的LangChain Embeddings一致，其余属性透传给被包装对象。
+    只缓存查询向量；文档向量（入库）不经过缓存。
+    """
+
+    def __init__(self, embeddings: Any, cache: QueryEmbeddingCache, model: str):
+        """
+        初始化包装
+
+        :param embeddings: 被包装的LangChain Embeddings对象
+        :param cache: 查询向量缓存
+        :param model: 模型名（缓存键的一部分）
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        生成查询向量（优先读取缓存）
+
+        :param text: 查询文本
+        :return: 向量
+        """
+        return self.cache.get_or_compute(self.model, text, self.embeddings.embed_query)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量，未命中缓存的查询合并为一次底层调用
+
+        :param texts: 查询文本列表
+        :return: 向量列表（与texts顺序一致）
+        """
+        vectors: List[Optional[List[float]]] = [self.cache.get(self.model, text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = embed_queries(self.embeddings, [texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+                self.cache.put(self.model, texts[i], vectors[i])
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成文档向量（直接调用底层模型，不经过缓存）
+
+        :param texts: 文本列表
+        :return: 向量列表（与texts顺序一致）
+        """
+        return self.embeddings.embed_documents(texts)
+
+    def __getattr__(self, name: str) -> Any:
+        # 只在常规属性查找失败时调用，透传被包装对象的其余属性
+        if name in ('embeddings', 'cache', 'model'):
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
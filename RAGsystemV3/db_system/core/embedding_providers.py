@@ -0,0 +1,497 @@
+"""
+Embedding提供方
+
+入库和查询时的文本、多模态embedding统一由这里创建，通过vectorization.embedding_provider.provider选择：
+- dashscope：DashScope API（默认，需要DASHSCOPE_API_KEY）
+- local：本地CPU模型（sentence-transformers目录或ONNX模型+tokenizer.json），不访问网络
+- hashing：确定性的字符n-gram哈希向量，无模型依赖，用于测试和离线环境的冒烟/基准测试
+
+返回的对象均为LangChain Embeddings（embed_query/embed_documents），本地实现额外提供
+embed_image（图片向量化）和dimension（向量维度）。
+
+批量查询向量统一通过embed_queries生成：DashScope的查询向量与文档向量不同（text_type），
+批量查询不能借用embed_documents。
+"""
+
+import os
+import base64
+import hashlib
+import logging
+import unicodedata
+from typing import Dict, List, Any, Optional, Union, Iterable
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logging.warning("numpy未安装，本地embedding功能将不可用")
+
+try:
+    from langchain_core.embeddings import Embeddings
+    LANGCHAIN_AVAILABLE = True
+except ImportError:
+    Embeddings = object
+    LANGCHAIN_AVAILABLE = False
+
+try:
+    import dashscope
+    from dashscope import MultiModalEmbedding
+    DASHSCOPE_AVAILABLE = True
+except ImportError:
+    DASHSCOPE_AVAILABLE = False
+
+# 支持的embedding提供方
+EMBEDDING_PROVIDERS = ('dashscope', 'local', 'hashing')
+
+# 本地模型后端
+LOCAL_BACKENDS = ('sentence_transformers', 'onnx')
+
+# 默认embedding提供方配置
+DEFAULT_EMBEDDING_PROVIDER_CONFIG = {
+    'provider': 'dashscope',
+    'local': {
+        'model_path': '',          # 文本模型目录（sentence-transformers目录，或包含model.onnx和tokenizer.json的目录）
+        'image_model_path': '',    # 多模态模型目录（sentence-transformers的CLIP类模型），为空时不支持图片向量
+        'backend': 'sentence_transformers',
+        'device': 'cpu',
+        'batch_size': 32,
+        'max_length': 512,
+        'normalize': True
+    },
+    'hashing': {
+        'dimension': 1536,
+        'ngram_range': [1, 3]
+    }
+}
+
+
+def get_embedding_provider_config(config_manager) -> Dict[str, Any]:
+    """
+    读取vectorization.embedding_provider配置并补全默认值
+
+    :param config_manager: 配置管理器
+    :return: 提供方配置（结构同DEFAULT_EMBEDDING_PROVIDER_CONFIG）
+    """
+    configured = config_manager.get('vectorization.embedding_provider', {}) or {}
+    config = {
+        'provider': configured.get('provider', DEFAULT_EMBEDDING_PROVIDER_CONFIG['provider']),
+        'local': dict(DEFAULT_EMBEDDING_PROVIDER_CONFIG['local'], **(configured.get('local') or {})),
+        'hashing': dict(DEFAULT_EMBEDDING_PROVIDER_CONFIG['hashing'], **(configured.get('hashing') or {}))
+    }
+    if config['provider'] not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"不支持的embedding提供方: {config['provider']}，可选: {', '.join(EMBEDDING_PROVIDERS)}")
+    return config
+
+
+def create_text_embeddings(config_manager, model: str) -> Embeddings:
+    """
+    创建文本embedding
+
+    :param config_manager: 配置管理器
+    :param model: DashScope文本模型名（provider为dashscope时使用）
+    :return: LangChain Embeddings
+    """
+    config = get_embedding_provider_config(config_manager)
+    provider = config['provider']
+
+    if provider == 'hashing':
+        return HashingEmbeddings(**config['hashing'])
+
+    if provider == 'local':
+        local_config = dict(config['local'])
+        local_config['model_path'] = _resolve_path(config_manager, local_config.get('model_path'))
+        local_config.pop('image_model_path', None)
+        return LocalEmbeddings(**local_config)
+
+    from langchain_community.embeddings import DashScopeEmbeddings
+    return DashScopeEmbeddings(dashscope_api_key=_get_dashscope_api_key(config_manager), model=model)
+
+
+def create_multimodal_embeddings(config_manager, model: str) -> Embeddings:
+    """
+    创建多模态embedding（查询文本向量化到图片视觉向量空间，本地实现还支持embed_image）
+
+    :param config_manager: 配置管理器
+    :param model: DashScope多模态模型名（provider为dashscope时使用）
+    :return: LangChain Embeddings
+    """
+    config = get_embedding_provider_config(config_manager)
+    provider = config['provider']
+
+    if provider == 'hashing':
+        return HashingEmbeddings(**config['hashing'])
+
+    if provider == 'local':
+        local_config = dict(config['local'])
+        image_model_path = _resolve_path(config_manager, local_config.pop('image_model_path', None))
+        if not image_model_path:
+            raise ValueError("未配置本地多模态模型路径: vectorization.embedding_provider.local.image_model_path")
+        local_config['model_path'] = image_model_path
+        local_config['backend'] = 'sentence_transformers'
+        return LocalEmbeddings(**local_config)
+
+    return DashScopeMultimodalEmbeddings(api_key=_get_dashscope_api_key(config_manager), model=model)
+
+
+def embed_queries(embeddings: Any, texts: List[str]) -> List[List[float]]:
+    """
+    批量生成查询向量（查询侧，与embed_query结果一致）
+
+    - 对象自身提供embed_queries时直接调用
+    - DashScope文本embedding以text_type=query发送一次批量请求
+    - 其余对象逐个调用embed_query
+
+    :param embeddings: LangChain Embeddings
+    :param texts: 查询文本列表
+    :return: 与texts一一对应的查询向量
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    if hasattr(embeddings, 'embed_queries'):
+        return embeddings.embed_queries(texts)
+    try:
+        from langchain_community.embeddings.dashscope import DashScopeEmbeddings, embed_with_retry
+    except ImportError:
+        DashScopeEmbeddings = None
+    if DashScopeEmbeddings is not None and isinstance(embeddings, DashScopeEmbeddings):
+        results = embed_with_retry(embeddings, input=texts, text_type="query", model=embeddings.model)
+        return [item["embedding"] for item in results]
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def _get_dashscope_api_key(config_manager) -> str:
+    """获取DashScope API密钥"""
+    api_key = config_manager.get_environment_manager().get_required_var('DASHSCOPE_API_KEY')
+    if not api_key:
+        raise ValueError("未找到有效的DashScope API密钥")
+    return api_key
+
+
+def _resolve_path(config_manager, path: Optional[str]) -> Optional[str]:
+    """相对路径按项目根目录解析为绝对路径"""
+    if not path or os.path.isabs(path):
+        return path
+    return config_manager.path_manager.get_absolute_path(path)
+
+
+def _read_image_bytes(image_input: Union[str, bytes]) -> bytes:
+    """
+    读取图片内容（本地路径、data URL或二进制数据）
+
+    :param image_input: 图片输入
+    :return: 图片二进制数据
+    """
+    if isinstance(image_input, (bytes, bytearray)):
+        return bytes(image_input)
+    if image_input.startswith('data:image'):
+        return base64.b64decode(image_input.split(',', 1)[-1])
+    if image_input.startswith('http'):
+        raise ValueError(f"本地embedding不支持远程图片: {image_input[:100]}")
+    if not os.path.exists(image_input):
+        raise FileNotFoundError(f"图片文件不存在: {image_input}")
+    with open(image_input, 'rb') as f:
+        return f.read()
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    确定性哈希embedding
+
+    文本按规范化后的字符n-gram做带符号的特征哈希并L2归一化，相同文本在任何环境下得到相同向量，
+    字面重叠越多余弦相似度越高。图片按内容摘要生成固定的随机单位向量（与文本向量空间不对齐）。
+    不依赖模型文件和网络，适用于测试和离线环境。
+    """
+
+    def __init__(self, dimension: int = DEFAULT_EMBEDDING_PROVIDER_CONFIG['hashing']['dimension'],
+                 ngram_range: Iterable[int] = DEFAULT_EMBEDDING_PROVIDER_CONFIG['hashing']['ngram_range']):
+        """
+        初始化哈希embedding
+
+        :param dimension: 向量维度
+        :param ngram_range: 字符n-gram的最小和最大长度
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy未安装，无法初始化哈希embedding")
+        self.dimension = int(dimension)
+        self.min_n, self.max_n = (int(n) for n in ngram_range)
+        self.model_name = f"hashing-{self.dimension}-{self.min_n}-{self.max_n}"
+
+    def _features(self, text: str) -> Iterable[str]:
+        """生成字符n-gram特征"""
+        text = ' '.join(unicodedata.normalize('NFKC', text or '').lower().split())
+        for n in range(self.min_n, self.max_n + 1):
+            for start in range(len(text) - n + 1):
+                yield text[start:start + n]
+
+    def _embed(self, text: str) -> List[float]:
+        """生成单个文本的向量"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text):
+            value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成文本向量
+
+        :param texts: 文本列表
+        :return: 向量列表
+        """
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        生成查询向量
+
+        :param text: 查询文本
+        :return: 向量
+        """
+        return self._embed(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量
+
+        :param texts: 查询文本列表
+        :return: 向量列表
+        """
+        return [self._embed(text) for text in texts]
+
+    def embed_image(self, image_input: Union[str, bytes]) -> List[float]:
+        """
+        生成图片向量（按内容摘要确定的随机单位向量）
+
+        :param image_input: 图片输入（本地路径、data URL或二进制数据）
+        :return: 向量
+        """
+        digest = hashlib.sha256(_read_image_bytes(image_input)).digest()
+        vector = np.random.default_rng(int.from_bytes(digest[:8], 'little')).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    本地CPU embedding模型
+
+    - sentence_transformers后端：加载本地sentence-transformers模型目录，CLIP类模型同时支持图片
+    - onnx后端：onnxruntime加载model.onnx，tokenizers加载tokenizer.json，按attention mask做均值池化
+    模型只从本地路径加载，不访问网络。
+    """
+
+    def __init__(self, model_path: str, backend: str = 'sentence_transformers', device: str = 'cpu',
+                 batch_size: int = 32, max_length: int = 512, normalize: bool = True):
+        """
+        初始化本地embedding模型
+
+        :param model_path: 模型目录（onnx后端也可以是.onnx文件路径）
+        :param backend: 模型后端（sentence_transformers/onnx）
+        :param device: 运行设备（sentence_transformers后端）
+        :param batch_size: 批量推理大小
+        :param max_length: 最大token数
+        :param normalize: 是否L2归一化
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy未安装，无法初始化本地embedding模型")
+        if not model_path or not os.path.exists(model_path):
+            raise ValueError(f"本地embedding模型路径不存在: {model_path}")
+        if backend not in LOCAL_BACKENDS:
+            raise ValueError(f"不支持的本地embedding后端: {backend}，可选: {', '.join(LOCAL_BACKENDS)}")
+
+        self.model_path = model_path
+        self.backend = backend
+        self.device = device
+        self.batch_size = max(int(batch_size), 1)
+        self.max_length = int(max_length)
+        self.normalize = normalize
+        self.model_name = f"local-{backend}:{os.path.basename(os.path.normpath(model_path))}"
+
+        self._model = None
+        self._session = None
+        self._tokenizer = None
+        if backend == 'onnx':
+            self._load_onnx()
+        else:
+            self._load_sentence_transformers()
+        logging.info(f"本地embedding模型加载成功: {model_path}（{backend}），维度: {self.dimension}")
+
+    def _load_sentence_transformers(self):
+        """加载sentence-transformers模型"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("sentence-transformers未安装，无法加载本地embedding模型")
+
+        self._model = SentenceTransformer(self.model_path, device=self.device)
+        if getattr(self._model, 'max_seq_length', None):
+            self._model.max_seq_length = min(self._model.max_seq_length, self.max_length)
+        self.dimension = self._model.get_sentence_embedding_dimension() or len(self._encode(['维度'])[0])
+
+    def _load_onnx(self):
+        """加载ONNX模型和tokenizer"""
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError("onnxruntime或tokenizers未安装，无法加载本地ONNX embedding模型")
+
+        if os.path.isfile(self.model_path):
+            model_file, model_dir = self.model_path, os.path.dirname(self.model_path)
+        else:
+            model_dir = self.model_path
+            candidates = [os.path.join(model_dir, 'model.onnx'), os.path.join(model_dir, 'onnx', 'model.onnx')]
+            model_file = next((path for path in candidates if os.path.exists(path)), None)
+            if model_file is None:
+                raise ValueError(f"模型目录中未找到model.onnx: {model_dir}")
+
+        tokenizer_file = os.path.join(model_dir, 'tokenizer.json')
+        if not os.path.exists(tokenizer_file):
+            raise ValueError(f"模型目录中未找到tokenizer.json: {model_dir}")
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_file)
+        self._tokenizer.enable_truncation(max_length=self.max_length)
+        self._tokenizer.enable_padding()
+        self._session = onnxruntime.InferenceSession(model_file, providers=['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+        self.dimension = len(self._encode(['维度'])[0])
+
+    def _encode(self, texts: List[str]) -> 'np.ndarray':
+        """
+        推理一批文本
+
+        :param texts: 文本列表
+        :return: 向量矩阵
+        """
+        if self._model is not None:
+            return np.asarray(self._model.encode(
+                texts, batch_size=self.batch_size, normalize_embeddings=self.normalize,
+                convert_to_numpy=True, show_progress_bar=False
+            ), dtype=np.float32)
+
+        encodings = self._tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': attention_mask,
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        outputs = self._session.run(None, {name: value for name, value in feeds.items() if name in self._input_names})
+        hidden = outputs[0]
+        if hidden.ndim == 3:
+            # token级输出按attention mask均值池化
+            mask = attention_mask[:, :, None].astype(np.float32)
+            vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        else:
+            vectors = hidden
+        vectors = vectors.astype(np.float32)
+        if self.normalize:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成文本向量
+
+        :param texts: 文本列表
+        :return: 向量列表
+        """
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(list(texts[start:start + self.batch_size])).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        生成查询向量
+
+        :param text: 查询文本
+        :return: 向量
+        """
+        return self._encode([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量
+
+        :param texts: 查询文本列表
+        :return: 向量列表
+        """
+        return self.embed_documents(texts)
+
+    def embed_image(self, image_input: Union[str, bytes]) -> List[float]:
+        """
+        生成图片向量（需要sentence-transformers的CLIP类多模态模型）
+
+        :param image_input: 图片输入（本地路径、data URL或二进制数据）
+        :return: 向量
+        """
+        if self._model is None:
+            raise RuntimeError("ONNX后端不支持图片向量化")
+        try:
+            import io
+            from PIL import Image
+        except ImportError:
+            raise RuntimeError("Pillow未安装，无法进行本地图片向量化")
+
+        image = Image.open(io.BytesIO(_read_image_bytes(image_input))).convert('RGB')
+        vectors = self._model.encode([image], normalize_embeddings=self.normalize,
+                                     convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)[0].tolist()
+
+
+class DashScopeMultimodalEmbeddings(Embeddings):
+    """
+    DashScope多模态embedding的查询文本向量化（MultiModalEmbedding API，纯文本输入）
+    """
+
+    def __init__(self, api_key: str, model: str):
+        """
+        初始化DashScope多模态embedding
+
+        :param api_key: DashScope API密钥
+        :param model: 多模态模型名
+        """
+        if not DASHSCOPE_AVAILABLE:
+            raise RuntimeError("DashScope未安装，无法使用多模态embedding")
+        dashscope.api_key = api_key
+        self.model = model
+        self.model_name = model
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        生成查询文本在多模态向量空间中的向量
+
+        :param text: 查询文本
+        :return: 向量
+        """
+        result = MultiModalEmbedding.call(
+            model=self.model,
+            input=[{'text': text}],
+            auto_truncation=True
+        )
+        if result.status_code != 200:
+            raise Exception(f"多模态模型调用失败: {result.message}")
+        return result.output["embedding"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成查询文本向量
+
+        :param texts: 文本列表
+        :return: 向量列表
+        """
+        return [self.embed_query(text) for text in texts]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成查询文本向量
+
+        :param texts: 查询文本列表
+        :return: 向量列表
+        """
+        return [self.embed_query(text) for text in texts]
@@ -0,0 +1,295 @@
+"""
+向量文件存储
+
+将文档元数据中的原始向量（text_embedding、image_embedding等）移出pickle的docstore，
+统一保存为连续的float32矩阵文件（embeddings.npy），加载时以内存映射方式打开。
+元数据中只保留 embedding_offsets: {字段名: 行号}。
+增量段的向量保存在各自目录下的embeddings.npy中，行号在主文件之后连续编号。
+"""
+
+import os
+import bisect
+import hashlib
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logging.warning("numpy未安装，向量文件存储功能将不可用")
+
+# 向量文件名（位于langchain_faiss_index目录下）
+EMBEDDING_FILE_NAME = 'embeddings.npy'
+
+# 元数据中记录向量行号的字段
+OFFSETS_FIELD = 'embedding_offsets'
+
+# 需要移出元数据的向量字段
+EMBEDDING_FIELDS = ['text_embedding', 'table_embedding', 'image_embedding', 'description_embedding']
+
+
+class EmbeddingStore:
+    """
+    向量文件存储
+
+    功能：
+    - 追加写入向量，返回行号
+    - 已保存部分以只读内存映射方式访问，新追加部分保存在内存中
+    - 保存时合并为单个.npy文件；增量保存时只写出新追加部分
+    """
+
+    def __init__(self):
+        """初始化向量文件存储"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy未安装，无法初始化向量文件存储")
+
+        self.dimension: Optional[int] = None
+        # 已落盘的向量块（主文件和各增量段文件，均为内存映射）及其起始行号
+        self._blocks: List['np.ndarray'] = []
+        self._block_starts: List[int] = []
+        self._pending: List['np.ndarray'] = []
+
+    @property
+    def base_count(self) -> int:
+        """已落盘的向量数量"""
+        if not self._blocks:
+            return 0
+        return self._block_starts[-1] + self._blocks[-1].shape[0]
+
+    @property
+    def size(self) -> int:
+        """向量总数"""
+        return self.base_count + len(self._pending)
+
+    def clear(self):
+        """清空存储"""
+        self.dimension = None
+        self._blocks = []
+        self._block_starts = []
+        self._pending = []
+
+    def append(self, vector: List[float]) -> Optional[int]:
+        """
+        追加一个向量
+
+        :param vector: 向量
+        :return: 行号；维度与已有向量不一致时返回None
+        """
+        array = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self.dimension is None:
+            self.dimension = array.shape[0]
+        elif array.shape[0] != self.dimension:
+            logging.warning(f"向量维度({array.shape[0]})与向量文件维度({self.dimension})不一致")
+            return None
+        self._pending.append(array)
+        return self.size - 1
+
+    def get(self, offset: int) -> Optional['np.ndarray']:
+        """
+        按行号读取向量
+
+        :param offset: 行号
+        :return: float32向量；行号无效时返回None
+        """
+        if offset is None or offset < 0 or offset >= self.size:
+            return None
+        if offset < self.base_count:
+            block = bisect.bisect_right(self._block_starts, offset) - 1
+            return np.asarray(self._blocks[block][offset - self._block_starts[block]])
+        return self._pending[offset - self.base_count]
+
+    def externalize(self, metadata: Dict[str, Any], cache: Dict[bytes, int] = None) -> Dict[str, Any]:
+        """
+        将元数据中的向量字段写入存储，返回只含行号的元数据副本
+
+        :param metadata: 原始元数据（不会被修改）
+        :param cache: 同一批次内的向量去重表（向量摘要 -> 行号，可选）
+        :return: 新的元数据
+        """
+        if not metadata or not any(isinstance(metadata.get(field), (list, tuple)) for field in EMBEDDING_FIELDS):
+            return metadata
+
+        result = dict(metadata)
+        offsets = dict(result.get(OFFSETS_FIELD) or {})
+        for field in EMBEDDING_FIELDS:
+            value = result.get(field)
+            if not isinstance(value, (list, tuple)):
+                continue
+            del result[field]
+            if not value:
+                continue
+
+            # 同一图片的visual/description两条记录携带相同向量，批内只存一份
+            key = hashlib.sha1(np.asarray(value, dtype=np.float32).tobytes()).digest() if cache is not None else None
+            offset = cache.get(key) if key is not None else None
+            if offset is None:
+                offset = self.append(value)
+                if offset is None:
+                    # 维度不一致的向量保留在元数据中
+                    result[field] = value
+                    continue
+                if key is not None:
+                    cache[key] = offset
+            offsets[field] = offset
+
+        if offsets:
+            result[OFFSETS_FIELD] = offsets
+        return result
+
+    def retain(self, offsets: Iterable[int]) -> Dict[int, int]:
+        """
+        只保留指定行（丢弃已删除文档的向量），剩余行按原顺序重新编号并读入内存，随后需调用save()
+
+        :param offsets: 需保留的行号
+        :return: 旧行号 -> 新行号
+        """
+        kept = sorted(set(offset for offset in offsets if offset is not None and 0 <= offset < self.size))
+        rows = [np.array(self.get(offset), dtype=np.float32) for offset in kept]
+        dimension = self.dimension
+        self.clear()
+        self.dimension = dimension if rows else None
+        self._pending = rows
+        return {offset: new_offset for new_offset, offset in enumerate(kept)}
+
+    def save(self, folder_path: str) -> bool:
+        """
+        保存为embeddings.npy（先写临时文件再替换）
+
+        :param folder_path: 保存目录
+        :return: 是否保存成功
+        """
+        try:
+            file_path = os.path.join(folder_path, EMBEDDING_FILE_NAME)
+            if self.size == 0:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return True
+
+            # 读入内存并释放映射，否则Windows下无法替换被映射的文件
+            parts = [np.array(block) for block in self._blocks]
+            if self._pending:
+                parts.append(np.vstack(self._pending))
+            matrix = np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+            self._blocks = []
+            self._block_starts = []
+
+            self._write_matrix(file_path, matrix)
+            self._blocks = [np.load(file_path, mmap_mode='r')]
+            self._block_starts = [0]
+            self._pending = []
+            logging.info(f"向量文件保存成功: {matrix.shape[0]} 个向量")
+            return True
+
+        except Exception as e:
+            logging.error(f"保存向量文件失败: {e}")
+            return False
+
+    def save_segment(self, folder_path: str) -> Tuple[int, int]:
+        """
+        只保存尚未落盘的向量（增量段），已有文件保持不变
+
+        :param folder_path: 增量段目录
+        :return: (起始行号, 行数)
+        """
+        start = self.base_count
+        if not self._pending:
+            return start, 0
+
+        os.makedirs(folder_path, exist_ok=True)
+        file_path = os.path.join(folder_path, EMBEDDING_FILE_NAME)
+        matrix = np.ascontiguousarray(np.vstack(self._pending), dtype=np.float32)
+        self._write_matrix(file_path, matrix)
+        self._blocks.append(np.load(file_path, mmap_mode='r'))
+        self._block_starts.append(start)
+        self._pending = []
+        logging.info(f"增量向量文件保存成功: {matrix.shape[0]} 个向量，起始行号 {start}")
+        return start, matrix.shape[0]
+
+    def _write_matrix(self, file_path: str, matrix: 'np.ndarray'):
+        """
+        写入.npy文件（先写临时文件再替换）
+
+        :param file_path: 目标文件
+        :param matrix: float32矩阵
+        """
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, file_path)
+
+    def load(self, folder_path: str) -> bool:
+        """
+        以只读内存映射方式加载embeddings.npy
+
+        :param folder_path: 向量文件所在目录
+        :return: 是否加载成功（文件不存在时为空存储，返回True）
+        """
+        self.clear()
+        file_path = os.path.join(folder_path, EMBEDDING_FILE_NAME)
+        if not os.path.exists(file_path):
+            return True
+        try:
+            block = self._open_block(file_path)
+            self._blocks = [block]
+            self._block_starts = [0]
+            self.dimension = block.shape[1]
+            logging.info(f"向量文件加载成功: {block.shape[0]} 个向量")
+            return True
+        except Exception as e:
+            logging.error(f"加载向量文件失败: {e}")
+            self.clear()
+            return False
+
+    def load_segment(self, folder_path: str, start: int, count: int) -> bool:
+        """
+        以只读内存映射方式追加一个增量段的向量文件
+
+        :param folder_path: 增量段目录
+        :param start: 增量段的起始行号（必须与当前向量总数一致）
+        :param count: 增量段的行数
+        :return: 是否加载成功
+        """
+        if start != self.size:
+            logging.error(f"增量向量文件起始行号({start})与当前向量数({self.size})不一致")
+            return False
+        if count == 0:
+            return True
+        try:
+            block = self._open_block(os.path.join(folder_path, EMBEDDING_FILE_NAME))
+            if block.shape[0] != count or (self.dimension is not None and block.shape[1] != self.dimension):
+                raise ValueError(f"增量向量文件形状异常: {block.shape}")
+            self._blocks.append(block)
+            self._block_starts.append(start)
+            self.dimension = block.shape[1]
+            return True
+        except Exception as e:
+            logging.error(f"加载增量向量文件失败: {e}")
+            return False
+
+    def _open_block(self, file_path: str) -> 'np.ndarray':
+        """
+        以只读内存映射方式打开.npy文件
+
+        :param file_path: 文件路径
+        :return: 二维float32矩阵
+        """
+        block = np.load(file_path, mmap_mode='r')
+        if block.ndim != 2:
+            raise ValueError(f"向量文件形状异常: {block.shape}")
+        return block
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取存储状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'dimension': self.dimension,
+            'total_vectors': self.size,
+            'persisted_vectors': self.base_count,
+            'pending_vectors': len(self._pending),
+            'files': len(self._blocks)
+        }
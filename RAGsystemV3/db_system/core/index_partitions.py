@@ -0,0 +1,866 @@
+"""
+向量索引分区管理器
+
+按(chunk_type, vector_type)为向量存储维护独立的FAISS子索引。
+带类型的查询只扫描自身分区，不再在混合索引中过量召回后再丢弃其他类型的结果。
+所有分区通过同一个manifest与主索引一起保存和加载。
+分区内为常用元数据字段的每个取值维护位图，过滤查询通过IDSelector在索引内部预过滤，top-k在过滤范围内精确。
+分区索引类型可配置为flat、IVF-Flat、IVF-PQ或HNSW，由optimize重建并报告recall@k。
+"""
+
+import os
+import json
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple, Set, Iterable
+
+try:
+    import numpy as np
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+    logging.warning("FAISS未安装，向量索引分区功能将不可用")
+
+# 分区文件目录和manifest文件名（位于langchain_faiss_index目录下）
+PARTITION_DIR_NAME = 'partitions'
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# 不参与分区的内部chunk类型（如创建空库时的初始化文本）
+EXCLUDED_CHUNK_TYPES = {'system'}
+
+# 由分区选择本身满足的过滤字段
+PARTITION_FIELDS = {'chunk_type', 'vector_type'}
+
+# 默认建立取值位图的元数据字段（可通过vector_store.filter_fields配置覆盖）
+DEFAULT_FILTER_FIELDS = ['document_name', 'parent_table_id', 'table_id', 'image_id', 'is_subtable']
+
+# 支持的分区索引类型
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw')
+
+# 分区索引默认参数（可通过vector_store.index配置覆盖）
+DEFAULT_INDEX_CONFIG = {
+    'type': 'flat',
+    'min_vectors': 10000,       # 向量数少于该值的分区保持flat
+    'nlist': 1024,              # IVF聚类中心数
+    'nprobe': 16,               # IVF查询时扫描的聚类数
+    'pq_m': 64,                 # PQ子空间数（需整除向量维度）
+    'pq_nbits': 8,              # PQ每个子空间的编码位数
+    'hnsw_m': 32,               # HNSW每个节点的邻居数
+    'ef_construction': 200,     # HNSW构建时的候选队列长度
+    'ef_search': 64,            # HNSW查询时的候选队列长度
+    'recall_k': 10,             # recall@k评估的k
+    'recall_sample_size': 200   # recall@k评估的采样查询数
+}
+
+
+def make_partition_key(chunk_type: str, vector_type: str) -> str:
+    """
+    生成分区键（同时用作分区文件名前缀）
+
+    :param chunk_type: 内容类型
+    :param vector_type: 向量类型
+    :return: 分区键
+    """
+    return f"{chunk_type or 'unknown'}__{vector_type or 'unknown'}"
+
+
+def normalize_vectors(vectors: Any) -> 'np.ndarray':
+    """
+    将向量转换为float32矩阵并做L2归一化，使内积等于余弦相似度
+
+    :param vectors: 向量或向量列表
+    :return: 归一化后的(n, d)矩阵
+    """
+    matrix = np.array(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    matrix = np.ascontiguousarray(matrix)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+def build_factory_string(index_type: str, dimension: int, count: int, index_config: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    根据配置生成FAISS index_factory描述串
+
+    :param index_type: 索引类型
+    :param dimension: 向量维度
+    :param count: 训练向量数量
+    :param index_config: 索引参数
+    :return: (factory描述串, 实际使用的索引类型)
+    """
+    if index_type == 'flat' or count < index_config['min_vectors']:
+        return 'Flat', 'flat'
+
+    if index_type == 'hnsw':
+        return f"HNSW{index_config['hnsw_m']},Flat", 'hnsw'
+
+    # 每个聚类中心至少需要约39个训练向量
+    nlist = max(1, min(index_config['nlist'], count // 39))
+    if index_type == 'ivf_pq':
+        pq_m = index_config['pq_m']
+        if dimension % pq_m == 0:
+            return f"IVF{nlist},PQ{pq_m}x{index_config['pq_nbits']}", 'ivf_pq'
+        logging.warning(f"PQ子空间数({pq_m})不能整除向量维度({dimension})，改用IVF-Flat")
+    return f"IVF{nlist},Flat", 'ivf_flat'
+
+
+def apply_search_params(index: Any, index_config: Dict[str, Any]):
+    """
+    设置索引的查询参数（nprobe / efSearch）
+
+    :param index: FAISS索引
+    :param index_config: 索引参数
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(index_config['nprobe'], ivf.nlist)
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = index_config['ef_search']
+
+
+class IndexPartition:
+    """
+    单个(chunk_type, vector_type)分区
+
+    使用内积索引保存归一化向量，搜索分数即余弦相似度。
+    docstore_ids[i] 为分区内第i个向量对应的docstore文档ID。
+    value_positions[field][value] 为该字段取该值的分区内位置列表，按需打包为FAISS位图。
+    deleted_positions 为已删除（墓碑）的分区内位置，搜索时通过位图排除，compact时物理删除。
+    """
+
+    def __init__(self, chunk_type: str, vector_type: str, dimension: int, index: Any = None,
+                 filter_fields: List[str] = None, index_type: str = 'flat'):
+        """
+        初始化分区
+
+        :param chunk_type: 内容类型
+        :param vector_type: 向量类型
+        :param dimension: 向量维度
+        :param index: 已有的FAISS索引（可选，默认新建IndexFlatIP）
+        :param filter_fields: 建立取值位图的元数据字段
+        :param index_type: 索引类型（flat/ivf_flat/ivf_pq/hnsw）
+        """
+        self.chunk_type = chunk_type
+        self.vector_type = vector_type
+        self.dimension = dimension
+        self.index = index if index is not None else faiss.IndexFlatIP(dimension)
+        self.index_type = index_type if index is not None else 'flat'
+        self.docstore_ids: List[str] = []
+        self.filter_fields = list(filter_fields if filter_fields is not None else DEFAULT_FILTER_FIELDS)
+        self.value_positions: Dict[str, Dict[Any, List[int]]] = {field: {} for field in self.filter_fields}
+        self._bitmap_cache: Dict[Tuple[str, Any], 'np.ndarray'] = {}
+        self.deleted_positions: Set[int] = set()
+        self._live_bitmap: Optional['np.ndarray'] = None
+
+    @property
+    def key(self) -> str:
+        """分区键"""
+        return make_partition_key(self.chunk_type, self.vector_type)
+
+    @property
+    def size(self) -> int:
+        """分区内向量数量"""
+        return len(self.docstore_ids)
+
+    @property
+    def live_size(self) -> int:
+        """分区内未删除的向量数量"""
+        return self.size - len(self.deleted_positions)
+
+    def add(self, vectors: 'np.ndarray', docstore_ids: List[str], metadatas: List[Dict[str, Any]] = None):
+        """
+        添加已归一化的向量
+
+        :param vectors: (n, d)归一化向量矩阵
+        :param docstore_ids: 对应的docstore文档ID
+        :param metadatas: 对应的元数据（用于更新取值位图）
+        """
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"分区 {self.key} 维度不匹配: 期望 {self.dimension}, 实际 {vectors.shape[1]}")
+        start = self.size
+        self.index.add(vectors)
+        self.docstore_ids.extend(docstore_ids)
+        self._live_bitmap = None
+        if metadatas:
+            self.index_metadata(metadatas, start)
+
+    def index_metadata(self, metadatas: List[Dict[str, Any]], start: int = 0):
+        """
+        记录元数据取值对应的分区内位置
+
+        :param metadatas: 元数据列表，第i项对应分区内位置start+i
+        :param start: 起始位置
+        """
+        for offset, metadata in enumerate(metadatas):
+            if not metadata:
+                continue
+            for field in self.filter_fields:
+                value = metadata.get(field)
+                if value is None or not isinstance(value, (str, int, float, bool)):
+                    continue
+                self.value_positions[field].setdefault(value, []).append(start + offset)
+        # 位置有变化，已打包的位图全部失效
+        self._bitmap_cache = {}
+
+    def reset_metadata_index(self):
+        """清空取值位图"""
+        self.value_positions = {field: {} for field in self.filter_fields}
+        self._bitmap_cache = {}
+
+    def delete(self, positions: Iterable[int]):
+        """
+        将分区内位置标记为已删除（搜索时排除）
+
+        :param positions: 分区内位置
+        """
+        self.deleted_positions.update(positions)
+        self._live_bitmap = None
+
+    def purge_deleted(self) -> bool:
+        """
+        物理删除已标记的向量
+
+        flat索引按位置删除后保持剩余向量顺序，直接删除；ANN索引无法保持位置连续，
+        只更新docstore_ids，由调用方从主索引重建索引。删除后取值位图需重建。
+
+        :return: 索引是否已同步删除（False表示需要重建索引）
+        """
+        if not self.deleted_positions:
+            return True
+
+        deleted = self.deleted_positions
+        self.docstore_ids = [doc_id for position, doc_id in enumerate(self.docstore_ids) if position not in deleted]
+        purged = self.index_type == 'flat' and isinstance(self.index, faiss.IndexFlat)
+        if purged:
+            self.index.remove_ids(np.array(sorted(deleted), dtype=np.int64))
+        self.deleted_positions = set()
+        self._live_bitmap = None
+        self.reset_metadata_index()
+        return purged
+
+    def _get_live_bitmap(self) -> 'np.ndarray':
+        """
+        获取未删除位置的打包位图
+
+        :return: uint8位图
+        """
+        if self._live_bitmap is None:
+            mask = np.ones(self.size, dtype=bool)
+            mask[list(self.deleted_positions)] = False
+            self._live_bitmap = np.packbits(mask, bitorder='little')
+        return self._live_bitmap
+
+    def _value_bitmap(self, field: str, value: Any) -> 'np.ndarray':
+        """
+        获取单个字段取值的打包位图（FAISS IDSelectorBitmap格式，低位在前）
+
+        :param field: 字段名
+        :param value: 字段取值
+        :return: uint8位图
+        """
+        cache_key = (field, value)
+        bitmap = self._bitmap_cache.get(cache_key)
+        if bitmap is None:
+            mask = np.zeros(self.size, dtype=bool)
+            positions = self.value_positions.get(field, {}).get(value)
+            if positions:
+                mask[positions] = True
+            bitmap = np.packbits(mask, bitorder='little')
+            self._bitmap_cache[cache_key] = bitmap
+        return bitmap
+
+    def build_bitmap(self, conditions: Dict[str, Any]) -> Tuple[Optional['np.ndarray'], int]:
+        """
+        将过滤条件转换为允许位置的位图
+
+        :param conditions: 字段过滤条件（字段必须都在filter_fields中）
+        :return: (uint8位图, 允许的向量数量)；无条件且无删除时位图为None
+        """
+        if not conditions:
+            if not self.deleted_positions:
+                return None, self.size
+            return self._get_live_bitmap(), self.live_size
+
+        bitmap = None
+        for field, value in conditions.items():
+            positions = self.value_positions.get(field, {}).get(value)
+            if not positions:
+                return None, 0
+            value_bitmap = self._value_bitmap(field, value)
+            bitmap = value_bitmap if bitmap is None else np.bitwise_and(bitmap, value_bitmap)
+
+        if self.deleted_positions:
+            bitmap = np.bitwise_and(bitmap, self._get_live_bitmap())
+            allowed = int(np.unpackbits(bitmap, bitorder='little').sum())
+        elif len(conditions) == 1:
+            allowed = len(self.value_positions[field][value])
+        else:
+            allowed = int(np.unpackbits(bitmap, bitorder='little').sum())
+        return bitmap, allowed
+
+    def search(self, query_vectors: 'np.ndarray', k: int, conditions: Dict[str, Any] = None) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        在分区内搜索
+
+        :param query_vectors: (nq, d)归一化查询向量
+        :param k: 返回数量
+        :param conditions: 元数据过滤条件（可选，通过IDSelector在索引内预过滤）
+        :return: (相似度矩阵, 分区内位置矩阵)，无效位置为-1
+        """
+        bitmap, allowed = self.build_bitmap(conditions)
+        k = min(k, allowed)
+        if k <= 0:
+            nq = query_vectors.shape[0]
+            return np.zeros((nq, 0), dtype=np.float32), np.zeros((nq, 0), dtype=np.int64)
+        if bitmap is None:
+            return self.index.search(query_vectors, k)
+
+        # 位图需在搜索期间保持存活，selector只持有其指针
+        selector = faiss.IDSelectorBitmap(self.size, faiss.swig_ptr(bitmap))
+        return self.index.search(query_vectors, k, params=self._search_params(selector))
+
+    def range_search(self, query_vector: 'np.ndarray', threshold: float, conditions: Dict[str, Any] = None) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        在分区内做范围搜索，返回余弦相似度大于阈值的全部向量
+
+        :param query_vector: (1, d)归一化查询向量
+        :param threshold: 余弦相似度阈值（内积索引返回严格大于该值的结果）
+        :param conditions: 元数据过滤条件（可选，通过IDSelector在索引内预过滤）
+        :return: (相似度数组, 分区内位置数组)
+        """
+        bitmap, allowed = self.build_bitmap(conditions)
+        if allowed <= 0 or self.size == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        if bitmap is None:
+            _, scores, positions = self.index.range_search(query_vector, threshold)
+        else:
+            selector = faiss.IDSelectorBitmap(self.size, faiss.swig_ptr(bitmap))
+            _, scores, positions = self.index.range_search(query_vector, threshold, params=self._search_params(selector))
+        return scores, positions
+
+    def _search_params(self, selector: Any) -> Any:
+        """
+        构造带IDSelector的查询参数（显式传参时需带上索引自身的nprobe/efSearch，否则会退回默认值）
+
+        :param selector: FAISS IDSelector
+        :return: FAISS SearchParameters
+        """
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        if hasattr(self.index, 'hnsw'):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+        return faiss.SearchParameters(sel=selector)
+
+
+class IndexPartitionManager:
+    """
+    向量索引分区管理器
+
+    功能：
+    - 按(chunk_type, vector_type)维护独立子索引
+    - 根据过滤条件确定需要扫描的分区
+    - 元数据过滤通过取值位图在分区索引内预过滤
+    - 跨分区合并搜索结果
+    - 通过manifest统一保存和加载所有分区
+    - 旧版本向量库缺少分区文件时从主索引重建
+    - 按配置将分区重建为IVF/HNSW/PQ索引并评估recall@k
+    - 按docstore ID标记删除，compact时物理删除
+    """
+
+    def __init__(self, filter_fields: List[str] = None, index_config: Dict[str, Any] = None):
+        """
+        初始化分区管理器
+
+        :param filter_fields: 建立取值位图的元数据字段（可选）
+        :param index_config: 分区索引参数（可选，未指定的项使用默认值）
+        """
+        if not FAISS_AVAILABLE:
+            raise RuntimeError("FAISS未安装，无法初始化向量索引分区管理器")
+
+        self.filter_fields = list(filter_fields if filter_fields is not None else DEFAULT_FILTER_FIELDS)
+        self.index_config = dict(DEFAULT_INDEX_CONFIG)
+        self.index_config.update(index_config or {})
+        if self.index_config['type'] not in INDEX_TYPES:
+            logging.warning(f"不支持的分区索引类型: {self.index_config['type']}，使用flat")
+            self.index_config['type'] = 'flat'
+        self.partitions: Dict[str, IndexPartition] = {}
+        self.last_update_time = None
+
+    def clear(self):
+        """清空所有分区"""
+        self.partitions = {}
+        self.last_update_time = time.time()
+
+    @property
+    def total_vectors(self) -> int:
+        """所有分区的向量总数"""
+        return sum(partition.size for partition in self.partitions.values())
+
+    def add_vectors(self, vectors: List[List[float]], metadatas: List[Dict[str, Any]], docstore_ids: List[str]) -> int:
+        """
+        按元数据中的chunk_type和vector_type将向量分配到各分区
+
+        :param vectors: 向量列表
+        :param metadatas: 元数据列表
+        :param docstore_ids: docstore文档ID列表
+        :return: 加入分区的向量数量
+        """
+        if not (len(vectors) == len(metadatas) == len(docstore_ids)):
+            raise ValueError("向量、元数据和文档ID数量不匹配")
+
+        # 先按分区分组，保证每个分区只调用一次index.add
+        groups: Dict[str, Dict[str, Any]] = {}
+        for vector, metadata, doc_id in zip(vectors, metadatas, docstore_ids):
+            chunk_type = metadata.get('chunk_type', 'unknown')
+            if chunk_type in EXCLUDED_CHUNK_TYPES:
+                continue
+            vector_type = metadata.get('vector_type', 'unknown')
+            key = make_partition_key(chunk_type, vector_type)
+            group = groups.setdefault(key, {
+                'chunk_type': chunk_type,
+                'vector_type': vector_type,
+                'vectors': [],
+                'ids': [],
+                'metadatas': []
+            })
+            group['vectors'].append(vector)
+            group['ids'].append(doc_id)
+            group['metadatas'].append(metadata)
+
+        added = 0
+        for key, group in groups.items():
+            matrix = normalize_vectors(group['vectors'])
+            partition = self.partitions.get(key)
+            if partition is None:
+                partition = IndexPartition(group['chunk_type'], group['vector_type'], matrix.shape[1],
+                                           filter_fields=self.filter_fields)
+                self.partitions[key] = partition
+            partition.add(matrix, group['ids'], group['metadatas'])
+            added += len(group['ids'])
+
+        self.last_update_time = time.time()
+        return added
+
+    def delete_ids(self, doc_ids: Set[str]) -> int:
+        """
+        将docstore ID对应的向量标记为已删除
+
+        :param doc_ids: docstore文档ID集合
+        :return: 标记删除的向量数量
+        """
+        deleted = 0
+        for partition in self.partitions.values():
+            positions = [
+                position for position, doc_id in enumerate(partition.docstore_ids)
+                if doc_id in doc_ids and position not in partition.deleted_positions
+            ]
+            if positions:
+                partition.delete(positions)
+                deleted += len(positions)
+        return deleted
+
+    def purge_deleted(self, vector_store: Any) -> int:
+        """
+        物理删除所有分区中已标记删除的向量（主索引须已删除对应向量）
+
+        :param vector_store: LangChain FAISS实例（ANN分区从中取回剩余向量重建）
+        :return: 删除的向量数量
+        """
+        purged = 0
+        stale = []
+        for key, partition in list(self.partitions.items()):
+            if not partition.deleted_positions:
+                continue
+            purged += len(partition.deleted_positions)
+            rebuilt = partition.purge_deleted()
+            if partition.size == 0:
+                del self.partitions[key]
+            elif not rebuilt:
+                stale.append(partition)
+
+        if stale:
+            positions_by_id = {doc_id: position for position, doc_id in vector_store.index_to_docstore_id.items()}
+            for partition in stale:
+                factory, _ = self._rebuild_partition_index(partition, vector_store.index, positions_by_id)
+                logging.info(f"分区 {partition.key} 删除向量后重建为 {factory}")
+        self.last_update_time = time.time()
+        return purged
+
+    def resolve_partitions(self, filter_dict: Optional[Dict[str, Any]]) -> Optional[List[IndexPartition]]:
+        """
+        根据过滤条件确定需要扫描的分区
+
+        :param filter_dict: 过滤条件
+        :return: 分区列表；过滤条件既不包含chunk_type/vector_type、也无法由位图预过滤时返回None（需扫描主索引）
+        """
+        if not filter_dict:
+            return None
+
+        chunk_type = filter_dict.get('chunk_type')
+        vector_type = filter_dict.get('vector_type')
+        if chunk_type is None and vector_type is None and not self.covers_filter(filter_dict):
+            return None
+
+        return [
+            partition for partition in self.partitions.values()
+            if (chunk_type is None or partition.chunk_type == chunk_type)
+            and (vector_type is None or partition.vector_type == vector_type)
+        ]
+
+    def covers_filter(self, filter_dict: Optional[Dict[str, Any]]) -> bool:
+        """
+        判断过滤条件是否完全由分区选择和取值位图满足（无需再做元数据后过滤）
+
+        :param filter_dict: 过滤条件
+        :return: 是否完全满足
+        """
+        if not filter_dict:
+            return False
+        for field, value in filter_dict.items():
+            if field in PARTITION_FIELDS:
+                continue
+            if field not in self.filter_fields:
+                return False
+            if value is None or not isinstance(value, (str, int, float, bool)):
+                return False
+        return True
+
+    def search(self, query_vector: List[float], k: int, partitions: List[IndexPartition],
+               filter_dict: Dict[str, Any] = None) -> List[Tuple[str, float]]:
+        """
+        在指定分区中搜索并合并结果
+
+        :param query_vector: 查询向量（未归一化）
+        :param k: 返回数量
+        :param partitions: 需要扫描的分区
+        :param filter_dict: 过滤条件（可选，须满足covers_filter，位图字段在索引内预过滤）
+        :return: [(docstore_id, 余弦相似度)]，按相似度降序
+        """
+        return self.search_batch([query_vector], k, partitions, filter_dict)[0]
+
+    def search_batch(self, query_vectors: List[List[float]], k: int, partitions: List[IndexPartition],
+                     filter_dict: Dict[str, Any] = None) -> List[List[Tuple[str, float]]]:
+        """
+        在指定分区中批量搜索（每个分区一次nq>1的FAISS调用）并按查询合并结果
+
+        :param query_vectors: 查询向量列表（未归一化）
+        :param k: 每个查询返回的数量
+        :param partitions: 需要扫描的分区
+        :param filter_dict: 过滤条件（可选，须满足covers_filter，位图字段在索引内预过滤）
+        :return: 每个查询的[(docstore_id, 余弦相似度)]，按相似度降序
+        """
+        nq = len(query_vectors)
+        if not partitions or k <= 0 or nq == 0:
+            return [[] for _ in range(nq)]
+
+        queries = normalize_vectors(query_vectors)
+        conditions = {
+            field: value for field, value in (filter_dict or {}).items()
+            if field not in PARTITION_FIELDS
+        }
+        merged: List[List[Tuple[str, float]]] = [[] for _ in range(nq)]
+        for partition in partitions:
+            if partition.size == 0:
+                continue
+            if partition.dimension != queries.shape[1]:
+                logging.warning(f"查询向量维度({queries.shape[1]})与分区 {partition.key} 维度({partition.dimension})不一致，跳过该分区")
+                continue
+            scores, positions = partition.search(queries, k, conditions)
+            for row, (row_scores, row_positions) in enumerate(zip(scores, positions)):
+                for score, position in zip(row_scores, row_positions):
+                    if position != -1:
+                        merged[row].append((partition.docstore_ids[position], float(score)))
+
+        if len(partitions) > 1:
+            for hits in merged:
+                hits.sort(key=lambda item: item[1], reverse=True)
+        return [hits[:k] for hits in merged]
+
+    def range_search(self, query_vector: List[float], threshold: float, partitions: List[IndexPartition],
+                     filter_dict: Dict[str, Any] = None) -> List[Tuple[str, float]]:
+        """
+        在指定分区中做范围搜索，返回余弦相似度大于阈值的全部结果
+
+        :param query_vector: 查询向量（未归一化）
+        :param threshold: 余弦相似度阈值
+        :param partitions: 需要扫描的分区
+        :param filter_dict: 过滤条件（可选，须满足covers_filter，位图字段在索引内预过滤）
+        :return: [(docstore_id, 余弦相似度)]，按相似度降序
+        """
+        if not partitions:
+            return []
+
+        query = normalize_vectors(query_vector)
+        conditions = {
+            field: value for field, value in (filter_dict or {}).items()
+            if field not in PARTITION_FIELDS
+        }
+        merged: List[Tuple[str, float]] = []
+        for partition in partitions:
+            if partition.size == 0:
+                continue
+            if partition.dimension != query.shape[1]:
+                logging.warning(f"查询向量维度({query.shape[1]})与分区 {partition.key} 维度({partition.dimension})不一致，跳过该分区")
+                continue
+            scores, positions = partition.range_search(query, threshold, conditions)
+            for score, position in zip(scores, positions):
+                merged.append((partition.docstore_ids[position], float(score)))
+
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return merged
+
+    def build_from_vector_store(self, vector_store: Any) -> int:
+        """
+        从LangChain FAISS主索引重建所有分区（用于没有分区文件的旧版本向量库）
+
+        :param vector_store: LangChain FAISS实例
+        :return: 加入分区的向量数量
+        """
+        self.clear()
+        index = vector_store.index
+        ntotal = getattr(index, 'ntotal', 0)
+        if ntotal == 0:
+            return 0
+
+        all_vectors = index.reconstruct_n(0, ntotal)
+        vectors = []
+        metadatas = []
+        docstore_ids = []
+        for position in range(ntotal):
+            doc_id = vector_store.index_to_docstore_id.get(position)
+            if doc_id is None:
+                continue
+            doc = vector_store.docstore.search(doc_id)
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
+            vectors.append(all_vectors[position])
+            metadatas.append(metadata)
+            docstore_ids.append(doc_id)
+
+        added = self.add_vectors(vectors, metadatas, docstore_ids) if vectors else 0
+        logging.info(f"从主索引重建向量分区完成: {len(self.partitions)} 个分区，{added} 个向量")
+        return added
+
+    def save(self, folder_path: str, base_ntotal: int = 0) -> bool:
+        """
+        保存所有分区和manifest
+
+        :param folder_path: 主索引目录（分区文件保存在其partitions子目录下）
+        :param base_ntotal: 主索引向量数量（加载时用于一致性检查）
+        :return: 是否保存成功
+        """
+        try:
+            partition_dir = os.path.join(folder_path, PARTITION_DIR_NAME)
+            os.makedirs(partition_dir, exist_ok=True)
+
+            manifest = {
+                'version': MANIFEST_VERSION,
+                'metric': 'inner_product',
+                'normalized': True,
+                'base_ntotal': base_ntotal,
+                'saved_at': time.time(),
+                'partitions': {}
+            }
+
+            for key, partition in self.partitions.items():
+                index_file = f"{key}.faiss"
+                ids_file = f"{key}.ids.json"
+                faiss.write_index(partition.index, os.path.join(partition_dir, index_file))
+                with open(os.path.join(partition_dir, ids_file), 'w', encoding='utf-8') as f:
+                    json.dump(partition.docstore_ids, f)
+                manifest['partitions'][key] = {
+                    'chunk_type': partition.chunk_type,
+                    'vector_type': partition.vector_type,
+                    'index_type': partition.index_type,
+                    'dimension': partition.dimension,
+                    'count': partition.size,
+                    'index_file': index_file,
+                    'ids_file': ids_file
+                }
+
+            # manifest最后写入，保证其引用的分区文件均已就绪
+            manifest_path = os.path.join(partition_dir, MANIFEST_FILE_NAME)
+            tmp_path = manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, manifest_path)
+
+            logging.info(f"向量分区保存成功: {len(self.partitions)} 个分区")
+            return True
+
+        except Exception as e:
+            logging.error(f"保存向量分区失败: {e}")
+            return False
+
+    def load(self, folder_path: str, base_ntotal: int = None, io_flags: int = 0) -> bool:
+        """
+        根据manifest加载所有分区
+
+        :param folder_path: 主索引目录
+        :param base_ntotal: 主索引向量数量（不一致时视为加载失败，由调用方重建）
+        :param io_flags: FAISS读取索引的IO标志（如只读内存映射）
+        :return: 是否加载成功
+        """
+        try:
+            partition_dir = os.path.join(folder_path, PARTITION_DIR_NAME)
+            manifest_path = os.path.join(partition_dir, MANIFEST_FILE_NAME)
+            if not os.path.exists(manifest_path):
+                logging.info(f"未找到向量分区manifest: {manifest_path}")
+                return False
+
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            if manifest.get('version') != MANIFEST_VERSION:
+                logging.warning(f"向量分区manifest版本不匹配: {manifest.get('version')}")
+                return False
+            if base_ntotal is not None and manifest.get('base_ntotal') != base_ntotal:
+                logging.warning(f"向量分区与主索引不一致: manifest={manifest.get('base_ntotal')}, 主索引={base_ntotal}")
+                return False
+
+            partitions = {}
+            for key, info in manifest.get('partitions', {}).items():
+                index = faiss.read_index(os.path.join(partition_dir, info['index_file']), io_flags)
+                apply_search_params(index, self.index_config)
+                partition = IndexPartition(info['chunk_type'], info['vector_type'], info['dimension'], index,
+                                           filter_fields=self.filter_fields,
+                                           index_type=info.get('index_type', 'flat'))
+                with open(os.path.join(partition_dir, info['ids_file']), 'r', encoding='utf-8') as f:
+                    partition.docstore_ids = json.load(f)
+                if partition.size != index.ntotal:
+                    logging.warning(f"分区 {key} 的ID数量({partition.size})与索引向量数({index.ntotal})不一致")
+                    return False
+                partitions[key] = partition
+
+            self.partitions = partitions
+            self.last_update_time = time.time()
+            logging.info(f"向量分区加载成功: {len(partitions)} 个分区，{self.total_vectors} 个向量")
+            return True
+
+        except Exception as e:
+            logging.error(f"加载向量分区失败: {e}")
+            return False
+
+    def optimize(self, vector_store: Any) -> Dict[str, Any]:
+        """
+        按配置的索引类型从主索引中的原始向量训练并重建所有分区，并评估recall@k
+
+        recall@k以分区内随机采样的向量为查询，与同一批向量上的精确内积搜索结果对比。
+
+        :param vector_store: LangChain FAISS实例（提供原始向量）
+        :return: 各分区的重建报告
+        """
+        base_index = vector_store.index
+        positions_by_id = {doc_id: position for position, doc_id in vector_store.index_to_docstore_id.items()}
+        k = self.index_config['recall_k']
+        sample_size = self.index_config['recall_sample_size']
+        rng = np.random.default_rng(0)
+
+        report = {}
+        for key, partition in self.partitions.items():
+            if partition.size == 0:
+                continue
+            start_time = time.time()
+            factory, vectors = self._rebuild_partition_index(partition, base_index, positions_by_id)
+            index = partition.index
+            index_type = partition.index_type
+            build_seconds = time.time() - start_time
+
+            # recall@k：ANN结果与精确搜索结果的重合比例
+            recall = 1.0
+            sample_k = min(k, partition.size)
+            if index_type != 'flat':
+                exact_index = faiss.IndexFlatIP(partition.dimension)
+                exact_index.add(vectors)
+                sample = rng.choice(partition.size, size=min(sample_size, partition.size), replace=False)
+                queries = vectors[sample]
+                _, exact_ids = exact_index.search(queries, sample_k)
+                _, ann_ids = index.search(queries, sample_k)
+                hits = sum(len(set(a[a != -1]) & set(e[e != -1])) for a, e in zip(ann_ids, exact_ids))
+                recall = hits / float(len(sample) * sample_k)
+
+            report[key] = {
+                'index_type': index_type,
+                'factory': factory,
+                'count': partition.size,
+                f'recall@{sample_k}': round(recall, 4),
+                'build_seconds': round(build_seconds, 3)
+            }
+            logging.info(f"分区 {key} 重建为 {factory}，recall@{sample_k}={recall:.4f}，耗时 {build_seconds:.2f}s")
+
+        self.last_update_time = time.time()
+        return report
+
+    def _rebuild_partition_index(self, partition: IndexPartition, base_index: Any,
+                                 positions_by_id: Dict[str, int]) -> Tuple[str, 'np.ndarray']:
+        """
+        按配置的索引类型，用主索引中的原始向量重建单个分区的索引
+
+        :param partition: 分区
+        :param base_index: 主FAISS索引
+        :param positions_by_id: docstore ID -> 主索引位置
+        :return: (factory字符串, 归一化后的分区向量)
+        """
+        # 从主索引取回原始向量，保证重建与分区当前索引类型无关
+        positions = [positions_by_id[doc_id] for doc_id in partition.docstore_ids]
+        vectors = normalize_vectors(np.vstack([base_index.reconstruct(int(pos)) for pos in positions]))
+
+        factory, index_type = build_factory_string(
+            self.index_config['type'], partition.dimension, partition.size, self.index_config
+        )
+        index = faiss.index_factory(partition.dimension, factory, faiss.METRIC_INNER_PRODUCT)
+        if hasattr(index, 'hnsw'):
+            index.hnsw.efConstruction = self.index_config['ef_construction']
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        apply_search_params(index, self.index_config)
+
+        # 向量按原顺序加入，分区内位置与docstore_ids和取值位图保持一致
+        partition.index = index
+        partition.index_type = index_type
+        return factory, vectors
+
+    def rebuild_metadata_index(self, docstore: Any) -> int:
+        """
+        根据docstore中的元数据重建各分区的取值位图（位图不落盘，加载分区后调用）
+
+        :param docstore: LangChain docstore
+        :return: 处理的向量数量
+        """
+        processed = 0
+        for partition in self.partitions.values():
+            partition.reset_metadata_index()
+            metadatas = []
+            for doc_id in partition.docstore_ids:
+                doc = docstore.search(doc_id)
+                metadatas.append(doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {})
+            partition.index_metadata(metadatas)
+            processed += len(metadatas)
+        return processed
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取分区状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'partition_count': len(self.partitions),
+            'total_vectors': self.total_vectors,
+            'deleted_vectors': sum(len(partition.deleted_positions) for partition in self.partitions.values()),
+            'filter_fields': self.filter_fields,
+            'partitions': {
+                key: {
+                    'chunk_type': partition.chunk_type,
+                    'vector_type': partition.vector_type,
+                    'index_type': partition.index_type,
+                    'dimension': partition.dimension,
+                    'count': partition.size
+                }
+                for key, partition in self.partitions.items()
+            }
+        }
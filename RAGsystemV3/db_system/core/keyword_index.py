@@ -0,0 +1,331 @@
+"""
+BM25关键词倒排索引
+
+召回的关键词层原先把每个关键词再作为embedding查询送入向量库，既多出embedding调用，
+也无法精确命中编号、名称、数字等词面信息。KeywordIndex在写入向量库时对各分块的文本做jieba分词：
+- 文本分块：正文
+- 表格分块：标题、说明、表头和表格内容
+- 图片分块：增强描述、标题和说明（只索引description_embedding向量，visual_embedding与其重复）
+
+按chunk_type分别维护倒排表，查询时在内存中计算BM25分数。正排（文档ID -> 词频）与主索引一起
+保存为keyword_index.json，加载时重建倒排表；文件缺失、与docstore不一致或分词规则（用户词典）变化时
+从docstore重建。
+"""
+
+import os
+import re
+import json
+import math
+import time
+import logging
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+from .tokenizer import get_tokenizer, tokenize
+
+# 关键词索引文件名（位于langchain_faiss_index目录下）
+KEYWORD_INDEX_FILE_NAME = 'keyword_index.json'
+
+# 关键词索引文件格式版本
+KEYWORD_INDEX_VERSION = 1
+
+# 默认关键词索引配置
+DEFAULT_KEYWORD_INDEX_CONFIG = {
+    'enabled': True,
+    'k1': 1.5,     # BM25词频饱和参数
+    'b': 0.75      # BM25文档长度归一化参数
+}
+
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def _join(value: Any) -> str:
+    """将字符串或字符串列表转换为文本"""
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value if item)
+    return str(value) if value else ''
+
+
+def extract_index_text(metadata: Dict[str, Any], page_content: str = '') -> Optional[str]:
+    """
+    提取分块中参与关键词索引的文本
+
+    :param metadata: 分块元数据
+    :param page_content: 文档page_content
+    :return: 索引文本；该分块不参与索引时返回None
+    """
+    chunk_type = metadata.get('chunk_type', '')
+    if chunk_type == 'text':
+        return metadata.get('text') or page_content
+    if chunk_type == 'table':
+        table_text = metadata.get('table_content') or _HTML_TAG_PATTERN.sub(' ', metadata.get('table_body', '') or '')
+        return ' '.join(part for part in (
+            _join(metadata.get('table_title')),
+            _join(metadata.get('table_caption')),
+            _join(metadata.get('table_headers')),
+            table_text
+        ) if part)
+    if chunk_type == 'image':
+        if metadata.get('vector_type') == 'visual_embedding':
+            return None
+        return ' '.join(part for part in (
+            _join(metadata.get('enhanced_description')),
+            _join(metadata.get('image_title')),
+            _join(metadata.get('caption')),
+            _join(metadata.get('img_caption'))
+        ) if part)
+    return None
+
+
+class KeywordIndex:
+    """
+    BM25关键词倒排索引
+
+    功能：
+    - 按chunk_type分别维护倒排表（词 -> {文档ID: 词频}）、文档长度和平均长度
+    - 文档新增/删除时增量更新
+    - BM25打分，同时给出按IDF加权的查询词覆盖率（[0,1]，与向量层的相似度阈值可比）
+    - 与主索引一起保存/加载（keyword_index.json）
+    """
+
+    def __init__(self, index_config: Dict[str, Any] = None):
+        """
+        初始化关键词索引
+
+        :param index_config: 关键词索引配置（可选，结构同DEFAULT_KEYWORD_INDEX_CONFIG）
+        """
+        self.config = dict(DEFAULT_KEYWORD_INDEX_CONFIG)
+        self.config.update(index_config or {})
+        # 正排：文档ID -> (chunk_type, {词: 词频})
+        self._documents: Dict[str, Tuple[str, Dict[str, int]]] = {}
+        # 倒排：chunk_type -> 词 -> {文档ID: 词频}
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # 文档ID -> 文档长度（词数）
+        self._doc_lengths: Dict[str, int] = {}
+        # chunk_type -> (文档数, 文档长度之和)
+        self._type_stats: Dict[str, Tuple[int, int]] = {}
+        # 内存中的索引是否与磁盘文件不一致
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用关键词索引"""
+        return bool(self.config.get('enabled', True))
+
+    def add_documents(self, doc_ids: List[str], metadatas: List[Optional[Dict[str, Any]]],
+                      page_contents: List[str] = None):
+        """
+        索引新增文档
+
+        :param doc_ids: docstore文档ID列表
+        :param metadatas: 元数据列表（与doc_ids一一对应）
+        :param page_contents: page_content列表（可选）
+        """
+        if not self.enabled:
+            return
+        documents, texts = [], []
+        for i, (doc_id, metadata) in enumerate(zip(doc_ids, metadatas)):
+            if not metadata:
+                continue
+            text = extract_index_text(metadata, page_contents[i] if page_contents else '')
+            if text is None:
+                continue
+            documents.append((doc_id, metadata.get('chunk_type', '')))
+            texts.append(text)
+        for (doc_id, chunk_type), terms in zip(documents, get_tokenizer().tokenize_batch(texts)):
+            self._index_document(doc_id, chunk_type, Counter(terms))
+        self.dirty = True
+
+    def _index_document(self, doc_id: str, chunk_type: str, term_counts: Dict[str, int]):
+        """写入一个文档的正排和倒排"""
+        if doc_id in self._documents:
+            self._unindex_document(doc_id)
+        term_counts = dict(term_counts)
+        self._documents[doc_id] = (chunk_type, term_counts)
+        postings = self._postings.setdefault(chunk_type, {})
+        for term, count in term_counts.items():
+            postings.setdefault(term, {})[doc_id] = count
+        length = sum(term_counts.values())
+        self._doc_lengths[doc_id] = length
+        doc_count, total_length = self._type_stats.get(chunk_type, (0, 0))
+        self._type_stats[chunk_type] = (doc_count + 1, total_length + length)
+
+    def _unindex_document(self, doc_id: str):
+        """删除一个文档的正排和倒排"""
+        chunk_type, term_counts = self._documents.pop(doc_id)
+        postings = self._postings.get(chunk_type, {})
+        for term in term_counts:
+            term_postings = postings.get(term)
+            if term_postings is not None:
+                term_postings.pop(doc_id, None)
+                if not term_postings:
+                    del postings[term]
+        length = self._doc_lengths.pop(doc_id, 0)
+        doc_count, total_length = self._type_stats.get(chunk_type, (1, length))
+        self._type_stats[chunk_type] = (doc_count - 1, total_length - length)
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        """
+        删除文档
+
+        :param doc_ids: docstore文档ID
+        """
+        removed = 0
+        for doc_id in doc_ids:
+            if doc_id in self._documents:
+                self._unindex_document(doc_id)
+                removed += 1
+        if removed:
+            self.dirty = True
+
+    def rebuild(self, docstore: Any) -> int:
+        """
+        遍历docstore重建索引
+
+        :param docstore: LangChain docstore
+        :return: 索引的文档数量
+        """
+        self.clear()
+        if not self.enabled:
+            return 0
+        doc_ids, metadatas, page_contents = [], [], []
+        for doc_id, doc in docstore._dict.items():
+            doc_ids.append(doc_id)
+            metadatas.append(doc.metadata if hasattr(doc, 'metadata') else None)
+            page_contents.append(getattr(doc, 'page_content', ''))
+        self.add_documents(doc_ids, metadatas, page_contents)
+        logging.info(f"关键词索引重建完成，共 {len(self._documents)} 个文档")
+        return len(self._documents)
+
+    def clear(self):
+        """清空索引"""
+        self._documents = {}
+        self._postings = {}
+        self._doc_lengths = {}
+        self._type_stats = {}
+        self.dirty = True
+
+    def search(self, query: str, chunk_type: str, k: int = 10,
+               query_terms: List[str] = None) -> List[Tuple[str, float, float, List[str]]]:
+        """
+        BM25检索
+
+        :param query: 查询文本
+        :param chunk_type: 检索的分块类型
+        :param k: 返回结果数量
+        :param query_terms: 查询词（可选，为None时对query分词）
+        :return: [(文档ID, BM25分数, 按IDF加权的查询词覆盖率, 命中的查询词)]，按BM25分数降序
+        """
+        postings = self._postings.get(chunk_type)
+        if not postings or k <= 0:
+            return []
+        terms = list(dict.fromkeys(query_terms if query_terms is not None else tokenize(query)))
+        if not terms:
+            return []
+
+        doc_count, total_length = self._type_stats.get(chunk_type, (0, 0))
+        avg_length = total_length / doc_count if doc_count else 0.0
+        k1 = float(self.config.get('k1', 1.5))
+        b = float(self.config.get('b', 0.75))
+
+        idfs = {}
+        for term in terms:
+            df = len(postings.get(term, ()))
+            idfs[term] = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+        total_idf = sum(idfs.values()) or 1.0
+
+        scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        for term in terms:
+            term_postings = postings.get(term)
+            if not term_postings:
+                continue
+            idf = idfs[term]
+            for doc_id, tf in term_postings.items():
+                norm = k1 * (1.0 - b + b * self._doc_lengths[doc_id] / avg_length) if avg_length else k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+                matched.setdefault(doc_id, []).append(term)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (doc_id, score, sum(idfs[term] for term in matched[doc_id]) / total_idf, matched[doc_id])
+            for doc_id, score in ranked
+        ]
+
+    def save(self, folder_path: str, document_count: int) -> bool:
+        """
+        保存到keyword_index.json
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数（加载时用于校验一致性）
+        :return: 是否保存成功
+        """
+        try:
+            index_path = os.path.join(folder_path, KEYWORD_INDEX_FILE_NAME)
+            tmp_path = index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': KEYWORD_INDEX_VERSION,
+                    'document_count': document_count,
+                    'tokenizer': get_tokenizer().signature(),
+                    'saved_at': time.time(),
+                    'documents': self._documents
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+            self.dirty = False
+            return True
+
+        except Exception as e:
+            logging.error(f"保存关键词索引失败: {e}")
+            return False
+
+    def load(self, folder_path: str, document_count: int) -> bool:
+        """
+        从keyword_index.json加载并重建倒排表
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数
+        :return: 是否加载成功；文件不存在、版本不符、与docstore不一致或分词规则变化时返回False
+        """
+        index_path = os.path.join(folder_path, KEYWORD_INDEX_FILE_NAME)
+        if not os.path.exists(index_path):
+            return False
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"读取关键词索引失败: {e}")
+            return False
+
+        if data.get('version') != KEYWORD_INDEX_VERSION:
+            logging.warning(f"关键词索引版本不匹配: {data.get('version')}")
+            return False
+        if data.get('document_count') != document_count:
+            logging.warning(f"关键词索引与docstore不一致: 索引={data.get('document_count')}, docstore={document_count}")
+            return False
+        if data.get('tokenizer') != get_tokenizer().signature():
+            logging.warning("分词规则已变化，关键词索引需要重建")
+            return False
+
+        self.clear()
+        for doc_id, (chunk_type, term_counts) in data.get('documents', {}).items():
+            self._index_document(doc_id, chunk_type, term_counts)
+        self.dirty = False
+        logging.info(f"关键词索引加载成功，共 {len(self._documents)} 个文档")
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取索引状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'enabled': self.enabled,
+            'documents': len(self._documents),
+            'terms': {chunk_type: len(postings) for chunk_type, postings in self._postings.items()},
+            'dirty': self.dirty
+        }
@@ -0,0 +1,176 @@
+"""
+docstore元数据倒排索引
+
+为向量存储的docstore维护内存中的二级索引：(字段, 取值) -> docstore文档ID。
+按chunk_type、document_name、parent_table_id等字段查询文档时为字典查找，
+不再遍历整个docstore。索引在加载时构建一次，添加和删除文档时增量更新。
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+# 默认建立倒排索引的元数据字段
+DEFAULT_INDEXED_FIELDS = ['chunk_type', 'document_name', 'parent_table_id', 'vector_type', 'image_id']
+
+
+class DocstoreMetadataIndex:
+    """
+    docstore元数据倒排索引
+
+    功能：
+    - 维护 字段 -> 取值 -> 文档ID列表（保持插入顺序）
+    - 支持单字段查找和多字段交集查询
+    - 支持枚举字段的所有取值（如全部文档名）
+    """
+
+    def __init__(self, fields: List[str] = None):
+        """
+        初始化元数据索引
+
+        :param fields: 建立索引的元数据字段（可选）
+        """
+        self.fields = list(fields if fields is not None else DEFAULT_INDEXED_FIELDS)
+        self.postings: Dict[str, Dict[Any, List[str]]] = {field: {} for field in self.fields}
+        self.total_documents = 0
+
+    def clear(self):
+        """清空索引"""
+        self.postings = {field: {} for field in self.fields}
+        self.total_documents = 0
+
+    def add(self, doc_id: str, metadata: Optional[Dict[str, Any]]):
+        """
+        将单个文档加入索引
+
+        :param doc_id: docstore文档ID
+        :param metadata: 文档元数据
+        """
+        self.total_documents += 1
+        if not metadata:
+            return
+        for field in self.fields:
+            value = metadata.get(field)
+            if value is None or not isinstance(value, (str, int, float, bool)):
+                continue
+            self.postings[field].setdefault(value, []).append(doc_id)
+
+    def add_documents(self, doc_ids: Iterable[str], metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """
+        批量将文档加入索引
+
+        :param doc_ids: docstore文档ID列表
+        :param metadatas: 对应的元数据列表
+        """
+        for doc_id, metadata in zip(doc_ids, metadatas):
+            self.add(doc_id, metadata)
+
+    def remove_documents(self, doc_ids: Iterable[str], metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """
+        批量将文档移出索引
+
+        :param doc_ids: docstore文档ID列表
+        :param metadatas: 对应的元数据列表（用于定位倒排列表）
+        """
+        # 按(字段, 取值)分组，每个倒排列表只重建一次
+        removals: Dict[Tuple[str, Any], set] = {}
+        removed = 0
+        for doc_id, metadata in zip(doc_ids, metadatas):
+            removed += 1
+            if not metadata:
+                continue
+            for field in self.fields:
+                value = metadata.get(field)
+                if value is None or not isinstance(value, (str, int, float, bool)):
+                    continue
+                removals.setdefault((field, value), set()).add(doc_id)
+
+        for (field, value), ids in removals.items():
+            posting = self.postings[field].get(value)
+            if posting is None:
+                continue
+            remaining = [doc_id for doc_id in posting if doc_id not in ids]
+            if remaining:
+                self.postings[field][value] = remaining
+            else:
+                del self.postings[field][value]
+        self.total_documents = max(self.total_documents - removed, 0)
+
+    def build(self, docstore: Any) -> int:
+        """
+        遍历docstore重建索引（仅在加载时调用一次）
+
+        :param docstore: LangChain docstore
+        :return: 索引的文档数量
+        """
+        self.clear()
+        for doc_id, doc in docstore._dict.items():
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
+            self.add(doc_id, metadata)
+        logging.info(f"docstore元数据索引构建完成: {self.total_documents} 个文档")
+        return self.total_documents
+
+    def is_indexed(self, field: str) -> bool:
+        """
+        判断字段是否建立了索引
+
+        :param field: 字段名
+        :return: 是否已索引
+        """
+        return field in self.postings
+
+    def lookup(self, field: str, value: Any) -> List[str]:
+        """
+        查找字段取该值的文档ID
+
+        :param field: 字段名（必须已建立索引）
+        :param value: 字段取值
+        :return: 文档ID列表（按加入顺序）
+        """
+        if field not in self.postings:
+            raise KeyError(f"字段未建立元数据索引: {field}")
+        return list(self.postings[field].get(value, []))
+
+    def query(self, filter_dict: Dict[str, Any]) -> List[str]:
+        """
+        多字段等值查询（各条件取交集）
+
+        :param filter_dict: 过滤条件，字段必须都已建立索引
+        :return: 文档ID列表（按加入顺序）
+        """
+        if not filter_dict:
+            return []
+
+        # 从最短的倒排列表开始求交集
+        postings = sorted(
+            (self.lookup(field, value) for field, value in filter_dict.items()),
+            key=len
+        )
+        result = postings[0]
+        for other in postings[1:]:
+            if not result:
+                break
+            other_ids = set(other)
+            result = [doc_id for doc_id in result if doc_id in other_ids]
+        return result
+
+    def values(self, field: str) -> List[Any]:
+        """
+        获取字段的所有取值
+
+        :param field: 字段名（必须已建立索引）
+        :return: 取值列表
+        """
+        if field not in self.postings:
+            raise KeyError(f"字段未建立元数据索引: {field}")
+        return list(self.postings[field].keys())
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取索引状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'total_documents': self.total_documents,
+            'fields': {field: len(values) for field, values in self.postings.items()}
+        }
@@ -13,7 +13,7 @@ from typing import Dict, List, Any, Optional, Union
 from pathlib import Path
 
 try:
-    from langchain_community.embeddings import DashScopeEmbeddings
+    from langchain_core.embeddings import Embeddings
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
@@ -27,12 +27,14 @@ except ImportError:
     DASHSCOPE_AVAILABLE = False
     logging.warning("DashScope未安装，多模态功能将不可用")
 
+from .embedding_providers import get_embedding_provider_config, create_text_embeddings, create_multimodal_embeddings
+
 class LangChainModelCaller:
     """
     LangChain模型调用器主类
     
     功能：
-    - 集成LangChain的DashScope Embeddings
+    - 集成LangChain的DashScope Embeddings，或按配置使用本地/哈希embedding（离线运行）
     - 支持文本和图片的向量化
     - 提供API调用重试和错误处理
     - 支持批量处理和限流控制
@@ -67,6 +69,18 @@ class LangChainModelCaller:
     def _initialize_models(self):
         """初始化embedding模型"""
         try:
+            # 本地/哈希提供方：文本和图片都在本地向量化，不需要API密钥
+            self.provider = get_embedding_provider_config(self.config_manager)['provider']
+            self.local_image_embeddings = None
+            if self.provider != 'dashscope':
+                self.text_embeddings = create_text_embeddings(self.config_manager, self.text_embedding_model)
+                try:
+                    self.local_image_embeddings = create_multimodal_embeddings(self.config_manager, self.image_embedding_model)
+                except Exception as e:
+                    logging.warning(f"本地多模态embedding模型初始化失败，图片embedding功能将不可用: {e}")
+                logging.info(f"使用{self.provider} embedding提供方: {getattr(self.text_embeddings, 'model_name', self.text_embedding_model)}")
+                return
+            
             # 获取API密钥
             api_key = self.config_manager.get_environment_manager().get_required_var('DASHSCOPE_API_KEY')
             if not api_key:
@@ -76,10 +90,7 @@ class LangChainModelCaller:
             dashscope.api_key = api_key
             
             # 初始化文本embedding模型
-            self.text_embeddings = DashScopeEmbeddings(
-                dashscope_api_key=api_key,
-                model=self.text_embedding_model
-            )
+            self.text_embeddings = create_text_embeddings(self.config_manager, self.text_embedding_model)
             
             # 图片embedding模型不需要LangChain包装，直接使用dashscope.MultiModalEmbedding
             # 检查DashScope是否可用
@@ -143,6 +154,9 @@ class LangChainModelCaller:
         :param kwargs: 其他参数
         :return: 调用结果字典
         """
+        if self.provider != 'dashscope':
+            return self._call_local_image_embedding(image_input)
+        
         if not DASHSCOPE_AVAILABLE:
             return {
                 'success': False,
@@ -270,6 +284,40 @@ class LangChainModelCaller:
                 'timestamp': time.time()
             }
 
+    def _call_local_image_embedding(self, image_input: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        使用本地多模态embedding模型向量化图片
+        
+        :param image_input: 图片输入（本地路径、data URL或二进制数据）
+        :return: 调用结果字典
+        """
+        model = getattr(self.local_image_embeddings, 'model_name', self.image_embedding_model)
+        try:
+            if self.local_image_embeddings is None:
+                raise RuntimeError("本地多模态embedding模型不可用")
+            if not image_input:
+                raise ValueError("图片输入为空")
+            
+            embedding = self.local_image_embeddings.embed_image(image_input)
+            return {
+                'success': True,
+                'embedding': embedding,
+                'model': model,
+                'dimension': len(embedding),
+                'input_image': str(image_input)[:100],
+                'timestamp': time.time()
+            }
+            
+        except Exception as e:
+            logging.error(f"本地图片embedding调用失败: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'model': model,
+                'input_image': str(image_input)[:100] if image_input else None,
+                'timestamp': time.time()
+            }
+
     def _encode_image_to_base64(self, image_path: str) -> str:
         """
         将图片文件编码为base64
@@ -327,8 +375,8 @@ class LangChainModelCaller:
                     result = self.call_text_embedding(text, **kwargs)
                     results.append(result)
                     
-                    # 批量大小控制和延迟
-                    if (i + 1) % self.batch_size == 0 and i < len(texts) - 1:
+                    # 批量大小控制和延迟（本地embedding不需要限流）
+                    if self.provider == 'dashscope' and (i + 1) % self.batch_size == 0 and i < len(texts) - 1:
                         time.sleep(self.delay_seconds)
                         logging.info(f"已处理 {i + 1}/{len(texts)} 个文本")
                     
@@ -366,7 +414,7 @@ class LangChainModelCaller:
         :return: 调用结果列表
         """
         try:
-            if not DASHSCOPE_AVAILABLE:
+            if self.provider == 'dashscope' and not DASHSCOPE_AVAILABLE:
                 raise RuntimeError("DashScope不可用，无法调用图片embedding模型")
             
             if not image_inputs:
@@ -381,8 +429,8 @@ class LangChainModelCaller:
                     result = self.call_image_embedding(image_input, **kwargs)
                     results.append(result)
                     
-                    # 批量大小控制和延迟
-                    if (i + 1) % self.batch_size == 0 and i < len(image_inputs) - 1:
+                    # 批量大小控制和延迟（本地embedding不需要限流）
+                    if self.provider == 'dashscope' and (i + 1) % self.batch_size == 0 and i < len(image_inputs) - 1:
                         time.sleep(self.delay_seconds)
                         logging.info(f"已处理 {i + 1}/{len(image_inputs)} 个图片")
                     
@@ -418,6 +466,7 @@ class LangChainModelCaller:
         :return: 模型信息字典
         """
         return {
+            'embedding_provider': self.provider,
             'text_embedding_model': self.text_embedding_model,
             'image_embedding_model': self.image_embedding_model,
             'langchain_available': LANGCHAIN_AVAILABLE,
@@ -440,7 +489,7 @@ class LangChainModelCaller:
             
             # 测试图片embedding（如果可用）
             image_result = None
-            if DASHSCOPE_AVAILABLE:
+            if DASHSCOPE_AVAILABLE or self.local_image_embeddings is not None:
                 # 创建一个简单的测试图片或使用默认图片
                 test_image_path = self._find_test_image()
                 if test_image_path:
@@ -0,0 +1,184 @@
+"""
+近重复内容检测（MinHash + LSH）
+
+混合查询的结果去重原先把每个结果与所有已保留的结果逐一比较共同字符比例，耗时随结果数平方增长，
+且任意两段较长的中文文本共同字符都很多，容易误判为重复。
+
+写入向量库时为每个分块的候选内容（与召回候选结果的content相同）计算MinHash签名，以十六进制
+字符串保存在元数据content_minhash字段中。去重时按LSH分段把签名放入桶中，只与同桶的已保留结果
+比较签名估计的Jaccard相似度，整体耗时近似线性。
+
+签名基于规范化文本（NFKC、小写、去除HTML标签和空白）的字符3-gram集合：
+- 64个哈希函数，((a * x + b) mod (2^31 - 1))
+- LSH分16段，每段4行：Jaccard相似度0.8的两段文本至少落入同一个桶的概率约为99.98%
+"""
+
+import re
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Hashable
+
+import numpy as np
+
+from .embedding_cache import normalize_text
+
+# 保存MinHash签名的元数据字段
+MINHASH_METADATA_KEY = 'content_minhash'
+
+# 哈希函数数量
+MINHASH_NUM_PERM = 64
+
+# LSH分段数（每段MINHASH_NUM_PERM // MINHASH_BANDS行）
+MINHASH_BANDS = 16
+
+# 字符shingle长度
+MINHASH_SHINGLE_SIZE = 3
+
+# 默认近重复判定阈值（估计的Jaccard相似度）
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_PERMUTATION_SEED = 20240901
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+_SPACE_PATTERN = re.compile(r'\s+')
+
+_rng = np.random.RandomState(_PERMUTATION_SEED)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=MINHASH_NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=MINHASH_NUM_PERM).astype(np.uint64)
+
+
+def _shingles(text: str) -> List[str]:
+    """
+    规范化文本并切分为字符shingle
+
+    :param text: 文本
+    :return: shingle列表（去重）
+    """
+    text = _SPACE_PATTERN.sub('', normalize_text(_HTML_TAG_PATTERN.sub(' ', text or '')).lower())
+    if not text:
+        return []
+    if len(text) <= MINHASH_SHINGLE_SIZE:
+        return [text]
+    return list({text[i:i + MINHASH_SHINGLE_SIZE] for i in range(len(text) - MINHASH_SHINGLE_SIZE + 1)})
+
+
+def compute_minhash(text: str) -> Optional[np.ndarray]:
+    """
+    计算文本的MinHash签名
+
+    :param text: 文本
+    :return: 签名（uint32数组，长度MINHASH_NUM_PERM）；文本为空时返回None
+    """
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    values = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') % _MERSENNE_PRIME
+         for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    hashes = (np.outer(values, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return hashes.min(axis=0).astype(np.uint32)
+
+
+def encode_signature(signature: np.ndarray) -> str:
+    """
+    签名编码为十六进制字符串（保存在元数据中）
+
+    :param signature: 签名
+    :return: 十六进制字符串
+    """
+    return signature.astype('<u4').tobytes().hex()
+
+
+def decode_signature(value: Any) -> Optional[np.ndarray]:
+    """
+    解码元数据中的签名
+
+    :param value: 十六进制字符串
+    :return: 签名；格式不符时返回None
+    """
+    if not isinstance(value, str) or len(value) != MINHASH_NUM_PERM * 8:
+        return None
+    try:
+        return np.frombuffer(bytes.fromhex(value), dtype='<u4').astype(np.uint32)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def text_minhash(text: str) -> Optional[np.ndarray]:
+    """
+    查询时计算未预计算签名的文本的MinHash签名，结果按文本缓存
+
+    :param text: 文本
+    :return: 签名；文本为空时返回None
+    """
+    return compute_minhash(text)
+
+
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    """
+    由MinHash签名估计Jaccard相似度
+
+    :param signature1: 签名1
+    :param signature2: 签名2
+    :return: 估计的Jaccard相似度 (0.0-1.0)
+    """
+    return float(np.count_nonzero(signature1 == signature2)) / len(signature1)
+
+
+class MinHashLSH:
+    """
+    MinHash签名的LSH桶索引
+
+    签名按MINHASH_BANDS段切分，每段的取值作为桶键；任意一段相同的签名互为候选。
+    """
+
+    def __init__(self, bands: int = MINHASH_BANDS):
+        """
+        初始化LSH桶索引
+
+        :param bands: 分段数
+        """
+        self.bands = bands
+        self.rows = MINHASH_NUM_PERM // bands
+        # (段号, 段取值) -> 键列表
+        self._buckets: Dict[tuple, List[Hashable]] = {}
+        # 键 -> 签名
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def insert(self, key: Hashable, signature: np.ndarray):
+        """
+        加入签名
+
+        :param key: 键
+        :param signature: 签名
+        """
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray, threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> Optional[Hashable]:
+        """
+        查找估计Jaccard相似度不低于阈值的已有签名
+
+        :param signature: 签名
+        :param threshold: 相似度阈值
+        :return: 第一个满足阈值的键；没有时返回None
+        """
+        checked = set()
+        for band_key in self._band_keys(signature):
+            for key in self._buckets.get(band_key, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if estimate_jaccard(signature, self._signatures[key]) >= threshold:
+                    return key
+        return None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
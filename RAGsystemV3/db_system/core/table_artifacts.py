@@ -0,0 +1,421 @@
+"""
+表格展示产物
+
+大表在入库时被切分为多个子表（parent_table_id + subtable_index）。查询时展示完整表格需要
+取回全部子表、逐个生成展示HTML、按<tr>拼接并统计行列数，同一张表在每次请求中都会重复计算。
+
+TableArtifactStore在写入向量库时按parent_table_id预先计算合并后的表格HTML、行数和摘要，
+与主索引一起保存为table_artifacts.json，查询时只需按parent_table_id查找。
+子表的新增和删除会将对应父表标记为待更新，保存向量库时只重新计算这些父表。
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable
+
+# 表格展示产物文件名（位于langchain_faiss_index目录下）
+TABLE_ARTIFACTS_FILE_NAME = 'table_artifacts.json'
+
+# 表格展示产物文件格式版本
+TABLE_ARTIFACTS_VERSION = 1
+
+_TR_PATTERN = re.compile(r'<tr[^>]*>(.*?)</tr>', re.DOTALL)
+_TR_OPEN_PATTERN = re.compile(r'<tr[^>]*>', re.IGNORECASE)
+_FIRST_ROW_PATTERN = re.compile(r'<tr[^>]*>(.*?)</tr>', re.IGNORECASE | re.DOTALL)
+_CELL_PATTERN = re.compile(r'<t[dh][^>]*>', re.IGNORECASE)
+
+
+# ==================== 表格HTML生成 ====================
+
+def build_table_display_html(metadata: Dict[str, Any]) -> str:
+    """
+    生成表格分块的展示HTML
+
+    优先使用table_body/table_html，其次从table_content生成，都没有时生成只有表头的空表格。
+
+    :param metadata: 表格分块元数据
+    :return: 表格HTML
+    """
+    if 'table_body' in metadata:
+        table_html = metadata['table_body']
+    elif 'table_html' in metadata:
+        table_html = metadata['table_html']
+    elif 'table_content' in metadata:
+        table_html = generate_table_html(metadata['table_content'])
+    else:
+        table_html = ''
+
+    if not table_html or table_html.strip() == '':
+        table_content = metadata.get('table_content', '')
+        if table_content:
+            return generate_table_html_from_content(table_content, metadata.get('table_headers', []))
+        return generate_empty_table_html(metadata.get('table_headers', []))
+
+    # 保持原始HTML结构：数据库中的表格已有<tbody>，表头是第一行的<td>内容
+    return table_html
+
+
+def build_table_content_text(metadata: Dict[str, Any]) -> str:
+    """
+    生成表格分块的增强表格信息（标题、名称、结构、内容、脚注和上下文），用作召回候选结果的content
+
+    :param metadata: 表格分块元数据
+    :return: 增强表格信息
+    """
+    try:
+        table_parts = []
+
+        # 1. 表格标题和说明
+        table_caption = metadata.get('table_caption', [])
+        if table_caption:
+            table_parts.append(f"**表格标题**: {', '.join(table_caption)}")
+
+        table_title = metadata.get('table_title', '')
+        if table_title:
+            table_parts.append(f"**表格名称**: {table_title}")
+
+        # 2. 表格结构信息
+        table_summary = metadata.get('table_summary', '')
+        if table_summary:
+            table_parts.append(f"**表格结构**: {table_summary}")
+
+        # 3. 表格内容（优先使用HTML格式）
+        table_body = metadata.get('table_body', '')
+        table_content = metadata.get('table_content', '')
+
+        if table_body:
+            table_parts.append(f"**表格内容**:\n{table_body}")
+        elif table_content:
+            table_parts.append(f"**表格内容**:\n{table_content}")
+
+        # 4. 表格脚注
+        table_footnote = metadata.get('table_footnote', [])
+        if table_footnote:
+            table_parts.append(f"**数据来源**: {', '.join(table_footnote)}")
+
+        # 5. 表格上下文
+        table_context = metadata.get('table_context', '')
+        if table_context:
+            table_parts.append(f"**表格上下文**: {table_context}")
+
+        return "\n\n".join(table_parts)
+
+    except Exception as e:
+        logging.error(f"构建增强表格信息失败: {e}")
+        # 回退到简单的表格内容
+        return metadata.get('table_content', '')
+
+
+def generate_table_html(table_content: str) -> str:
+    """
+    从制表符或竖线分隔的表格文本生成HTML表格（第一行为表头）
+
+    :param table_content: 表格内容文本
+    :return: HTML表格字符串
+    """
+    try:
+        if not table_content:
+            return ''
+
+        lines = table_content.strip().split('\n')
+        if len(lines) < 2:
+            return f'<div class="table-content">{table_content}</div>'
+
+        headers = lines[0].split('\t') if '\t' in lines[0] else lines[0].split('|')
+        headers = [h.strip() for h in headers if h.strip()]
+
+        html = '<table class="result-table">\n'
+        html += '  <thead>\n    <tr>\n'
+        for header in headers:
+            html += f'      <th>{header}</th>\n'
+        html += '    </tr>\n  </thead>\n'
+
+        html += '  <tbody>\n'
+        for line in lines[1:]:
+            if line.strip():
+                cells = line.split('\t') if '\t' in line else line.split('|')
+                cells = [c.strip() for c in cells if c.strip()]
+                if cells:
+                    html += '    <tr>\n'
+                    for cell in cells:
+                        html += f'      <td>{cell}</td>\n'
+                    html += '    </tr>\n'
+        html += '  </tbody>\n'
+        html += '</table>'
+
+        return html
+
+    except Exception as e:
+        logging.error(f"生成表格HTML失败: {e}")
+        return f'<div class="table-content">{table_content}</div>'
+
+
+def generate_table_html_from_content(table_content: str, headers: List[str] = None) -> str:
+    """
+    将表格纯文本内容包装为HTML表格
+
+    :param table_content: 表格纯文本内容
+    :param headers: 表头列表（可选）
+    :return: HTML表格字符串
+    """
+    if not headers:
+        return f"<table><tbody><tr><td>{table_content}</td></tr></tbody></table>"
+    return f"<table>{generate_header_html(headers)}<tbody><tr><td>{table_content}</td></tr></tbody></table>"
+
+
+def generate_empty_table_html(headers: List[str] = None) -> str:
+    """
+    生成空表格HTML（只有表头）
+
+    :param headers: 表头列表（可选）
+    :return: 空表格HTML
+    """
+    if headers:
+        return f"<table>{generate_header_html(headers)}<tbody></tbody></table>"
+    return "<table><tbody></tbody></table>"
+
+
+def generate_header_html(headers: List[str]) -> str:
+    """
+    生成表头HTML
+
+    :param headers: 表头列表
+    :return: 表头HTML字符串
+    """
+    if not headers:
+        return ""
+    return f"<thead><tr>{''.join(f'<th>{header}</th>' for header in headers)}</tr></thead>"
+
+
+def merge_table_htmls(html_list: List[str]) -> str:
+    """
+    按顺序拼接多个子表HTML的全部<tr>行（子表之间没有重复行）
+
+    :param html_list: HTML列表
+    :return: 合并后的HTML
+    """
+    if not html_list:
+        return ""
+    rows = [f"<tr>{row}</tr>" for html in html_list for row in _TR_PATTERN.findall(html)]
+    return f"<table><tbody>{''.join(rows)}</tbody></table>"
+
+
+def count_table_rows(html: str) -> int:
+    """
+    统计表格行数
+
+    :param html: 表格HTML
+    :return: <tr>数量
+    """
+    return len(_TR_OPEN_PATTERN.findall(html or ''))
+
+
+def summarize_merged_table(html: str) -> str:
+    """
+    生成合并后的表格摘要
+
+    :param html: 表格HTML
+    :return: 表格摘要
+    """
+    rows = count_table_rows(html)
+    if rows == 0:
+        return "空表格"
+    first_row = _FIRST_ROW_PATTERN.search(html)
+    columns = len(_CELL_PATTERN.findall(first_row.group(1))) if first_row else 0
+    return f"合并表格包含 {rows} 行 {columns} 列数据"
+
+
+def build_table_artifact(parent_table_id: str, documents: List[Tuple[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    计算一张父表的展示产物
+
+    :param parent_table_id: 父表ID
+    :param documents: 该父表全部子表的[(文档ID, 文档)]列表
+    :return: 展示产物；没有可用HTML时返回None
+    """
+    subtables = sorted(
+        ((doc_id, doc.metadata) for doc_id, doc in documents if getattr(doc, 'metadata', None)),
+        key=lambda item: item[1].get('subtable_index', 0)
+    )
+    html_list = [html for html in (build_table_display_html(metadata) for _, metadata in subtables) if html]
+    if not html_list:
+        return None
+
+    merged_html = merge_table_htmls(html_list)
+    return {
+        'parent_table_id': parent_table_id,
+        'subtable_ids': [doc_id for doc_id, _ in subtables],
+        'merged_html': merged_html,
+        'table_rows': count_table_rows(merged_html),
+        'table_summary': summarize_merged_table(merged_html)
+    }
+
+
+class TableArtifactStore:
+    """
+    表格展示产物存储
+
+    功能：
+    - 按parent_table_id保存合并后的表格HTML、行数、摘要和子表文档ID（按subtable_index排序）
+    - 子表新增或删除时标记父表，refresh时只重新计算被标记的父表
+    - 与主索引一起保存/加载（table_artifacts.json），文件缺失或与docstore不一致时从docstore重建
+    """
+
+    def __init__(self):
+        """初始化表格展示产物存储"""
+        self._artifacts: Dict[str, Dict[str, Any]] = {}
+        self._dirty_parents = set()
+        # 内存中的产物是否与磁盘文件不一致
+        self.dirty = False
+        # 磁盘文件记录的docstore文档数（非表格文档增删后需要重新写出，否则加载时校验失败）
+        self.document_count: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._artifacts)
+
+    def get(self, parent_table_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询父表的展示产物
+
+        :param parent_table_id: 父表ID
+        :return: 展示产物（只读）；不存在或待更新时返回None
+        """
+        if not parent_table_id or parent_table_id in self._dirty_parents:
+            return None
+        return self._artifacts.get(parent_table_id)
+
+    def mark_dirty(self, metadatas: Iterable[Optional[Dict[str, Any]]]):
+        """
+        标记子表发生变化的父表
+
+        :param metadatas: 新增或删除的文档元数据
+        """
+        for metadata in metadatas:
+            if metadata and metadata.get('chunk_type') == 'table' and metadata.get('parent_table_id'):
+                self._dirty_parents.add(metadata['parent_table_id'])
+
+    def refresh(self, get_documents: Callable[[str], List[Tuple[str, Any]]]) -> int:
+        """
+        重新计算被标记的父表
+
+        :param get_documents: 按父表ID返回全部子表[(文档ID, 文档)]的函数
+        :return: 重新计算的父表数量
+        """
+        if not self._dirty_parents:
+            return 0
+
+        refreshed = 0
+        for parent_table_id in sorted(self._dirty_parents):
+            try:
+                artifact = build_table_artifact(parent_table_id, get_documents(parent_table_id))
+            except Exception as e:
+                logging.warning(f"计算表格展示产物失败: {parent_table_id}, 错误: {e}")
+                artifact = None
+            if artifact:
+                self._artifacts[parent_table_id] = artifact
+            else:
+                self._artifacts.pop(parent_table_id, None)
+            refreshed += 1
+
+        self._dirty_parents.clear()
+        self.dirty = True
+        logging.info(f"表格展示产物已更新 {refreshed} 个父表，共 {len(self._artifacts)} 个")
+        return refreshed
+
+    def rebuild(self, docstore: Any) -> int:
+        """
+        遍历docstore重新计算全部父表
+
+        :param docstore: LangChain docstore
+        :return: 父表数量
+        """
+        groups: Dict[str, List[Tuple[str, Any]]] = {}
+        for doc_id, doc in docstore._dict.items():
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
+            if metadata.get('chunk_type') == 'table' and metadata.get('parent_table_id'):
+                groups.setdefault(metadata['parent_table_id'], []).append((doc_id, doc))
+
+        self._artifacts = {}
+        self._dirty_parents = set(groups)
+        self.refresh(lambda parent_table_id: groups.get(parent_table_id, []))
+        return len(self._artifacts)
+
+    def clear(self):
+        """清空全部产物"""
+        self._artifacts = {}
+        self._dirty_parents = set()
+        self.dirty = True
+
+    def save(self, folder_path: str, document_count: int) -> bool:
+        """
+        保存到table_artifacts.json
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数（加载时用于校验一致性）
+        :return: 是否保存成功
+        """
+        try:
+            artifacts_path = os.path.join(folder_path, TABLE_ARTIFACTS_FILE_NAME)
+            tmp_path = artifacts_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': TABLE_ARTIFACTS_VERSION,
+                    'document_count': document_count,
+                    'saved_at': time.time(),
+                    'artifacts': self._artifacts
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, artifacts_path)
+            self.dirty = False
+            self.document_count = document_count
+            return True
+
+        except Exception as e:
+            logging.error(f"保存表格展示产物失败: {e}")
+            return False
+
+    def load(self, folder_path: str, document_count: int) -> bool:
+        """
+        从table_artifacts.json加载
+
+        :param folder_path: 主索引目录
+        :param document_count: 当前docstore文档数
+        :return: 是否加载成功；文件不存在、版本不符或与docstore不一致时返回False
+        """
+        artifacts_path = os.path.join(folder_path, TABLE_ARTIFACTS_FILE_NAME)
+        if not os.path.exists(artifacts_path):
+            return False
+        try:
+            with open(artifacts_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"读取表格展示产物失败: {e}")
+            return False
+
+        if data.get('version') != TABLE_ARTIFACTS_VERSION:
+            logging.warning(f"表格展示产物版本不匹配: {data.get('version')}")
+            return False
+        if data.get('document_count') != document_count:
+            logging.warning(f"表格展示产物与docstore不一致: 产物={data.get('document_count')}, docstore={document_count}")
+            return False
+
+        self._artifacts = data.get('artifacts', {})
+        self._dirty_parents = set()
+        self.dirty = False
+        self.document_count = document_count
+        logging.info(f"表格展示产物加载成功，共 {len(self._artifacts)} 个父表")
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取产物状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'parent_tables': len(self._artifacts),
+            'pending_parents': len(self._dirty_parents),
+            'dirty': self.dirty
+        }
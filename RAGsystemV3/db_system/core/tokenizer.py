@@ -0,0 +1,329 @@
+"""
+共用分词服务
+
+jieba在第一次分词时才构建前缀词典（数百毫秒），服务重启或新开工作进程后的第一个查询都要承担这段延迟；
+召回、对话记忆和入库又各自导入和调用jieba，领域词汇（公司名、财务指标等）也没有加入词典。
+
+TokenizerService统一管理jieba的默认分词器：
+- 启动时预热：前缀词典从缓存的序列化文件（dictionary_cache）加载，不存在时构建后写入该文件
+- 加载领域用户词典（user_dictionary，jieba用户词典格式：词 [词频] [词性]）
+- 入库批量分词可使用jieba并行模式（parallel_workers，仅posix系统），文本数较少时按顺序分词
+- signature()为jieba版本与用户词典内容的摘要，关键词索引和分块词项向量据此判断是否需要重新分词
+
+get_tokenizer()返回进程内共用的实例；第一次调用时传入配置管理器则读取tokenizer配置。
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+from .embedding_cache import normalize_text
+
+try:
+    import jieba
+    import jieba.analyse
+    import jieba.posseg
+    JIEBA_AVAILABLE = True
+except ImportError:
+    JIEBA_AVAILABLE = False
+    logging.warning("jieba未安装，将使用基础分词方法")
+
+# 默认分词服务配置（tokenizer，路径相对于db_system目录）
+DEFAULT_TOKENIZER_CONFIG = {
+    'warm_up': True,                                  # 启动时加载词典
+    'dictionary_cache': './central/jieba.cache',      # 序列化前缀词典缓存文件
+    'user_dictionary': './config/user_dict.txt',      # 领域用户词典
+    'parallel_workers': 0,                            # 入库批量分词的并行进程数（0或1：不并行）
+    'parallel_min_texts': 256                         # 启用并行分词的最少文本数
+}
+
+# 不参与索引和查询的停用词
+STOP_WORDS = frozenset({
+    '的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很',
+    '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这', '与', '或', '但',
+    '而', '过', '及', '等', '其', '之', '为', '对', '从', '以', '中', '吗', '呢', '吧', '啊',
+    '什么', '哪些', '怎么', '如何', '多少', '是否', '请问'
+})
+
+_TOKEN_PATTERN = re.compile(r'\w', re.UNICODE)
+_FALLBACK_PATTERN = re.compile(r'[a-z0-9]+(?:[._\-][a-z0-9]+)*|[一-鿿]')
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _default_resolve_path(path: str) -> str:
+    """相对路径按db_system目录解析"""
+    if os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(_BASE_DIR, path))
+
+
+class TokenizerService:
+    """
+    共用分词服务
+
+    功能：
+    - 预热jieba词典（序列化词典缓存 + 领域用户词典）
+    - 单条/批量分词、词性标注分词和TF-IDF关键词提取
+    - 入库批量分词的并行模式
+    """
+
+    def __init__(self, tokenizer_config: Dict[str, Any] = None,
+                 resolve_path: Optional[Callable[[str], str]] = None):
+        """
+        初始化分词服务（不加载词典，加载在warm_up或第一次分词时进行）
+
+        :param tokenizer_config: 分词服务配置（结构同DEFAULT_TOKENIZER_CONFIG）
+        :param resolve_path: 把配置中的相对路径转换为绝对路径的函数（默认相对于db_system目录）
+        """
+        self.config = dict(DEFAULT_TOKENIZER_CONFIG)
+        self.config.update(tokenizer_config or {})
+        resolve_path = resolve_path or _default_resolve_path
+        self.dictionary_cache = resolve_path(self.config['dictionary_cache']) if self.config['dictionary_cache'] else ''
+        self.user_dictionary = resolve_path(self.config['user_dictionary']) if self.config['user_dictionary'] else ''
+        self.parallel_workers = int(self.config.get('parallel_workers') or 0)
+        self.parallel_min_texts = int(self.config.get('parallel_min_texts') or 0)
+
+        self.ready = False
+        self.user_words = 0
+        self.load_time = 0.0
+        self._signature = None
+        self._lock = threading.Lock()
+        self._parallel_lock = threading.Lock()
+
+    def warm_up(self) -> bool:
+        """
+        加载分词词典：前缀词典优先从序列化缓存文件读取，然后加载领域用户词典（重复调用直接返回）
+
+        :return: 词典是否已加载（jieba不可用时返回False）
+        """
+        if self.ready or not JIEBA_AVAILABLE:
+            return self.ready
+        with self._lock:
+            if self.ready:
+                return True
+            start_time = time.time()
+            if self.dictionary_cache:
+                try:
+                    cache_dir = os.path.dirname(self.dictionary_cache)
+                    os.makedirs(cache_dir, exist_ok=True)
+                    jieba.dt.tmp_dir = cache_dir
+                    jieba.dt.cache_file = os.path.basename(self.dictionary_cache)
+                except OSError as e:
+                    logging.warning(f"分词词典缓存目录不可用，使用系统临时目录: {e}")
+            jieba.initialize()
+            self.user_words = self._load_user_dictionary()
+            self.load_time = time.time() - start_time
+            self.ready = True
+            logging.info(f"分词词典加载完成，用户词典词数: {self.user_words}，耗时 {self.load_time:.2f}s")
+        return True
+
+    def _load_user_dictionary(self) -> int:
+        """
+        加载领域用户词典
+
+        :return: 词数；文件不存在或读取失败时返回0
+        """
+        if not self.user_dictionary:
+            return 0
+        if not os.path.exists(self.user_dictionary):
+            logging.warning(f"分词用户词典不存在: {self.user_dictionary}")
+            return 0
+        try:
+            jieba.load_userdict(self.user_dictionary)
+            with open(self.user_dictionary, 'r', encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+        except Exception as e:
+            logging.error(f"加载分词用户词典失败: {e}")
+            return 0
+
+    def signature(self) -> str:
+        """
+        分词规则摘要（jieba版本与用户词典内容），分词规则变化后据此重新生成入库时的分词结果
+
+        :return: 摘要字符串
+        """
+        if self._signature is None:
+            if not JIEBA_AVAILABLE:
+                self._signature = 'fallback'
+            else:
+                digest = hashlib.sha1(str(getattr(jieba, '__version__', '')).encode('utf-8'))
+                if self.user_dictionary and os.path.exists(self.user_dictionary):
+                    with open(self.user_dictionary, 'rb') as f:
+                        digest.update(f.read())
+                self._signature = digest.hexdigest()[:16]
+        return self._signature
+
+    def lcut(self, text: str) -> List[str]:
+        """
+        精确模式分词（不做规范化和过滤）
+
+        :param text: 文本
+        :return: 词列表
+        """
+        if not text:
+            return []
+        if not JIEBA_AVAILABLE:
+            return _FALLBACK_PATTERN.findall(text.lower())
+        self.warm_up()
+        return jieba.lcut(text)
+
+    def posseg_cut(self, text: str) -> List[Tuple[str, str]]:
+        """
+        词性标注分词
+
+        :param text: 文本
+        :return: [(词, 词性)]；jieba不可用时返回空列表
+        """
+        if not text or not JIEBA_AVAILABLE:
+            return []
+        self.warm_up()
+        return [(pair.word, pair.flag) for pair in jieba.posseg.cut(text)]
+
+    def extract_tags(self, text: str, top_k: int) -> List[str]:
+        """
+        TF-IDF关键词
+
+        :param text: 文本
+        :param top_k: 关键词数量
+        :return: 关键词列表；jieba不可用时返回空列表
+        """
+        if not text or not JIEBA_AVAILABLE:
+            return []
+        self.warm_up()
+        return jieba.analyse.extract_tags(text, topK=top_k)
+
+    def tokenize(self, text: str, search_mode: bool = True, remove_stop_words: bool = True) -> List[str]:
+        """
+        分词：规范化（NFKC、小写）后使用jieba分词，去除不含文字的词（标点、空白）
+
+        jieba不可用时英文/数字按连续串切分，中文按单字切分。
+
+        :param text: 文本
+        :param search_mode: 是否使用jieba搜索引擎模式（长词再切分出短词，提高召回）；否则使用精确模式
+        :param remove_stop_words: 是否去除停用词
+        :return: 词列表（保留重复，用于统计词频）
+        """
+        text = normalize_text(text).lower()
+        if not text:
+            return []
+        if not JIEBA_AVAILABLE:
+            words = _FALLBACK_PATTERN.findall(text)
+        else:
+            self.warm_up()
+            words = jieba.lcut_for_search(text) if search_mode else jieba.lcut(text)
+        return self._filter(words, remove_stop_words)
+
+    def tokenize_batch(self, texts: List[str], search_mode: bool = True,
+                       remove_stop_words: bool = True) -> List[List[str]]:
+        """
+        批量分词（结果与逐条调用tokenize相同）：配置了并行进程且文本数足够多时使用jieba并行模式
+
+        :param texts: 文本列表
+        :param search_mode: 是否使用搜索引擎模式
+        :param remove_stop_words: 是否去除停用词
+        :return: 与texts一一对应的词列表
+        """
+        if (JIEBA_AVAILABLE and self.parallel_workers > 1
+                and len(texts) >= max(self.parallel_min_texts, 2)):
+            normalized = [normalize_text(text).lower() for text in texts]
+            groups = self._parallel_cut(normalized, search_mode)
+            if groups is not None:
+                return [self._filter(words, remove_stop_words) for words in groups]
+        return [self.tokenize(text, search_mode, remove_stop_words) for text in texts]
+
+    def _parallel_cut(self, texts: List[str], search_mode: bool) -> Optional[List[List[str]]]:
+        """
+        jieba并行模式分词：文本按行拼接后分发给工作进程，结果按换行符切回各文本
+
+        :param texts: 已规范化的文本（不含换行）
+        :param search_mode: 是否使用搜索引擎模式
+        :return: 各文本的词列表；并行模式不可用时返回None
+        """
+        self.warm_up()
+        with self._parallel_lock:
+            try:
+                # 工作进程在此时fork，继承已加载的词典
+                jieba.enable_parallel(self.parallel_workers)
+            except NotImplementedError as e:
+                logging.warning(f"jieba并行分词不可用，改为顺序分词: {e}")
+                self.parallel_workers = 0
+                return None
+            try:
+                cut = jieba.cut_for_search if search_mode else jieba.cut
+                words = list(cut('\n'.join(texts)))
+            finally:
+                jieba.disable_parallel()
+
+        groups: List[List[str]] = [[]]
+        for word in words:
+            if word == '\n':
+                groups.append([])
+            else:
+                groups[-1].append(word)
+        if len(groups) != len(texts):
+            logging.warning(f"并行分词结果数量不一致: {len(groups)} != {len(texts)}，改为顺序分词")
+            return None
+        return groups
+
+    @staticmethod
+    def _filter(words: List[str], remove_stop_words: bool) -> List[str]:
+        terms = (word.strip() for word in words)
+        return [term for term in terms
+                if term and _TOKEN_PATTERN.search(term) and not (remove_stop_words and term in STOP_WORDS)]
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取分词服务状态
+
+        :return: 状态信息字典
+        """
+        return {
+            'jieba_available': JIEBA_AVAILABLE,
+            'ready': self.ready,
+            'dictionary_cache': self.dictionary_cache,
+            'user_dictionary': self.user_dictionary,
+            'user_words': self.user_words,
+            'load_time': self.load_time,
+            'parallel_workers': self.parallel_workers,
+            'signature': self.signature()
+        }
+
+
+# 进程内共用的分词服务
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer(config_manager=None) -> TokenizerService:
+    """
+    获取共用分词服务（单例模式）
+
+    :param config_manager: 配置管理器（可选，第一次创建时读取tokenizer配置，相对路径按其路径管理器解析）
+    :return: 分词服务
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                if config_manager is not None:
+                    _tokenizer = TokenizerService(config_manager.get('tokenizer', {}),
+                                                  config_manager.path_manager.get_absolute_path)
+                else:
+                    _tokenizer = TokenizerService()
+    return _tokenizer
+
+
+def tokenize(text: str, search_mode: bool = True, remove_stop_words: bool = True) -> List[str]:
+    """
+    使用共用分词服务分词（参数同TokenizerService.tokenize）
+
+    :param text: 文本
+    :param search_mode: 是否使用搜索引擎模式
+    :param remove_stop_words: 是否去除停用词
+    :return: 词列表
+    """
+    return get_tokenizer().tokenize(text, search_mode, remove_stop_words)
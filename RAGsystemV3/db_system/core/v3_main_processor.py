@@ -273,16 +273,9 @@ class V3MainProcessor:
             if not self.vector_store_manager.vector_store:
                 return []
             
-            docstore = self.vector_store_manager.vector_store.docstore._dict
-            document_names = set()
-            
-            for doc_id, doc in docstore.items():
-                metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
-                doc_name = metadata.get('document_name', '')
-                if doc_name and doc_name != 'unknown':
-                    document_names.add(doc_name)
-            
-            return list(document_names)
+            # 从元数据索引枚举文档名，无需遍历docstore
+            document_names = self.vector_store_manager.get_metadata_values('document_name')
+            return [name for name in document_names if name and name != 'unknown']
             
         except Exception as e:
             logging.error(f"获取现有文档名失败: {e}")
@@ -530,9 +523,9 @@ class V3MainProcessor:
         增量模式文档处理
         
         功能：
-        - 检测新增的文档
-        - 只处理新增内容
-        - 增量更新向量数据库
+        - 检测新增的文档，以及源文件在上次向量化之后有修改的已有文档
+        - 只处理新增和修改的文档，未修改的已有文档跳过
+        - 增量更新向量数据库（修改的文档在存储阶段替换旧向量）
         - 保持现有数据完整性
         """
         try:
@@ -552,39 +545,41 @@ class V3MainProcessor:
                     'message': '没有文件需要处理'
                 }
             
-            # 检测新增文档（不在现有数据库中的文档）
+            # 检测新增文档和已修改的文档（按文档名精确匹配，与新建模式的doc_name规则一致）
+            existing_doc_names = set(existing_docs or [])
             new_files = []
+            replaced_documents = []
             for file_path in files:
                 file_name = os.path.basename(file_path)
-                # 检查文件名是否在现有文档中
-                is_new = True
-                for existing_doc in (existing_docs or []):
-                    if existing_doc in file_name or file_name in existing_doc:
-                        print(f"     🔍 检测到重复文档: {file_name} <-> {existing_doc}")
-                        is_new = False
-                        break
+                doc_name = os.path.splitext(file_name)[0]
                 
-                if is_new:
-                    new_files.append({
-                        'path': file_path,
-                        'name': file_name,
-                        'type': input_type
-                    })
-                    print(f"     ✅ 新文档: {file_name}")
+                if doc_name in existing_doc_names:
+                    if not self._is_document_modified(doc_name, file_path):
+                        print(f"     ⚠️  跳过未修改的文档: {file_name}")
+                        continue
+                    replaced_documents.append(doc_name)
+                    print(f"     🔁 文档已修改，将替换旧向量: {file_name}")
                 else:
-                    print(f"     ⚠️  跳过重复文档: {file_name}")
+                    print(f"     ✅ 新文档: {file_name}")
+                
+                new_files.append({
+                    'path': file_path,
+                    'name': file_name,
+                    'doc_name': doc_name,
+                    'type': input_type
+                })
             
             if not new_files:
-                print("     没有新增文档需要处理")
+                print("     没有新增或修改的文档需要处理")
                 return {
                     'processed_items': [],
                     'new_files': 0,
                     'incremental_updates': 0,
                     'status': 'success',
-                    'message': '没有新增文档'
+                    'message': '没有新增或修改的文档'
                 }
             
-            print(f"     检测到 {len(new_files)} 个新增文档")
+            print(f"     检测到 {len(new_files) - len(replaced_documents)} 个新增文档，{len(replaced_documents)} 个修改文档")
             
             # 增量处理新增文档
             processed_items = []
@@ -650,6 +645,10 @@ class V3MainProcessor:
                 'successful_items': successful_items,
                 'failed_items': failed_items,
                 'new_files': len(new_files),
+                'replaced_documents': [
+                    item['file_info']['doc_name'] for item in successful_items
+                    if item['file_info']['doc_name'] in replaced_documents
+                ],
                 'incremental_updates': incremental_updates,
                 'total_vectors_added': sum(item.get('vector_count', 0) for item in successful_items),
                 'status': 'success' if successful_items else 'failed',
@@ -674,6 +673,26 @@ class V3MainProcessor:
                 'error': str(e)
             }
 
+    def _is_document_modified(self, doc_name: str, file_path: str) -> bool:
+        """
+        判断已有文档的源文件是否在上次向量化之后被修改
+
+        :param doc_name: 文档名
+        :param file_path: 源文件路径
+        :return: 是否需要重新处理
+        """
+        try:
+            timestamps = [
+                doc.metadata.get('vectorization_timestamp') or 0
+                for _, doc in self.vector_store_manager.get_documents_by_metadata({'document_name': doc_name})
+            ]
+            if not timestamps:
+                return True
+            return os.path.getmtime(file_path) > max(timestamps)
+        except Exception as e:
+            logging.warning(f"检查文档修改时间失败: {doc_name}, 错误: {e}")
+            return False
+
     def _load_existing_vector_db(self, vector_db_path: str) -> bool:
         """
         加载现有向量数据库
@@ -1674,6 +1693,45 @@ class V3MainProcessor:
                 else:
                     failed_updates += 1
             
+            # 修改过的文档先整体替换（旧向量以墓碑删除），其余向量按新增写入
+            replaced_documents = set(processing_result.get('replaced_documents', []))
+            all_updated_metadata = updated_metadata
+            if replaced_documents and updated_vectors:
+                replaced_groups = {}
+                remaining_vectors = []
+                remaining_metadata = []
+                for vector, metadata in zip(updated_vectors, updated_metadata):
+                    document_name = metadata.get('document_name', '')
+                    if document_name in replaced_documents:
+                        group = replaced_groups.setdefault(document_name, ([], []))
+                        group[0].append(vector)
+                        group[1].append(metadata)
+                    else:
+                        remaining_vectors.append(vector)
+                        remaining_metadata.append(metadata)
+                
+                for document_name, (doc_vectors, doc_metadata) in replaced_groups.items():
+                    if self.vector_store_manager.upsert_document(document_name, doc_vectors, doc_metadata):
+                        print(f"     🔁 已替换文档: {document_name}（{len(doc_vectors)} 个向量）")
+                    else:
+                        print(f"     ❌ 替换文档失败: {document_name}")
+                        return {
+                            'updated_items': 0,
+                            'storage_path': target_vector_db,
+                            'status': 'failed',
+                            'error': f'替换文档失败: {document_name}'
+                        }
+                
+                if replaced_groups and not remaining_vectors and not self.vector_store_manager.save():
+                    print(f"     ❌ 向量数据库保存失败")
+                    return {
+                        'updated_items': 0,
+                        'storage_path': target_vector_db,
+                        'status': 'failed',
+                        'error': '向量数据库保存失败'
+                    }
+                updated_vectors, updated_metadata = remaining_vectors, remaining_metadata
+            
             # 执行数据库更新
             if updated_vectors and updated_metadata:
                 print(f"     准备更新 {len(updated_vectors)} 个向量...")
@@ -1695,7 +1753,7 @@ class V3MainProcessor:
                     }
             
             # 更新元数据管理器
-            self._update_metadata_manager(updated_metadata)
+            self._update_metadata_manager(all_updated_metadata)
             
             # 生成更新结果
             result = {
@@ -1703,11 +1761,12 @@ class V3MainProcessor:
                 'storage_path': target_vector_db,
                 'status': 'success',
                 'update_statistics': {
-                    'total_vectors_updated': len(updated_vectors),
+                    'total_vectors_updated': len(all_updated_metadata),
                     'text_updates': text_updates,
                     'image_updates': image_updates,
                     'table_updates': table_updates,
-                    'failed_updates': failed_updates
+                    'failed_updates': failed_updates,
+                    'replaced_documents': sorted(replaced_documents)
                 },
                 'update_timestamp': int(time.time()),
                 'update_type': 'content_update'
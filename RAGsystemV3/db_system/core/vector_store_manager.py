@@ -6,14 +6,18 @@ LangChain向量存储管理器
 """
 
 import os
+import copy
+import asyncio
+import functools
 import logging
 import time
+from concurrent.futures import Executor
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
 try:
     from langchain_community.vectorstores import FAISS
-    from langchain_community.embeddings import DashScopeEmbeddings
+    from langchain_community.docstore.in_memory import InMemoryDocstore
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
@@ -26,6 +30,22 @@ except ImportError:
     FAISS_AVAILABLE = False
     logging.warning("FAISS未安装，向量存储功能将不可用")
 
+from .index_partitions import IndexPartitionManager, DEFAULT_FILTER_FIELDS
+from .metadata_index import DocstoreMetadataIndex, DEFAULT_INDEXED_FIELDS
+from .embedding_store import EmbeddingStore, EMBEDDING_FIELDS, OFFSETS_FIELD
+from .delta_segments import DeltaSegment, DeltaSegmentStore, DELTA_DIR_NAME
+from .embedding_cache import QueryEmbeddingCache, CachedEmbeddings
+from .table_artifacts import TableArtifactStore, TABLE_ARTIFACTS_FILE_NAME
+from .keyword_index import KeywordIndex, KEYWORD_INDEX_FILE_NAME
+from .tokenizer import get_tokenizer
+from .chunk_tokens import ChunkTokenStore, CHUNK_TOKENS_FILE_NAME, build_candidate_content
+from .association_graph import AssociationGraph, ASSOCIATION_GRAPH_FILE_NAME
+from .near_duplicate import compute_minhash, encode_signature, MINHASH_METADATA_KEY
+from .embedding_providers import create_text_embeddings, create_multimodal_embeddings, embed_queries
+
+# 向量存储加载模式：memory为全量读入内存，mmap为只读内存映射
+LOAD_MODES = ('memory', 'mmap')
+
 class LangChainVectorStoreManager:
     """
     LangChain向量存储管理器主类
@@ -34,15 +54,26 @@ class LangChainVectorStoreManager:
     - 基于LangChain管理FAISS向量数据库
     - 提供向量存储和检索服务
     - 支持多模态向量存储
+    - 按(chunk_type, vector_type)分区的子索引，带类型查询只扫描自身分区
+    - docstore元数据倒排索引，按元数据查询文档无需遍历docstore
+    - 元数据中的原始向量保存在内存映射的向量文件中，docstore只保留行号
+    - 支持只读内存映射加载模式，启动耗时与索引大小无关，多进程共享物理页
+    - 增量写入保存为追加式增量段，保存耗时与变更量成正比，compact时并入主索引
+    - 文档级删除和替换（墓碑），查询时排除，compact时物理删除
+    - 可选的查询向量缓存（内存LRU + 磁盘），相同查询不重复调用embedding API
+    - embedding提供方可配置（DashScope API / 本地CPU模型 / 确定性哈希），支持离线运行
+    - 写入时按parent_table_id预计算子表合并后的表格展示产物，查询时直接查找
     - 自动索引优化
     - 支持备份和恢复
     """
 
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, load_mode: str = None, embedding_cache: QueryEmbeddingCache = None):
         """
         初始化LangChain向量存储管理器
 
         :param config_manager: 配置管理器
+        :param load_mode: 加载模式（memory/mmap，可选，默认读取vector_store.load_mode）
+        :param embedding_cache: 查询向量缓存（可选，提供时文本embedding经过缓存）
         """
         if not LANGCHAIN_AVAILABLE:
             raise RuntimeError("LangChain未安装，无法初始化向量存储管理器")
@@ -64,10 +95,60 @@ class LangChainVectorStoreManager:
         self.is_initialized = False
         self.dimension = 1536  # 默认向量维度
         
+        # 加载模式，mmap模式加载后为只读
+        self.load_mode = load_mode or self.config_manager.get('vector_store.load_mode', 'memory')
+        if self.load_mode not in LOAD_MODES:
+            logging.warning(f"不支持的向量存储加载模式: {self.load_mode}，使用memory模式")
+            self.load_mode = 'memory'
+        self.read_only = False
+        
         # LangChain FAISS实例
         self.vector_store = None
         self.text_embeddings = None
         self.image_embeddings = None
+        self.embedding_cache = embedding_cache
+        
+        # 按(chunk_type, vector_type)划分的子索引
+        self.partition_manager = IndexPartitionManager(
+            filter_fields=self.config_manager.get('vector_store.filter_fields', DEFAULT_FILTER_FIELDS),
+            index_config=self.config_manager.get('vector_store.index', {})
+        ) if FAISS_AVAILABLE else None
+        
+        # docstore元数据倒排索引
+        self.metadata_index = DocstoreMetadataIndex(
+            fields=self.config_manager.get('vector_store.indexed_fields', DEFAULT_INDEXED_FIELDS)
+        )
+        
+        # 元数据向量字段的文件存储
+        self.embedding_store = EmbeddingStore() if FAISS_AVAILABLE else None
+        
+        # 增量段（主索引落盘后的新向量写入增量段，compact时并入主索引）
+        self.delta_store = DeltaSegmentStore(
+            filter_fields=self.config_manager.get('vector_store.filter_fields', DEFAULT_FILTER_FIELDS),
+            delta_config=self.config_manager.get('vector_store.delta', {})
+        ) if FAISS_AVAILABLE else None
+        # 主索引当前落盘的目录；为None表示内存中的主索引尚未完整保存
+        self._base_path = None
+        
+        # 按parent_table_id预计算的表格展示产物（合并HTML、行数、摘要）
+        self.table_artifacts = TableArtifactStore()
+        
+        # 共用分词服务：启动时加载序列化词典缓存和领域用户词典，避免第一次分词时构建词典
+        self.tokenizer = get_tokenizer(self.config_manager)
+        if self.tokenizer.config.get('warm_up', True):
+            self.tokenizer.warm_up()
+        
+        # 分块文本的BM25关键词倒排索引（召回关键词层使用）
+        self.keyword_index = KeywordIndex(self.config_manager.get('vector_store.keyword_index', {}))
+        
+        # 入库时预先分词的分块词项向量（召回评分阶段使用）
+        self.chunk_tokens = ChunkTokenStore(self.config_manager.get('vector_store.chunk_tokens', {}))
+        
+        # 文本、表格、图片分块之间的跨模态关联图（混合召回跨类型提升使用）
+        self.association_graph = AssociationGraph(self.config_manager.get('vector_store.association_graph', {}))
+        
+        # 存储版本号：向量增删、保存、加载和重建时递增，供查询结果缓存判断是否失效
+        self.version = 0
         
         # 统计信息
         self.total_vectors = 0
@@ -82,28 +163,26 @@ class LangChainVectorStoreManager:
         logging.info("LangChainVectorStoreManager初始化完成")
 
     def _initialize_embedding_models(self):
-        """初始化embedding模型"""
+        """初始化embedding模型（按vectorization.embedding_provider选择提供方）"""
         try:
-            # 获取API密钥
-            api_key = self.config_manager.get_environment_manager().get_required_var('DASHSCOPE_API_KEY')
-            if not api_key:
-                raise ValueError("未找到有效的DashScope API密钥")
-            
             # 初始化文本embedding模型
-            text_model = self.config.get('vectorization.text_embedding_model', 'text-embedding-v1')
-            self.text_embeddings = DashScopeEmbeddings(
-                dashscope_api_key=api_key,
-                model=text_model
-            )
-            
-            # 初始化图片embedding模型
-            image_model = self.config.get('vectorization.image_embedding_model', 'multimodal-embedding-one-peace-v1')
-            self.image_embeddings = DashScopeEmbeddings(
-                dashscope_api_key=api_key,
-                model=image_model
-            )
+            text_model = self.config_manager.get('vectorization.text_embedding_model', 'text-embedding-v1')
+            self.text_embeddings = create_text_embeddings(self.config_manager, text_model)
+            if self.embedding_cache is not None:
+                # 缓存键使用提供方的模型标识，不同提供方的向量互不混用
+                cache_model = getattr(self.text_embeddings, 'model_name', text_model)
+                self.text_embeddings = CachedEmbeddings(self.text_embeddings, self.embedding_cache, cache_model)
+            
+            # 初始化多模态embedding模型（查询文本向量化到图片视觉向量空间），不可用时不影响文本检索
+            image_model = self.config_manager.get('vectorization.image_embedding_model', 'multimodal-embedding-one-peace-v1')
+            try:
+                self.image_embeddings = create_multimodal_embeddings(self.config_manager, image_model)
+            except Exception as e:
+                logging.warning(f"多模态embedding模型初始化失败，图片视觉检索不可用: {e}")
+                self.image_embeddings = None
             
-            logging.info(f"Embedding模型初始化成功: 文本({text_model}), 图片({image_model})")
+            logging.info(f"Embedding模型初始化成功: 文本({getattr(self.text_embeddings, 'model_name', text_model)}), "
+                         f"图片({getattr(self.image_embeddings, 'model_name', image_model)})")
             
         except Exception as e:
             logging.error(f"Embedding模型初始化失败: {e}")
@@ -139,28 +218,58 @@ class LangChainVectorStoreManager:
             if not FAISS_AVAILABLE:
                 raise RuntimeError("FAISS未安装，无法创建向量存储")
             
-            if dimension:
-                self.dimension = dimension
+            dimension = dimension or getattr(self.text_embeddings, 'dimension', None) or \
+                self.config_manager.get('vectorization.text_embedding_dimension')
             
             # 创建空的FAISS向量存储，使用余弦距离策略
             from langchain_community.vectorstores.utils import DistanceStrategy
-            self.vector_store = FAISS.from_texts(
-                texts=["初始化文本"],
-                embedding=self.text_embeddings,
-                metadatas=[{"chunk_type": "system", "content": "initialization"}],
-                distance_strategy=DistanceStrategy.COSINE
-            )
-            
-            # 删除初始化文本（如果存在）
-            try:
-                self.vector_store.delete([0])
-            except Exception as e:
-                logging.warning(f"删除初始化文本时出现警告: {e}")
-                # 继续执行，不影响后续操作
-            
+            if dimension:
+                # 维度已知时直接创建空索引，不调用embedding接口（与from_texts在余弦策略下创建的flat L2索引一致）
+                self.dimension = int(dimension)
+                self.vector_store = FAISS(
+                    embedding_function=self.text_embeddings,
+                    index=faiss.IndexFlatL2(self.dimension),
+                    docstore=InMemoryDocstore(),
+                    index_to_docstore_id={},
+                    distance_strategy=DistanceStrategy.COSINE
+                )
+            else:
+                # 维度未知时向量化一条初始化文本确定维度
+                self.vector_store = FAISS.from_texts(
+                    texts=["初始化文本"],
+                    embedding=self.text_embeddings,
+                    metadatas=[{"chunk_type": "system", "content": "initialization"}],
+                    distance_strategy=DistanceStrategy.COSINE
+                )
+                self.dimension = self.vector_store.index.d
+                
+                # 删除初始化文本（如果存在）
+                try:
+                    self.vector_store.delete([0])
+                except Exception as e:
+                    logging.warning(f"删除初始化文本时出现警告: {e}")
+                    # 继续执行，不影响后续操作
+
+            self.read_only = False
+            
+            # 新建存储时清空分区和元数据索引
+            if self.partition_manager:
+                self.partition_manager.clear()
+            self.metadata_index.clear()
+            if self.embedding_store:
+                self.embedding_store.clear()
+            if self.delta_store:
+                self.delta_store.clear()
+            self._base_path = None
+            self.table_artifacts.clear()
+            self.keyword_index.clear()
+            self.chunk_tokens.clear()
+            self.association_graph.clear()
+
             self.is_initialized = True
             self.total_vectors = 0
             self.last_update_time = time.time()
+            self._bump_version()
             
             logging.info(f"向量存储创建成功，维度: {self.dimension}")
             return True
@@ -190,15 +299,9 @@ class LangChainVectorStoreManager:
             elif len(metadatas) != len(texts):
                 raise ValueError("文本列表和元数据列表长度不匹配")
             
-            # 使用LangChain的add_texts方法
-            self.vector_store.add_texts(texts, metadatas)
-            
-            # 更新统计信息
-            self.total_vectors += len(texts)
-            self.last_update_time = time.time()
-            
-            logging.info(f"成功添加 {len(texts)} 个文本到向量存储")
-            return True
+            # 先生成向量再走add_embeddings，保证分区索引同步更新
+            vectors = self.text_embeddings.embed_documents(texts)
+            return self.add_embeddings(list(zip(texts, vectors)), metadatas)
             
         except Exception as e:
             logging.error(f"添加文本失败: {e}")
@@ -219,12 +322,22 @@ class LangChainVectorStoreManager:
             if not text_embedding_pairs:
                 return True
             
+            self._ensure_writable()
+            
             # 确保元数据列表长度匹配
             if metadatas is None:
                 metadatas = [{} for _ in text_embedding_pairs]
             elif len(metadatas) != len(text_embedding_pairs):
                 raise ValueError("向量对列表和元数据列表长度不匹配")
             
+            # 为候选内容计算MinHash签名，供结果去重使用
+            metadatas = self._attach_content_signatures(text_embedding_pairs, metadatas)
+            
+            # 元数据中的向量字段写入向量文件，docstore只保存行号
+            if self.embedding_store:
+                dedup_cache = {}
+                metadatas = [self.embedding_store.externalize(meta, dedup_cache) for meta in metadatas]
+            
             logging.info(f"准备添加 {len(text_embedding_pairs)} 个向量对")
             logging.info(f"第一个向量对: 文本='{text_embedding_pairs[0][0][:50]}...', 向量长度={len(text_embedding_pairs[0][1])}")
             logging.info(f"第一个元数据: {metadatas[0]}")
@@ -242,14 +355,37 @@ class LangChainVectorStoreManager:
                 if hasattr(self.vector_store.index, 'ntotal'):
                     logging.info(f"当前索引中的向量数量: {self.vector_store.index.ntotal}")
             
+            # 主索引已落盘时写入活动增量段，否则直接写入主索引
+            segment = self._get_active_segment()
+            target_store = segment.vector_store if segment else self.vector_store
+            
             # 使用LangChain的add_embeddings方法
             logging.info("调用LangChain的add_embeddings方法...")
-            self.vector_store.add_embeddings(text_embedding_pairs, metadatas)
+            doc_ids = target_store.add_embeddings(text_embedding_pairs, metadatas)
             logging.info("LangChain add_embeddings调用成功")
             
+            if segment:
+                # 增量段文档同时登记到主docstore，按ID查询文档无需区分所在段
+                self.vector_store.docstore.add({
+                    doc_id: segment.vector_store.docstore.search(doc_id) for doc_id in doc_ids
+                })
+
+            # 同步写入对应的(chunk_type, vector_type)分区
+            partition_manager = self.delta_store.partition_manager if segment else self.partition_manager
+            if partition_manager:
+                partition_manager.add_vectors(
+                    [vector for _, vector in text_embedding_pairs], metadatas, doc_ids
+                )
+            self.metadata_index.add_documents(doc_ids, metadatas)
+            self.table_artifacts.mark_dirty(metadatas)
+            self.association_graph.mark_dirty(metadatas)
+            self.keyword_index.add_documents(doc_ids, metadatas, [text for text, _ in text_embedding_pairs])
+            self.chunk_tokens.add_documents(doc_ids, metadatas, [text for text, _ in text_embedding_pairs])
+            
             # 更新统计信息
             self.total_vectors += len(text_embedding_pairs)
             self.last_update_time = time.time()
+            self._bump_version()
             
             logging.info(f"成功添加 {len(text_embedding_pairs)} 个向量到存储")
             return True
@@ -345,7 +481,8 @@ class LangChainVectorStoreManager:
         更新向量到存储（增量模式）
         
         注意：对于FAISS向量存储，更新操作实际上就是添加新向量
-        因为FAISS不支持真正的"更新"操作，只能添加新向量
+        因为FAISS不支持真正的"更新"操作，只能添加新向量。
+        主索引已落盘时新向量保存为增量段，不重写主索引和docstore。
 
         :param vectors: 向量列表
         :param metadata: 元数据列表
@@ -398,6 +535,9 @@ class LangChainVectorStoreManager:
         """
         相似性搜索
 
+        过滤条件包含chunk_type/vector_type时只扫描对应分区；document_name等位图字段通过IDSelector
+        在索引内预过滤，top-k在过滤范围内精确。fetch_k仅在过滤条件含无位图字段时生效。
+
         :param query: 查询文本
         :param k: 返回结果数量
         :param filter_dict: 过滤条件
@@ -408,63 +548,370 @@ class LangChainVectorStoreManager:
             if not self.is_initialized:
                 raise RuntimeError("向量存储未初始化")
             
-            # 使用底层的FAISS搜索方法避免LangChain的分数检查警告
-            import numpy as np
-            
             # 获取查询向量
             query_vector = self.vector_store.embeddings.embed_query(query)
             
-            # 使用FAISS直接搜索
-            faiss_index = self.vector_store.index
-            query_vector_np = np.array([query_vector], dtype=np.float32)
+            results_with_scores = self._search_with_scores(query_vector, k, filter_dict, fetch_k)
+            results = self.attach_similarity_scores(results_with_scores, copy_docs=True)
+            
+            logging.info(f"相似性搜索完成，返回 {len(results)} 个结果")
+            return results
+            
+        except Exception as e:
+            logging.error(f"相似性搜索失败: {e}")
+            return []
+
+    def similarity_search_batch(self, queries: List[str], k: int = 5, filter_dict: Dict[str, Any] = None, fetch_k: int = None) -> List[List[Any]]:
+        """
+        批量相似性搜索
+
+        所有查询文本通过一次批量查询向量调用（embed_queries，查询侧向量）生成向量，再以nq>1的方式一次完成FAISS搜索。
+        同一文档可能出现在多个查询的结果中，因此每条结果都是带独立元数据的文档副本，
+        similarity_score互不覆盖。
+
+        :param queries: 查询文本列表
+        :param k: 每个查询返回的结果数量
+        :param filter_dict: 过滤条件（对所有查询生效）
+        :param fetch_k: 过滤前获取的结果数量
+        :return: 与queries一一对应的搜索结果列表
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            if not queries:
+                return []
             
-            # 确定搜索数量
-            search_k = k
-            if filter_dict and fetch_k:
-                search_k = fetch_k
+            query_vectors = embed_queries(self.vector_store.embeddings, queries)
             
-            distances, indices = faiss_index.search(query_vector_np, search_k)
+            batch_results = [
+                self.attach_similarity_scores(results_with_scores, copy_docs=True)
+                for results_with_scores in self._search_with_scores_batch(query_vectors, k, filter_dict, fetch_k)
+            ]
             
-            # 处理搜索结果
-            results_with_scores = []
-            for i, dist in zip(indices[0], distances[0]):
-                if i != -1:  # 确保索引有效
-                    doc = self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
-                    results_with_scores.append((doc, dist))
+            logging.info(f"批量相似性搜索完成，{len(queries)} 个查询，返回 {sum(len(r) for r in batch_results)} 个结果")
+            return batch_results
             
-            # 应用过滤条件
-            if filter_dict:
-                filtered_results = []
-                for doc, score in results_with_scores:
-                    if self._matches_filter(doc, filter_dict):
-                        filtered_results.append((doc, score))
-                results_with_scores = filtered_results[:k]  # 取前k个结果
+        except Exception as e:
+            logging.error(f"批量相似性搜索失败: {e}")
+            return [[] for _ in queries]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        批量生成查询向量（一次embedding请求，与similarity_search使用的embed_query向量一致）
+
+        :param queries: 查询文本列表
+        :return: 与queries一一对应的查询向量
+        """
+        if not self.is_initialized:
+            raise RuntimeError("向量存储未初始化")
+        if not queries:
+            return []
+        return embed_queries(self.vector_store.embeddings, queries)
+
+    def similarity_search_with_score_by_vectors(self, query_vectors: List[List[float]], k: int,
+                                                filter_dict: Dict[str, Any] = None, fetch_k: int = None) -> List[List[Tuple[Any, float]]]:
+        """
+        按向量批量搜索，返回未归一化的原始分数（分数越大越相似）
+
+        调用方可对结果的前若干项调用attach_similarity_scores，得到与对应k的top-k搜索一致的similarity_score。
+
+        :param query_vectors: 查询向量列表
+        :param k: 每个查询返回的结果数量
+        :param filter_dict: 过滤条件（对所有查询生效）
+        :param fetch_k: 过滤前获取的结果数量
+        :return: 与query_vectors一一对应的[(文档, 原始分数)]列表
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            if not query_vectors:
+                return []
+            return self._search_with_scores_batch(query_vectors, k, filter_dict, fetch_k)
+            
+        except Exception as e:
+            logging.error(f"批量向量搜索失败: {e}")
+            return [[] for _ in query_vectors]
+
+    def similarity_search_range(self, query: str, score_threshold: float, filter_dict: Dict[str, Any] = None, max_results: int = None) -> List[Any]:
+        """
+        范围相似性搜索
+
+        使用分区索引的真实余弦相似度和绝对阈值（FAISS range_search），返回所有相似度高于阈值的结果。
+        结果的similarity_score为余弦相似度本身，不做结果集内归一化，低相关查询可能返回空列表。
+
+        :param query: 查询文本
+        :param score_threshold: 余弦相似度阈值
+        :param filter_dict: 过滤条件
+        :param max_results: 最多返回的结果数量（可选，按相似度截断）
+        :return: 搜索结果列表（按相似度降序）
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            query_vector = self.vector_store.embeddings.embed_query(query)
+            results = self.similarity_search_range_by_vector(query_vector, score_threshold, filter_dict, max_results)
+            
+            logging.info(f"范围相似性搜索完成，阈值 {score_threshold}，返回 {len(results)} 个结果")
+            return results
+            
+        except Exception as e:
+            logging.error(f"范围相似性搜索失败: {e}")
+            return []
+
+    def similarity_search_range_by_vector(self, query_vector: List[float], score_threshold: float, filter_dict: Dict[str, Any] = None, max_results: int = None) -> List[Any]:
+        """
+        按向量进行范围相似性搜索
+
+        :param query_vector: 查询向量
+        :param score_threshold: 余弦相似度阈值
+        :param filter_dict: 过滤条件
+        :param max_results: 最多返回的结果数量（可选，按相似度截断）
+        :return: 搜索结果列表（按相似度降序）
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            if not self.partition_manager:
+                raise RuntimeError("范围搜索依赖向量索引分区，当前不可用")
+            
+            # 过滤条件无法完全由分区和位图满足时，扫描类型对应（或全部）分区后再做元数据过滤
+            exact = not filter_dict or self.partition_manager.covers_filter(filter_dict)
+            hits = []
+            for manager in self._partition_managers():
+                hits.extend(manager.range_search(
+                    query_vector, score_threshold, self._resolve_partitions(manager, filter_dict),
+                    filter_dict if exact else None
+                ))
+            hits.sort(key=lambda item: item[1], reverse=True)
             
-            # 将分数添加到结果的元数据中
             results = []
-            if results_with_scores:
-                # 获取所有距离值进行归一化
-                distances = [float(score) for _, score in results_with_scores]
-                min_distance = min(distances)
-                max_distance = max(distances)
-                
-                for doc, score in results_with_scores:
-                    if hasattr(doc, 'metadata'):
-                        # 将欧几里得距离转换为[0,1]范围内的相似度值
-                        # 距离越小，相似度越高
-                        if max_distance > min_distance:
-                            similarity_score = 1.0 - (float(score) - min_distance) / (max_distance - min_distance)
-                        else:
-                            similarity_score = 1.0  # 所有距离相同的情况
-                        doc.metadata['similarity_score'] = similarity_score
-                    results.append(doc)
+            for doc_id, score in hits:
+                doc = self.vector_store.docstore.search(doc_id)
+                if not hasattr(doc, 'metadata'):
+                    continue
+                if not exact and not self._matches_filter(doc, filter_dict):
+                    continue
+                doc = copy.copy(doc)
+                doc.metadata = dict(doc.metadata)
+                doc.metadata['similarity_score'] = score
+                results.append(doc)
+                if max_results and len(results) >= max_results:
+                    break
             
-            logging.info(f"相似性搜索完成，返回 {len(results)} 个结果")
             return results
             
         except Exception as e:
-            logging.error(f"相似性搜索失败: {e}")
+            logging.error(f"范围向量搜索失败: {e}")
+            return []
+
+    def keyword_search(self, query: str, k: int = 10, filter_dict: Dict[str, Any] = None,
+                       query_terms: List[str] = None) -> List[Any]:
+        """
+        BM25关键词检索（不调用embedding）
+
+        :param query: 查询文本
+        :param k: 返回结果数量
+        :param filter_dict: 过滤条件（须包含chunk_type，其余字段在命中文档上检查）
+        :param query_terms: 查询词（可选，为None时对query分词）
+        :return: 文档副本列表，元数据中similarity_score为按IDF加权的查询词覆盖率，
+                 bm25_score为BM25分数，matched_terms为命中的查询词
+        """
+        try:
+            if not self.is_initialized or not self.keyword_index.enabled:
+                return []
+            filter_dict = dict(filter_dict or {})
+            chunk_type = filter_dict.pop('chunk_type', None)
+            if not chunk_type:
+                raise ValueError("关键词检索须指定chunk_type")
+            
+            docstore = self.vector_store.docstore._dict
+            # 其余过滤条件在命中文档上检查，多取一些候选
+            fetch_k = k * 4 if filter_dict else k
+            results = []
+            for doc_id, bm25_score, coverage, matched_terms in self.keyword_index.search(query, chunk_type, fetch_k, query_terms):
+                doc = docstore.get(doc_id)
+                if doc is None or (filter_dict and not self._matches_filter(doc, filter_dict)):
+                    continue
+                doc = copy.copy(doc)
+                doc.metadata = dict(doc.metadata)
+                doc.metadata.update({
+                    'similarity_score': coverage,
+                    'bm25_score': bm25_score,
+                    'matched_terms': matched_terms
+                })
+                results.append(doc)
+                if len(results) >= k:
+                    break
+            return results
+            
+        except Exception as e:
+            logging.error(f"关键词检索失败: {e}")
+            return []
+
+    def _search_with_scores(self, query_vector: List[float], k: int, filter_dict: Dict[str, Any] = None, fetch_k: int = None) -> List[Tuple[Any, float]]:
+        """
+        按单个查询向量搜索
+
+        :param query_vector: 查询向量
+        :param k: 返回结果数量
+        :param filter_dict: 过滤条件
+        :param fetch_k: 过滤前获取的结果数量
+        :return: [(文档, 分数)]，分数越大越相似
+        """
+        return self._search_with_scores_batch([query_vector], k, filter_dict, fetch_k)[0]
+
+    def _search_with_scores_batch(self, query_vectors: List[List[float]], k: int, filter_dict: Dict[str, Any] = None, fetch_k: int = None) -> List[List[Tuple[Any, float]]]:
+        """
+        按查询向量批量搜索，优先使用(chunk_type, vector_type)分区
+
+        :param query_vectors: 查询向量列表
+        :param k: 每个查询返回的结果数量
+        :param filter_dict: 过滤条件
+        :param fetch_k: 过滤前获取的结果数量
+        :return: 每个查询的[(文档, 分数)]，分数越大越相似
+        """
+        managers = self._partition_managers()
+        use_partitions = bool(managers) and (
+            self.partition_manager.resolve_partitions(filter_dict) is not None
+            # 无过滤条件时扫描全部分区，使分区的ANN索引同样作用于不限类型的查询
+            or (not filter_dict and any(manager.partitions for manager in managers))
+        )
+        
+        if use_partitions:
+            # 分区和位图已满足全部过滤条件时直接取k个，否则按fetch_k取候选再做剩余字段过滤
+            exact = not filter_dict or self.partition_manager.covers_filter(filter_dict)
+            search_k = k if exact else max(k, fetch_k or k)
+            
+            # 主索引分区和增量段分区分别搜索后按分数合并
+            batch_hits = [[] for _ in query_vectors]
+            for manager in managers:
+                manager_hits = manager.search_batch(
+                    query_vectors, search_k, self._resolve_partitions(manager, filter_dict),
+                    filter_dict if exact else None
+                )
+                for hits, more in zip(batch_hits, manager_hits):
+                    hits.extend(more)
+            if len(managers) > 1:
+                for hits in batch_hits:
+                    hits.sort(key=lambda item: item[1], reverse=True)
+                    del hits[search_k:]
+            
+            batch_results = []
+            for hits in batch_hits:
+                results_with_scores = []
+                for doc_id, score in hits:
+                    doc = self.vector_store.docstore.search(doc_id)
+                    if not hasattr(doc, 'metadata'):
+                        continue
+                    if exact or self._matches_filter(doc, filter_dict):
+                        results_with_scores.append((doc, score))
+                batch_results.append(results_with_scores[:k])
+            return batch_results
+        
+        # 无类型过滤：使用底层的FAISS搜索方法避免LangChain的分数检查警告
+        import numpy as np
+        
+        faiss_index = self.vector_store.index
+        query_vector_np = np.array(query_vectors, dtype=np.float32)
+        
+        # 确定搜索数量
+        search_k = k
+        if filter_dict and fetch_k:
+            search_k = fetch_k
+        
+        # 已删除的文档在索引中仍存在，多取相应数量的候选
+        if self.delta_store and self.delta_store.tombstones:
+            search_k += len(self.delta_store.tombstones)
+        
+        # 主索引和各增量段分别搜索
+        stores = [self.vector_store]
+        if self.delta_store:
+            stores.extend(segment.vector_store for segment in self.delta_store.segments if segment.size)
+        
+        batch_results = [[] for _ in query_vectors]
+        for store in stores:
+            distances, indices = store.index.search(query_vector_np, search_k)
+            for results_with_scores, row_indices, row_distances in zip(batch_results, indices, distances):
+                # 欧几里得距离取负，统一为分数越大越相似
+                for i, dist in zip(row_indices, row_distances):
+                    if i != -1:  # 确保索引有效
+                        # 增量段文档也登记在主docstore中，已删除的文档查不到
+                        doc = self.vector_store.docstore.search(store.index_to_docstore_id[i])
+                        if hasattr(doc, 'metadata'):
+                            results_with_scores.append((doc, -float(dist)))
+        
+        for row, results_with_scores in enumerate(batch_results):
+            if len(stores) > 1:
+                results_with_scores.sort(key=lambda item: item[1], reverse=True)
+                results_with_scores = results_with_scores[:search_k]
+            
+            # 应用过滤条件
+            if filter_dict:
+                results_with_scores = [
+                    (doc, score) for doc, score in results_with_scores
+                    if self._matches_filter(doc, filter_dict)
+                ]
+            batch_results[row] = results_with_scores[:k]  # 取前k个结果
+        
+        return batch_results
+
+    def _partition_managers(self) -> List[IndexPartitionManager]:
+        """
+        获取需要搜索的分区管理器（主索引分区，以及存在增量段时的增量分区）
+
+        :return: 分区管理器列表
+        """
+        if not self.partition_manager:
             return []
+        managers = [self.partition_manager]
+        if self.delta_store and self.delta_store.segments:
+            managers.append(self.delta_store.partition_manager)
+        return managers
+
+    def _resolve_partitions(self, manager: IndexPartitionManager, filter_dict: Dict[str, Any] = None) -> List[Any]:
+        """
+        确定分区管理器中需要扫描的分区
+
+        :param manager: 分区管理器
+        :param filter_dict: 过滤条件
+        :return: 分区列表（过滤条件不含类型字段时为全部分区）
+        """
+        partitions = manager.resolve_partitions(filter_dict)
+        if partitions is None:
+            partitions = list(manager.partitions.values())
+        return partitions
+
+    def attach_similarity_scores(self, results_with_scores: List[Tuple[Any, float]], copy_docs: bool = False) -> List[Any]:
+        """
+        将分数归一化到[0,1]并写入文档元数据的similarity_score
+
+        :param results_with_scores: [(文档, 分数)]，分数越大越相似
+        :param copy_docs: 是否写入文档副本（搜索路径均应传True，避免并发查询的分数互相覆盖docstore中共享的元数据）
+        :return: 文档列表
+        """
+        results = []
+        if not results_with_scores:
+            return results
+        
+        scores = [float(score) for _, score in results_with_scores]
+        min_score = min(scores)
+        max_score = max(scores)
+        
+        for doc, score in results_with_scores:
+            if hasattr(doc, 'metadata'):
+                if copy_docs:
+                    doc = copy.copy(doc)
+                    doc.metadata = dict(doc.metadata)
+                if max_score > min_score:
+                    similarity_score = (float(score) - min_score) / (max_score - min_score)
+                else:
+                    similarity_score = 1.0  # 所有分数相同的情况
+                doc.metadata['similarity_score'] = similarity_score
+            results.append(doc)
+        return results
 
     def _matches_filter(self, doc: Any, filter_dict: Dict[str, Any]) -> bool:
         """
@@ -485,25 +932,33 @@ class LangChainVectorStoreManager:
         
         return True
 
-    def similarity_search_by_vector(self, query_vector: List[float], k: int = 5) -> List[Any]:
+    def similarity_search_by_vector(self, query_vector: List[float], k: int = 5, filter_dict: Dict[str, Any] = None) -> List[Any]:
         """
         按向量进行相似性搜索
 
         :param query_vector: 查询向量
         :param k: 返回结果数量
+        :param filter_dict: 过滤条件（可选，包含chunk_type/vector_type时只扫描对应分区）
         :return: 搜索结果列表
         """
         try:
             if not self.is_initialized:
                 raise RuntimeError("向量存储未初始化")
             
+            if filter_dict or (self.delta_store and self.delta_store.segments):
+                # 存在增量段时LangChain只能搜索主索引，统一走合并搜索
+                results = self.attach_similarity_scores(
+                    self._search_with_scores(query_vector, k, filter_dict), copy_docs=True
+                )
+                logging.info(f"向量搜索完成，返回 {len(results)} 个结果")
+                return results
+            
             # 使用LangChain的similarity_search_by_vector方法
             results = self.vector_store.similarity_search_by_vector(query_vector, k=k)
             
             # 为向量搜索结果添加相似度分数（使用默认值1.0，因为向量搜索通常不返回分数）
-            for result in results:
-                if hasattr(result, 'metadata') and 'similarity_score' not in result.metadata:
-                    result.metadata['similarity_score'] = 1.0
+            # 写入文档副本，不修改docstore中共享的元数据
+            results = self.attach_similarity_scores([(result, 1.0) for result in results], copy_docs=True)
             
             logging.info(f"向量搜索完成，返回 {len(results)} 个结果")
             return results
@@ -512,10 +967,46 @@ class LangChainVectorStoreManager:
             logging.error(f"向量搜索失败: {e}")
             return []
 
+    async def asimilarity_search(self, query: str, k: int = 5, filter_dict: Dict[str, Any] = None,
+                                 fetch_k: int = None, executor: Executor = None) -> List[Any]:
+        """
+        异步相似度搜索（在线程池中执行，不阻塞事件循环）
+
+        :param query: 查询文本
+        :param k: 返回结果数量
+        :param filter_dict: 过滤条件
+        :param fetch_k: 候选数量
+        :param executor: 执行搜索的线程池（可选，默认使用事件循环的默认线程池）
+        :return: 搜索结果列表
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(self.similarity_search, query, k, filter_dict, fetch_k)
+        )
+
+    async def asimilarity_search_by_vector(self, query_vector: List[float], k: int = 5,
+                                           filter_dict: Dict[str, Any] = None, executor: Executor = None) -> List[Any]:
+        """
+        异步向量相似度搜索（在线程池中执行，不阻塞事件循环）
+
+        :param query_vector: 查询向量
+        :param k: 返回结果数量
+        :param filter_dict: 过滤条件
+        :param executor: 执行搜索的线程池（可选，默认使用事件循环的默认线程池）
+        :return: 搜索结果列表
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(self.similarity_search_by_vector, query_vector, k, filter_dict)
+        )
+
     def save(self, save_path: str = None) -> bool:
         """
         保存向量存储
 
+        主索引已在该目录落盘时只写出活动增量段（耗时与新增量成正比），增量段达到阈值时自动compact；
+        否则（新建的存储、保存到其他目录或未启用增量段）整体保存主索引。
+
         :param save_path: 保存路径（可选）
         :return: 是否保存成功
         """
@@ -523,11 +1014,23 @@ class LangChainVectorStoreManager:
             if not self.is_initialized:
                 raise RuntimeError("向量存储未初始化")
             
+            self._ensure_writable()
+            
             if save_path is None:
                 save_path = os.path.join(self.vector_db_dir, 'langchain_faiss_index')
             
-            # 使用LangChain的save_local方法
-            self.vector_store.save_local(save_path)
+            if self.delta_store and self.delta_store.enabled and self._is_base_path(save_path):
+                self._save_delta(save_path)
+                if self.delta_store.needs_compaction():
+                    logging.info("增量段达到compact阈值，开始合并到主索引")
+                    self._save_full(save_path)
+            else:
+                self._save_full(save_path)
+            self._save_table_artifacts(save_path)
+            self._save_keyword_index(save_path)
+            self._save_chunk_tokens(save_path)
+            self._save_association_graph(save_path)
+            self._bump_version()
             
             logging.info(f"向量存储保存成功: {save_path}")
             return True
@@ -536,11 +1039,437 @@ class LangChainVectorStoreManager:
             logging.error(f"保存向量存储失败: {e}")
             return False
 
-    def load(self, load_path: str = None) -> bool:
+    def compact(self, save_path: str = None) -> bool:
+        """
+        将全部增量段合并到主索引并整体保存，随后删除增量段
+
+        :param save_path: 保存路径（可选）
+        :return: 是否成功
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            self._ensure_writable()
+            
+            if save_path is None:
+                save_path = os.path.join(self.vector_db_dir, 'langchain_faiss_index')
+            
+            segment_count = len(self.delta_store.segments) if self.delta_store else 0
+            start_time = time.time()
+            self._save_full(save_path)
+            self._bump_version()
+            
+            logging.info(f"增量段compact完成: 合并 {segment_count} 个增量段，耗时 {time.time() - start_time:.2f}s")
+            return True
+            
+        except Exception as e:
+            logging.error(f"增量段compact失败: {e}")
+            return False
+
+    def _save_full(self, save_path: str):
+        """
+        合并增量段后整体保存主索引、分区和向量文件
+
+        :param save_path: 保存路径
+        """
+        self._fold_delta_segments()
+        self._purge_tombstones()
+        
+        # 旧数据中仍保存在元数据里的向量先迁移到向量文件
+        if self.embedding_store:
+            self._externalize_docstore_embeddings()
+        
+        # 使用LangChain的save_local方法
+        self.vector_store.save_local(save_path)
+        
+        if self.embedding_store:
+            self.embedding_store.save(save_path)
+        
+        # 分区与主索引一起保存
+        if self.partition_manager:
+            self.partition_manager.save(save_path, base_ntotal=self.vector_store.index.ntotal)
+        
+        # 主索引已包含全部向量，删除旧的增量段
+        if self.delta_store:
+            self.delta_store.clear(
+                base_ntotal=self.vector_store.index.ntotal,
+                base_embeddings=self.embedding_store.size if self.embedding_store else 0
+            )
+            self.delta_store.remove_files(save_path)
+        self._base_path = os.path.abspath(save_path)
+
+    def _save_table_artifacts(self, save_path: str):
+        """
+        重新计算子表有变化的父表，并在产物有变化、docstore文档数与产物文件记录的不一致（只增删了非表格文档）
+        或目标目录缺少产物文件时写出table_artifacts.json
+
+        :param save_path: 主索引目录
+        """
+        self.table_artifacts.refresh(self._get_subtable_documents)
+        document_count = len(self.vector_store.docstore._dict)
+        if (self.table_artifacts.dirty or self.table_artifacts.document_count != document_count
+                or not os.path.exists(os.path.join(save_path, TABLE_ARTIFACTS_FILE_NAME))):
+            if not self.table_artifacts.save(save_path, document_count):
+                raise RuntimeError("表格展示产物保存失败")
+
+    def _save_keyword_index(self, save_path: str):
+        """
+        关键词索引有变化或目标目录缺少索引文件时写出keyword_index.json
+
+        :param save_path: 主索引目录
+        """
+        if not self.keyword_index.enabled:
+            return
+        if self.keyword_index.dirty or not os.path.exists(os.path.join(save_path, KEYWORD_INDEX_FILE_NAME)):
+            if not self.keyword_index.save(save_path, len(self.vector_store.docstore._dict)):
+                raise RuntimeError("关键词索引保存失败")
+
+    def _attach_content_signatures(self, text_embedding_pairs: List[Tuple[str, List[float]]],
+                                   metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        为每个分块的候选内容计算MinHash签名，写入元数据的content_minhash字段（相同内容只计算一次）
+
+        :param text_embedding_pairs: (文本, 向量)对列表
+        :param metadatas: 元数据列表
+        :return: 元数据列表（已有签名的元数据保持不变，其余为带签名的副本）
+        """
+        computed: Dict[str, Optional[str]] = {}
+        result = []
+        for (text, _), metadata in zip(text_embedding_pairs, metadatas):
+            metadata = metadata or {}
+            if MINHASH_METADATA_KEY not in metadata:
+                content = build_candidate_content(metadata, text) or ''
+                if content not in computed:
+                    signature = compute_minhash(content)
+                    computed[content] = encode_signature(signature) if signature is not None else None
+                if computed[content] is not None:
+                    metadata = dict(metadata)
+                    metadata[MINHASH_METADATA_KEY] = computed[content]
+            result.append(metadata)
+        return result
+
+    def _save_chunk_tokens(self, save_path: str):
+        """
+        分块词项向量有变化或目标目录缺少文件时写出chunk_tokens.npz
+
+        :param save_path: 主索引目录
+        """
+        if not self.chunk_tokens.enabled:
+            return
+        if self.chunk_tokens.dirty or not os.path.exists(os.path.join(save_path, CHUNK_TOKENS_FILE_NAME)):
+            if not self.chunk_tokens.save(save_path, len(self.vector_store.docstore._dict)):
+                raise RuntimeError("分块词项向量保存失败")
+
+    def _save_association_graph(self, save_path: str):
+        """
+        重新计算分块有变化的文档的跨模态关联，并在关联图有变化或目标目录缺少文件时写出association_graph.json
+
+        :param save_path: 主索引目录
+        """
+        if not self.association_graph.enabled:
+            return
+        self.association_graph.refresh(
+            lambda document_name: self.get_documents_by_metadata({'document_name': document_name}),
+            self.get_embedding
+        )
+        if self.association_graph.dirty or not os.path.exists(os.path.join(save_path, ASSOCIATION_GRAPH_FILE_NAME)):
+            if not self.association_graph.save(save_path, len(self.vector_store.docstore._dict)):
+                raise RuntimeError("跨模态关联图保存失败")
+
+    def _get_subtable_documents(self, parent_table_id: str) -> List[Tuple[str, Any]]:
+        """
+        获取父表的全部子表文档
+
+        :param parent_table_id: 父表ID
+        :return: [(文档ID, 文档)]列表
+        """
+        return self.get_documents_by_metadata({'chunk_type': 'table', 'parent_table_id': parent_table_id})
+
+    def get_table_artifact(self, parent_table_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取父表预计算的展示产物
+
+        :param parent_table_id: 父表ID
+        :return: 展示产物（merged_html、table_rows、table_summary、subtable_ids，只读）；不存在时返回None
+        """
+        if not self.is_initialized or not self.vector_store:
+            return None
+        return self.table_artifacts.get(parent_table_id)
+
+    def get_chunk_tokens(self, doc_id: str, field: str = 'content') -> Optional[Any]:
+        """
+        获取分块入库时预计算的词项向量
+
+        :param doc_id: docstore文档ID
+        :param field: 字段（content/title/keywords）
+        :return: 词项向量（TokenVector，只读）；不存在时返回None
+        """
+        if not self.is_initialized or not self.vector_store:
+            return None
+        return self.chunk_tokens.get(doc_id, field)
+
+    def get_associations(self, key: str) -> Dict[str, float]:
+        """
+        获取分块在跨模态关联图中的关联分块
+
+        :param key: 节点键（元数据中的chunk_id，没有时为docstore文档ID）
+        :return: {关联分块节点键: 权重}（只读）
+        """
+        if not self.is_initialized or not self.vector_store:
+            return {}
+        return self.association_graph.neighbors(key)
+
+    def _save_delta(self, save_path: str):
+        """
+        将活动增量段写入deltas目录，并在段或墓碑有变化时更新manifest
+
+        :param save_path: 主索引目录
+        """
+        segment = self.delta_store.active_segment
+        if segment is None and not self.delta_store.tombstones_dirty:
+            logging.info("没有新增或删除的向量，无需写入增量段")
+            return
+        
+        if segment is not None:
+            segment_dir = self.delta_store.segment_path(save_path, segment)
+            segment.vector_store.save_local(segment_dir)
+            if self.embedding_store:
+                segment.embedding_start, segment.embedding_count = self.embedding_store.save_segment(segment_dir)
+            segment.persisted = True
+        
+        # manifest最后写入，保证其引用的段文件均已就绪
+        if not self.delta_store.save_manifest(save_path):
+            raise RuntimeError("增量段manifest保存失败")
+        if segment is not None:
+            logging.info(f"增量段保存成功: {segment.name}，{segment.size} 个向量（共 {len(self.delta_store.segments)} 个增量段）")
+        logging.info(f"增量段manifest已更新，删除墓碑 {len(self.delta_store.tombstones)} 个")
+
+    def _get_active_segment(self) -> Optional[DeltaSegment]:
+        """
+        获取用于写入的活动增量段，不存在时创建
+
+        :return: 活动增量段；主索引尚未落盘或未启用增量段时返回None（直接写入主索引）
+        """
+        if not self.delta_store or not self.delta_store.enabled or self._base_path is None:
+            return None
+        
+        segment = self.delta_store.active_segment
+        if segment is None:
+            # 与主索引相同度量的空flat索引，不调用embedding接口
+            base_index = self.vector_store.index
+            store = FAISS(
+                embedding_function=self.text_embeddings,
+                index=faiss.index_factory(base_index.d, 'Flat', base_index.metric_type),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+                normalize_L2=getattr(self.vector_store, '_normalize_L2', False),
+                distance_strategy=self.vector_store.distance_strategy
+            )
+            segment = DeltaSegment(self.delta_store.new_segment_name(), store)
+            self.delta_store.add_segment(segment)
+        return segment
+
+    def _fold_delta_segments(self) -> int:
+        """
+        将增量段的向量并入内存中的主索引和主索引分区（文档已在主docstore中）
+
+        :return: 合并的向量数量
+        """
+        if not self.delta_store or not self.delta_store.segments:
+            return 0
+        
+        import numpy as np
+        
+        tombstones = self.delta_store.tombstones
+        folded = 0
+        for segment in self.delta_store.segments:
+            # 段内已删除的文档直接丢弃
+            entries = [
+                entry for entry in zip(*segment.iter_entries())
+                if entry[2] not in tombstones
+            ]
+            if not entries:
+                continue
+            vectors, metadatas, doc_ids = (list(column) for column in zip(*entries))
+            start = self.vector_store.index.ntotal
+            self.vector_store.index.add(np.asarray(vectors, dtype=np.float32))
+            for offset, doc_id in enumerate(doc_ids):
+                self.vector_store.index_to_docstore_id[start + offset] = doc_id
+            if self.partition_manager:
+                self.partition_manager.add_vectors(vectors, metadatas, doc_ids)
+            folded += len(doc_ids)
+        
+        self.delta_store.drop_segments()
+        # 内存中的主索引已与磁盘不一致，下次保存需整体写入
+        self._base_path = None
+        logging.info(f"已将 {folded} 个增量向量合并到主索引")
+        return folded
+
+    def _purge_tombstones(self) -> int:
+        """
+        从内存中的主索引、分区和向量文件中物理删除墓碑对应的向量（增量段须已合并）
+
+        :return: 删除的向量数量
+        """
+        if not self.delta_store or not self.delta_store.tombstones:
+            return 0
+        
+        import numpy as np
+        
+        tombstones = self.delta_store.tombstones
+        mapping = self.vector_store.index_to_docstore_id
+        ordered = [mapping[position] for position in sorted(mapping)]
+        positions = [position for position, doc_id in enumerate(ordered) if doc_id in tombstones]
+        if positions:
+            # flat索引按位置删除后保持剩余向量顺序
+            self.vector_store.index.remove_ids(np.array(positions, dtype=np.int64))
+            remaining = [doc_id for doc_id in ordered if doc_id not in tombstones]
+            self.vector_store.index_to_docstore_id = dict(enumerate(remaining))
+        
+        if self.partition_manager:
+            self.partition_manager.purge_deleted(self.vector_store)
+            self.partition_manager.rebuild_metadata_index(self.vector_store.docstore)
+        
+        # 只保留仍被引用的向量文件行，并更新元数据中的行号
+        if self.embedding_store and self.embedding_store.size:
+            documents = list(self.vector_store.docstore._dict.values())
+            live_offsets = [
+                offset
+                for doc in documents if hasattr(doc, 'metadata') and doc.metadata
+                for offset in (doc.metadata.get(OFFSETS_FIELD) or {}).values()
+            ]
+            offset_map = self.embedding_store.retain(live_offsets)
+            for doc in documents:
+                offsets = doc.metadata.get(OFFSETS_FIELD) if hasattr(doc, 'metadata') and doc.metadata else None
+                if offsets:
+                    doc.metadata[OFFSETS_FIELD] = {
+                        field: offset_map[offset] for field, offset in offsets.items() if offset in offset_map
+                    }
+        
+        self.delta_store.tombstones = set()
+        self.delta_store.tombstones_dirty = False
+        self._base_path = None
+        logging.info(f"已物理删除 {len(positions)} 个墓碑向量")
+        return len(positions)
+
+    def delete_document(self, document_name: str) -> int:
+        """
+        删除文档的全部向量
+
+        删除以墓碑方式记录：查询时立即排除，保存时只更新增量段manifest，compact时物理删除。
+
+        :param document_name: 文档名（元数据document_name）
+        :return: 删除的向量数量
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            doc_ids = self.get_doc_ids_by_metadata({'document_name': document_name})
+            deleted = self.delete_documents(doc_ids)
+            logging.info(f"文档 {document_name} 已删除 {deleted} 个向量")
+            return deleted
+            
+        except Exception as e:
+            logging.error(f"删除文档失败: {document_name}, 错误: {e}")
+            return 0
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        按docstore ID删除向量（墓碑）
+
+        :param doc_ids: docstore文档ID列表
+        :return: 删除的向量数量
+        """
+        if not doc_ids:
+            return 0
+        
+        self._ensure_writable()
+        if not self.delta_store:
+            raise RuntimeError("FAISS未安装，无法删除向量")
+        
+        doc_ids = set(doc_ids) - self.delta_store.tombstones
+        self._apply_tombstones(doc_ids)
+        self.total_vectors -= len(doc_ids)
+        self.last_update_time = time.time()
+        return len(doc_ids)
+
+    def upsert_document(self, document_name: str, vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> bool:
+        """
+        替换文档：删除该文档的旧向量后写入新向量
+
+        :param document_name: 文档名
+        :param vectors: 新向量列表
+        :param metadata: 新元数据列表（document_name须与参数一致）
+        :return: 是否成功
+        """
+        try:
+            if not self.is_initialized:
+                raise RuntimeError("向量存储未初始化")
+            
+            mismatched = [meta.get('document_name') for meta in metadata if meta.get('document_name') != document_name]
+            if mismatched:
+                raise ValueError(f"元数据中的document_name与文档名不一致: {mismatched[0]} != {document_name}")
+            
+            # 先写入新向量，失败时旧向量保持可见
+            old_doc_ids = self.get_doc_ids_by_metadata({'document_name': document_name})
+            if not self.add_vectors(vectors, metadata):
+                raise RuntimeError("写入新向量失败")
+            deleted = self.delete_documents(old_doc_ids)
+            
+            logging.info(f"文档 {document_name} 已替换: 删除 {deleted} 个旧向量，写入 {len(vectors)} 个新向量")
+            return True
+            
+        except Exception as e:
+            logging.error(f"替换文档失败: {document_name}, 错误: {e}")
+            return False
+
+    def _apply_tombstones(self, doc_ids: set):
+        """
+        将文档标记为已删除：从docstore和元数据索引移除，分区中屏蔽对应向量
+
+        :param doc_ids: docstore文档ID集合
+        """
+        docstore = self.vector_store.docstore
+        existing = [doc_id for doc_id in doc_ids if doc_id in docstore._dict]
+        existing_metadatas = [getattr(docstore._dict[doc_id], 'metadata', None) for doc_id in existing]
+        self.metadata_index.remove_documents(existing, existing_metadatas)
+        self.table_artifacts.mark_dirty(existing_metadatas)
+        self.association_graph.mark_dirty(existing_metadatas)
+        self.keyword_index.remove_documents(existing)
+        self.chunk_tokens.remove_documents(existing)
+        if existing:
+            docstore.delete(existing)
+        
+        if self.partition_manager:
+            self.partition_manager.delete_ids(doc_ids)
+        self.delta_store.partition_manager.delete_ids(doc_ids)
+        self.delta_store.add_tombstones(doc_ids)
+        self._bump_version()
+
+    def _bump_version(self):
+        """存储内容或落盘状态变化后递增版本号（查询结果缓存据此失效）"""
+        self.version += 1
+
+    def _is_base_path(self, path: str) -> bool:
+        """
+        判断主索引是否已完整保存在该目录
+
+        :param path: 目录
+        :return: 是否一致
+        """
+        return self._base_path is not None and self._base_path == os.path.abspath(path)
+
+    def load(self, load_path: str = None, load_mode: str = None) -> bool:
         """
         加载向量存储
 
+        mmap模式以只读内存映射方式打开FAISS索引，启动耗时与索引大小无关，
+        同一主机上的多个进程共享物理页；该模式下不支持写入和保存。
+
         :param load_path: 加载路径（可选）
+        :param load_mode: 加载模式（memory/mmap，可选，默认使用初始化时的模式）
         :return: 是否加载成功
         """
         try:
@@ -562,16 +1491,69 @@ class LangChainVectorStoreManager:
             logging.info(f"路径是否存在: {os.path.exists(load_path)}")
             logging.info(f"路径内容: {os.listdir(load_path) if os.path.exists(load_path) else '路径不存在'}")
             
+            load_mode = load_mode or self.load_mode
+            io_flags = self._get_io_flags(load_mode)
+            logging.info(f"向量存储加载模式: {load_mode}")
+            
             self.vector_store = FAISS.load_local(
                 load_path, 
                 self.text_embeddings,
-                allow_dangerous_deserialization=True
+                allow_dangerous_deserialization=True,
+                io_flags=io_flags
             )
+            self.read_only = load_mode == 'mmap'
+            
+            # 加载分区，缺失或与主索引不一致时从主索引重建
+            if self.partition_manager:
+                if self.partition_manager.load(load_path, base_ntotal=self.vector_store.index.ntotal, io_flags=io_flags):
+                    self.partition_manager.rebuild_metadata_index(self.vector_store.docstore)
+                else:
+                    logging.info("向量分区不可用，从主索引重建")
+                    self.partition_manager.build_from_vector_store(self.vector_store)
+            
+            # 以内存映射方式打开向量文件
+            if self.embedding_store:
+                self.embedding_store.load(load_path)
+            
+            # 加载主索引之后的增量段（常驻内存，文档登记到主docstore）
+            self._base_path = os.path.abspath(load_path)
+            if self.delta_store:
+                self.delta_store.clear(
+                    base_ntotal=self.vector_store.index.ntotal,
+                    base_embeddings=self.embedding_store.size if self.embedding_store else 0
+                )
+                self._load_delta_segments(load_path)
+            
+            # 构建docstore元数据索引
+            self.metadata_index.build(self.vector_store.docstore)
+            
+            # 加载表格展示产物，缺失或与docstore不一致时从docstore重建
+            if not self.table_artifacts.load(load_path, len(self.vector_store.docstore._dict)):
+                logging.info("表格展示产物不可用，从docstore重建")
+                self.table_artifacts.rebuild(self.vector_store.docstore)
+            
+            # 加载关键词索引，缺失或与docstore不一致时从docstore重建
+            if self.keyword_index.enabled and not self.keyword_index.load(load_path, len(self.vector_store.docstore._dict)):
+                logging.info("关键词索引不可用，从docstore重建")
+                self.keyword_index.rebuild(self.vector_store.docstore)
+            
+            # 加载分块词项向量，缺失或与docstore不一致时从docstore重建
+            if self.chunk_tokens.enabled and not self.chunk_tokens.load(load_path, len(self.vector_store.docstore._dict)):
+                logging.info("分块词项向量不可用，从docstore重建")
+                self.chunk_tokens.rebuild(self.vector_store.docstore)
+            
+            # 加载跨模态关联图，缺失或与docstore不一致时从docstore重建
+            if self.association_graph.enabled and not self.association_graph.load(load_path, len(self.vector_store.docstore._dict)):
+                logging.info("跨模态关联图不可用，从docstore重建")
+                self.association_graph.rebuild(self.vector_store.docstore, self.get_embedding)
             
             # 更新状态
             self.is_initialized = True
             self.total_vectors = self.vector_store.index.ntotal if hasattr(self.vector_store, 'index') else 0
+            if self.delta_store:
+                self.total_vectors += self.delta_store.total_vectors - len(self.delta_store.tombstones)
             self.last_update_time = time.time()
+            self._bump_version()
             
             logging.info(f"向量存储加载成功: {load_path}")
             return True
@@ -580,6 +1562,78 @@ class LangChainVectorStoreManager:
             logging.error(f"加载向量存储失败: {e}")
             return False
 
+    def _load_delta_segments(self, load_path: str) -> int:
+        """
+        按manifest顺序加载增量段
+
+        :param load_path: 主索引目录
+        :return: 加载的增量向量数量
+        """
+        manifest = self.delta_store.read_manifest(
+            load_path, self.delta_store.base_ntotal, self.delta_store.base_embeddings
+        )
+        entries = manifest.get('segments', [])
+        loaded = 0
+        for entry in entries:
+            segment_dir = os.path.join(load_path, DELTA_DIR_NAME, entry['name'])
+            try:
+                store = FAISS.load_local(
+                    segment_dir,
+                    self.text_embeddings,
+                    allow_dangerous_deserialization=True
+                )
+                if store.index.ntotal != entry.get('count'):
+                    raise ValueError(f"向量数({store.index.ntotal})与manifest({entry.get('count')})不一致")
+                if self.embedding_store and not self.embedding_store.load_segment(
+                        segment_dir, entry.get('embedding_start', 0), entry.get('embedding_count', 0)):
+                    raise ValueError("增量向量文件不可用")
+            except Exception as e:
+                # 后续段的向量文件行号依赖当前段，无法继续加载
+                logging.error(f"加载增量段 {entry['name']} 失败，忽略该段及其后的增量段: {e}")
+                break
+            
+            segment = DeltaSegment(
+                entry['name'], store,
+                embedding_start=entry.get('embedding_start', 0),
+                embedding_count=entry.get('embedding_count', 0),
+                persisted=True
+            )
+            self.delta_store.add_segment(segment)
+            self.vector_store.docstore.add(dict(store.docstore._dict))
+            loaded += segment.size
+        
+        if entries:
+            logging.info(f"增量段加载完成: {len(self.delta_store.segments)} 个段，{loaded} 个向量")
+        
+        # 重新应用墓碑（已删除的文档在主索引和段文件中仍存在，直到compact）
+        tombstones = set(manifest.get('tombstones', []))
+        if tombstones:
+            self._apply_tombstones(tombstones)
+            self.delta_store.tombstones_dirty = False
+            logging.info(f"已应用 {len(tombstones)} 个删除墓碑")
+        return loaded
+
+    def _get_io_flags(self, load_mode: str) -> int:
+        """
+        获取FAISS读取索引的IO标志
+
+        :param load_mode: 加载模式
+        :return: IO标志
+        """
+        if load_mode != 'mmap':
+            return 0
+        # IO_FLAG_MMAP_IFC使Flat类索引的向量数据也走内存映射（新版本FAISS提供）
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+
+    def _ensure_writable(self):
+        """
+        检查向量存储是否可写
+
+        内存映射的索引不能追加向量（FAISS会直接中止进程），必须在调用前拦截。
+        """
+        if self.read_only:
+            raise RuntimeError("向量存储以只读内存映射模式加载，不支持写入，请使用memory模式加载")
+
     def get_status(self) -> Dict[str, Any]:
         """
         获取向量存储状态
@@ -594,7 +1648,10 @@ class LangChainVectorStoreManager:
                 'last_update_time': self.last_update_time,
                 'vector_db_dir': self.vector_db_dir,
                 'langchain_available': LANGCHAIN_AVAILABLE,
-                'faiss_available': FAISS_AVAILABLE
+                'faiss_available': FAISS_AVAILABLE,
+                'load_mode': self.load_mode,
+                'read_only': self.read_only,
+                'version': self.version
             }
             
             if self.is_initialized and self.vector_store:
@@ -602,6 +1659,20 @@ class LangChainVectorStoreManager:
                     'index_type': 'FAISS',
                     'index_ntotal': getattr(self.vector_store.index, 'ntotal', 0) if hasattr(self.vector_store, 'index') else 0
                 })
+                if self.partition_manager:
+                    status['partitions'] = self.partition_manager.get_status()
+                status['metadata_index'] = self.metadata_index.get_status()
+                if self.embedding_store:
+                    status['embedding_store'] = self.embedding_store.get_status()
+                if self.delta_store:
+                    status['delta_segments'] = self.delta_store.get_status()
+                status['table_artifacts'] = self.table_artifacts.get_status()
+                status['keyword_index'] = self.keyword_index.get_status()
+                status['chunk_tokens'] = self.chunk_tokens.get_status()
+                status['association_graph'] = self.association_graph.get_status()
+                status['tokenizer'] = self.tokenizer.get_status()
+            if self.embedding_cache is not None:
+                status['embedding_cache'] = self.embedding_cache.get_status()
             
             return status
             
@@ -609,6 +1680,116 @@ class LangChainVectorStoreManager:
             logging.error(f"获取状态失败: {e}")
             return {'error': str(e)}
 
+    def get_doc_ids_by_metadata(self, filter_dict: Dict[str, Any]) -> List[str]:
+        """
+        按元数据等值条件查询docstore文档ID
+
+        条件字段都已建立元数据索引时为字典查找，否则回退为遍历docstore。
+
+        :param filter_dict: 过滤条件
+        :return: 文档ID列表
+        """
+        if not self.is_initialized or not self.vector_store or not filter_dict:
+            return []
+        
+        if all(self.metadata_index.is_indexed(field) for field in filter_dict):
+            return self.metadata_index.query(filter_dict)
+        
+        logging.debug(f"过滤字段未全部建立元数据索引，遍历docstore: {list(filter_dict.keys())}")
+        return [
+            doc_id for doc_id, doc in self.vector_store.docstore._dict.items()
+            if self._matches_filter(doc, filter_dict)
+        ]
+
+    def get_documents_by_metadata(self, filter_dict: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """
+        按元数据等值条件查询docstore文档
+
+        :param filter_dict: 过滤条件
+        :return: [(文档ID, 文档)]列表
+        """
+        documents = []
+        for doc_id in self.get_doc_ids_by_metadata(filter_dict):
+            doc = self.vector_store.docstore.search(doc_id)
+            if hasattr(doc, 'metadata'):
+                documents.append((doc_id, doc))
+        return documents
+
+    def get_metadata_values(self, field: str) -> List[Any]:
+        """
+        获取元数据字段在docstore中的所有取值
+
+        :param field: 字段名
+        :return: 取值列表
+        """
+        if not self.is_initialized or not self.vector_store:
+            return []
+        
+        if self.metadata_index.is_indexed(field):
+            return self.metadata_index.values(field)
+        
+        values = set()
+        for doc in self.vector_store.docstore._dict.values():
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
+            value = metadata.get(field)
+            if value is not None:
+                values.add(value)
+        return list(values)
+
+    def get_embedding(self, metadata: Dict[str, Any], field: str) -> Optional[List[float]]:
+        """
+        读取文档元数据对应的原始向量
+
+        :param metadata: 文档元数据
+        :param field: 向量字段（text_embedding/table_embedding/image_embedding/description_embedding）
+        :return: 向量；不存在时返回None
+        """
+        if not metadata:
+            return None
+        
+        # 兼容旧数据：向量仍保存在元数据中
+        value = metadata.get(field)
+        if isinstance(value, (list, tuple)):
+            return list(value) if value else None
+        
+        offset = (metadata.get(OFFSETS_FIELD) or {}).get(field)
+        if offset is None or not self.embedding_store:
+            return None
+        vector = self.embedding_store.get(offset)
+        return vector.tolist() if vector is not None else None
+
+    def has_embedding(self, metadata: Dict[str, Any], field: str) -> bool:
+        """
+        判断文档是否有指定的原始向量（不读取向量内容）
+
+        :param metadata: 文档元数据
+        :param field: 向量字段
+        :return: 是否存在
+        """
+        if not metadata:
+            return False
+        if metadata.get(field):
+            return True
+        return field in (metadata.get(OFFSETS_FIELD) or {})
+
+    def _externalize_docstore_embeddings(self) -> int:
+        """
+        将docstore中旧格式（向量保存在元数据中）的文档迁移为行号格式
+
+        :return: 迁移的文档数量
+        """
+        migrated = 0
+        dedup_cache = {}
+        for doc in self.vector_store.docstore._dict.values():
+            metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else None
+            if not metadata or not any(isinstance(metadata.get(field), (list, tuple)) for field in EMBEDDING_FIELDS):
+                continue
+            doc.metadata = self.embedding_store.externalize(metadata, dedup_cache)
+            migrated += 1
+        if migrated:
+            logging.info(f"已将 {migrated} 个文档元数据中的向量迁移到向量文件")
+        return migrated
+
     def get_unfinished_images(self) -> List[Dict[str, Any]]:
         """
         获取未完成的图片列表
@@ -622,15 +1803,15 @@ class LangChainVectorStoreManager:
             
             unfinished_images = []
             
-            # 遍历所有文档，找到图片类型且未完成的
-            for doc_id, doc in self.vector_store.docstore._dict.items():
+            # 通过元数据索引只检查图片类型的文档
+            for doc_id, doc in self.get_documents_by_metadata({'chunk_type': 'image'}):
                 metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
                 
                 if metadata.get('chunk_type') == 'image':
                     # 检查是否已完成增强和向量化
                     has_enhancement = (metadata.get('enhanced_description') and 
                                      metadata.get('enhancement_status') == 'success')
-                    has_vectorization = (metadata.get('image_embedding') and 
+                    has_vectorization = (self.has_embedding(metadata, 'image_embedding') and 
                                        metadata.get('vectorization_status') == 'success')
                     
                     if not has_enhancement or not has_vectorization:
@@ -651,23 +1832,46 @@ class LangChainVectorStoreManager:
             logging.error(f"获取未完成图片失败: {e}")
             return []
 
-    def optimize_index(self) -> bool:
+    def optimize_index(self) -> Dict[str, Any]:
         """
         优化索引性能
 
-        :return: 是否优化成功
+        按vector_store.index配置（flat/ivf_flat/ivf_pq/hnsw）从主索引中的原始向量训练并重建各分区索引，
+        并对每个分区采样评估recall@k（与精确搜索对比）。主索引保持flat，作为分区重建的数据来源。
+        存在增量段或删除墓碑时先将其合并到主索引。重建结果需调用save()持久化（整体保存）。
+
+        :return: 优化报告，包含success和各分区的索引类型、recall@k和耗时
         """
         try:
             if not self.is_initialized:
                 raise RuntimeError("向量存储未初始化")
             
-            # LangChain FAISS会自动处理索引优化
-            logging.info("索引优化完成（LangChain自动优化）")
-            return True
+            self._ensure_writable()
+            
+            if not self.partition_manager:
+                raise RuntimeError("向量索引分区不可用")
+            
+            start_time = time.time()
+            self._fold_delta_segments()
+            self._purge_tombstones()
+            partition_reports = self.partition_manager.optimize(self.vector_store)
+            # 分区已重建，下次保存需整体写入
+            self._base_path = None
+            self.last_update_time = time.time()
+            # 近似索引会改变搜索结果，使已缓存的查询结果失效
+            self._bump_version()
+            
+            logging.info(f"索引优化完成: {len(partition_reports)} 个分区，耗时 {time.time() - start_time:.2f}s")
+            return {
+                'success': True,
+                'index_config': dict(self.partition_manager.index_config),
+                'partitions': partition_reports,
+                'total_seconds': round(time.time() - start_time, 3)
+            }
             
         except Exception as e:
             logging.error(f"索引优化失败: {e}")
-            return False
+            return {'success': False, 'error': str(e)}
 
     def clear(self) -> bool:
         """
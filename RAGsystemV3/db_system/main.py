@@ -77,6 +77,12 @@ def parse_arguments():
 
   # 查看详细日志
   python main.py --log-level DEBUG
+
+  # 按配置重建ANN索引并输出recall@k
+  python main.py --optimize-index
+
+  # 将增量段合并到主索引
+  python main.py --compact-index
         """
     )
 
@@ -133,6 +139,20 @@ def parse_arguments():
         action='store_true',
         help='输出数据库结构和内容分析'
     )
+    
+    # 索引优化参数
+    parser.add_argument(
+        '--optimize-index',
+        action='store_true',
+        help='按配置的索引类型（flat/IVF/HNSW/PQ）重建向量索引并输出recall@k'
+    )
+    
+    # 增量段合并参数
+    parser.add_argument(
+        '--compact-index',
+        action='store_true',
+        help='将增量写入产生的增量段合并到主索引并整体保存'
+    )
 
     return parser.parse_args()
 
@@ -213,6 +233,32 @@ def main():
         if args.diagnose_db:
             print("\n🔍 数据库诊断模式，跳过文档处理...")
             result = {'success': True, 'mode': 'diagnostic_only'}
+        elif args.optimize_index:
+            print("\n⚙️  索引优化模式，跳过文档处理...")
+            vector_store_manager = processor.vector_store_manager
+            report = vector_store_manager.optimize_index()
+            success = report.get('success', False)
+            if success:
+                success = vector_store_manager.save()
+                if success:
+                    print(f"✅ 索引优化完成，耗时 {report.get('total_seconds')}s")
+                    for key, info in report.get('partitions', {}).items():
+                        print(f"   {key}: {info}")
+                else:
+                    print("❌ 索引优化完成，但保存优化后的索引失败")
+            else:
+                print(f"❌ 索引优化失败: {report.get('error', '未知错误')}")
+            result = {'success': success, 'mode': 'optimize_only'}
+        elif args.compact_index:
+            print("\n🗜️  增量段合并模式，跳过文档处理...")
+            vector_store_manager = processor.vector_store_manager
+            delta_status = vector_store_manager.get_status().get('delta_segments', {})
+            success = vector_store_manager.compact()
+            if success:
+                print(f"✅ 增量段合并完成: {delta_status.get('segment_count', 0)} 个增量段，{delta_status.get('total_vectors', 0)} 个向量")
+            else:
+                print("❌ 增量段合并失败")
+            result = {'success': success, 'mode': 'compact_only'}
         else:
             # 处理文档
             print("\n🚀 开始处理文档...")
@@ -261,8 +261,8 @@ class ImageCompletion:
             metadata = image['metadata']
             
             # 检查是否有现有的向量
-            has_existing_vectors = (metadata.get('image_embedding') and 
-                                   metadata.get('description_embedding'))
+            has_existing_vectors = (self.vector_store_manager.has_embedding(metadata, 'image_embedding') and 
+                                   self.vector_store_manager.has_embedding(metadata, 'description_embedding'))
             
             if not has_existing_vectors:
                 return True  # 没有向量，需要向量化
@@ -14,19 +14,20 @@ from pathlib import Path
 try:
     from langchain_text_splitters import RecursiveCharacterTextSplitter
     from langchain_core.documents import Document
-    from langchain_community.embeddings import DashScopeEmbeddings
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
     logging.warning("LangChain未安装，文本向量化功能将不可用")
 
+from core.embedding_providers import get_embedding_provider_config, create_text_embeddings
+
 class LangChainTextVectorizer:
     """
     LangChain文本向量化器
     
     功能：
     - 使用LangChain文本分割器进行智能分块
-    - 通过DashScope API生成文本向量
+    - 通过配置的embedding提供方（DashScope API或本地模型）生成文本向量
     - 支持批量文本向量化
     - 生成标准化的向量化结果
     """
@@ -63,16 +64,9 @@ class LangChainTextVectorizer:
     def _initialize_embedding_model(self):
         """初始化embedding模型"""
         try:
-            # 获取API密钥
-            api_key = self.config_manager.get_environment_manager().get_required_var('DASHSCOPE_API_KEY')
-            if not api_key:
-                raise ValueError("未找到有效的DashScope API密钥")
-            
-            # 初始化DashScope Embeddings
-            self.embeddings = DashScopeEmbeddings(
-                dashscope_api_key=api_key,
-                model=self.text_embedding_model
-            )
+            # 按vectorization.embedding_provider创建embedding（DashScope时需要API密钥）
+            self.provider = get_embedding_provider_config(self.config_manager)['provider']
+            self.embeddings = create_text_embeddings(self.config_manager, self.text_embedding_model)
             
             logging.info(f"Embedding模型初始化成功: {self.text_embedding_model}")
             
@@ -341,8 +335,8 @@ class LangChainTextVectorizer:
                     result = self.vectorize(text, metadata)
                     results.append(result)
                     
-                    # 批量大小控制和延迟
-                    if (i + 1) % self.batch_size == 0 and i < len(texts) - 1:
+                    # 批量大小控制和延迟（本地embedding不需要限流）
+                    if self.provider == 'dashscope' and (i + 1) % self.batch_size == 0 and i < len(texts) - 1:
                         time.sleep(self.delay_seconds)
                         logging.info(f"已处理 {i + 1}/{len(texts)} 个文本")
                     
@@ -5,6 +5,8 @@ RAG系统的API路由模块，负责定义所有RESTful API端点
 为RAG系统提供完整的HTTP接口服务
 """
 
+import asyncio
+import functools
 import logging
 from typing import Dict, List, Optional, Any
 from fastapi import APIRouter, HTTPException, Depends, Query, Body
@@ -392,30 +394,39 @@ async def search_content(
         if not retrieval_engine:
             raise HTTPException(status_code=503, detail="召回引擎不可用")
         
-        # 根据内容类型选择搜索策略
+        # 根据内容类型选择搜索策略（异步召回，不阻塞事件循环）
         if request.content_type == "text":
-            results = retrieval_engine.retrieve_texts(
+            results = await retrieval_engine.aretrieve_texts(
                 request.query, 
                 request.max_results
             )
         elif request.content_type == "image":
-            results = retrieval_engine.retrieve_images(
+            results = await retrieval_engine.aretrieve_images(
                 request.query, 
                 request.max_results
             )
         elif request.content_type == "table":
-            results = retrieval_engine.retrieve_tables(
+            results = await retrieval_engine.aretrieve_tables(
                 request.query, 
                 request.max_results
             )
         else:
-            # 使用智能搜索
-            results = retrieval_engine.smart_retrieve(
-                request.query, 
-                content_type=request.content_type,
-                max_results=request.max_results
+            # 使用智能搜索（同步实现，放到线程池中执行）
+            results = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    retrieval_engine.smart_retrieve,
+                    request.query, 
+                    content_type=request.content_type,
+                    max_results=request.max_results
+                )
             )
         
+        # 为返回的结果生成展示字段（图片字段、表格HTML）
+        vector_db_integration = services.get('vector_db_integration')
+        if vector_db_integration:
+            vector_db_integration.materialize_results(results)
+        
         # 计算处理时间
         processing_time = (datetime.now() - start_time).total_seconds()
         
@@ -121,6 +121,7 @@ class ConfigIntegration:
             },
             "performance": {
                 "max_concurrent_queries": 10,
+                "retrieval_workers": 8,
                 "query_timeout": 60,
                 "enable_monitoring": True
             },
@@ -0,0 +1,176 @@
+"""
+召回结果多样化（最大边际相关性，MMR）
+
+混合召回融合出的候选中常有内容重复的分块（同一段落的文本与表格、同一张图的多条记录等）。
+MMR使用入库时已保存的分块向量衡量冗余：候选向量组成一个L2归一化的矩阵，一次矩阵乘法得到
+两两余弦相似度，然后贪心选择
+
+    lambda * 相关性 - (1 - lambda) * 与已选结果的最大相似度
+
+最大的候选（负相似度按0计），每选一个只需对一行相似度取逐元素最大值。
+
+相关性为融合分数除以候选中的最高分数；向量字段与跨模态关联图相同（文本text_embedding、
+表格table_embedding、图片description_embedding），缺少向量的候选不受冗余惩罚。
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Callable
+
+import numpy as np
+
+from db_system.core.association_graph import ASSOCIATION_VECTOR_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# 默认MMR配置（rag_system.engines.hybrid_engine.mmr）
+DEFAULT_MMR_CONFIG = {
+    'enabled': True,
+    'lambda': 0.7,                  # 相关性占比（1.0时等同于按分数取前k个）
+    'candidate_multiplier': 2       # 候选数量为结果数量的倍数
+}
+
+
+def mmr_select(relevance: np.ndarray, similarity: np.ndarray, k: int, mmr_lambda: float) -> List[int]:
+    """
+    贪心MMR选择
+
+    :param relevance: 候选相关性（长度n）
+    :param similarity: 候选两两相似度矩阵（n x n）
+    :param k: 选择数量
+    :param mmr_lambda: 相关性占比
+    :return: 选中候选的下标（按选择顺序）
+    """
+    count = len(relevance)
+    k = min(k, count)
+    if k <= 0:
+        return []
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = []
+    for _ in range(k):
+        scores = mmr_lambda * relevance - (1.0 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        index = int(np.argmax(scores))
+        selected.append(index)
+        available[index] = False
+        np.maximum(redundancy, similarity[index], out=redundancy)
+    return selected
+
+
+class MMRDiversifier:
+    """
+    基于分块向量的MMR多样化
+
+    功能：
+    - 收集候选的已存储向量组成矩阵
+    - 一次矩阵乘法计算冗余度，贪心选择结果
+    """
+
+    def __init__(self, enabled: bool = DEFAULT_MMR_CONFIG['enabled'],
+                 mmr_lambda: float = DEFAULT_MMR_CONFIG['lambda'],
+                 candidate_multiplier: float = DEFAULT_MMR_CONFIG['candidate_multiplier']):
+        """
+        初始化MMR多样化
+
+        :param enabled: 是否启用
+        :param mmr_lambda: 相关性占比（0.0-1.0）
+        :param candidate_multiplier: 候选数量为结果数量的倍数
+        """
+        self.enabled = bool(enabled)
+        self.mmr_lambda = min(max(float(mmr_lambda), 0.0), 1.0)
+        self.candidate_multiplier = max(float(candidate_multiplier), 1.0)
+
+    @classmethod
+    def from_config(cls, mmr_config: Dict[str, Any]) -> 'MMRDiversifier':
+        """
+        根据配置创建MMR多样化
+
+        :param mmr_config: MMR配置（结构同DEFAULT_MMR_CONFIG）
+        :return: MMR多样化实例
+        """
+        config = dict(DEFAULT_MMR_CONFIG)
+        config.update(mmr_config or {})
+        return cls(enabled=config['enabled'], mmr_lambda=config['lambda'],
+                   candidate_multiplier=config['candidate_multiplier'])
+
+    def candidate_count(self, k: int) -> int:
+        """
+        需要召回的候选数量
+
+        :param k: 结果数量
+        :return: 候选数量（未启用时等于结果数量）
+        """
+        if not self.enabled or self.mmr_lambda >= 1.0:
+            return k
+        return int(k * self.candidate_multiplier)
+
+    def diversify(self, results: List[Dict[str, Any]], k: int,
+                  get_vector: Callable[[Dict[str, Any], str], Optional[List[float]]],
+                  score_key: str = 'similarity_score') -> List[Dict[str, Any]]:
+        """
+        从候选中选择k个相关且互不冗余的结果
+
+        :param results: 候选结果（按分数降序）
+        :param k: 结果数量
+        :param get_vector: 按(元数据, 向量字段)读取分块向量的函数
+        :param score_key: 分数字段
+        :return: 选中的结果（按选择顺序）
+        """
+        if not self.enabled or self.mmr_lambda >= 1.0 or len(results) <= 1:
+            return results[:k]
+
+        matrix = self._vector_matrix(results, get_vector)
+        if matrix is None:
+            return results[:k]
+
+        scores = np.asarray([float(result.get(score_key) or 0.0) for result in results], dtype=np.float32)
+        top_score = float(scores.max())
+        relevance = scores / top_score if top_score > 0 else scores
+        similarity = matrix @ matrix.T
+        return [results[index] for index in mmr_select(relevance, similarity, k, self.mmr_lambda)]
+
+    @staticmethod
+    def _vector_matrix(results: List[Dict[str, Any]],
+                       get_vector: Callable[[Dict[str, Any], str], Optional[List[float]]]) -> Optional[np.ndarray]:
+        """
+        收集候选向量组成L2归一化矩阵（缺少向量或维度不一致的候选为零向量）
+
+        :param results: 候选结果
+        :param get_vector: 向量读取函数
+        :return: 矩阵（n x 维度）；没有任何候选有向量时返回None
+        """
+        vectors: List[Optional[np.ndarray]] = []
+        for result in results:
+            metadata = result.get('metadata') or {}
+            chunk_type = result.get('chunk_type') or metadata.get('chunk_type')
+            vector = None
+            for field in ASSOCIATION_VECTOR_FIELDS.get(chunk_type, ()):
+                value = get_vector(metadata, field)
+                if value:
+                    vector = np.asarray(value, dtype=np.float32)
+                    break
+            vectors.append(vector)
+
+        dimensions = [vector.shape[0] for vector in vectors if vector is not None]
+        if not dimensions:
+            return None
+        dimension = max(set(dimensions), key=dimensions.count)
+        matrix = np.zeros((len(vectors), dimension), dtype=np.float32)
+        for i, vector in enumerate(vectors):
+            if vector is not None and vector.shape[0] == dimension:
+                norm = np.linalg.norm(vector)
+                if norm > 0:
+                    matrix[i] = vector / norm
+        return matrix
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取MMR配置
+
+        :return: 状态信息字典
+        """
+        return {
+            'enabled': self.enabled,
+            'lambda': self.mmr_lambda,
+            'candidate_multiplier': self.candidate_multiplier
+        }
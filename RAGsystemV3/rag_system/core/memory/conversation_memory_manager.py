@@ -18,7 +18,7 @@ from pathlib import Path
 # 用于三层检索策略的导入
 try:
     import jieba
-    import jieba.posseg as pseg
+    from db_system.core.tokenizer import get_tokenizer
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
     JIEBA_AVAILABLE = True
@@ -675,8 +675,8 @@ class ConversationMemoryManager:
             List[str]: 关键词列表
         """
         try:
-            # 使用jieba分词和词性标注
-            words = pseg.cut(text)
+            # 使用共用分词服务（已加载领域用户词典）分词和词性标注
+            words = get_tokenizer().posseg_cut(text)
             
             # 停用词集合
             stop_words = {
@@ -0,0 +1,293 @@
+"""
+查询扩展引擎
+
+召回的扩展搜索层用同义词/别名替换查询中的词生成扩展查询，表格关键词搜索还会追加专业词汇。
+原先这些词典写死在召回引擎中，逐个词执行`word in query`判断，耗时随词典规模线性增长。
+
+QueryExpansionEngine从词典文件（rag_system.query_expansion.dictionary_file，JSON）加载各召回类型
+（text/image/table）的词典，启动时编译为Aho-Corasick自动机，对查询扫描一遍即可找到全部匹配的词：
+- synonyms：{词: [替换词, ...]}，查询包含该词时把该词替换为各替换词，按词典顺序生成扩展查询
+- keyword_groups：[{triggers: [...], keywords: [...]}]，查询包含任一触发词时追加该组专业词汇
+
+同一规范化查询的扩展结果按LRU缓存。
+"""
+
+import os
+import json
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple, Callable
+
+from db_system.core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 默认查询扩展配置（rag_system.query_expansion）
+DEFAULT_QUERY_EXPANSION_CONFIG = {
+    'enabled': True,
+    'dictionary_file': './config/query_expansion.json',   # 相对于db_system目录
+    'max_expansions': 3,                                   # 每个查询最多生成的扩展查询数
+    'cache_size': 1024                                     # 扩展结果缓存的查询数
+}
+
+# 词典中的召回类型
+EXPANSION_PROFILES = ('text', 'image', 'table')
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick多模式匹配自动机
+
+    状态转移保存为每个状态一个字典，失败指针构建时把后缀状态的输出合并到当前状态，
+    匹配时每个字符只需一次状态转移。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        构建自动机
+
+        :param patterns: 模式串（空串忽略，下标按传入顺序）
+        """
+        self.patterns: List[str] = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._insert(pattern, index)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str, index: int):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (index,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        扫描文本，产出全部匹配（含重叠匹配）
+
+        :param text: 文本
+        :return: (模式下标, 匹配起始位置)迭代器
+        """
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position - len(self.patterns[index]) + 1
+
+    def match_set(self, text: str) -> List[int]:
+        """
+        文本中出现的模式下标（去重，升序）
+
+        :param text: 文本
+        :return: 模式下标列表
+        """
+        return sorted({index for index, _ in self.iter_matches(text)})
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+
+class ExpansionDictionary:
+    """单个召回类型的已编译扩展词典"""
+
+    def __init__(self, synonyms: Dict[str, List[str]], keyword_groups: List[Dict[str, List[str]]]):
+        """
+        编译词典
+
+        :param synonyms: {词: [替换词, ...]}
+        :param keyword_groups: [{'triggers': [...], 'keywords': [...]}, ...]
+        """
+        self.terms = [term for term in synonyms if term]
+        self.replacements = [[s for s in synonyms[term] if s and s != term] for term in self.terms]
+        self.synonym_automaton = AhoCorasick(self.terms)
+
+        self.keyword_groups = [list(group.get('keywords', [])) for group in keyword_groups]
+        self.triggers: List[str] = []
+        self.trigger_groups: List[int] = []
+        for group_index, group in enumerate(keyword_groups):
+            for trigger in group.get('triggers', []):
+                self.triggers.append(trigger)
+                self.trigger_groups.append(group_index)
+        self.trigger_automaton = AhoCorasick(self.triggers)
+
+    def expand(self, query: str, limit: int) -> Tuple[str, ...]:
+        """
+        生成扩展查询（按词典顺序，去重）
+
+        :param query: 查询文本
+        :param limit: 最大数量
+        :return: 扩展查询
+        """
+        expanded: Dict[str, None] = {}
+        for term_index in self.synonym_automaton.match_set(query):
+            term = self.terms[term_index]
+            for replacement in self.replacements[term_index]:
+                if len(expanded) >= limit:
+                    return tuple(expanded)
+                expanded.setdefault(query.replace(term, replacement))
+        return tuple(expanded)
+
+    def keywords(self, query: str) -> Tuple[str, ...]:
+        """
+        查询命中的专业词汇（按词组顺序）
+
+        :param query: 查询文本
+        :return: 专业词汇
+        """
+        groups = sorted({self.trigger_groups[index] for index in self.trigger_automaton.match_set(query)})
+        return tuple(keyword for group in groups for keyword in self.keyword_groups[group])
+
+    def get_status(self) -> Dict[str, int]:
+        return {'terms': len(self.terms), 'keyword_groups': len(self.keyword_groups)}
+
+
+class QueryExpansionEngine:
+    """
+    查询扩展引擎
+
+    功能：
+    - 从词典文件加载各召回类型的同义词/别名与专业词汇
+    - 编译为Aho-Corasick自动机，一次扫描查询找出全部匹配
+    - 按规范化查询缓存扩展结果
+    """
+
+    def __init__(self, dictionaries: Dict[str, Dict[str, Any]], enabled: bool = True,
+                 max_expansions: int = DEFAULT_QUERY_EXPANSION_CONFIG['max_expansions'],
+                 cache_size: int = DEFAULT_QUERY_EXPANSION_CONFIG['cache_size'],
+                 source: str = ''):
+        """
+        初始化查询扩展引擎
+
+        :param dictionaries: {召回类型: {'synonyms': {...}, 'keyword_groups': [...]}}
+        :param enabled: 是否启用
+        :param max_expansions: 每个查询最多生成的扩展查询数
+        :param cache_size: 扩展结果缓存的查询数
+        :param source: 词典文件路径（用于状态信息）
+        """
+        self.enabled = bool(enabled)
+        self.max_expansions = max(int(max_expansions), 0)
+        self.source = source
+        self.dictionaries: Dict[str, ExpansionDictionary] = {}
+        for profile, dictionary in (dictionaries or {}).items():
+            dictionary = dictionary or {}
+            self.dictionaries[profile] = ExpansionDictionary(
+                dictionary.get('synonyms') or {}, dictionary.get('keyword_groups') or []
+            )
+        self._cached_expand = lru_cache(maxsize=max(int(cache_size), 0))(self._expand)
+        self._cached_keywords = lru_cache(maxsize=max(int(cache_size), 0))(self._keywords)
+
+    @classmethod
+    def from_config(cls, expansion_config: Dict[str, Any],
+                    resolve_path: Optional[Callable[[str], str]] = None) -> 'QueryExpansionEngine':
+        """
+        根据配置创建查询扩展引擎（词典文件不存在或格式错误时使用空词典）
+
+        :param expansion_config: 查询扩展配置（结构同DEFAULT_QUERY_EXPANSION_CONFIG）
+        :param resolve_path: 把配置中的相对路径转换为绝对路径的函数
+        :return: 查询扩展引擎
+        """
+        config = dict(DEFAULT_QUERY_EXPANSION_CONFIG)
+        config.update(expansion_config or {})
+        path = config['dictionary_file']
+        if resolve_path is not None and path:
+            path = resolve_path(path)
+        dictionaries = cls.load_dictionaries(path) if config['enabled'] else {}
+        return cls(dictionaries, enabled=config['enabled'], max_expansions=config['max_expansions'],
+                   cache_size=config['cache_size'], source=path)
+
+    @staticmethod
+    def load_dictionaries(path: str) -> Dict[str, Dict[str, Any]]:
+        """
+        读取词典文件
+
+        :param path: 词典文件路径
+        :return: {召回类型: 词典}；文件不存在或格式错误时返回空字典
+        """
+        if not path or not os.path.exists(path):
+            logger.warning(f"查询扩展词典文件不存在: {path}，不生成扩展查询")
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            dictionaries = data.get('dictionaries', {})
+            if not isinstance(dictionaries, dict):
+                raise ValueError("dictionaries必须是对象")
+            unknown = set(dictionaries) - set(EXPANSION_PROFILES)
+            if unknown:
+                logger.warning(f"查询扩展词典包含未使用的召回类型: {sorted(unknown)}")
+            return dictionaries
+        except (OSError, ValueError) as e:
+            logger.error(f"读取查询扩展词典失败: {e}，不生成扩展查询")
+            return {}
+
+    def expand(self, query: str, profile: str) -> List[str]:
+        """
+        生成扩展查询
+
+        :param query: 查询文本
+        :param profile: 召回类型（text/image/table）
+        :return: 扩展查询列表
+        """
+        if not self.enabled or profile not in self.dictionaries or not query:
+            return []
+        return list(self._cached_expand(profile, normalize_text(query)))
+
+    def keywords(self, query: str, profile: str) -> List[str]:
+        """
+        查询命中的专业词汇
+
+        :param query: 查询文本
+        :param profile: 召回类型（text/image/table）
+        :return: 专业词汇列表
+        """
+        if not self.enabled or profile not in self.dictionaries or not query:
+            return []
+        return list(self._cached_keywords(profile, normalize_text(query)))
+
+    def _expand(self, profile: str, query: str) -> Tuple[str, ...]:
+        return self.dictionaries[profile].expand(query, self.max_expansions)
+
+    def _keywords(self, profile: str, query: str) -> Tuple[str, ...]:
+        return self.dictionaries[profile].keywords(query)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取查询扩展引擎状态
+
+        :return: 状态信息字典
+        """
+        cache_info = self._cached_expand.cache_info()
+        return {
+            'enabled': self.enabled,
+            'dictionary_file': self.source,
+            'max_expansions': self.max_expansions,
+            'dictionaries': {profile: d.get_status() for profile, d in self.dictionaries.items()},
+            'cache_hits': cache_info.hits,
+            'cache_misses': cache_info.misses,
+            'cache_size': cache_info.currsize
+        }
@@ -0,0 +1,173 @@
+"""
+召回结果排序融合
+
+各召回层（以及混合召回中的各内容类型）分别产出一个结果列表，融合为去重后的前k个结果：
+- score（默认）：加权分数融合。每个列表原地建堆，按加权分数做k路堆归并，同一chunk_id只保留
+  分数最高的一次，取满k个结果即停止，不对全部候选排序
+- rrf：加权倒数排名融合（Reciprocal Rank Fusion）。结果在各列表中的排名贡献
+  weight / (rrf_k + rank)，累加后用堆取前k个
+
+融合只重排结果字典本身，不复制；rrf方式会在结果中写入fusion_score。
+"""
+
+import heapq
+import logging
+from typing import Dict, List, Any, Optional, Iterator, Tuple, Hashable
+
+logger = logging.getLogger(__name__)
+
+# 默认排序融合配置（rag_system.performance.rank_fusion）
+DEFAULT_RANK_FUSION_CONFIG = {
+    'method': 'score',      # score：加权分数融合；rrf：加权倒数排名融合
+    'rrf_k': 60             # RRF平滑常数
+}
+
+# 支持的融合方式
+FUSION_METHODS = ('score', 'rrf')
+
+
+def result_key(result: Dict[str, Any]) -> Hashable:
+    """
+    结果的去重键：优先使用chunk_id，没有时使用内容
+
+    :param result: 结果
+    :return: 去重键
+    """
+    chunk_id = result.get('chunk_id', '')
+    if chunk_id:
+        return 'id', chunk_id
+    return 'content', result.get('content', '')
+
+
+def _score_stream(results: List[Dict[str, Any]], list_index: int, weight: float,
+                  score_key: str) -> Iterator[Tuple[float, int, int, Dict[str, Any]]]:
+    """
+    按加权分数从高到低逐个产出列表中的结果（原地建堆，按需弹出）
+
+    :param results: 结果列表
+    :param list_index: 列表序号（同分时排在前面的列表优先）
+    :param weight: 列表权重
+    :param score_key: 分数字段
+    :return: (负加权分数, 列表序号, 列表内位置, 结果)迭代器
+    """
+    heap = [(-weight * float(result.get(score_key) or 0.0), list_index, position, result)
+            for position, result in enumerate(results) if result is not None]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)
+
+
+class RankFusion:
+    """
+    召回结果排序融合
+
+    功能：
+    - 加权分数融合：k路堆归并，按chunk_id去重，取满k个即停止
+    - 加权倒数排名融合
+    """
+
+    def __init__(self, method: str = DEFAULT_RANK_FUSION_CONFIG['method'],
+                 rrf_k: float = DEFAULT_RANK_FUSION_CONFIG['rrf_k']):
+        """
+        初始化排序融合
+
+        :param method: 融合方式（score/rrf）
+        :param rrf_k: RRF平滑常数
+        """
+        if method not in FUSION_METHODS:
+            logger.warning(f"不支持的排序融合方式: {method}，使用score")
+            method = 'score'
+        self.method = method
+        self.rrf_k = max(float(rrf_k), 0.0)
+
+    @classmethod
+    def from_config(cls, fusion_config: Dict[str, Any]) -> 'RankFusion':
+        """
+        根据配置创建排序融合
+
+        :param fusion_config: 排序融合配置（结构同DEFAULT_RANK_FUSION_CONFIG）
+        :return: 排序融合实例
+        """
+        config = dict(DEFAULT_RANK_FUSION_CONFIG)
+        config.update(fusion_config or {})
+        return cls(method=config['method'], rrf_k=config['rrf_k'])
+
+    def fuse(self, ranked_lists: List[List[Dict[str, Any]]], k: int,
+             weights: Optional[List[float]] = None,
+             score_key: str = 'similarity_score') -> List[Dict[str, Any]]:
+        """
+        融合多个结果列表，返回去重后的前k个结果
+
+        :param ranked_lists: 结果列表（rrf方式按列表顺序计算排名）
+        :param k: 结果数量
+        :param weights: 各列表权重（默认均为1.0）
+        :param score_key: 分数字段（score方式使用）
+        :return: 融合后的结果列表
+        """
+        if k <= 0 or not ranked_lists:
+            return []
+        if weights is None:
+            weights = [1.0] * len(ranked_lists)
+        if self.method == 'rrf':
+            return self._fuse_rrf(ranked_lists, k, weights)
+        return self._fuse_scores(ranked_lists, k, weights, score_key)
+
+    def _fuse_scores(self, ranked_lists: List[List[Dict[str, Any]]], k: int,
+                     weights: List[float], score_key: str) -> List[Dict[str, Any]]:
+        """加权分数融合：k路堆归并，同一结果只保留加权分数最高的一次"""
+        streams = [_score_stream(results, index, weight, score_key)
+                   for index, (results, weight) in enumerate(zip(ranked_lists, weights)) if results]
+        seen = set()
+        fused = []
+        for _, _, _, result in heapq.merge(*streams):
+            key = result_key(result)
+            if key in seen:
+                continue
+            seen.add(key)
+            fused.append(result)
+            if len(fused) >= k:
+                break
+        return fused
+
+    def _fuse_rrf(self, ranked_lists: List[List[Dict[str, Any]]], k: int,
+                  weights: List[float]) -> List[Dict[str, Any]]:
+        """加权倒数排名融合：累加各列表的排名贡献，用堆取前k个"""
+        scores: Dict[Hashable, float] = {}
+        # 去重键 -> (首次出现的结果, 列表序号, 排名)
+        first_seen: Dict[Hashable, Tuple[Dict[str, Any], int, int]] = {}
+        for list_index, (results, weight) in enumerate(zip(ranked_lists, weights)):
+            listed = set()
+            rank = 0
+            for result in results:
+                if result is None:
+                    continue
+                key = result_key(result)
+                if key in listed:
+                    continue
+                listed.add(key)
+                rank += 1
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank)
+                if key not in first_seen:
+                    first_seen[key] = (result, list_index, rank)
+
+        top = heapq.nlargest(
+            k, scores.items(),
+            key=lambda item: (item[1], -first_seen[item[0]][1], -first_seen[item[0]][2])
+        )
+        fused = []
+        for key, score in top:
+            result = first_seen[key][0]
+            result['fusion_score'] = score
+            fused.append(result)
+        return fused
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取排序融合配置
+
+        :return: 状态信息字典
+        """
+        return {
+            'method': self.method,
+            'rrf_k': self.rrf_k
+        }
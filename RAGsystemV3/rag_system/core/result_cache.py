@@ -0,0 +1,275 @@
+"""
+召回结果缓存
+
+缓存召回入口（retrieve_texts/images/tables、aretrieve、retrieve_hybrid等）的最终结果，
+相同问题（如预设问题列表中的常见问题）重复查询时直接返回，不再向量化、检索和评分：
+- 进程内LRU缓存，同时受条目数和估算字节数约束，超出时淘汰最久未使用的条目
+- 条目按TTL过期
+- 缓存键包含召回入口、规范化后的查询、召回参数、向量库版本和影响召回结果的配置
+- 向量库版本变化（增删向量、保存、重新加载）时自动清空缓存
+- 命中/未命中/淘汰/过期/失效统计
+"""
+
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from db_system.core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 默认召回结果缓存配置（rag_system.performance.caching）
+DEFAULT_RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'max_cache_size': 1000,                 # 最大条目数
+    'max_cache_bytes': 64 * 1024 * 1024,    # 最大估算字节数
+    'cache_ttl': 3600                       # 条目存活时间（秒），0表示不过期
+}
+
+# 影响召回结果、需要参与缓存键的配置
+RESULT_CACHE_CONFIG_KEYS = (
+    'rag_system.engines',
+    'rag_system.performance.retrieval_planner',
+    'rag_system.performance.rank_fusion',
+    'rag_system.query_expansion'
+)
+
+# 未命中标记（缓存的结果可能是空列表）
+MISS = object()
+
+
+def copy_result(value: Any) -> Any:
+    """
+    复制召回结果，使调用方对结果的修改（补全展示字段、重排序分数等）不影响缓存
+
+    递归复制字典和列表（结果字典及其metadata等），字符串、数值等不可变值共享。
+
+    :param value: 召回结果（结果列表或{内容类型: 结果列表}）
+    :return: 副本
+    """
+    if isinstance(value, list):
+        return [copy_result(item) for item in value]
+    if isinstance(value, dict):
+        return {key: copy_result(item) for key, item in value.items()}
+    return value
+
+
+def estimate_size(value: Any) -> int:
+    """
+    估算对象占用的字节数（递归累加容器和元素，同一对象只计算一次）
+
+    :param value: 对象
+    :return: 估算字节数
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+class RetrievalResultCache:
+    """
+    召回结果缓存
+
+    功能：
+    - LRU淘汰，受max_entries（条目数）和max_bytes（估算字节数）双重约束
+    - TTL过期
+    - 缓存键绑定向量库版本，版本变化时清空全部条目
+    - 线程安全
+    - 命中/未命中/淘汰/过期/失效统计
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_CONFIG['max_cache_size'],
+                 max_bytes: int = DEFAULT_RESULT_CACHE_CONFIG['max_cache_bytes'],
+                 ttl: float = DEFAULT_RESULT_CACHE_CONFIG['cache_ttl']):
+        """
+        初始化召回结果缓存
+
+        :param max_entries: 最大条目数
+        :param max_bytes: 最大估算字节数
+        :param ttl: 条目存活时间（秒），0表示不过期
+        """
+        self.max_entries = max(int(max_entries), 1)
+        self.max_bytes = max(int(max_bytes), 1)
+        self.ttl = max(float(ttl), 0.0)
+        # 缓存键 -> (结果, 过期时间, 估算字节数)
+        self._entries: 'OrderedDict[str, Tuple[Any, float, int]]' = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'rejected': 0
+        }
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> Optional['RetrievalResultCache']:
+        """
+        根据配置创建缓存
+
+        :param cache_config: 缓存配置（结构同DEFAULT_RESULT_CACHE_CONFIG）
+        :return: 缓存实例；配置未启用时返回None
+        """
+        config = dict(DEFAULT_RESULT_CACHE_CONFIG)
+        config.update(cache_config or {})
+        if not config.get('enabled', True):
+            return None
+        return cls(max_entries=config['max_cache_size'],
+                   max_bytes=config['max_cache_bytes'],
+                   ttl=config['cache_ttl'])
+
+    @staticmethod
+    def make_key(entry_point: str, query: str, params: Dict[str, Any], fingerprint: str = '') -> str:
+        """
+        生成缓存键
+
+        :param entry_point: 召回入口名
+        :param query: 查询文本
+        :param params: 召回参数（max_results、阈值、内容类型等）
+        :param fingerprint: 影响召回结果的配置指纹
+        :return: 缓存键
+        """
+        payload = json.dumps([entry_point, normalize_text(query), params, fingerprint],
+                             ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def config_fingerprint(config: Any) -> str:
+        """
+        计算影响召回结果的配置指纹
+
+        :param config: 配置集成管理器（支持点分键get）
+        :return: 配置指纹
+        """
+        values = {key: config.get(key, None) for key in RESULT_CACHE_CONFIG_KEYS}
+        payload = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _sync_version(self, version: Any):
+        """向量库版本变化时清空全部条目（调用方持有锁）"""
+        if version == self._version:
+            return
+        if self._entries:
+            self.stats['invalidations'] += len(self._entries)
+            logger.info(f"向量库版本变化（{self._version} -> {version}），召回结果缓存已失效 {len(self._entries)} 条")
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+
+    def get(self, key: str, version: Any = None) -> Any:
+        """
+        查询缓存
+
+        :param key: 缓存键
+        :param version: 当前向量库版本
+        :return: 结果副本；未命中时返回MISS
+        """
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if expires_at and time.time() >= expires_at:
+                    self._remove(key)
+                    self.stats['expirations'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return copy_result(value)
+            self.stats['misses'] += 1
+            return MISS
+
+    def put(self, key: str, value: Any, version: Any = None):
+        """
+        写入缓存（保存副本）
+
+        :param key: 缓存键
+        :param value: 召回结果
+        :param version: 开始计算结果时的向量库版本（计算期间版本已变化的结果不写入）
+        """
+        value = copy_result(value)
+        size = estimate_size(value)
+        with self._lock:
+            if self._version is None:
+                self._sync_version(version)
+            if version != self._version or size > self.max_bytes:
+                self.stats['rejected'] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.time() + self.ttl if self.ttl else 0.0
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, key: str):
+        """删除条目（调用方持有锁）"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def purge_expired(self) -> int:
+        """
+        删除已过期的条目
+
+        :return: 删除的条目数
+        """
+        with self._lock:
+            now = time.time()
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at and now >= expires_at]
+            for key in expired:
+                self._remove(key)
+            self.stats['expirations'] += len(expired)
+            return len(expired)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取缓存状态
+
+        :return: 状态信息字典
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'vector_store_version': self._version,
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'evictions': self.stats['evictions'],
+                'expirations': self.stats['expirations'],
+                'invalidations': self.stats['invalidations'],
+                'rejected': self.stats['rejected'],
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+            }
@@ -5,22 +5,24 @@ RAG系统的召回引擎模块，负责多策略内容检索和智能召回
 为RAG系统提供高效、准确的内容检索服务
 """
 
+import asyncio
 import logging
+import threading
 import time
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Tuple, Callable
 from .vector_db_integration import VectorDBIntegration
-
-# 集成jieba分词工具
-try:
-    import jieba
-    import jieba.analyse
-    JIEBA_AVAILABLE = True
-    logger = logging.getLogger(__name__)
-    logger.info("jieba分词工具加载成功")
-except ImportError:
-    JIEBA_AVAILABLE = False
-    logger = logging.getLogger(__name__)
-    logger.warning("jieba分词工具未安装，将使用基础分词方法")
+from .retrieval_planner import RetrievalPlan
+from .result_cache import RetrievalResultCache, MISS
+from .rank_fusion import RankFusion
+from .diversification import MMRDiversifier
+from .query_expansion import QueryExpansionEngine
+from db_system.core.chunk_tokens import (
+    TokenVector, text_token_vector, text_keyword_vector,
+    overlap_similarity, jaccard_similarity, cosine_similarity
+)
+from db_system.core.association_graph import association_key
+from db_system.core.tokenizer import get_tokenizer
 
 logger = logging.getLogger(__name__)
 
@@ -44,192 +46,476 @@ class RetrievalEngine:
             'visual_searches': 0,
             'table_searches': 0
         }
+        # 异步召回使用的有界线程池（首次使用时创建）
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # 各召回层/各内容类型结果的排序融合
+        self.rank_fusion = RankFusion.from_config(self.config.get('rag_system.performance.rank_fusion', {}))
+        # 扩展搜索层使用的查询扩展词典（启动时编译）
+        self.query_expander = self._create_query_expander()
         logger.info("召回引擎初始化完成")
     
-    def retrieve_texts(self, query: str, max_results: int = 30, relevance_threshold: float = None) -> List[Dict[str, Any]]:
+    def _create_query_expander(self) -> QueryExpansionEngine:
+        """
+        根据rag_system.query_expansion配置创建查询扩展引擎（词典文件路径相对于db_system目录）
+        
+        :return: 查询扩展引擎
+        """
+        expansion_config = self.config.get('rag_system.query_expansion', {}) or {}
+        path_manager = getattr(getattr(self.config, 'config_manager', None), 'path_manager', None)
+        resolve_path = path_manager.get_absolute_path if path_manager is not None else None
+        expander = QueryExpansionEngine.from_config(expansion_config, resolve_path)
+        logger.info(f"查询扩展词典加载完成: {expander.get_status()['dictionaries']}")
+        return expander
+    
+    def retrieve_texts(self, query: str, max_results: int = 30, relevance_threshold: float = None,
+                       plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """
         文本内容召回
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
         :return: 召回结果列表
         """
+        if plan is not None:
+            return self._retrieve_texts(query, max_results, relevance_threshold, plan)
+        return self._cached_call('texts', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                 lambda: self._retrieve_texts(query, max_results, relevance_threshold))
+    
+    def _retrieve_texts(self, query: str, max_results: int = 30, relevance_threshold: float = None,
+                        plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """文本内容召回（不经过召回结果缓存）"""
         start_time = time.time()
         try:
             logger.info(f"开始文本召回，查询: {query[:50]}...，最大结果: {max_results}")
-            
-            # 获取文本引擎配置
-            text_config = self.config.get('rag_system.engines.text_engine', {})
-            if relevance_threshold is None:
-                similarity_threshold = text_config.get('similarity_threshold', 0.7)
-            else:
-                similarity_threshold = relevance_threshold
-            
-            logger.info(f"文本召回配置: 相似度阈值={similarity_threshold}")
-            
-            # 第一层：文本向量搜索
-            logger.info("开始第一层：文本向量搜索")
-            vector_results = self._text_vector_search(query, max_results, similarity_threshold)
-            logger.info(f"第一层向量搜索完成，返回 {len(vector_results)} 个结果")
-            
-            # 第二层：文本关键词搜索
-            logger.info("开始第二层：文本关键词搜索")
-            keyword_results = self._text_keyword_search(query, max_results // 2, similarity_threshold)
-            logger.info(f"第二层关键词搜索完成，返回 {len(keyword_results)} 个结果")
-            
-            # 第三层：文本扩展搜索
-            logger.info("开始第三层：文本扩展搜索")
-            expansion_results = self._text_expansion_search(query, max_results // 3, similarity_threshold)
-            logger.info(f"第三层扩展搜索完成，返回 {len(expansion_results)} 个结果")
-            
-            # 合并和去重
-            logger.info("开始合并和去重处理")
-            all_results = self._deduplicate_and_sort(
-                vector_results + keyword_results + expansion_results,
-                max_results
-            )
-            
-            # 更新统计信息
-            self._update_stats(len(all_results), time.time() - start_time)
-            
-            logger.info(f"文本召回完成，查询: {query[:50]}...，最终结果: {len(all_results)}")
-            return all_results
+            layers = self._text_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = self._plan_layers(layers)
+            layer_results = [self._run_layer(*layer, plan=plan) for layer in layers]
+            return self._merge_layer_results('文本', query, layer_results, max_results, start_time)
             
         except Exception as e:
             logger.error(f"文本召回失败: {e}")
             return []
     
-    def retrieve_images(self, query: str, max_results: int = 20, relevance_threshold: float = None) -> List[Dict[str, Any]]:
+    async def aretrieve_texts(self, query: str, max_results: int = 30, relevance_threshold: float = None,
+                              plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """
+        文本内容召回（异步，各层在召回线程池中并发执行）
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
+        :return: 召回结果列表
+        """
+        if plan is not None:
+            return await self._aretrieve_texts(query, max_results, relevance_threshold, plan)
+        return await self._acached_call('texts', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                        lambda: self._aretrieve_texts(query, max_results, relevance_threshold))
+    
+    async def _aretrieve_texts(self, query: str, max_results: int = 30, relevance_threshold: float = None,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """文本内容召回（异步，各层在召回线程池中并发执行，不经过召回结果缓存）"""
+        start_time = time.time()
+        try:
+            logger.info(f"开始异步文本召回，查询: {query[:50]}...，最大结果: {max_results}")
+            layers = self._text_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._plan_layers, layers)
+            layer_results = await self._run_layers_async(layers, plan)
+            return self._merge_layer_results('文本', query, layer_results, max_results, start_time)
+            
+        except Exception as e:
+            logger.error(f"异步文本召回失败: {e}")
+            return []
+    
+    def _text_layers(self, query: str, max_results: int, relevance_threshold: float = None) -> List[Tuple[str, Callable, tuple]]:
+        """
+        文本召回的各层搜索
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :return: (层名, 搜索函数, 参数)列表
+        """
+        # 获取文本引擎配置
+        text_config = self.config.get('rag_system.engines.text_engine', {})
+        if relevance_threshold is None:
+            similarity_threshold = text_config.get('similarity_threshold', 0.7)
+        else:
+            similarity_threshold = relevance_threshold
+        
+        logger.info(f"文本召回配置: 相似度阈值={similarity_threshold}")
+        
+        return [
+            ('第一层：文本向量搜索', self._text_vector_search, (query, max_results, similarity_threshold)),
+            ('第二层：文本关键词搜索', self._text_keyword_search, (query, max_results // 2, similarity_threshold)),
+            ('第三层：文本扩展搜索', self._text_expansion_search, (query, max_results // 3, similarity_threshold))
+        ]
+    
+    def retrieve_images(self, query: str, max_results: int = 20, relevance_threshold: float = None,
+                        plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """
         图片内容召回
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
         :return: 召回结果列表
         """
+        if plan is not None:
+            return self._retrieve_images(query, max_results, relevance_threshold, plan)
+        return self._cached_call('images', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                 lambda: self._retrieve_images(query, max_results, relevance_threshold))
+    
+    def _retrieve_images(self, query: str, max_results: int = 20, relevance_threshold: float = None,
+                         plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """图片内容召回（不经过召回结果缓存）"""
         start_time = time.time()
         try:
             logger.info(f"开始图片召回，查询: {query[:50]}...，最大结果: {max_results}")
-            
-            # 获取图片引擎配置
-            image_config = self.config.get('rag_system.engines.image_engine', {})
-            if relevance_threshold is None:
-                similarity_threshold = image_config.get('similarity_threshold', 0.3)
-            else:
-                similarity_threshold = relevance_threshold
-            
-            logger.info(f"图片召回配置: 相似度阈值={similarity_threshold}")
-            
-            # 第一层：图片语义搜索
-            logger.info("开始第一层：图片语义搜索")
-            semantic_results = self._image_semantic_search(query, max_results, similarity_threshold)
-            logger.info(f"第一层语义搜索完成，返回 {len(semantic_results)} 个结果")
-            
-            # 第二层：图片视觉搜索
-            logger.info("开始第二层：图片视觉搜索")
-            visual_results = self._image_visual_search(query, max_results // 2, similarity_threshold)
-            logger.info(f"第二层视觉搜索完成，返回 {len(visual_results)} 个结果")
-            
-            # 第三层：图片关键词搜索
-            logger.info("开始第三层：图片关键词搜索")
-            keyword_results = self._image_keyword_search(query, max_results // 3, similarity_threshold)
-            logger.info(f"第三层关键词搜索完成，返回 {len(keyword_results)} 个结果")
-            
-            # 第四层：图片扩展搜索
-            logger.info("开始第四层：图片扩展搜索")
-            expansion_results = self._image_expansion_search(query, max_results // 4, similarity_threshold)
-            logger.info(f"第四层扩展搜索完成，返回 {len(expansion_results)} 个结果")
-            
-            # 合并和去重
-            logger.info("开始合并和去重处理")
-            all_results = self._deduplicate_and_sort(
-                semantic_results + visual_results + keyword_results + expansion_results,
-                max_results
-            )
-            
-            # 更新统计信息
-            self._update_stats(len(all_results), time.time() - start_time)
-            
-            logger.info(f"图片召回完成，查询: {query[:50]}...，最终结果: {len(all_results)}")
-            return all_results
+            layers = self._image_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = self._plan_layers(layers)
+            layer_results = [self._run_layer(*layer, plan=plan) for layer in layers]
+            return self._merge_layer_results('图片', query, layer_results, max_results, start_time)
             
         except Exception as e:
             logger.error(f"图片召回失败: {e}")
             return []
     
-    def retrieve_tables(self, query: str, max_results: int = 15, relevance_threshold: float = None) -> List[Dict[str, Any]]:
+    async def aretrieve_images(self, query: str, max_results: int = 20, relevance_threshold: float = None,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """
+        图片内容召回（异步，各层在召回线程池中并发执行）
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
+        :return: 召回结果列表
+        """
+        if plan is not None:
+            return await self._aretrieve_images(query, max_results, relevance_threshold, plan)
+        return await self._acached_call('images', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                        lambda: self._aretrieve_images(query, max_results, relevance_threshold))
+    
+    async def _aretrieve_images(self, query: str, max_results: int = 20, relevance_threshold: float = None,
+                                plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """图片内容召回（异步，各层在召回线程池中并发执行，不经过召回结果缓存）"""
+        start_time = time.time()
+        try:
+            logger.info(f"开始异步图片召回，查询: {query[:50]}...，最大结果: {max_results}")
+            layers = self._image_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._plan_layers, layers)
+            layer_results = await self._run_layers_async(layers, plan)
+            return self._merge_layer_results('图片', query, layer_results, max_results, start_time)
+            
+        except Exception as e:
+            logger.error(f"异步图片召回失败: {e}")
+            return []
+    
+    def _image_layers(self, query: str, max_results: int, relevance_threshold: float = None) -> List[Tuple[str, Callable, tuple]]:
+        """
+        图片召回的各层搜索
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :return: (层名, 搜索函数, 参数)列表
+        """
+        # 获取图片引擎配置
+        image_config = self.config.get('rag_system.engines.image_engine', {})
+        if relevance_threshold is None:
+            similarity_threshold = image_config.get('similarity_threshold', 0.3)
+        else:
+            similarity_threshold = relevance_threshold
+        
+        logger.info(f"图片召回配置: 相似度阈值={similarity_threshold}")
+        
+        return [
+            ('第一层：图片语义搜索', self._image_semantic_search, (query, max_results, similarity_threshold)),
+            ('第二层：图片视觉搜索', self._image_visual_search, (query, max_results // 2, similarity_threshold)),
+            ('第三层：图片关键词搜索', self._image_keyword_search, (query, max_results // 3, similarity_threshold)),
+            ('第四层：图片扩展搜索', self._image_expansion_search, (query, max_results // 4, similarity_threshold))
+        ]
+    
+    def retrieve_tables(self, query: str, max_results: int = 15, relevance_threshold: float = None,
+                        plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """
         表格内容召回
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
         :return: 召回结果列表
         """
+        if plan is not None:
+            return self._retrieve_tables(query, max_results, relevance_threshold, plan)
+        return self._cached_call('tables', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                 lambda: self._retrieve_tables(query, max_results, relevance_threshold))
+    
+    def _retrieve_tables(self, query: str, max_results: int = 15, relevance_threshold: float = None,
+                         plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """表格内容召回（不经过召回结果缓存）"""
         start_time = time.time()
         try:
             logger.info(f"开始表格召回，查询: {query[:50]}...，最大结果: {max_results}")
-            
-            # 获取表格引擎配置
-            table_config = self.config.get('rag_system.engines.table_engine', {})
-            if relevance_threshold is None:
-                similarity_threshold = table_config.get('similarity_threshold', 0.3)  # 使用配置文件中的阈值
-            else:
-                similarity_threshold = relevance_threshold
-            
-            logger.info(f"表格召回配置: 相似度阈值={similarity_threshold}")
-            
-            # 第一层：表格语义搜索
-            logger.info("开始第一层：表格语义搜索")
-            semantic_results = self._table_structure_search(query, max_results, similarity_threshold)
-            logger.info(f"第一层语义搜索完成，返回 {len(semantic_results)} 个结果")
-            
-            # 第二层：表格结构搜索（使用配置文件中的阈值）
-            logger.info("开始第二层：表格结构搜索")
-            structure_threshold = table_config.get('structure_search_threshold', 0.2)
-            structure_results = self._table_semantic_search(query, max_results // 2, structure_threshold)
-            logger.info(f"第二层结构搜索完成，返回 {len(structure_results)} 个结果")
-            
-            # 第三层：表格关键词搜索（使用配置文件中的阈值）
-            logger.info("开始第三层：表格关键词搜索")
-            keyword_threshold = table_config.get('keyword_search_threshold', 0.2)
-            keyword_results = self._table_keyword_search(query, max_results // 3, keyword_threshold)
-            logger.info(f"第三层关键词搜索完成，返回 {len(keyword_results)} 个结果")
-            
-            # 第四层：表格扩展搜索（使用配置文件中的阈值）
-            logger.info("开始第四层：表格扩展搜索")
-            expansion_threshold = table_config.get('expansion_search_threshold', 0.2)
-            expansion_results = self._table_expansion_search(query, max_results // 4, expansion_threshold)
-            logger.info(f"第四层扩展搜索完成，返回 {len(expansion_results)} 个结果")
-            
-            # 合并和去重
-            logger.info("开始合并和去重处理")
-            all_results = self._deduplicate_and_sort(
-                semantic_results + structure_results + keyword_results + expansion_results,
-                max_results
-            )
-            
-            # 更新统计信息
-            self._update_stats(len(all_results), time.time() - start_time)
+            layers = self._table_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = self._plan_layers(layers)
+            layer_results = [self._run_layer(*layer, plan=plan) for layer in layers]
+            all_results = self._merge_layer_results('表格', query, layer_results, max_results, start_time)
             self.retrieval_stats['table_searches'] += 1
-            
-            logger.info(f"表格召回完成，查询: {query[:50]}...，最终结果: {len(all_results)}")
             return all_results
             
         except Exception as e:
             logger.error(f"表格召回失败: {e}")
             return []
     
+    async def aretrieve_tables(self, query: str, max_results: int = 15, relevance_threshold: float = None,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """
+        表格内容召回（异步，各层在召回线程池中并发执行）
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :param plan: 召回计划（可选，为None时为本次召回单独生成并使用召回结果缓存）
+        :return: 召回结果列表
+        """
+        if plan is not None:
+            return await self._aretrieve_tables(query, max_results, relevance_threshold, plan)
+        return await self._acached_call('tables', query, {'max_results': max_results, 'relevance_threshold': relevance_threshold},
+                                        lambda: self._aretrieve_tables(query, max_results, relevance_threshold))
+    
+    async def _aretrieve_tables(self, query: str, max_results: int = 15, relevance_threshold: float = None,
+                                plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """表格内容召回（异步，各层在召回线程池中并发执行，不经过召回结果缓存）"""
+        start_time = time.time()
+        try:
+            logger.info(f"开始异步表格召回，查询: {query[:50]}...，最大结果: {max_results}")
+            layers = self._table_layers(query, max_results, relevance_threshold)
+            if plan is None:
+                plan = await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._plan_layers, layers)
+            layer_results = await self._run_layers_async(layers, plan)
+            all_results = self._merge_layer_results('表格', query, layer_results, max_results, start_time)
+            self.retrieval_stats['table_searches'] += 1
+            return all_results
+            
+        except Exception as e:
+            logger.error(f"异步表格召回失败: {e}")
+            return []
+    
+    def _table_layers(self, query: str, max_results: int, relevance_threshold: float = None) -> List[Tuple[str, Callable, tuple]]:
+        """
+        表格召回的各层搜索
+        
+        :param query: 查询文本
+        :param max_results: 最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用配置文件中的值
+        :return: (层名, 搜索函数, 参数)列表
+        """
+        # 获取表格引擎配置
+        table_config = self.config.get('rag_system.engines.table_engine', {})
+        if relevance_threshold is None:
+            similarity_threshold = table_config.get('similarity_threshold', 0.3)  # 使用配置文件中的阈值
+        else:
+            similarity_threshold = relevance_threshold
+        
+        logger.info(f"表格召回配置: 相似度阈值={similarity_threshold}")
+        
+        # 第二至四层使用配置文件中的阈值
+        structure_threshold = table_config.get('structure_search_threshold', 0.2)
+        keyword_threshold = table_config.get('keyword_search_threshold', 0.2)
+        expansion_threshold = table_config.get('expansion_search_threshold', 0.2)
+        
+        return [
+            ('第一层：表格语义搜索', self._table_structure_search, (query, max_results, similarity_threshold)),
+            ('第二层：表格结构搜索', self._table_semantic_search, (query, max_results // 2, structure_threshold)),
+            ('第三层：表格关键词搜索', self._table_keyword_search, (query, max_results // 3, keyword_threshold)),
+            ('第四层：表格扩展搜索', self._table_expansion_search, (query, max_results // 4, expansion_threshold))
+        ]
+    
+    async def aretrieve(self, query: str, content_types: List[str], max_results: int = 10,
+                        relevance_threshold: float = None,
+                        type_options: Dict[str, Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        多类型内容并发召回（异步）
+        
+        所有内容类型共用一个召回计划，相同子查询只向量化和检索一次；
+        各内容类型及其内部各层同时在召回线程池中执行，总耗时接近最慢的一层。
+        
+        :param query: 查询文本
+        :param content_types: 内容类型列表（text/image/table）
+        :param max_results: 每种类型的最大结果数量
+        :param relevance_threshold: 相关性阈值，如果为None则使用各引擎配置中的值
+        :param type_options: 按内容类型覆盖的max_results和relevance_threshold（可选）
+        :return: {内容类型: 召回结果列表}
+        """
+        params = {
+            'content_types': list(content_types),
+            'max_results': max_results,
+            'relevance_threshold': relevance_threshold,
+            'type_options': type_options
+        }
+        return await self._acached_call('multi', query, params,
+                                        lambda: self._aretrieve(query, content_types, max_results,
+                                                                relevance_threshold, type_options))
+    
+    async def _aretrieve(self, query: str, content_types: List[str], max_results: int = 10,
+                         relevance_threshold: float = None,
+                         type_options: Dict[str, Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """多类型内容并发召回（异步，不经过召回结果缓存）"""
+        retrievers = {
+            'text': (self._text_layers, self._aretrieve_texts),
+            'image': (self._image_layers, self._aretrieve_images),
+            'table': (self._table_layers, self._aretrieve_tables)
+        }
+        try:
+            requests = {}
+            for content_type in content_types:
+                if content_type not in retrievers:
+                    continue
+                options = (type_options or {}).get(content_type, {})
+                requests[content_type] = (
+                    options.get('max_results', max_results),
+                    options.get('relevance_threshold', relevance_threshold)
+                )
+            
+            # 汇总所有类型各层的子查询，统一生成召回计划
+            all_layers = []
+            for content_type, (type_max_results, type_threshold) in requests.items():
+                all_layers.extend(retrievers[content_type][0](query, type_max_results, type_threshold))
+            plan = await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._plan_layers, all_layers)
+            
+            results = await asyncio.gather(
+                *(retrievers[content_type][1](query, type_max_results, type_threshold, plan=plan)
+                  for content_type, (type_max_results, type_threshold) in requests.items())
+            )
+            return dict(zip(requests.keys(), results))
+            
+        except Exception as e:
+            logger.error(f"多类型并发召回失败: {e}")
+            return {content_type: [] for content_type in content_types}
+    
+    def _plan_layers(self, layers: List[Tuple[str, Callable, tuple]]) -> Optional[RetrievalPlan]:
+        """
+        生成召回计划：以记录模式执行各层，收集全部子查询后统一向量化和检索
+        
+        :param layers: (层名, 搜索函数, 参数)列表
+        :return: 已执行的召回计划；未启用或执行失败时返回None
+        """
+        if not self.config.get('rag_system.performance.retrieval_planner.enabled', True):
+            return None
+        try:
+            plan = RetrievalPlan()
+            for label, search_func, args in layers:
+                search_func(*args, plan=plan)
+            if not plan.execute(self.vector_db.vector_store_manager):
+                return None
+            return plan
+        except Exception as e:
+            logger.warning(f"生成召回计划失败，各层单独检索: {e}")
+            return None
+    
+    def _run_layer(self, label: str, search_func: Callable, args: tuple,
+                   plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """
+        执行单层搜索
+        
+        :param label: 层名
+        :param search_func: 搜索函数
+        :param args: 搜索函数参数
+        :param plan: 召回计划（可选）
+        :return: 该层的搜索结果
+        """
+        try:
+            logger.info(f"开始{label}")
+            results = search_func(*args, plan=plan)
+            logger.info(f"{label}完成，返回 {len(results)} 个结果")
+            return results
+        except Exception as e:
+            logger.error(f"{label}失败: {e}")
+            return []
+    
+    async def _run_layers_async(self, layers: List[Tuple[str, Callable, tuple]],
+                                plan: RetrievalPlan = None) -> List[List[Dict[str, Any]]]:
+        """
+        在召回线程池中并发执行各层搜索，不阻塞事件循环
+        
+        :param layers: (层名, 搜索函数, 参数)列表
+        :param plan: 召回计划（可选）
+        :return: 各层的搜索结果（与layers顺序一致）
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        return list(await asyncio.gather(
+            *(loop.run_in_executor(executor, self._run_layer, label, search_func, args, plan)
+              for label, search_func, args in layers)
+        ))
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        获取召回线程池（首次使用时创建，大小由rag_system.performance.retrieval_workers配置）
+        
+        :return: 线程池
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                max_workers = self.config.get('rag_system.performance.retrieval_workers', 8)
+                self._executor = ThreadPoolExecutor(max_workers=max(int(max_workers), 1),
+                                                    thread_name_prefix='rag-retrieval')
+                logger.info(f"召回线程池已创建，线程数: {max_workers}")
+            return self._executor
+    
+    def shutdown(self):
+        """关闭召回线程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+    
+    def _merge_layer_results(self, type_label: str, query: str, layer_results: List[List[Dict[str, Any]]],
+                             max_results: int, start_time: float) -> List[Dict[str, Any]]:
+        """
+        合并各层结果、去重排序并更新统计信息
+        
+        :param type_label: 内容类型名称（用于日志）
+        :param query: 查询文本
+        :param layer_results: 各层的搜索结果
+        :param max_results: 最大结果数量
+        :param start_time: 召回开始时间
+        :return: 召回结果列表
+        """
+        logger.info("开始合并和去重处理")
+        all_results = self.rank_fusion.fuse(layer_results, max_results)
+        
+        # 更新统计信息
+        self._update_stats(len(all_results), time.time() - start_time)
+        
+        logger.info(f"{type_label}召回完成，查询: {query[:50]}...，最终结果: {len(all_results)}")
+        return all_results
+    
     def retrieve_hybrid(self, query: str, max_results: int = 25) -> List[Dict[str, Any]]:
         """
-        混合内容召回 - 增强版
+        混合内容召回 - 增强版（使用召回结果缓存）
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :return: 召回结果列表
         """
+        return self._cached_call('hybrid', query, {'max_results': max_results},
+                                 lambda: self._retrieve_hybrid(query, max_results))
+    
+    def _retrieve_hybrid(self, query: str, max_results: int = 25) -> List[Dict[str, Any]]:
+        """混合内容召回（不经过召回结果缓存）"""
         start_time = time.time()
         try:
             logger.info(f"开始混合召回，查询: {query[:50]}...，最大结果: {max_results}")
@@ -238,34 +524,40 @@ class RetrievalEngine:
             hybrid_config = self.config.get('rag_system.engines.hybrid_engine', {})
             weights = hybrid_config.get('weights', {'image': 0.3, 'text': 0.4, 'table': 0.3})
             cross_type_boost = hybrid_config.get('cross_type_boost', 0.2)
+            diversifier = MMRDiversifier.from_config(hybrid_config.get('mmr', {}))
+            candidate_count = diversifier.candidate_count(max_results)
             
-            logger.info(f"混合召回配置: 权重={weights}, 跨类型提升={cross_type_boost}")
+            logger.info(f"混合召回配置: 权重={weights}, 跨类型提升={cross_type_boost}, MMR={diversifier.get_status()}")
             
-            # 分别召回各类型内容
+            # 分别召回各类型内容（共用一个召回计划，相同子查询只检索一次）
             logger.info("开始各类型内容召回")
-            text_results = self.retrieve_texts(query, int(max_results * weights['text']))
-            image_results = self.retrieve_images(query, int(max_results * weights['image']))
-            table_results = self.retrieve_tables(query, int(max_results * weights['table']))
+            text_k = int(candidate_count * weights['text'])
+            image_k = int(candidate_count * weights['image'])
+            table_k = int(candidate_count * weights['table'])
+            plan = self._plan_layers(
+                self._text_layers(query, text_k) + self._image_layers(query, image_k) + self._table_layers(query, table_k)
+            )
+            text_results = self._retrieve_texts(query, text_k, plan=plan)
+            image_results = self._retrieve_images(query, image_k, plan=plan)
+            table_results = self._retrieve_tables(query, table_k, plan=plan)
             
             logger.info(f"各类型召回结果: 文本={len(text_results)}, 图片={len(image_results)}, 表格={len(table_results)}")
             
             # 计算跨类型相关性
             logger.info("开始计算跨类型相关性")
-            enhanced_results = self._enhance_cross_type_relevance(
+            self._enhance_cross_type_relevance(
                 text_results, image_results, table_results, query, cross_type_boost
             )
-            logger.info(f"跨类型相关性增强完成，结果数: {len(enhanced_results)}")
             
-            # 智能融合搜索结果
-            logger.info("开始智能融合搜索结果")
+            # 融合各类型结果（去重并取前candidate_count个）
+            logger.info("开始融合各类型结果")
             fused_results = self._fuse_hybrid_results(
-                enhanced_results, query, max_results
+                {'text': text_results, 'image': image_results, 'table': table_results},
+                hybrid_config.get('fusion_weights', {}), candidate_count
             )
-            logger.info(f"智能融合完成，结果数: {len(fused_results)}")
             
-            # 去重和排序
-            logger.info("开始去重和排序")
-            final_results = self._deduplicate_and_sort(fused_results, max_results)
+            # MMR多样化（使用已存储的分块向量，取前max_results个）
+            final_results = self._diversify_results(diversifier, fused_results, max_results)
             
             # 更新统计信息
             self._update_stats(len(final_results), time.time() - start_time)
@@ -313,10 +605,17 @@ class RetrievalEngine:
             return []
     
     # 文本召回策略实现
-    def _text_vector_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _text_vector_search(self, query: str, max_results: int, threshold: float,
+                            plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """文本向量搜索"""
         try:
-            results = self.vector_db.search_texts(query, max_results, threshold)
+            range_config = self.config.get('rag_system.engines.text_engine.range_search', {})
+            candidates = self._vector_candidates('text_engine', query, max_results, {'chunk_type': 'text'}, plan)
+            if range_config.get('enabled', False):
+                # 范围搜索：similarity_score为真实余弦相似度，阈值直接作用于绝对分数
+                results = self._format_candidates(candidates)
+            else:
+                results = self._format_candidates(candidates, threshold)
             for result in results:
                 result['strategy'] = 'vector_similarity'
                 result['layer'] = 1
@@ -325,18 +624,27 @@ class RetrievalEngine:
             logger.error(f"文本向量搜索失败: {e}")
             return []
     
-    def _text_keyword_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
-        """文本关键词搜索"""
+    def _text_keyword_search(self, query: str, max_results: int, threshold: float,
+                             plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """文本关键词搜索：在BM25关键词索引中精确匹配查询词（索引不可用时以关键词做向量搜索）"""
         try:
+            candidates = self._keyword_candidates(query, max_results, {'chunk_type': 'text'}, plan)
+            if candidates is not None:
+                return self._format_keyword_candidates(candidates, threshold, 'keyword_matching', 2)
+            
             # 提取关键词
             keywords = self._extract_text_keywords(query)
             if not keywords:
                 return []
             
-            # 使用关键词进行搜索
+            # 使用关键词进行批量搜索
+            keywords = keywords[:3]  # 限制关键词数量
+            batch_results = [
+                self._format_candidates(candidates, threshold)
+                for candidates in self._search_candidates(keywords, max_results // 3, {'chunk_type': 'text'}, plan)
+            ]
             results = []
-            for keyword in keywords[:3]:  # 限制关键词数量
-                keyword_results = self.vector_db.search_texts(keyword, max_results // 3, threshold)
+            for keyword, keyword_results in zip(keywords, batch_results):
                 for result in keyword_results:
                     result['strategy'] = 'keyword_matching'
                     result['layer'] = 2
@@ -348,7 +656,8 @@ class RetrievalEngine:
             logger.error(f"文本关键词搜索失败: {e}")
             return []
     
-    def _text_expansion_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _text_expansion_search(self, query: str, max_results: int, threshold: float,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """文本扩展搜索"""
         try:
             # 生成扩展查询
@@ -356,10 +665,14 @@ class RetrievalEngine:
             if not expanded_queries:
                 return []
             
-            # 使用扩展查询进行搜索
+            # 使用扩展查询进行批量搜索
+            expanded_queries = expanded_queries[:2]  # 限制扩展查询数量
+            batch_results = [
+                self._format_candidates(candidates, threshold)
+                for candidates in self._search_candidates(expanded_queries, max_results // 2, {'chunk_type': 'text'}, plan)
+            ]
             results = []
-            for expanded_query in expanded_queries[:2]:  # 限制扩展查询数量
-                expanded_results = self.vector_db.search_texts(expanded_query, max_results // 2, threshold)
+            for expanded_query, expanded_results in zip(expanded_queries, batch_results):
                 for result in expanded_results:
                     result['strategy'] = 'query_expansion'
                     result['layer'] = 3
@@ -373,25 +686,27 @@ class RetrievalEngine:
     
     # 图片召回策略实现
 
-    def _image_semantic_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _image_semantic_search(self, query: str, max_results: int, threshold: float,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """
         图片语义搜索 - 使用text-embedding-v1模型在description_embedding向量空间中搜索
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param threshold: 相似度阈值
+        :param plan: 召回计划（可选）
         :return: 搜索结果列表
         """
         try:
             logger.info(f"开始第一层：图片语义搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
             logger.info("使用text-embedding-v1模型在description_embedding向量空间中搜索")
             
-            # 使用similarity_search方法，获取更多候选结果
-            results = self.vector_db.vector_store_manager.similarity_search(
-                query=query, 
+            # 获取候选结果（启用范围搜索时按绝对余弦阈值召回）
+            results = self._vector_candidates(
+                'image_engine', query,
                 k=100,  # 获取更多候选结果
-                filter_dict={'chunk_type': 'image'},  # 只过滤图片类型
-                fetch_k=200  # 进一步增加fetch_k
+                filter_dict={'chunk_type': 'image', 'vector_type': 'description_embedding'},  # 只扫描图片描述向量分区
+                plan=plan
             )
             logger.info(f"向量搜索返回 {len(results)} 个原始结果")
             
@@ -410,8 +725,8 @@ class RetrievalEngine:
                         # 检查是否达到阈值（第一层语义搜索使用更低的阈值）
                         semantic_threshold = min(threshold, 0.01)  # 使用更低的阈值
                         if similarity_score >= semantic_threshold:
-                            # 使用_format_search_result方法格式化结果
-                            formatted_result = self.vector_db._format_search_result(result)
+                            # 创建轻量候选结果（展示字段在最终返回时生成）
+                            formatted_result = self.vector_db.create_candidate(result)
                             # 添加搜索策略信息
                             formatted_result['strategy'] = 'visual_similarity'
                             formatted_result['layer'] = 2  # 第二层搜索
@@ -432,45 +747,40 @@ class RetrievalEngine:
             logger.error(f"图片语义搜索失败: {e}")
             return []
     
-    def _image_visual_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _image_visual_search(self, query: str, max_results: int, threshold: float,
+                             plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """
         图片视觉搜索 - 使用multimodal-embedding-one-peace-v1模型在visual_embedding向量空间中搜索
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param threshold: 相似度阈值
+        :param plan: 召回计划（可选）
         :return: 搜索结果列表
         """
+        if plan is not None and plan.recording:
+            # 视觉搜索使用多模态向量空间，不经过召回计划
+            return []
         try:
             logger.info(f"开始图片视觉搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
             
             # 1. 使用配置中的图片embedding模型将查询文本向量化
             image_embedding_model = self.config.get('vectorization.image_embedding_model', 'multimodal-embedding-one-peace-v1')
-            logger.info(f"使用{image_embedding_model}模型向量化查询文本")
             try:
-                # 直接使用DashScope的MultiModalEmbedding API，而不是LangChain包装
-                import dashscope
-                from dashscope import MultiModalEmbedding
+                # 多模态embedding由向量存储管理器按embedding提供方创建（DashScope API或本地模型）
+                multimodal_embeddings = self.vector_db.vector_store_manager.image_embeddings
+                if multimodal_embeddings is None:
+                    raise Exception("多模态embedding模型不可用")
+                cache_model = getattr(multimodal_embeddings, 'model_name', image_embedding_model)
+                logger.info(f"使用{cache_model}模型向量化查询文本")
                 
-                # 设置API密钥
-                api_key = self.vector_db.vector_store_manager.config_manager.get_environment_manager().get_required_var('DASHSCOPE_API_KEY')
-                dashscope.api_key = api_key
-                
-                # 构建正确的输入格式：纯文本输入
-                input_data = [{'text': query}]
-                
-                # 调用多模态embedding模型
-                result = MultiModalEmbedding.call(
-                    model=image_embedding_model,
-                    input=input_data,
-                    auto_truncation=True
-                )
-                
-                if result.status_code == 200:
-                    query_vector = result.output["embedding"]
-                    logger.info(f"多模态模型向量化完成，向量维度: {len(query_vector)}")
+                # 相同查询优先读取查询向量缓存
+                embedding_cache = getattr(self.vector_db, 'embedding_cache', None)
+                if embedding_cache is not None:
+                    query_vector = embedding_cache.get_or_compute(cache_model, query, multimodal_embeddings.embed_query)
                 else:
-                    raise Exception(f"多模态模型调用失败: {result.message}")
+                    query_vector = multimodal_embeddings.embed_query(query)
+                logger.info(f"多模态模型向量化完成，向量维度: {len(query_vector)}")
             
             except Exception as e:
                 logger.error(f"多模态模型向量化失败: {e}")
@@ -480,7 +790,8 @@ class RetrievalEngine:
             logger.info("在visual_embedding向量空间中搜索")
             results = self.vector_db.vector_store_manager.similarity_search_by_vector(
                 query_vector=query_vector,
-                k=max_results
+                k=max_results,
+                filter_dict={'chunk_type': 'image', 'vector_type': 'visual_embedding'}  # 只扫描图片视觉向量分区
             )
             logger.info(f"向量搜索返回 {len(results)} 个原始结果")
             
@@ -498,8 +809,8 @@ class RetrievalEngine:
                         
                         # 检查是否达到阈值
                         if similarity_score >= threshold:
-                            # 使用_format_search_result方法格式化结果
-                            formatted_result = self.vector_db._format_search_result(result)
+                            # 创建轻量候选结果（展示字段在最终返回时生成）
+                            formatted_result = self.vector_db.create_candidate(result)
                             # 添加搜索策略信息
                             formatted_result['strategy'] = 'visual_similarity'
                             formatted_result['layer'] = 2  # 第二层搜索
@@ -525,26 +836,33 @@ class RetrievalEngine:
             logger.error(f"图片视觉搜索失败: {e}")
             # 回退到语义搜索
             logger.info("回退到语义搜索")
-            return self._image_semantic_search(query, max_results, threshold)
+            return self._image_semantic_search(query, max_results, threshold, plan)
     
-    def _image_keyword_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
-        """图片关键词搜索"""
+    def _image_keyword_search(self, query: str, max_results: int, threshold: float,
+                              plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """图片关键词搜索：在BM25关键词索引中匹配图片描述（索引不可用时以关键词做向量搜索）"""
         try:
+            candidates = self._keyword_candidates(
+                query, max_results, {'chunk_type': 'image', 'vector_type': 'description_embedding'}, plan
+            )
+            if candidates is not None:
+                return self._format_keyword_candidates(candidates, threshold, 'keyword_matching', 3)
+            
             # 提取图片相关关键词
             keywords = self._extract_image_keywords(query)
             if not keywords:
                 return []
             
-            # 使用关键词进行搜索，使用第一层的方法
+            # 使用关键词进行批量搜索，使用第一层的向量空间
+            keywords = keywords[:3]
+            batch_results = self._search_candidates(
+                keywords,
+                max_results * 10,  # 获取更多候选结果
+                {'chunk_type': 'image', 'vector_type': 'description_embedding'},  # 只扫描图片描述向量分区
+                plan
+            )
             results = []
-            for keyword in keywords[:3]:
-                # 使用similarity_search方法，获取更多候选结果
-                keyword_results = self.vector_db.vector_store_manager.similarity_search(
-                    query=keyword, 
-                    k=max_results * 10,  # 获取更多候选结果
-                    filter_dict={'chunk_type': 'image'},  # 只过滤图片类型
-                    fetch_k=max_results * 20  # 进一步增加fetch_k
-                )
+            for keyword, keyword_results in zip(keywords, batch_results):
                 
                 # 手动过滤：只保留description_embedding类型且相似度达到阈值的图片
                 filtered_results = []
@@ -565,8 +883,8 @@ class RetrievalEngine:
                                 if not content and hasattr(result, 'page_content'):
                                     content = result.page_content
                                 
-                                # 使用_format_search_result方法格式化结果
-                                formatted_result = self.vector_db._format_search_result(result)
+                                # 创建轻量候选结果（展示字段在最终返回时生成）
+                                formatted_result = self.vector_db.create_candidate(result)
                                 # 添加搜索策略信息
                                 formatted_result['strategy'] = 'keyword_matching'
                                 formatted_result['layer'] = 3  # 第三层搜索
@@ -586,7 +904,8 @@ class RetrievalEngine:
             logger.error(f"图片关键词搜索失败: {e}")
             return []
     
-    def _image_expansion_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _image_expansion_search(self, query: str, max_results: int, threshold: float,
+                                plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """图片扩展搜索"""
         try:
             # 生成图片相关扩展查询
@@ -594,16 +913,16 @@ class RetrievalEngine:
             if not expanded_queries:
                 return []
             
-            # 使用扩展查询进行搜索，使用第一层的方法
+            # 使用扩展查询进行批量搜索，使用第一层的向量空间
+            expanded_queries = expanded_queries[:2]
+            batch_results = self._search_candidates(
+                expanded_queries,
+                max_results * 10,  # 获取更多候选结果
+                {'chunk_type': 'image', 'vector_type': 'description_embedding'},  # 只扫描图片描述向量分区
+                plan
+            )
             results = []
-            for expanded_query in expanded_queries[:2]:
-                # 使用similarity_search方法，获取更多候选结果
-                expanded_results = self.vector_db.vector_store_manager.similarity_search(
-                    query=expanded_query, 
-                    k=max_results * 10,  # 获取更多候选结果
-                    filter_dict={'chunk_type': 'image'},  # 只过滤图片类型
-                    fetch_k=max_results * 20  # 进一步增加fetch_k
-                )
+            for expanded_query, expanded_results in zip(expanded_queries, batch_results):
                 
                 # 手动过滤：只保留description_embedding类型且相似度达到阈值的图片
                 filtered_results = []
@@ -624,8 +943,8 @@ class RetrievalEngine:
                                 if not content and hasattr(result, 'page_content'):
                                     content = result.page_content
                                 
-                                # 使用_format_search_result方法格式化结果
-                                formatted_result = self.vector_db._format_search_result(result)
+                                # 创建轻量候选结果（展示字段在最终返回时生成）
+                                formatted_result = self.vector_db.create_candidate(result)
                                 # 添加搜索策略信息
                                 formatted_result['strategy'] = 'query_expansion'
                                 formatted_result['layer'] = 4  # 第四层搜索
@@ -646,18 +965,19 @@ class RetrievalEngine:
             return []
     
     # 表格召回策略实现
-    def _table_structure_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _table_structure_search(self, query: str, max_results: int, threshold: float,
+                                plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """表格结构搜索 - 第一层：在text_embedding向量空间中搜索表格"""
         try:
             logger.info(f"开始第一层：表格语义搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
             logger.info("使用text-embedding-v1模型在text_embedding向量空间中搜索表格")
             
-            # 使用similarity_search方法，获取更多候选结果
-            results = self.vector_db.vector_store_manager.similarity_search(
-                query=query, 
+            # 获取候选结果（启用范围搜索时按绝对余弦阈值召回）
+            results = self._vector_candidates(
+                'table_engine', query,
                 k=100,  # 获取更多候选结果
-                filter_dict={'chunk_type': 'table'},  # 只过滤表格类型
-                fetch_k=200  # 进一步增加fetch_k
+                filter_dict={'chunk_type': 'table', 'vector_type': 'text_embedding'},  # 只扫描表格文本向量分区
+                plan=plan
             )
             logger.info(f"向量搜索返回 {len(results)} 个原始结果")
             
@@ -679,8 +999,8 @@ class RetrievalEngine:
                             if not content and hasattr(result, 'page_content'):
                                 content = result.page_content
                             
-                            # 使用_format_search_result方法格式化结果
-                            formatted_result = self.vector_db._format_search_result(result)
+                            # 创建轻量候选结果（展示字段在最终返回时生成）
+                            formatted_result = self.vector_db.create_candidate(result)
                             # 添加搜索策略信息
                             formatted_result['strategy'] = 'semantic_similarity'
                             formatted_result['layer'] = 1  # 第一层搜索
@@ -700,17 +1020,18 @@ class RetrievalEngine:
             logger.error(f"表格语义搜索失败: {e}")
             return []
     
-    def _table_semantic_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _table_semantic_search(self, query: str, max_results: int, threshold: float,
+                               plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """表格结构搜索 - 第二层：基于表格标题、列名、类型进行结构匹配"""
         try:
             logger.info(f"开始第二层：表格结构搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
             
-            # 先获取所有表格
-            results = self.vector_db.vector_store_manager.similarity_search(
-                query=query, 
+            # 先获取候选表格（启用范围搜索时按绝对余弦阈值召回）
+            results = self._vector_candidates(
+                'table_engine', query,
                 k=200,  # 获取更多候选结果
-                filter_dict={'chunk_type': 'table'},  # 只过滤表格类型
-                fetch_k=400
+                filter_dict={'chunk_type': 'table', 'vector_type': 'text_embedding'},  # 只扫描表格文本向量分区
+                plan=plan
             )
             
             # 基于结构特征计算匹配分数
@@ -720,8 +1041,8 @@ class RetrievalEngine:
                     if (hasattr(result, 'metadata') and 
                         result.metadata.get('chunk_type') == 'table'):
                         
-                        # 先格式化结果
-                        formatted_result = self.vector_db._format_search_result(result)
+                        # 先创建候选结果
+                        formatted_result = self.vector_db.create_candidate(result)
                         
                         # 计算结构匹配分数
                         structure_score = self._calculate_structure_match(query, formatted_result)
@@ -746,11 +1067,18 @@ class RetrievalEngine:
             logger.error(f"表格结构搜索失败: {e}")
             return []
     
-    def _table_keyword_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
-        """表格关键词搜索 - 第三层：使用jieba分词提取关键词，在text_embedding空间搜索"""
+    def _table_keyword_search(self, query: str, max_results: int, threshold: float,
+                              plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
+        """表格关键词搜索 - 第三层：在BM25关键词索引中匹配表格标题、表头和内容（索引不可用时以关键词做向量搜索）"""
         try:
             logger.info(f"开始第三层：表格关键词搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
             
+            candidates = self._keyword_candidates(
+                query, max_results, {'chunk_type': 'table', 'vector_type': 'text_embedding'}, plan
+            )
+            if candidates is not None:
+                return self._format_keyword_candidates(candidates, threshold, 'keyword_match', 3)
+            
             # 提取关键词
             keywords = self._extract_table_keywords(query)
             logger.info(f"提取到关键词: {keywords}")
@@ -759,16 +1087,16 @@ class RetrievalEngine:
                 logger.info("未提取到有效关键词，跳过关键词搜索")
                 return []
             
-            # 对每个关键词进行搜索
+            # 所有关键词一次批量搜索
+            batch_results = self._search_candidates(
+                keywords,
+                50,  # 每个关键词获取50个结果
+                {'chunk_type': 'table', 'vector_type': 'text_embedding'},  # 只扫描表格文本向量分区
+                plan
+            )
             all_results = []
-            for keyword in keywords:
+            for keyword, results in zip(keywords, batch_results):
                 try:
-                    results = self.vector_db.vector_store_manager.similarity_search(
-                        query=keyword, 
-                        k=50,  # 每个关键词获取50个结果
-                        filter_dict={'chunk_type': 'table'},  # 只过滤表格类型
-                        fetch_k=100
-                    )
                     
                     # 处理结果
                     for result in results:
@@ -783,8 +1111,8 @@ class RetrievalEngine:
                                     # 直接使用page_content字段，因为table_content为空
                                     content = getattr(result, 'page_content', '')
                                     
-                                    # 使用_format_search_result方法格式化结果
-                                    formatted_result = self.vector_db._format_search_result(result)
+                                    # 创建轻量候选结果（展示字段在最终返回时生成）
+                                    formatted_result = self.vector_db.create_candidate(result)
                                     # 添加搜索策略信息
                                     formatted_result['strategy'] = 'keyword_match'
                                     formatted_result['layer'] = 3  # 第三层搜索
@@ -809,7 +1137,8 @@ class RetrievalEngine:
             logger.error(f"表格关键词搜索失败: {e}")
             return []
     
-    def _table_expansion_search(self, query: str, max_results: int, threshold: float) -> List[Dict[str, Any]]:
+    def _table_expansion_search(self, query: str, max_results: int, threshold: float,
+                                plan: RetrievalPlan = None) -> List[Dict[str, Any]]:
         """表格扩展搜索 - 第四层：生成扩展查询，在text_embedding空间搜索"""
         try:
             logger.info(f"开始第四层：表格扩展搜索，查询: {query[:50]}...，最大结果: {max_results}，阈值: {threshold}")
@@ -822,16 +1151,16 @@ class RetrievalEngine:
                 logger.info("未生成扩展查询，跳过扩展搜索")
                 return []
             
-            # 对每个扩展查询进行搜索
+            # 所有扩展查询一次批量搜索
+            batch_results = self._search_candidates(
+                expanded_queries,
+                30,  # 每个扩展查询获取30个结果
+                {'chunk_type': 'table', 'vector_type': 'text_embedding'},  # 只扫描表格文本向量分区
+                plan
+            )
             all_results = []
-            for expanded_query in expanded_queries:
+            for expanded_query, results in zip(expanded_queries, batch_results):
                 try:
-                    results = self.vector_db.vector_store_manager.similarity_search(
-                        query=expanded_query, 
-                        k=30,  # 每个扩展查询获取30个结果
-                        filter_dict={'chunk_type': 'table'},  # 只过滤表格类型
-                        fetch_k=60
-                    )
                     
                     # 处理结果
                     for result in results:
@@ -847,8 +1176,8 @@ class RetrievalEngine:
                                     if not content and hasattr(result, 'page_content'):
                                         content = result.page_content
                                     
-                                    # 使用_format_search_result方法格式化结果
-                                    formatted_result = self.vector_db._format_search_result(result)
+                                    # 创建轻量候选结果（展示字段在最终返回时生成）
+                                    formatted_result = self.vector_db.create_candidate(result)
                                     # 添加搜索策略信息
                                     formatted_result['strategy'] = 'expansion_search'
                                     formatted_result['layer'] = 4  # 第四层搜索
@@ -874,34 +1203,122 @@ class RetrievalEngine:
             return []
     
     # 辅助方法
-    def _deduplicate_and_sort(self, results: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
-        """去重和排序"""
-        try:
-            # 基于chunk_id去重
-            seen_ids = set()
-            unique_results = []
-            
-            for result in results:
-                chunk_id = result.get('chunk_id', '')
-                if chunk_id and chunk_id not in seen_ids:
-                    seen_ids.add(chunk_id)
-                    unique_results.append(result)
-                elif not chunk_id:
-                    # 如果没有chunk_id，基于内容去重
-                    content = result.get('content', '')
-                    if content not in seen_ids:
-                        seen_ids.add(content)
-                        unique_results.append(result)
-            
-            # 按相似度排序
-            unique_results.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
-            
-            # 返回前max_results个结果
-            return unique_results[:max_results]
-            
-        except Exception as e:
-            logger.error(f"去重和排序失败: {e}")
-            return results[:max_results]
+    def _vector_candidates(self, engine_name: str, query: str, k: int, filter_dict: Dict[str, Any],
+                           plan: RetrievalPlan = None) -> List[Any]:
+        """
+        获取向量候选结果
+        
+        引擎配置range_search.enabled为true时使用绝对余弦阈值的范围搜索（min_cosine），
+        只返回真正相关的结果，最多k个；否则使用top-k搜索（结果集内归一化分数）。
+        
+        :param engine_name: 引擎配置名（text_engine/image_engine/table_engine）
+        :param query: 查询文本
+        :param k: 候选数量（范围搜索时为上限）
+        :param filter_dict: 过滤条件
+        :param plan: 召回计划（可选）
+        :return: 文档列表
+        """
+        range_config = self.config.get(f'rag_system.engines.{engine_name}.range_search', {})
+        score_threshold = range_config.get('min_cosine', 0.5) if range_config.get('enabled', False) else None
+        return self._search_candidates([query], k, filter_dict, plan, score_threshold)[0]
+    
+    def _search_candidates(self, queries: List[str], k: int, filter_dict: Dict[str, Any],
+                           plan: RetrievalPlan = None, score_threshold: float = None) -> List[List[Any]]:
+        """
+        批量获取向量候选结果
+        
+        提供召回计划时：记录阶段只登记子查询并返回空结果，执行阶段从计划中取回候选结果；
+        否则直接检索向量库。
+        
+        :param queries: 查询文本列表
+        :param k: 每个查询的候选数量（范围搜索时为上限）
+        :param filter_dict: 过滤条件
+        :param plan: 召回计划（可选）
+        :param score_threshold: 范围搜索的余弦相似度阈值（为None时为top-k搜索）
+        :return: 与queries一一对应的文档列表
+        """
+        if plan is not None:
+            if plan.recording:
+                plan.register(queries, k, filter_dict, score_threshold)
+                return [[] for _ in queries]
+            return plan.fetch(queries, k, filter_dict, score_threshold)
+        
+        manager = self.vector_db.vector_store_manager
+        if score_threshold is not None:
+            return [
+                manager.similarity_search_range(
+                    query=query,
+                    score_threshold=score_threshold,
+                    filter_dict=filter_dict,
+                    max_results=k
+                )
+                for query in queries
+            ]
+        if len(queries) == 1:
+            return [manager.similarity_search(query=queries[0], k=k, filter_dict=filter_dict)]
+        return manager.similarity_search_batch(queries=queries, k=k, filter_dict=filter_dict)
+    
+    def _keyword_candidates(self, query: str, k: int, filter_dict: Dict[str, Any],
+                            plan: RetrievalPlan = None) -> Optional[List[Any]]:
+        """
+        关键词层候选结果：BM25关键词索引检索，不调用embedding，也不登记到召回计划
+        
+        :param query: 查询文本
+        :param k: 结果数量
+        :param filter_dict: 过滤条件（须包含chunk_type）
+        :param plan: 召回计划（记录阶段直接返回空结果）
+        :return: 文档列表；关键词索引不可用时返回None
+        """
+        manager = self.vector_db.vector_store_manager
+        keyword_index = getattr(manager, 'keyword_index', None)
+        if keyword_index is None or not keyword_index.enabled or not len(keyword_index):
+            return None
+        if plan is not None and plan.recording:
+            return []
+        return manager.keyword_search(query, k, filter_dict)
+    
+    def _format_keyword_candidates(self, candidates: List[Any], threshold: float,
+                                   strategy: str, layer: int) -> List[Dict[str, Any]]:
+        """
+        将关键词索引命中的文档转换为候选结果，过滤查询词覆盖率低于阈值的结果
+        
+        :param candidates: 文档列表（元数据含similarity_score、bm25_score、matched_terms）
+        :param threshold: 覆盖率阈值
+        :param strategy: 搜索策略名
+        :param layer: 层号
+        :return: 候选结果列表
+        """
+        results = self._format_candidates(candidates, threshold)
+        for result in results:
+            metadata = result.get('metadata') or {}
+            matched_terms = metadata.get('matched_terms', [])
+            result.update({
+                'strategy': strategy,
+                'layer': layer,
+                'keyword': matched_terms[0] if matched_terms else '',
+                'matched_terms': matched_terms,
+                'bm25_score': metadata.get('bm25_score', 0.0)
+            })
+            if metadata.get('vector_type'):
+                result['vector_type'] = metadata['vector_type']
+        return results
+    
+    def _format_candidates(self, candidates: List[Any], threshold: float = None) -> List[Dict[str, Any]]:
+        """
+        将向量候选结果转换为轻量候选结果，过滤相似度低于阈值的结果
+        
+        :param candidates: 文档列表
+        :param threshold: 相似度阈值（为None时不过滤）
+        :return: 候选结果列表
+        """
+        results = []
+        for candidate in candidates:
+            # 没有相似度信息的结果默认包含
+            if (threshold is not None and hasattr(candidate, 'metadata') and
+                    candidate.metadata.get('similarity_score', threshold) < threshold):
+                continue
+            results.append(self.vector_db.create_candidate(candidate))
+        return results
     
     def _extract_text_keywords(self, query: str) -> List[str]:
         """提取文本关键词"""
@@ -918,9 +1335,8 @@ class RetrievalEngine:
     def _extract_image_keywords(self, query: str) -> List[str]:
         """提取图片关键词"""
         try:
-            # 使用jieba分词提取关键词
-            import jieba
-            words = jieba.lcut(query)
+            # 使用共用分词服务提取关键词
+            words = get_tokenizer().lcut(query)
             
             # 过滤掉停用词和短词
             stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
@@ -934,10 +1350,8 @@ class RetrievalEngine:
     def _extract_table_keywords(self, query: str) -> List[str]:
         """提取表格关键词 - 参考图片召回的成功经验"""
         try:
-            import jieba
-            
-            # 1. 使用jieba分词（参考图片召回）
-            words = jieba.lcut(query)
+            # 1. 使用共用分词服务分词（参考图片召回）
+            words = get_tokenizer().lcut(query)
             
             # 2. 过滤停用词和短词（保留表格相关词汇）
             stop_words = {'的', '是', '在', '有', '和', '与', '或', '但', '而', '了', '着', '过', '列', '行'}
@@ -958,100 +1372,25 @@ class RetrievalEngine:
             return query.split()[:3]
     
     def _generate_expanded_queries(self, query: str) -> List[str]:
-        """生成扩展查询"""
-        try:
-            # 简单的查询扩展（实际应该使用同义词词典或LLM）
-            expanded = []
-            # 添加同义词
-            synonyms = {
-                '分析': ['分析', '研究', '探讨', '讨论'],
-                '比较': ['比较', '对比', '对照', '对比分析'],
-                '总结': ['总结', '概括', '归纳', '汇总']
-            }
-            
-            for word, syns in synonyms.items():
-                if word in query:
-                    for syn in syns:
-                        if syn != word:
-                            expanded.append(query.replace(word, syn))
-            
-            return expanded[:3]  # 限制扩展查询数量
+        """生成扩展查询（使用查询扩展词典的text部分）"""
+        try:
+            return self.query_expander.expand(query, 'text')
         except Exception as e:
             logger.error(f"生成扩展查询失败: {e}")
             return []
     
     def _generate_image_expanded_queries(self, query: str) -> List[str]:
-        """生成图片扩展查询"""
-        try:
-            # 图片相关扩展查询
-            expanded = []
-            
-            # 基础的同义词替换
-            if '图片' in query:
-                expanded.append(query.replace('图片', '图像'))
-                expanded.append(query.replace('图片', '照片'))
-            elif '图像' in query:
-                expanded.append(query.replace('图像', '图片'))
-            elif '照片' in query:
-                expanded.append(query.replace('照片', '图片'))
-            
-            # 添加一些通用的扩展查询
-            if '图' in query:
-                # 如果查询包含"图"，添加一些相关的扩展
-                if '示意图' in query:
-                    expanded.append(query.replace('示意图', '图表'))
-                    expanded.append(query.replace('示意图', '流程图'))
-                elif '图表' in query:
-                    expanded.append(query.replace('图表', '示意图'))
-                elif '流程图' in query:
-                    expanded.append(query.replace('流程图', '示意图'))
-            
-            # 添加一些业务相关的扩展
-            if '中芯国际' in query:
-                expanded.append(query.replace('中芯国际', 'SMIC'))
-                expanded.append(query.replace('中芯国际', '中芯'))
-            
-            return expanded[:3]
+        """生成图片扩展查询（使用查询扩展词典的image部分）"""
+        try:
+            return self.query_expander.expand(query, 'image')
         except Exception as e:
             logger.error(f"生成图片扩展查询失败: {e}")
             return []
     
     def _generate_table_expanded_queries(self, query: str) -> List[str]:
-        """生成表格扩展查询 - 参考图片召回的成功经验"""
-        try:
-            expanded = []
-            
-            # 1. 同义词替换
-            synonyms = {
-                '营业收入': ['收入', '营收', '销售额'],
-                '净利润': ['利润', '净利', '盈利'],
-                '基本数据': ['基础数据', '基本信息', '概况'],
-                '财务数据': ['财务信息', '财务指标', '财务情况'],
-                '表格': ['表', '数据表', '统计表'],
-                '数据': ['信息', '指标', '数字']
-            }
-            
-            for original, synonyms_list in synonyms.items():
-                if original in query:
-                    for synonym in synonyms_list:
-                        expanded.append(query.replace(original, synonym))
-            
-            # 2. 业务相关扩展
-            business_terms = {
-                '中芯国际': ['SMIC', '中芯', '半导体'],
-                '业绩': ['财报', '财务', '经营'],
-                '数据': ['指标', '统计', '数字'],
-                '分析': ['研究', '探讨', '评估']
-            }
-            
-            for term, expansions in business_terms.items():
-                if term in query:
-                    for expansion in expansions:
-                        expanded.append(query.replace(term, expansion))
-            
-            # 3. 限制数量并去重
-            return list(set(expanded))[:3]
-            
+        """生成表格扩展查询（使用查询扩展词典的table部分）"""
+        try:
+            return self.query_expander.expand(query, 'table')
         except Exception as e:
             logger.warning(f"扩展查询生成失败: {e}")
             return []
@@ -1133,7 +1472,7 @@ class RetrievalEngine:
     
     def _calculate_fast_text_similarity(self, query: str, content: str) -> float:
         """
-        计算快速文本相似度 - 核心算法2
+        计算快速文本相似度 - 核心算法2（Jaccard相似度与词频余弦相似度的平均值）
         
         :param query: 查询文本
         :param content: 内容文本
@@ -1143,55 +1482,7 @@ class RetrievalEngine:
             if not query or not content:
                 return 0.0
             
-            # 使用jieba分词工具（如果可用）
-            if JIEBA_AVAILABLE:
-                query_words = set(jieba.lcut(query))
-                content_words = set(jieba.lcut(content))
-            else:
-                # 备选方案：基础分词
-                query_words = set(query.lower().split())
-                content_words = set(content.lower().split())
-            
-            if not query_words or not content_words:
-                return 0.0
-            
-            # 计算Jaccard相似度
-            intersection = len(query_words.intersection(content_words))
-            union = len(query_words.union(content_words))
-            
-            if union == 0:
-                return 0.0
-            
-            jaccard_similarity = intersection / union
-            
-            # 计算词频相似度
-            query_freq = {}
-            content_freq = {}
-            
-            for word in query_words:
-                query_freq[word] = query.count(word)
-            
-            for word in content_words:
-                content_freq[word] = content.count(word)
-            
-            # 计算余弦相似度
-            common_words = query_words.intersection(content_words)
-            if not common_words:
-                return jaccard_similarity
-            
-            numerator = sum(query_freq[word] * content_freq[word] for word in common_words)
-            query_norm = sum(query_freq[word] ** 2 for word in query_words) ** 0.5
-            content_norm = sum(content_freq[word] ** 2 for word in content_words) ** 0.5
-            
-            if query_norm == 0 or content_norm == 0:
-                return jaccard_similarity
-            
-            cosine_similarity = numerator / (query_norm * content_norm)
-            
-            # 综合相似度（Jaccard + 余弦）
-            combined_similarity = (jaccard_similarity + cosine_similarity) / 2
-            
-            return max(0.0, min(1.0, combined_similarity))
+            return overlap_similarity(text_token_vector(query), text_token_vector(content))
             
         except Exception as e:
             logger.error(f"计算快速文本相似度失败: {e}")
@@ -1223,55 +1514,17 @@ class RetrievalEngine:
     
     def _calculate_tfidf_similarity(self, query: str, content: str) -> float:
         """
-        基于TF-IDF的相似度计算（备选方案）
+        基于词频向量余弦的相似度计算（备选方案）
         
         :param query: 查询文本
         :param content: 内容文本
         :return: 相似度分数 (0.0-1.0)
         """
         try:
-            # 使用jieba分词工具（如果可用）
-            if JIEBA_AVAILABLE:
-                query_words = jieba.lcut(query)
-                content_words = jieba.lcut(content)
-            else:
-                # 备选方案：基础分词
-                query_words = query.lower().split()
-                content_words = content.lower().split()
-            
-            if not query_words or not content_words:
-                return 0.0
-            
-            # 计算词频
-            query_tf = {}
-            content_tf = {}
-            
-            for word in query_words:
-                query_tf[word] = query_tf.get(word, 0) + 1
-            
-            for word in content_words:
-                content_tf[word] = content_tf.get(word, 0) + 1
-            
-            # 计算TF-IDF向量
-            all_words = set(query_words + content_words)
-            query_vector = []
-            content_vector = []
-            
-            for word in all_words:
-                query_vector.append(query_tf.get(word, 0))
-                content_vector.append(content_tf.get(word, 0))
-            
-            # 计算余弦相似度
-            numerator = sum(a * b for a, b in zip(query_vector, content_vector))
-            query_norm = sum(a ** 2 for a in query_vector) ** 0.5
-            content_norm = sum(b ** 2 for b in content_vector) ** 0.5
-            
-            if query_norm == 0 or content_norm == 0:
+            if not query or not content:
                 return 0.0
             
-            cosine_similarity = numerator / (query_norm * content_norm)
-            
-            return max(0.0, min(1.0, cosine_similarity))
+            return cosine_similarity(text_token_vector(query), text_token_vector(content))
             
         except Exception as e:
             logger.error(f"计算TF-IDF相似度失败: {e}")
@@ -1388,6 +1641,7 @@ class RetrievalEngine:
             'status': 'ready',
             'service_type': 'RAG Retrieval Engine',
             'retrieval_stats': self.retrieval_stats,
+            'result_cache': self._get_cache_stats(),
             'features': [
                 'text_retrieval',
                 'image_retrieval',
@@ -1396,6 +1650,8 @@ class RetrievalEngine:
                 'smart_retrieval',
                 'multi_layer_strategy'
             ],
+            'rank_fusion': self.rank_fusion.get_status(),
+            'query_expansion': self.query_expander.get_status(),
             'strategies': {
                 'text': ['vector_similarity', 'keyword_matching', 'query_expansion'],
                 'image': ['semantic_similarity', 'visual_similarity', 'keyword_matching', 'query_expansion'],
@@ -1407,61 +1663,85 @@ class RetrievalEngine:
                                     image_results: List[Dict], 
                                     table_results: List[Dict], 
                                     query: str, 
-                                    cross_type_boost: float) -> List[Dict]:
+                                    cross_type_boost: float):
         """
-        增强跨类型内容相关性
+        增强跨类型内容相关性：原地写入每个结果的cross_type_score和final_score
+        
+        优先使用入库时预计算的跨模态关联图，每个结果只查找自己的关联分块；关联图不可用时逐对比较。
         
         :param text_results: 文本搜索结果
         :param image_results: 图片搜索结果
         :param table_results: 表格搜索结果
         :param query: 查询文本
         :param cross_type_boost: 跨类型提升系数
-        :return: 增强后的结果列表
         """
         try:
-            enhanced_results = []
-            
-            # 1. 处理文本结果
-            for result in text_results:
-                if result is None:
-                    continue
-                enhanced_result = result.copy()
-                enhanced_result['cross_type_score'] = self._calculate_cross_type_relevance(
-                    result, image_results + table_results, query
-                )
-                enhanced_result['final_score'] = result.get('similarity_score', 0.0) + \
-                                               enhanced_result['cross_type_score'] * cross_type_boost
-                enhanced_results.append(enhanced_result)
-            
-            # 2. 处理图片结果
-            for result in image_results:
-                if result is None:
-                    continue
-                enhanced_result = result.copy()
-                enhanced_result['cross_type_score'] = self._calculate_cross_type_relevance(
-                    result, text_results + table_results, query
-                )
-                enhanced_result['final_score'] = result.get('similarity_score', 0.0) + \
-                                               enhanced_result['cross_type_score'] * cross_type_boost
-                enhanced_results.append(enhanced_result)
-            
-            # 3. 处理表格结果
-            for result in table_results:
-                if result is None:
-                    continue
-                enhanced_result = result.copy()
-                enhanced_result['cross_type_score'] = self._calculate_cross_type_relevance(
-                    result, text_results + image_results, query
-                )
-                enhanced_result['final_score'] = result.get('similarity_score', 0.0) + \
-                                               enhanced_result['cross_type_score'] * cross_type_boost
-                enhanced_results.append(enhanced_result)
-            
-            return enhanced_results
+            graph_scores = self._association_cross_type_scores(
+                text_results + image_results + table_results, query
+            )
+            for results, other_results in (
+                (text_results, image_results + table_results),
+                (image_results, text_results + table_results),
+                (table_results, text_results + image_results)
+            ):
+                for result in results:
+                    if result is None:
+                        continue
+                    if graph_scores is not None:
+                        result['cross_type_score'] = graph_scores.get(id(result), 0.0)
+                    else:
+                        result['cross_type_score'] = self._calculate_cross_type_relevance(
+                            result, other_results, query
+                        )
+                    result['final_score'] = result.get('similarity_score', 0.0) + \
+                                            result['cross_type_score'] * cross_type_boost
             
         except Exception as e:
             logger.error(f"增强跨类型相关性失败: {e}")
-            return text_results + image_results + table_results
+            # 未完成增强的结果按原始相似度参与融合
+            for result in text_results + image_results + table_results:
+                if result is not None and 'final_score' not in result:
+                    result['final_score'] = result.get('similarity_score', 0.0)
+    
+    def _association_cross_type_scores(self, results: List[Dict], query: str) -> Optional[Dict[int, float]]:
+        """
+        基于跨模态关联图计算跨类型相关性分数
+        
+        每个结果只与本次结果中出现的关联分块比较：分数为关联权重(0.6)与两者查询相关性平均值(0.4)
+        加权和的最大值，没有关联分块的结果为0。
+        
+        :param results: 全部类型的结果
+        :param query: 查询文本
+        :return: {id(结果): 跨类型相关性分数}；关联图不可用时返回None
+        """
+        manager = getattr(self.vector_db, 'vector_store_manager', None)
+        graph = getattr(manager, 'association_graph', None)
+        if graph is None or not graph.enabled or not len(graph):
+            return None
+        
+        nodes: Dict[str, List[Dict]] = {}
+        for result in results:
+            if result is not None:
+                key = association_key(result.get('metadata') or {}, result.get('chunk_id', ''))
+                nodes.setdefault(key, []).append(result)
+        
+        relevance: Dict[int, float] = {}
+        def query_relevance(result: Dict) -> float:
+            if id(result) not in relevance:
+                relevance[id(result)] = self._calculate_query_relevance(query, result)
+            return relevance[id(result)]
+        
+        scores: Dict[int, float] = {}
+        for key, node_results in nodes.items():
+            neighbors = manager.get_associations(key)
+            for result in node_results:
+                best = 0.0
+                for neighbor, weight in neighbors.items():
+                    for other in nodes.get(neighbor, ()):
+                        score = weight * 0.6 + (query_relevance(result) + query_relevance(other)) / 2 * 0.4
+                        best = max(best, score)
+                scores[id(result)] = best
+        return scores
     
     def _calculate_cross_type_relevance(self, current_result: Dict, 
                                       other_results: List[Dict], 
@@ -1479,18 +1759,11 @@ class RetrievalEngine:
                 return 0.0
             
             cross_type_scores = []
-            current_content = current_result.get('content', '')
-            current_metadata = current_result.get('metadata', {})
             
             for other_result in other_results:
-
-                other_content = other_result.get('content', '')
-                other_metadata = other_result.get('metadata', {})
                 
                 # 计算内容相似度
-                content_similarity = self._calculate_cross_content_similarity(
-                    current_content, other_content, current_metadata, other_metadata
-                )
+                content_similarity = self._calculate_cross_content_similarity(current_result, other_result)
                 
                 # 计算查询相关性
                 query_relevance = self._calculate_query_relevance_for_cross_type(
@@ -1508,28 +1781,29 @@ class RetrievalEngine:
             logger.error(f"计算跨类型相关性失败: {e}")
             return 0.0
     
-    def _calculate_cross_content_similarity(self, content1: str, content2: str, 
-                                          metadata1: Dict, metadata2: Dict) -> float:
+    def _calculate_cross_content_similarity(self, result1: Dict, result2: Dict) -> float:
         """
-        计算跨类型内容相似度
+        计算跨类型内容相似度（使用分块入库时预计算的词项向量和关键词）
         
-        :param content1: 内容1
-        :param content2: 内容2
-        :param metadata1: 元数据1
-        :param metadata2: 元数据2
+        :param result1: 结果1
+        :param result2: 结果2
         :return: 相似度分数
         """
         try:
             # 1. 文本内容相似度
-            text_similarity = self._calculate_text_similarity(content1, content2)
+            text_similarity = overlap_similarity(
+                self._result_tokens(result1), self._result_tokens(result2)
+            )
             
             # 2. 元数据相似度
-            metadata_similarity = self._calculate_metadata_similarity(metadata1, metadata2)
+            metadata_similarity = self._calculate_metadata_similarity(
+                result1.get('metadata', {}), result2.get('metadata', {})
+            )
             
             # 3. 关键词相似度
-            keywords1 = self._extract_keywords_from_content(content1)
-            keywords2 = self._extract_keywords_from_content(content2)
-            keyword_similarity = self._calculate_keyword_set_similarity(keywords1, keywords2)
+            keyword_similarity = jaccard_similarity(
+                self._result_tokens(result1, 'keywords'), self._result_tokens(result2, 'keywords')
+            )
             
             # 加权计算
             final_similarity = (
@@ -1607,58 +1881,25 @@ class RetrievalEngine:
             logger.error(f"计算列表相似度失败: {e}")
             return 0.0
     
-    def _extract_keywords_from_content(self, content: str) -> List[str]:
+    def _result_tokens(self, result: Dict, field: str = 'content') -> TokenVector:
         """
-        从内容中提取关键词
+        获取结果的词项向量：优先使用分块入库时预计算的词项向量，没有时对结果文本分词（按文本缓存）
         
-        :param content: 内容文本
-        :return: 关键词列表
-        """
-        try:
-            if JIEBA_AVAILABLE:
-                # 使用jieba提取关键词
-                keywords = jieba.analyse.extract_tags(content, topK=20)
-                return keywords
-            else:
-                # 基础分词
-                words = content.split()
-                # 过滤短词和常见词
-                stop_words = {'的', '是', '在', '有', '和', '与', '或', '但', '而', '了', '着', '过'}
-                keywords = [word for word in words if len(word) > 1 and word not in stop_words]
-                return keywords[:20]
-                
-        except Exception as e:
-            logger.error(f"提取关键词失败: {e}")
-            return []
-    
-    def _calculate_keyword_set_similarity(self, keywords1: List[str], keywords2: List[str]) -> float:
-        """
-        计算关键词集合相似度
-        
-        :param keywords1: 关键词集合1
-        :param keywords2: 关键词集合2
-        :return: 相似度分数
-        """
-        try:
-            if not keywords1 or not keywords2:
-                return 0.0
-            
-            # 转换为集合
-            set1 = set(keywords1)
-            set2 = set(keywords2)
-            
-            # 计算Jaccard相似度
-            intersection = len(set1.intersection(set2))
-            union = len(set1.union(set2))
-            
-            if union == 0:
-                return 0.0
-            
-            return intersection / union
-            
-        except Exception as e:
-            logger.error(f"计算关键词集合相似度失败: {e}")
-            return 0.0
+        :param result: 结果
+        :param field: 字段（content：内容，title：表格标题，keywords：内容关键词）
+        :return: 词项向量
+        """
+        chunk_id = result.get('chunk_id')
+        if chunk_id:
+            manager = getattr(self.vector_db, 'vector_store_manager', None)
+            vector = manager.get_chunk_tokens(chunk_id, field) if hasattr(manager, 'get_chunk_tokens') else None
+            if vector is not None:
+                return vector
+        if field == 'title':
+            return text_token_vector(result.get('table_title') or '')
+        if field == 'keywords':
+            return text_keyword_vector(result.get('content') or '')
+        return text_token_vector(result.get('content') or '')
     
     def _calculate_query_relevance_for_cross_type(self, query: str, 
                                                 result1: Dict, 
@@ -1692,154 +1933,72 @@ class RetrievalEngine:
         :return: 相关性分数
         """
         try:
-            content = result.get('content', '')
-            if not content:
+            if not query or not result.get('content', ''):
                 return 0.0
             
-            # 使用文本相似度计算
-            return self._calculate_text_similarity(query, content)
+            # 使用文本相似度计算（结果一侧使用预计算的词项向量）
+            return overlap_similarity(text_token_vector(query), self._result_tokens(result))
             
         except Exception as e:
             logger.error(f"计算查询相关性失败: {e}")
             return 0.0
     
-    def _fuse_hybrid_results(self, enhanced_results: List[Dict], 
-                            query: str, 
+    def _fuse_hybrid_results(self, type_results: Dict[str, List[Dict]], 
+                            fusion_weights: Dict[str, float], 
                             max_results: int) -> List[Dict]:
         """
-        智能融合混合搜索结果
+        融合各内容类型的结果：按chunk_id去重，取前max_results个
         
-        :param enhanced_results: 增强后的结果列表
-        :param query: 查询文本
+        按含跨类型提升的final_score排序和融合（rrf方式先把各类型结果按final_score重新排序）。
+        
+        :param type_results: {内容类型: 结果列表}
+        :param fusion_weights: {内容类型: 融合权重}（未配置的类型为1.0）
         :param max_results: 最大结果数量
         :return: 融合后的结果列表
         """
         try:
-            if not enhanced_results:
-                return []
-            
-            # 1. 按最终分数排序
-            sorted_results = sorted(enhanced_results, 
-                                  key=lambda x: x.get('final_score', 0.0), 
-                                  reverse=True)
-            
-            # 2. 应用多样性策略
-            diverse_results = self._apply_diversity_strategy(sorted_results, max_results)
-            
-            # 3. 应用内容类型平衡策略
-            balanced_results = self._apply_content_type_balance(diverse_results, max_results)
-            
-            return balanced_results
+            content_types = list(type_results)
+            ranked_lists = [
+                sorted((result for result in type_results[content_type] if result is not None),
+                       key=lambda result: result.get('final_score') or 0.0, reverse=True)
+                for content_type in content_types
+            ]
+            return self.rank_fusion.fuse(
+                ranked_lists, max_results,
+                weights=[float(fusion_weights.get(content_type, 1.0)) for content_type in content_types],
+                score_key='final_score'
+            )
             
         except Exception as e:
             logger.error(f"融合混合搜索结果失败: {e}")
-            return enhanced_results[:max_results]
-    
-    def _apply_diversity_strategy(self, results: List[Dict], max_results: int) -> List[Dict]:
-        """
-        应用多样性策略
-        
-        :param results: 结果列表
-        :param max_results: 最大结果数量
-        :return: 多样性结果列表
-        """
-        try:
-            if len(results) <= max_results:
-                return results
-            
-            diverse_results = []
-            seen_content_types = set()
-            seen_keywords = set()
-            
-            for result in results:
-                if len(diverse_results) >= max_results:
-                    break
-                
-                content_type = result.get('content_type', 'unknown')
-                content = result.get('content', '')
-                
-                # 检查内容类型多样性
-                if content_type not in seen_content_types:
-                    diverse_results.append(result)
-                    seen_content_types.add(content_type)
-                    continue
-                
-                # 检查关键词多样性
-                keywords = self._extract_keywords_from_content(content)
-                new_keywords = [kw for kw in keywords if kw not in seen_keywords]
-                
-                if new_keywords:
-                    diverse_results.append(result)
-                    seen_keywords.update(new_keywords)
-                    continue
-                
-                # 如果都没有新的多样性，检查分数
-                if len(diverse_results) < max_results * 0.8:  # 保留20%给高分结果
-                    diverse_results.append(result)
-            
-            return diverse_results
-            
-        except Exception as e:
-            logger.error(f"应用多样性策略失败: {e}")
+            results = []
+            for content_type_results in type_results.values():
+                results.extend(content_type_results)
             return results[:max_results]
     
-    def _apply_content_type_balance(self, results: List[Dict], max_results: int) -> List[Dict]:
+    def _diversify_results(self, diversifier: MMRDiversifier, results: List[Dict],
+                           max_results: int) -> List[Dict]:
         """
-        应用内容类型平衡策略
+        使用分块向量对融合结果做MMR多样化（相关性使用含跨类型提升的final_score）
         
-        :param results: 结果列表
+        :param diversifier: MMR多样化实例
+        :param results: 融合后的候选结果（按分数降序）
         :param max_results: 最大结果数量
-        :return: 平衡后的结果列表
+        :return: 多样化后的结果列表
         """
         try:
-            if len(results) <= max_results:
-                return results
-            
-            # 统计各类型数量
-            type_counts = {}
-            for result in results:
-                content_type = result.get('content_type', 'unknown')
-                type_counts[content_type] = type_counts.get(content_type, 0) + 1
-            
-            # 计算理想分布
-            total_results = len(results)
-            ideal_distribution = {
-                'text': int(max_results * 0.4),
-                'image': int(max_results * 0.3),
-                'table': int(max_results * 0.3)
-            }
-            
-            # 重新平衡结果
-            balanced_results = []
-            type_used = {k: 0 for k in ideal_distribution.keys()}
-            
-            for result in results:
-                if len(balanced_results) >= max_results:
-                    break
-                
-                content_type = result.get('content_type', 'unknown')
-                if content_type in ideal_distribution:
-                    if type_used[content_type] < ideal_distribution[content_type]:
-                        balanced_results.append(result)
-                        type_used[content_type] += 1
-                        continue
-                
-                # 如果某个类型已满，检查其他类型
-                for other_type, limit in ideal_distribution.items():
-                    if type_used[other_type] < limit:
-                        balanced_results.append(result)
-                        type_used[other_type] += 1
-                        break
-            
-            return balanced_results
+            manager = getattr(self.vector_db, 'vector_store_manager', None)
+            if not hasattr(manager, 'get_embedding'):
+                return results[:max_results]
+            return diversifier.diversify(results, max_results, manager.get_embedding, score_key='final_score')
             
         except Exception as e:
-            logger.error(f"应用内容类型平衡策略失败: {e}")
+            logger.error(f"MMR多样化失败: {e}")
             return results[:max_results]
     
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
         """
-        计算两个文本的相似度
+        计算两个文本的相似度（Jaccard相似度与词频余弦相似度的平均值，分词结果按文本缓存）
         
         :param text1: 文本1
         :param text2: 文本2
@@ -1849,55 +2008,7 @@ class RetrievalEngine:
             if not text1 or not text2:
                 return 0.0
             
-            # 使用jieba分词工具（如果可用）
-            if JIEBA_AVAILABLE:
-                words1 = set(jieba.lcut(text1))
-                words2 = set(jieba.lcut(text2))
-            else:
-                # 备选方案：基础分词
-                words1 = set(text1.lower().split())
-                words2 = set(text2.lower().split())
-            
-            if not words1 or not words2:
-                return 0.0
-            
-            # 计算Jaccard相似度
-            intersection = len(words1.intersection(words2))
-            union = len(words1.union(words2))
-            
-            if union == 0:
-                return 0.0
-            
-            jaccard_similarity = intersection / union
-            
-            # 计算词频相似度
-            freq1 = {}
-            freq2 = {}
-            
-            for word in words1:
-                freq1[word] = text1.count(word)
-            
-            for word in words2:
-                freq2[word] = text2.count(word)
-            
-            # 计算余弦相似度
-            common_words = words1.intersection(words2)
-            if not common_words:
-                return jaccard_similarity
-            
-            numerator = sum(freq1[word] * freq2[word] for word in common_words)
-            norm1 = sum(freq1[word] ** 2 for word in words1) ** 0.5
-            norm2 = sum(freq2[word] ** 2 for word in words2) ** 0.5
-            
-            if norm1 == 0 or norm2 == 0:
-                return jaccard_similarity
-            
-            cosine_similarity = numerator / (norm1 * norm2)
-            
-            # 综合相似度（Jaccard + 余弦）
-            combined_similarity = (jaccard_similarity + cosine_similarity) / 2
-            
-            return max(0.0, min(1.0, combined_similarity))
+            return overlap_similarity(text_token_vector(text1), text_token_vector(text2))
             
         except Exception as e:
             logger.error(f"计算文本相似度失败: {e}")
@@ -2013,44 +2124,29 @@ class RetrievalEngine:
             return [[] for _ in queries]
     
     def _get_table_specific_keywords(self, query: str) -> List[str]:
-        """获取表格相关的专业词汇"""
+        """获取表格相关的专业词汇（使用查询扩展词典table部分的keyword_groups）"""
         try:
-            table_keywords = []
-            
-            # 财务相关词汇
-            if any(word in query for word in ['财务', '收入', '利润', '业绩']):
-                table_keywords.extend(['财务', '收入', '利润', '业绩', '财报'])
-            
-            # 数据相关词汇
-            if any(word in query for word in ['数据', '统计', '指标']):
-                table_keywords.extend(['数据', '统计', '指标', '数字'])
-            
-            # 公司相关词汇
-            if any(word in query for word in ['中芯国际', 'SMIC', '中芯']):
-                table_keywords.extend(['中芯国际', 'SMIC', '中芯', '半导体'])
-            
-            return table_keywords
+            return self.query_expander.keywords(query, 'table')
         except Exception as e:
             logger.warning(f"获取表格专业词汇失败: {e}")
             return []
     
     def _calculate_structure_match(self, query: str, result: Dict) -> float:
-        """计算表格结构匹配分数 - 基于实际可用字段调整权重"""
+        """计算表格结构匹配分数 - 基于实际可用字段调整权重（使用分块入库时预计算的词项向量）"""
         try:
             total_score = 0.0
             weight_sum = 0.0
+            query_tokens = text_token_vector(query)
             
             # 1. 表格内容匹配（权重50%）- 从content字段获取
-            content = result.get('content', '')
-            if content:
-                content_score = self._calculate_content_similarity(query, content)
+            if result.get('content', ''):
+                content_score = overlap_similarity(query_tokens, self._result_tokens(result))
                 total_score += content_score * 0.5
                 weight_sum += 0.5
             
             # 2. 表格标题匹配（权重30%）- 从table_title字段获取
-            table_title = result.get('table_title', '')
-            if table_title:
-                title_score = self._calculate_title_similarity(query, table_title)
+            if result.get('table_title', ''):
+                title_score = overlap_similarity(query_tokens, self._result_tokens(result, 'title'))
                 total_score += title_score * 0.3
                 weight_sum += 0.3
             
@@ -2088,17 +2184,12 @@ class RetrievalEngine:
             if not headers:
                 return 0.0
             
-            query_words = set(query.lower().split())
+            query_tokens = text_token_vector(query)
             total_score = 0.0
             
             for header in headers:
                 if header:
-                    header_words = set(header.lower().split())
-                    if query_words and header_words:
-                        intersection = len(query_words & header_words)
-                        union = len(query_words | header_words)
-                        if union > 0:
-                            total_score += intersection / union
+                    total_score += jaccard_similarity(query_tokens, text_token_vector(header))
             
             return total_score / len(headers) if headers else 0.0
         except Exception as e:
@@ -2248,150 +2339,97 @@ class RetrievalEngine:
     def retrieve_with_cache(self, query: str, max_results: int = 25, 
                            use_cache: bool = True) -> List[Dict[str, Any]]:
         """
-        带缓存的召回 - 性能优化版本
+        带缓存的混合召回
         
         :param query: 查询文本
         :param max_results: 最大结果数量
         :param use_cache: 是否使用缓存
         :return: 召回结果列表
         """
-        start_time = time.time()
-        try:
-            if not use_cache:
-                return self.retrieve_hybrid(query, max_results)
-            
-            # 获取缓存配置
-            cache_config = self.config.get('rag_system.performance.caching', {})
-            cache_ttl = cache_config.get('cache_ttl', 3600)  # 1小时
-            max_cache_size = cache_config.get('max_cache_size', 1000)
-            
-            # 生成缓存键
-            cache_key = self._generate_cache_key(query, max_results)
-            
-            # 检查缓存
-            cached_result = self._get_cached_result(cache_key)
-            if cached_result is not None:
-                logger.info(f"缓存命中: {query}")
-                return cached_result
-            
-            # 执行召回
-            results = self.retrieve_hybrid(query, max_results)
-            
-            # 缓存结果
-            self._cache_result(cache_key, results, cache_ttl, max_cache_size)
-            
-            # 更新统计信息
-            self._update_stats(len(results), time.time() - start_time)
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"缓存召回失败: {e}")
-            return self.retrieve_hybrid(query, max_results)
+        if not use_cache:
+            return self._retrieve_hybrid(query, max_results)
+        return self.retrieve_hybrid(query, max_results)
     
-    def _generate_cache_key(self, query: str, max_results: int) -> str:
+    @property
+    def result_cache(self) -> Optional[RetrievalResultCache]:
+        """召回结果缓存（由向量数据库集成管理器持有，同一向量库的召回引擎共用）"""
+        return getattr(self.vector_db, 'result_cache', None)
+    
+    def _cache_lookup(self, entry_point: str, query: str, params: Dict[str, Any]) -> Tuple[Optional[str], Any, Any]:
         """
-        生成缓存键
+        查询召回结果缓存
         
+        :param entry_point: 召回入口名
         :param query: 查询文本
-        :param max_results: 最大结果数量
-        :return: 缓存键
+        :param params: 召回参数
+        :return: (缓存键, 向量库版本, 缓存结果)；缓存未启用时键为None，未命中时结果为MISS
         """
+        cache = self.result_cache
+        if cache is None:
+            return None, None, MISS
         try:
-            import hashlib
-            # 生成查询的哈希值
-            query_hash = hashlib.md5(query.encode('utf-8')).hexdigest()
-            return f"retrieval_{query_hash}_{max_results}"
+            version = getattr(self.vector_db.vector_store_manager, 'version', None)
+            key = cache.make_key(entry_point, query, params, cache.config_fingerprint(self.config))
+            cached = cache.get(key, version)
+            if cached is not MISS:
+                logger.info(f"召回结果缓存命中: {query[:50]}...")
+            return key, version, cached
         except Exception as e:
-            logger.error(f"生成缓存键失败: {e}")
-            return f"retrieval_{query}_{max_results}"
+            logger.warning(f"查询召回结果缓存失败: {e}")
+            return None, None, MISS
     
-    def _get_cached_result(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    def _cache_store(self, key: Optional[str], version: Any, results: Any):
         """
-        获取缓存结果
+        写入召回结果缓存（空结果可能来自召回失败，不缓存）
         
-        :param cache_key: 缓存键
-        :return: 缓存的结果或None
+        :param key: 缓存键（为None时不缓存）
+        :param version: 开始召回时的向量库版本
+        :param results: 召回结果
         """
+        if key is None or not results:
+            return
+        if isinstance(results, dict) and not any(results.values()):
+            return
         try:
-            if not hasattr(self, '_cache'):
-                self._cache = {}
-            
-            if cache_key in self._cache:
-                cache_entry = self._cache[cache_key]
-                # 检查是否过期
-                if time.time() < cache_entry['expires_at']:
-                    return cache_entry['data']
-                else:
-                    # 删除过期缓存
-                    del self._cache[cache_key]
-            
-            return None
-            
+            self.result_cache.put(key, results, version)
         except Exception as e:
-            logger.error(f"获取缓存结果失败: {e}")
-            return None
+            logger.warning(f"写入召回结果缓存失败: {e}")
     
-    def _cache_result(self, cache_key: str, data: List[Dict[str, Any]], 
-                     ttl: int, max_size: int):
+    def _cached_call(self, entry_point: str, query: str, params: Dict[str, Any],
+                     compute: Callable[[], Any]) -> Any:
         """
-        缓存结果
+        经过召回结果缓存执行召回
         
-        :param cache_key: 缓存键
-        :param data: 要缓存的数据
-        :param ttl: 生存时间（秒）
-        :param max_size: 最大缓存大小
+        :param entry_point: 召回入口名
+        :param query: 查询文本
+        :param params: 召回参数
+        :param compute: 未命中时执行的召回函数
+        :return: 召回结果
         """
-        try:
-            if not hasattr(self, '_cache'):
-                self._cache = {}
-            
-            # 检查缓存大小
-            if len(self._cache) >= max_size:
-                # 清理最旧的缓存
-                self._cleanup_cache()
-            
-            # 添加新缓存
-            self._cache[cache_key] = {
-                'data': data,
-                'expires_at': time.time() + ttl,
-                'created_at': time.time()
-            }
-            
-        except Exception as e:
-            logger.error(f"缓存结果失败: {e}")
+        key, version, cached = self._cache_lookup(entry_point, query, params)
+        if cached is not MISS:
+            return cached
+        results = compute()
+        self._cache_store(key, version, results)
+        return results
     
-    def _cleanup_cache(self):
-        """清理过期和旧的缓存"""
-        try:
-            if not hasattr(self, '_cache'):
-                return
-            
-            current_time = time.time()
-            
-            # 删除过期缓存
-            expired_keys = [
-                key for key, entry in self._cache.items()
-                if current_time >= entry['expires_at']
-            ]
-            
-            for key in expired_keys:
-                del self._cache[key]
-            
-            # 如果仍然超过最大大小，删除最旧的缓存
-            if len(self._cache) > 1000:  # 硬限制
-                sorted_cache = sorted(
-                    self._cache.items(),
-                    key=lambda x: x[1]['created_at']
-                )
-                
-                # 删除最旧的20%
-                to_delete = int(len(sorted_cache) * 0.2)
-                for key, _ in sorted_cache[:to_delete]:
-                    del self._cache[key]
-                    
-        except Exception as e:
-            logger.error(f"清理缓存失败: {e}")
+    async def _acached_call(self, entry_point: str, query: str, params: Dict[str, Any],
+                            compute: Callable[[], Any]) -> Any:
+        """
+        经过召回结果缓存执行异步召回
+        
+        :param entry_point: 召回入口名
+        :param query: 查询文本
+        :param params: 召回参数
+        :param compute: 未命中时执行的召回函数（返回协程）
+        :return: 召回结果
+        """
+        key, version, cached = self._cache_lookup(entry_point, query, params)
+        if cached is not MISS:
+            return cached
+        results = await compute()
+        self._cache_store(key, version, results)
+        return results
     
     def warm_up_cache(self, common_queries: List[str], max_results: int = 25):
         """
@@ -2433,17 +2471,15 @@ class RetrievalEngine:
             return {}
     
     def _get_cache_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
+        """获取召回结果缓存统计信息"""
         try:
-            if not hasattr(self, '_cache'):
-                return {'cache_size': 0, 'hit_rate': 0.0}
+            cache = self.result_cache
+            if cache is None:
+                return {'enabled': False, 'cache_size': 0, 'hit_rate': 0.0}
             
-            cache_size = len(self._cache)
-            # 这里可以添加更详细的缓存统计
-            return {
-                'cache_size': cache_size,
-                'hit_rate': 0.0  # 可以扩展为实际的命中率统计
-            }
+            status = cache.get_status()
+            status.update({'enabled': True, 'cache_size': status['entries']})
+            return status
             
         except Exception as e:
             logger.error(f"获取缓存统计失败: {e}")
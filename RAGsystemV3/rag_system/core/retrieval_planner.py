@@ -0,0 +1,148 @@
+"""
+召回计划模块
+
+一次召回请求中，各模态、各层（原始查询、关键词、扩展查询）会发出大量相同或近似相同的子查询。
+召回计划先收集请求将要发出的全部子查询，按（规范化文本, 过滤条件, 搜索方式）去重，
+每个唯一文本只向量化一次，每组过滤条件只检索一次（k取所有使用方所需的最大值），
+再按各层的k切分候选结果交回各层评分。
+"""
+
+import copy
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+from db_system.core.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalPlan:
+    """
+    召回计划
+
+    使用方式：
+    1. 记录阶段（recording=True）：各层调用register登记子查询，得到空结果
+    2. execute：统一向量化和检索
+    3. 执行阶段：各层以相同参数调用fetch取回候选结果
+    """
+
+    def __init__(self):
+        """初始化召回计划"""
+        self.recording = True
+        # (规范化文本, 过滤条件键, 范围搜索阈值) -> 所需的最大结果数
+        self._requests: Dict[Tuple[str, tuple, Optional[float]], int] = {}
+        self._filters: Dict[tuple, Dict[str, Any]] = {}
+        # top-k搜索保存原始分数，取回时按各层的k重新归一化；范围搜索保存带绝对分数的文档
+        self._scored_results: Dict[Tuple[str, tuple, Optional[float]], List[Tuple[Any, float]]] = {}
+        self._range_results: Dict[Tuple[str, tuple, Optional[float]], List[Any]] = {}
+        self._manager = None
+        self.stats = {
+            'requested_subqueries': 0,
+            'unique_subqueries': 0,
+            'embedded_texts': 0,
+            'search_calls': 0
+        }
+
+    @staticmethod
+    def _filter_key(filter_dict: Dict[str, Any] = None) -> tuple:
+        """过滤条件转换为可哈希的键"""
+        return tuple(sorted((filter_dict or {}).items()))
+
+    def _key(self, text: str, filter_dict: Dict[str, Any], score_threshold: Optional[float]) -> Tuple[str, tuple, Optional[float]]:
+        """子查询键"""
+        return (normalize_text(text), self._filter_key(filter_dict), score_threshold)
+
+    def register(self, queries: List[str], k: int, filter_dict: Dict[str, Any] = None,
+                 score_threshold: float = None):
+        """
+        登记子查询
+
+        :param queries: 查询文本列表
+        :param k: 每个查询需要的结果数量（范围搜索时为上限）
+        :param filter_dict: 过滤条件
+        :param score_threshold: 范围搜索的余弦相似度阈值（为None时为top-k搜索）
+        """
+        self._filters[self._filter_key(filter_dict)] = dict(filter_dict or {})
+        for query in queries:
+            if not normalize_text(query):
+                continue
+            key = self._key(query, filter_dict, score_threshold)
+            self._requests[key] = max(self._requests.get(key, 0), int(k))
+            self.stats['requested_subqueries'] += 1
+
+    def execute(self, manager: Any) -> bool:
+        """
+        执行计划：每个唯一文本向量化一次，每组（过滤条件, 搜索方式）检索一次
+
+        :param manager: 向量存储管理器（LangChainVectorStoreManager）
+        :return: 是否执行成功（向量化失败时返回False）
+        """
+        self._manager = manager
+        self.recording = False
+        self.stats['unique_subqueries'] = len(self._requests)
+        if not self._requests:
+            return True
+
+        try:
+            texts = sorted({key[0] for key in self._requests})
+            vectors = dict(zip(texts, manager.embed_queries(texts)))
+            self.stats['embedded_texts'] = len(texts)
+        except Exception as e:
+            logger.error(f"召回计划向量化失败: {e}")
+            return False
+
+        # 按（过滤条件, 范围搜索阈值）分组
+        groups: Dict[Tuple[tuple, Optional[float]], List[Tuple[str, int]]] = {}
+        for (text, filter_key, score_threshold), k in self._requests.items():
+            groups.setdefault((filter_key, score_threshold), []).append((text, k))
+
+        for (filter_key, score_threshold), entries in groups.items():
+            filter_dict = self._filters.get(filter_key) or None
+            try:
+                if score_threshold is None:
+                    # 同组的所有文本一次批量检索，k取组内最大值
+                    k = max(k for _, k in entries)
+                    batch = manager.similarity_search_with_score_by_vectors(
+                        [vectors[text] for text, _ in entries], k, filter_dict
+                    )
+                    self.stats['search_calls'] += 1
+                    for (text, _), results in zip(entries, batch):
+                        self._scored_results[(text, filter_key, None)] = results
+                else:
+                    for text, k in entries:
+                        self._range_results[(text, filter_key, score_threshold)] = manager.similarity_search_range_by_vector(
+                            vectors[text], score_threshold, filter_dict, max_results=k
+                        )
+                        self.stats['search_calls'] += 1
+            except Exception as e:
+                logger.error(f"召回计划检索失败: {e}")
+
+        logger.info(f"召回计划执行完成，子查询: {self.stats['requested_subqueries']}，"
+                    f"去重后: {self.stats['unique_subqueries']}，检索调用: {self.stats['search_calls']}")
+        return True
+
+    def fetch(self, queries: List[str], k: int, filter_dict: Dict[str, Any] = None,
+              score_threshold: float = None) -> List[List[Any]]:
+        """
+        取回子查询的候选结果（与单独执行对应k的搜索结果一致）
+
+        :param queries: 查询文本列表
+        :param k: 每个查询需要的结果数量（范围搜索时为上限）
+        :param filter_dict: 过滤条件
+        :param score_threshold: 范围搜索的余弦相似度阈值（为None时为top-k搜索）
+        :return: 与queries一一对应的文档列表（文档为副本，similarity_score互不覆盖）
+        """
+        batch_results = []
+        for query in queries:
+            key = self._key(query, filter_dict, score_threshold)
+            if score_threshold is None:
+                scored = self._scored_results.get(key, [])[:k]
+                batch_results.append(self._manager.attach_similarity_scores(scored, copy_docs=True) if scored else [])
+            else:
+                docs = []
+                for doc in self._range_results.get(key, [])[:k]:
+                    doc = copy.copy(doc)
+                    doc.metadata = dict(doc.metadata)
+                    docs.append(doc)
+                batch_results.append(docs)
+        return batch_results
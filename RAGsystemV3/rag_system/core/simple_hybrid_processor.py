@@ -8,8 +8,11 @@ RAG系统的混合查询处理器，负责混合查询类型的内容检索和
 import logging
 import time
 from typing import Dict, List, Optional, Any
-import asyncio
 
+from db_system.core.near_duplicate import (
+    MinHashLSH, decode_signature, text_minhash,
+    MINHASH_METADATA_KEY, DEFAULT_DUPLICATE_THRESHOLD
+)
 from .config_integration import ConfigIntegration
 from .unified_services import UnifiedServices
 from .common_models import QueryOptions, QueryResult
@@ -45,6 +48,8 @@ class SimpleHybridProcessor:
                 'image': 0.3,
                 'table': 0.3
             })
+            # 近重复判定阈值（MinHash估计的Jaccard相似度）
+            self.dedup_threshold = self.hybrid_config.get('dedup_threshold', DEFAULT_DUPLICATE_THRESHOLD)
             
             logger.info("混合查询处理器初始化完成")
             
@@ -71,25 +76,19 @@ class SimpleHybridProcessor:
             result = QueryResult()
             result.query_type = 'hybrid'
             
-            # 1. 并行检索所有内容类型
-            retrieval_tasks = [
-                self._retrieve_content_type(query, 'text', options),
-                self._retrieve_content_type(query, 'image', options),
-                self._retrieve_content_type(query, 'table', options)
-            ]
-            
-            # 等待所有检索任务完成
-            retrieval_results = await asyncio.gather(*retrieval_tasks, return_exceptions=True)
+            # 1. 并行检索所有内容类型（共用一个召回计划，相同子查询只检索一次）
+            content_types = ['text', 'image', 'table']
+            type_options = {
+                content_type: self._get_type_specific_options(content_type, options)
+                for content_type in content_types
+            }
+            retrieval_results = await self.unified_services.retrieve_by_type(query, type_options)
             
             # 2. 处理检索结果
             all_results = []
-            content_types = ['text', 'image', 'table']
-            for i, content_type in enumerate(content_types):
-                if isinstance(retrieval_results[i], Exception):
-                    logger.warning(f"{content_type}类型检索失败: {retrieval_results[i]}")
-                    continue
-                
-                results = retrieval_results[i]
+            for content_type in content_types:
+                results = retrieval_results.get(content_type, [])
+                logger.debug(f"{content_type}类型检索完成，返回 {len(results)} 个结果")
                 # 为结果添加类型标识和权重
                 for item in results:
                     if isinstance(item, dict):
@@ -120,6 +119,9 @@ class SimpleHybridProcessor:
             context_memories = options.context_memories if hasattr(options, 'context_memories') else None
             answer = await self.unified_services.generate_answer(query, reranked_results, context_memories)
             
+            # 为最终返回的结果生成展示字段（图片字段、表格HTML）
+            self.unified_services.vector_db_integration.materialize_results(reranked_results)
+            
             # 6. 整合结果
             result.success = True
             result.answer = answer
@@ -154,30 +156,6 @@ class SimpleHybridProcessor:
             }
             return result
     
-    async def _retrieve_content_type(self, query: str, content_type: str, 
-                                   options: QueryOptions) -> List[Dict[str, Any]]:
-        """
-        检索指定内容类型
-        
-        :param query: 查询文本
-        :param options: 查询选项
-        :param content_type: 内容类型
-        :return: 检索结果列表
-        """
-        try:
-            # 根据内容类型调整检索参数
-            type_specific_options = self._get_type_specific_options(content_type, options)
-            
-            # 调用统一检索服务
-            results = await self.unified_services.retrieve(query, [content_type], type_specific_options)
-            
-            logger.debug(f"{content_type}类型检索完成，返回 {len(results)} 个结果")
-            return results
-            
-        except Exception as e:
-            logger.error(f"{content_type}类型检索失败: {e}")
-            return []
-    
     def _get_type_specific_options(self, content_type: str, base_options: QueryOptions) -> Dict[str, Any]:
         """
         获取类型特定的检索选项
@@ -273,6 +251,9 @@ class SimpleHybridProcessor:
         """
         基于内容相似性去重
         
+        使用入库时预计算的MinHash签名（元数据content_minhash，缺失时按内容计算），
+        通过LSH桶只与可能相似的已保留结果比较，耗时近似线性。
+        
         :param results: 结果列表
         :return: 去重后的结果列表
         """
@@ -280,26 +261,21 @@ class SimpleHybridProcessor:
             if not results:
                 return []
             
-            # 简单的基于内容的去重
-            seen_contents = set()
+            lsh = MinHashLSH()
             unique_results = []
             
             for result in results:
-                content = self._extract_content_for_dedup(result)
-                if not content:
+                signature = self._content_signature(result)
+                if signature is None:
                     unique_results.append(result)
                     continue
                 
                 # 检查是否与已有内容相似
-                is_duplicate = False
-                for seen_content in seen_contents:
-                    if self._is_content_similar(content, seen_content):
-                        is_duplicate = True
-                        break
+                if lsh.query(signature, self.dedup_threshold) is not None:
+                    continue
                 
-                if not is_duplicate:
-                    seen_contents.add(content)
-                    unique_results.append(result)
+                lsh.insert(len(unique_results), signature)
+                unique_results.append(result)
             
             return unique_results
             
@@ -307,6 +283,24 @@ class SimpleHybridProcessor:
             logger.error(f"去重处理失败: {e}，返回原始结果")
             return results
     
+    def _content_signature(self, result: Dict[str, Any]):
+        """
+        获取结果内容的MinHash签名（过短的内容不参与去重）
+        
+        :param result: 结果项
+        :return: 签名；内容为空或过短时返回None
+        """
+        content = self._extract_content_for_dedup(result)
+        if len(content) < 10:
+            return None
+        
+        metadata = result.get('metadata')
+        if isinstance(metadata, dict):
+            signature = decode_signature(metadata.get(MINHASH_METADATA_KEY))
+            if signature is not None:
+                return signature
+        return text_minhash(content)
+    
     def _extract_content_for_dedup(self, result: Dict[str, Any]) -> str:
         """
         提取用于去重的内容
@@ -325,32 +319,6 @@ class SimpleHybridProcessor:
         except Exception:
             return ""
     
-    def _is_content_similar(self, content1: str, content2: str, threshold: float = 0.8) -> bool:
-        """
-        判断两个内容是否相似
-        
-        :param content1: 内容1
-        :param content2: 内容2
-        :param threshold: 相似度阈值
-        :return: 是否相似
-        """
-        try:
-            if not content1 or not content2:
-                return False
-            
-            # 简单的相似度计算（基于共同字符比例）
-            if len(content1) < 10 or len(content2) < 10:
-                return False
-            
-            # 计算共同字符数量
-            common_chars = sum(1 for c in content1 if c in content2)
-            similarity = common_chars / max(len(content1), len(content2))
-            
-            return similarity >= threshold
-            
-        except Exception:
-            return False
-    
     def get_service_status(self) -> Dict[str, Any]:
         """获取服务状态信息"""
         return {
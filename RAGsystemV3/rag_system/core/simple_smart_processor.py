@@ -165,6 +165,9 @@ class SimpleSmartProcessor:
             answer = await self.unified_services.generate_answer(query, reranked_results, context_memories)
             logger.info("✅ LLM问答生成完成")
             
+            # 为最终返回的结果生成展示字段（图片字段、表格HTML）
+            self.unified_services.vector_db_integration.materialize_results(reranked_results)
+            
             # 4. 子表合并（在输出给前端前）
             if content_type == 'table' and self.config.get('rag_system.table_merge.enabled', True):
                 try:
@@ -275,6 +278,9 @@ class SimpleSmartProcessor:
             answer = await self.unified_services.generate_answer(query, reranked_results, context_memories)
             logger.info("✅ LLM问答生成完成")
             
+            # 为最终返回的结果生成展示字段（图片字段、表格HTML）
+            self.unified_services.vector_db_integration.materialize_results(reranked_results)
+            
             # 4. 子表合并（在输出给前端前）
             if self.config.get('rag_system.table_merge.enabled', True):
                 try:
@@ -76,20 +76,14 @@ class UnifiedServices:
             max_results = options.get('max_results', 10)
             relevance_threshold = options.get('relevance_threshold', 0.5)
             
-            # 根据内容类型进行检索
-            all_results = []
-            
-            if 'text' in content_types:
-                text_results = self.retrieval_service.retrieve_texts(query, max_results, relevance_threshold)
-                all_results.extend(text_results)
-            
-            if 'image' in content_types:
-                image_results = self.retrieval_service.retrieve_images(query, max_results, relevance_threshold)
-                all_results.extend(image_results)
+            # 各内容类型及其内部各层并发检索，检索在召回线程池中执行，不阻塞事件循环
+            results_by_type = await self.retrieval_service.aretrieve(
+                query, content_types, max_results, relevance_threshold
+            )
             
-            if 'table' in content_types:
-                table_results = self.retrieval_service.retrieve_tables(query, max_results, relevance_threshold)
-                all_results.extend(table_results)
+            all_results = []
+            for content_type in ['text', 'image', 'table']:
+                all_results.extend(results_by_type.get(content_type, []))
             
             logger.info(f"统一检索完成，查询: {query}，返回结果: {len(all_results)}")
             return all_results
@@ -101,6 +95,30 @@ class UnifiedServices:
             logger.error(f"统一检索失败（未知错误）: {e}")
             return []
     
+    async def retrieve_by_type(self, query: str,
+                               type_options: Dict[str, Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        按内容类型检索（各类型可使用不同的检索选项，共用一个召回计划）
+        
+        :param query: 查询文本
+        :param type_options: {内容类型: 检索选项(max_results/relevance_threshold)}
+        :return: {内容类型: 检索结果列表}
+        """
+        try:
+            results_by_type = await self.retrieval_service.aretrieve(
+                query, list(type_options.keys()), type_options=type_options
+            )
+            result_counts = {content_type: len(results) for content_type, results in results_by_type.items()}
+            logger.info(f"按类型检索完成，查询: {query}，返回结果: {result_counts}")
+            return results_by_type
+            
+        except RetrievalError as e:
+            logger.error(f"按类型检索失败: {e}")
+            return {content_type: [] for content_type in type_options}
+        except Exception as e:
+            logger.error(f"按类型检索失败（未知错误）: {e}")
+            return {content_type: [] for content_type in type_options}
+    
     async def rerank(self, query: str, results: List[Any]) -> List[Dict[str, Any]]:
         """
         重排序服务 - 完全复用
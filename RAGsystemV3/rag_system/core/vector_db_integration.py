@@ -6,10 +6,15 @@ RAG系统的向量数据库集成模块，负责与V3向量数据库的交互
 """
 
 import logging
-import re
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from db_system.core.vector_store_manager import LangChainVectorStoreManager
 from db_system.core.metadata_manager import MetadataManager
+from db_system.core.embedding_cache import QueryEmbeddingCache
+from db_system.core.table_artifacts import (
+    build_table_display_html, build_table_content_text, merge_table_htmls, count_table_rows, summarize_merged_table
+)
+from db_system.core.chunk_tokens import build_candidate_content
+from .result_cache import RetrievalResultCache
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +29,55 @@ class VectorDBIntegration:
         :param config_integration: RAG配置集成管理器实例
         """
         self.config = config_integration
-        self.vector_store_manager = LangChainVectorStoreManager(self.config.config_manager)
+        # 查询向量缓存（文本查询和多模态查询共用）
+        self.embedding_cache = self._create_embedding_cache()
+        # RAG系统只读访问向量库，默认以只读内存映射方式加载
+        self.vector_store_manager = LangChainVectorStoreManager(
+            self.config.config_manager,
+            load_mode=self.config.get('rag_system.vector_db.load_mode', 'mmap'),
+            embedding_cache=self.embedding_cache
+        )
         self.metadata_manager = MetadataManager(self.config.config_manager)
+        # 召回结果缓存（使用同一向量库的召回引擎共用，向量库版本变化时自动失效）
+        self.result_cache = self._create_result_cache()
         logger.info("RAG向量数据库集成管理器初始化完成")
     
+    def _create_embedding_cache(self) -> Optional[QueryEmbeddingCache]:
+        """
+        根据rag_system.embedding_cache配置创建查询向量缓存
+        
+        :return: 查询向量缓存；未启用或创建失败时返回None
+        """
+        try:
+            cache_config = dict(self.config.get('rag_system.embedding_cache', {}) or {})
+            config_manager = self.config.config_manager
+            disk_config = dict(cache_config.get('disk_cache') or {})
+            if disk_config.get('path'):
+                disk_config['path'] = config_manager.path_manager.get_absolute_path(disk_config['path'])
+                cache_config['disk_cache'] = disk_config
+            cache = QueryEmbeddingCache.from_config(cache_config, default_dir=config_manager.get_path('vector_db_dir'))
+            if cache is not None:
+                logger.info(f"查询向量缓存已启用，最大条目数: {cache.max_entries}，磁盘缓存: {cache.disk_path}")
+            return cache
+        except Exception as e:
+            logger.warning(f"创建查询向量缓存失败，不使用缓存: {e}")
+            return None
+    
+    def _create_result_cache(self) -> Optional[RetrievalResultCache]:
+        """
+        根据rag_system.performance.caching配置创建召回结果缓存
+        
+        :return: 召回结果缓存；未启用或创建失败时返回None
+        """
+        try:
+            cache = RetrievalResultCache.from_config(self.config.get('rag_system.performance.caching', {}) or {})
+            if cache is not None:
+                logger.info(f"召回结果缓存已启用，最大条目数: {cache.max_entries}，最大字节数: {cache.max_bytes}，TTL: {cache.ttl}s")
+            return cache
+        except Exception as e:
+            logger.warning(f"创建召回结果缓存失败，不使用缓存: {e}")
+            return None
+    
     def search_texts(self, query: str, k: int = 10, 
                     similarity_threshold: float = 0.5) -> List[Dict[str, Any]]:
         """
@@ -68,6 +118,45 @@ class VectorDBIntegration:
             return []
     
 
+    def search_texts_batch(self, queries: List[str], k: int = 10,
+                           similarity_threshold: float = 0.5) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索文本内容（一次embedding请求和一次向量检索）
+        
+        :param queries: 查询文本列表
+        :param k: 每个查询返回的结果数量
+        :param similarity_threshold: 相似度阈值
+        :return: 与queries一一对应的搜索结果列表
+        """
+        try:
+            logger.info(f"开始批量文本搜索，查询数: {len(queries)}，请求数量: {k}，阈值: {similarity_threshold}")
+            
+            batch_results = self.vector_store_manager.similarity_search_batch(
+                queries=queries,
+                k=k,
+                filter_dict={'chunk_type': 'text'}
+            )
+            
+            formatted_batch = []
+            for results in batch_results:
+                # 过滤相似度低于阈值的结果
+                filtered_results = []
+                for result in results:
+                    if hasattr(result, 'metadata') and 'similarity_score' in result.metadata:
+                        if result.metadata['similarity_score'] >= similarity_threshold:
+                            filtered_results.append(self._format_search_result(result))
+                    else:
+                        # 如果没有相似度信息，默认包含
+                        filtered_results.append(self._format_search_result(result))
+                formatted_batch.append(filtered_results)
+            
+            logger.info(f"批量文本搜索完成，过滤后结果: {[len(r) for r in formatted_batch]}")
+            return formatted_batch
+            
+        except Exception as e:
+            logger.error(f"批量文本检索失败: {e}")
+            return [[] for _ in queries]
+
     def search_tables(self, query: str, k: int = 10, 
                      similarity_threshold: float = 0.65) -> List[Dict[str, Any]]:
         """
@@ -171,8 +260,8 @@ class VectorDBIntegration:
                         max_results=int(k * weights['image']),
                         relevance_threshold=0.3
                     )
-                    # 转换为标准格式
-                    image_results = [self._format_search_result(result) for result in image_retrieval_results]
+                    # 补全展示字段
+                    image_results = self.materialize_results(image_retrieval_results)
                 except Exception as e:
                     logger.warning(f"图片搜索失败: {e}")
                     image_results = []
@@ -206,127 +295,7 @@ class VectorDBIntegration:
         :return: 格式化后的结果
         """
         try:
-            # 提取基本信息
-            # 对于图片，优先使用enhanced_description作为内容
-            # 对于文本，优先使用metadata中的text字段作为内容
-            # 对于表格，构建增强的表格信息
-            content = getattr(result, 'page_content', '')
-            if hasattr(result, 'metadata') and result.metadata:
-                chunk_type = result.metadata.get('chunk_type', '')
-                if chunk_type == 'image' and 'enhanced_description' in result.metadata:
-                    content = result.metadata['enhanced_description']
-                elif chunk_type == 'text' and 'text' in result.metadata:
-                    content = result.metadata['text']
-                elif chunk_type == 'table':
-                    # 构建增强的表格信息
-                    content = self._build_enhanced_table_info(result.metadata)
-            
-            formatted_result = {
-                'chunk_id': getattr(result, 'id', ''),
-                'content': content,
-                'similarity_score': 0.0,
-                'relevance_score': 0.0,  # 添加relevance_score字段
-                'chunk_type': 'unknown',
-                'document_name': '',
-                'page_number': 1,
-                # 图片展示字段
-                'image_path': '',
-                'caption': '',
-                'image_title': '',
-                # 表格展示字段
-                'table_html': '',
-                'table_title': '',
-                'table_headers': [],
-                'description': '',
-                'image_url': '',
-                'table_data': None
-            }
-            
-            # 提取元数据
-            if hasattr(result, 'metadata') and result.metadata:
-                metadata = result.metadata
-                
-                # 相似度分数
-                if 'similarity_score' in metadata:
-                    formatted_result['similarity_score'] = float(metadata['similarity_score'])
-                    formatted_result['relevance_score'] = float(metadata['similarity_score'])  # 同时设置relevance_score
-                elif 'score' in metadata:
-                    formatted_result['similarity_score'] = float(metadata['score'])
-                    formatted_result['relevance_score'] = float(metadata['score'])  # 同时设置relevance_score
-                
-                # 内容类型
-                if 'chunk_type' in metadata:
-                    formatted_result['chunk_type'] = metadata['chunk_type']
-                
-                # 文档信息
-                if 'document_name' in metadata:
-                    formatted_result['document_name'] = metadata['document_name']
-                if 'page_number' in metadata:
-                    formatted_result['page_number'] = int(metadata['page_number']) + 1
-                
-                # 图片相关字段
-                if chunk_type == 'image':
-                    if 'enhanced_description' in metadata:
-                        formatted_result['description'] = metadata['enhanced_description']
-                        formatted_result['caption'] = metadata['enhanced_description']
-                    elif 'description' in metadata:
-                        formatted_result['description'] = metadata['description']
-                        formatted_result['caption'] = metadata['description']
-                    
-                    if 'image_path' in metadata:
-                        formatted_result['image_path'] = metadata['image_path']
-                        formatted_result['image_url'] = metadata['image_path']
-                    elif 'image_url' in metadata:
-                        formatted_result['image_path'] = metadata['image_url']
-                        formatted_result['image_url'] = metadata['image_url']
-                    
-                    if 'image_title' in metadata:
-                        formatted_result['image_title'] = metadata['image_title']
-                    elif 'title' in metadata:
-                        formatted_result['image_title'] = metadata['title']
-                
-                # 表格相关字段
-                elif chunk_type == 'table':
-                    # 获取原始HTML
-                    if 'table_body' in metadata:
-                        table_html = metadata['table_body']
-                    elif 'table_html' in metadata:
-                        table_html = metadata['table_html']
-                    elif 'table_content' in metadata:
-                        # 如果没有HTML，尝试从table_content生成简单的HTML
-                        table_html = self._generate_table_html(metadata['table_content'])
-                    else:
-                        table_html = ""
-                    
-                    # ✅ 验证和修复HTML
-                    fixed_html = self._validate_and_fix_table_html(table_html, metadata)
-                    formatted_result['table_html'] = fixed_html
-                    
-                    if 'table_title' in metadata:
-                        formatted_result['table_title'] = metadata['table_title']
-                    elif 'title' in metadata:
-                        formatted_result['table_title'] = metadata['title']
-                    
-                    # 直接使用metadata中的表头
-                    table_headers = metadata.get('table_headers', [])
-                    formatted_result['table_headers'] = table_headers
-                    
-                    if 'table_data' in metadata:
-                        formatted_result['table_data'] = metadata['table_data']
-                    
-                    # 检查子表信息
-                    is_subtable = metadata.get('is_subtable', False)
-                    if is_subtable:
-                        parent_id = metadata.get('parent_table_id', '')
-                        subtable_index = metadata.get('subtable_index', '')
-            
-            # 保存原始metadata到格式化结果中
-            if hasattr(result, 'metadata') and result.metadata:
-                formatted_result['metadata'] = result.metadata
-            else:
-                formatted_result['metadata'] = {}
-            
-            return formatted_result
+            return self._materialize_candidate(self.create_candidate(result))
             
         except Exception as e:
             logger.error(f"格式化搜索结果失败: {e}")
@@ -349,51 +318,125 @@ class VectorDBIntegration:
                 'table_headers': []
             }
     
-    def _generate_table_html(self, table_content: str) -> str:
+    def create_candidate(self, result) -> Dict[str, Any]:
         """
-        从表格内容生成简单的HTML表格
+        创建轻量候选结果
+        
+        只包含召回评分、去重、重排序和问答所需的字段（docstore ID、内容、分数、类型、文档信息和原始metadata），
+        图片和表格的展示字段（含表格HTML）在materialize_results中只为最终返回的结果生成。
+        
+        :param result: 原始搜索结果（LangChain Document）
+        :return: 候选结果
+        """
+        # 图片优先使用enhanced_description，文本优先使用metadata中的text字段，表格使用增强的表格信息
+        # （与入库时预计算分块词项向量使用同一规则）
+        metadata = result.metadata if hasattr(result, 'metadata') and result.metadata else {}
+        chunk_type = metadata.get('chunk_type', '')
+        content = build_candidate_content(metadata, getattr(result, 'page_content', ''))
         
-        :param table_content: 表格内容文本
-        :return: HTML表格字符串
+        candidate = {
+            'chunk_id': getattr(result, 'id', ''),
+            'content': content,
+            'similarity_score': 0.0,
+            'relevance_score': 0.0,
+            'chunk_type': chunk_type or 'unknown',
+            'document_name': metadata.get('document_name', ''),
+            'page_number': int(metadata['page_number']) + 1 if 'page_number' in metadata else 1,
+            'table_title': metadata.get('table_title', metadata.get('title', '')) if chunk_type == 'table' else '',
+            'metadata': metadata,
+            'materialized': False
+        }
+        
+        # 相似度分数
+        if 'similarity_score' in metadata:
+            candidate['similarity_score'] = float(metadata['similarity_score'])
+            candidate['relevance_score'] = float(metadata['similarity_score'])
+        elif 'score' in metadata:
+            candidate['similarity_score'] = float(metadata['score'])
+            candidate['relevance_score'] = float(metadata['score'])
+        
+        return candidate
+    
+    def materialize_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        try:
-            if not table_content:
-                return ''
-            
-            # 简单的表格内容解析
-            lines = table_content.strip().split('\n')
-            if len(lines) < 2:
-                return f'<div class="table-content">{table_content}</div>'
-            
-            # 假设第一行是表头
-            headers = lines[0].split('\t') if '\t' in lines[0] else lines[0].split('|')
-            headers = [h.strip() for h in headers if h.strip()]
-            
-            html = '<table class="result-table">\n'
-            html += '  <thead>\n    <tr>\n'
-            for header in headers:
-                html += f'      <th>{header}</th>\n'
-            html += '    </tr>\n  </thead>\n'
-            
-            # 处理数据行
-            html += '  <tbody>\n'
-            for line in lines[1:]:
-                if line.strip():
-                    cells = line.split('\t') if '\t' in line else line.split('|')
-                    cells = [c.strip() for c in cells if c.strip()]
-                    if cells:
-                        html += '    <tr>\n'
-                        for cell in cells:
-                            html += f'      <td>{cell}</td>\n'
-                        html += '    </tr>\n'
-            html += '  </tbody>\n'
-            html += '</table>'
-            
-            return html
+        为最终返回的结果生成展示字段（图片字段、表格HTML等），已生成的结果保持不变
+        
+        :param results: 结果列表（候选结果或已格式化的结果）
+        :return: 结果列表（原地补全）
+        """
+        for result in results:
+            if isinstance(result, dict) and result.get('materialized') is False:
+                try:
+                    self._materialize_candidate(result)
+                except Exception as e:
+                    logger.warning(f"生成结果展示字段失败: {e}")
+        return results
+    
+    def _materialize_candidate(self, candidate: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        为候选结果补全展示字段
+        
+        :param candidate: 候选结果
+        :return: 补全后的结果（原地修改）
+        """
+        metadata = candidate.get('metadata') or {}
+        chunk_type = metadata.get('chunk_type', '')
+        
+        # 图片展示字段
+        candidate.update({
+            'image_path': '',
+            'caption': '',
+            'image_title': '',
+            'description': '',
+            'image_url': ''
+        })
+        # 表格展示字段
+        candidate.update({
+            'table_html': '',
+            'table_headers': [],
+            'table_data': None
+        })
+        candidate.setdefault('table_title', '')
+        
+        # 图片相关字段
+        if chunk_type == 'image':
+            if 'enhanced_description' in metadata:
+                candidate['description'] = metadata['enhanced_description']
+                candidate['caption'] = metadata['enhanced_description']
+            elif 'description' in metadata:
+                candidate['description'] = metadata['description']
+                candidate['caption'] = metadata['description']
+            
+            if 'image_path' in metadata:
+                candidate['image_path'] = metadata['image_path']
+                candidate['image_url'] = metadata['image_path']
+            elif 'image_url' in metadata:
+                candidate['image_path'] = metadata['image_url']
+                candidate['image_url'] = metadata['image_url']
+            
+            if 'image_title' in metadata:
+                candidate['image_title'] = metadata['image_title']
+            elif 'title' in metadata:
+                candidate['image_title'] = metadata['title']
+        
+        # 表格相关字段
+        elif chunk_type == 'table':
+            # 原始HTML，缺失时从table_content生成
+            candidate['table_html'] = build_table_display_html(metadata)
             
-        except Exception as e:
-            logger.error(f"生成表格HTML失败: {e}")
-            return f'<div class="table-content">{table_content}</div>'
+            if 'table_title' in metadata:
+                candidate['table_title'] = metadata['table_title']
+            elif 'title' in metadata:
+                candidate['table_title'] = metadata['title']
+            
+            # 直接使用metadata中的表头
+            candidate['table_headers'] = metadata.get('table_headers', [])
+            
+            if 'table_data' in metadata:
+                candidate['table_data'] = metadata['table_data']
+        
+        candidate.pop('materialized', None)
+        return candidate
     
     def get_vector_db_status(self) -> Dict[str, Any]:
         """获取向量数据库状态"""
@@ -412,7 +455,9 @@ class VectorDBIntegration:
                 'search_methods': [
                     'similarity_search',
                     'similarity_search_by_vector'
-                ]
+                ],
+                'embedding_cache': self.embedding_cache.get_status() if self.embedding_cache else None,
+                'result_cache': self.result_cache.get_status() if self.result_cache else None
             }
         except Exception as e:
             logger.error(f"获取向量数据库状态失败: {e}")
@@ -439,7 +484,9 @@ class VectorDBIntegration:
     
     def _merge_subtables_for_display(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        为前端展示合并子表HTML - 修改版：查询数据库获取所有相关子表
+        为前端展示合并子表HTML
+        
+        优先使用入库时按parent_table_id预计算的表格展示产物，产物缺失时查询数据库获取所有子表并现场合并。
         
         :param results: 重排序后的结果列表
         :return: 合并后的结果列表
@@ -447,19 +494,16 @@ class VectorDBIntegration:
         try:
             logger.info(f"🔍 开始子表合并，输入结果数量: {len(results)}")
             
-            # 1. 识别子表组并查询数据库获取所有相关子表
-            subtable_groups = self._identify_subtable_groups(results)
+            # 1. 识别结果中的父表，获取合并后的表格
+            merged_tables = self._identify_merged_tables(results)
             
-            # 2. 合并每个子表组
+            # 2. 用合并后的表格替换子表
             merged_results = []
             processed_subtables = set()
-            non_subtable_count = 0
             
-            for i, result in enumerate(results):
+            for result in results:
                 chunk_id = result.get('chunk_id', '')
-                chunk_type = result.get('chunk_type', 'unknown')
                 metadata = result.get('metadata', {})
-                is_subtable = metadata.get('is_subtable', False)
                 
                 # 如果这个结果已经被合并过，跳过
                 if chunk_id in processed_subtables:
@@ -468,23 +512,16 @@ class VectorDBIntegration:
                 # 检查是否是子表：如果存在parent_table_id字段，就认为是子表
                 parent_id = metadata.get('parent_table_id', '')
                 if parent_id:
-                    if parent_id in subtable_groups:
-                        # 合并这个子表组（包含从数据库查询到的所有子表）
-                        logger.info(f"🔄 开始合并子表组 {parent_id}，包含 {len(subtable_groups[parent_id])} 个子表")
-                        merged_result = self._merge_subtable_group(subtable_groups[parent_id])
-                        if merged_result:
-                            logger.info(f"✅ 子表组合并成功，包含 {len(subtable_groups[parent_id])} 个子表")
-                            merged_results.append(merged_result)
-                            # 标记所有子表为已处理
-                            for subtable in subtable_groups[parent_id]:
-                                processed_subtables.add(subtable.get('chunk_id', ''))
-                        else:
-                            logger.warning(f"❌ 子表组合并失败")
+                    if parent_id in merged_tables:
+                        merged_result, subtable_ids = merged_tables[parent_id]
+                        logger.info(f"✅ 子表组 {parent_id} 合并成功，包含 {len(subtable_ids)} 个子表")
+                        merged_results.append(merged_result)
+                        # 标记所有子表为已处理
+                        processed_subtables.update(subtable_ids)
                     else:
                         logger.warning(f"⚠️ 子表但找不到对应的组")
                 else:
                     # 非子表直接添加
-                    non_subtable_count += 1
                     merged_results.append(result)
 
             logger.info(f"✅ 子表合并完成，原始结果: {len(results)}，合并后结果: {len(merged_results)}")
@@ -494,34 +531,80 @@ class VectorDBIntegration:
             logger.error(f"❌ 子表合并失败: {e}")
             return results  # 失败时返回原始结果
     
-    def _identify_subtable_groups(self, results: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def _identify_merged_tables(self, results: List[Dict[str, Any]]) -> Dict[str, Tuple[Dict[str, Any], List[str]]]:
         """
-        识别子表组，按parent_table_id分组，并查询数据库获取所有相关子表
+        识别结果中的父表并获取合并后的表格
         
         :param results: 重排序结果列表
-        :return: 子表组字典 {parent_table_id: [所有子表列表]}
+        :return: {parent_table_id: (合并后的结果, 全部子表chunk_id)}
         """
-        subtable_groups = {}
-        
-        # 1. 从检索结果中识别子表组
         parent_ids_found = set()
-        for i, result in enumerate(results):
-            metadata = result.get('metadata', {})
-            chunk_id = result.get('chunk_id', '')
-            chunk_type = result.get('chunk_type', 'unknown')
-            
-            # 检查是否是子表：如果存在parent_table_id字段，就认为是子表
-            parent_id = metadata.get('parent_table_id', '')
+        for result in results:
+            parent_id = result.get('metadata', {}).get('parent_table_id', '')
             if parent_id:
                 parent_ids_found.add(parent_id)
         
-        # 2. 对每个发现的父表ID，查询数据库获取所有子表
+        merged_tables = {}
         for parent_id in parent_ids_found:
+            # 1. 预计算的表格展示产物，只需查找
+            artifact = self.vector_store_manager.get_table_artifact(parent_id)
+            merged_result = self._merged_table_from_artifact(artifact) if artifact else None
+            if merged_result:
+                merged_tables[parent_id] = (merged_result, artifact['subtable_ids'])
+                continue
+            
+            # 2. 产物缺失时查询数据库获取所有子表并现场合并
+            logger.info(f"父表 {parent_id} 没有预计算的展示产物，现场合并子表")
             all_subtables = self._get_all_subtables_by_parent_id(parent_id)
-            if all_subtables:
-                subtable_groups[parent_id] = all_subtables
+            merged_result = self._merge_subtable_group(all_subtables)
+            if merged_result:
+                merged_tables[parent_id] = (merged_result, [subtable.get('chunk_id', '') for subtable in all_subtables])
+            else:
+                logger.warning(f"❌ 子表组 {parent_id} 合并失败")
+        
+        return merged_tables
+    
+    def _merged_table_from_artifact(self, artifact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        根据预计算的表格展示产物生成合并后的结果
+        
+        :param artifact: 表格展示产物
+        :return: 合并后的结果（以第一个子表为基础），第一个子表不存在时返回None
+        """
+        subtable_ids = artifact.get('subtable_ids') or []
+        if not subtable_ids:
+            return None
+        first_doc = self.vector_store_manager.vector_store.docstore.search(subtable_ids[0])
+        if not hasattr(first_doc, 'metadata'):
+            return None
+        return self._apply_merged_table(
+            self._format_search_result(first_doc),
+            artifact['merged_html'], artifact['table_rows'], artifact['table_summary']
+        )
+    
+    def _apply_merged_table(self, base_result: Dict[str, Any], merged_html: str,
+                            table_rows: int, table_summary: str) -> Dict[str, Any]:
+        """
+        以第一个子表为基础生成合并后的主表结果（复制metadata，不修改docstore中的文档）
+        
+        :param base_result: 第一个子表的格式化结果
+        :param merged_html: 合并后的表格HTML
+        :param table_rows: 合并后的行数
+        :param table_summary: 合并后的表格摘要
+        :return: 合并后的结果
+        """
+        merged_result = dict(base_result)
+        metadata = dict(merged_result.get('metadata') or {})
+        metadata['table_body'] = merged_html
+        metadata['table_html'] = merged_html
+        metadata['is_subtable'] = False  # 标记为合并后的主表
+        metadata['table_rows'] = table_rows
+        metadata['table_summary'] = table_summary
+        merged_result['metadata'] = metadata
         
-        return subtable_groups
+        # 同时更新顶级字段（前端直接访问）
+        merged_result['table_html'] = merged_html
+        return merged_result
     
     def _get_all_subtables_by_parent_id(self, parent_table_id: str) -> List[Dict[str, Any]]:
         """
@@ -531,20 +614,17 @@ class VectorDBIntegration:
         :return: 所有子表列表，按subtable_index排序
         """
         try:
-            # 直接遍历docstore获取所有相关子表
+            # 通过元数据索引直接定位目标父表的所有子表
             subtables = []
-            docstore = self.vector_store_manager.vector_store.docstore
+            documents = self.vector_store_manager.get_documents_by_metadata({
+                'chunk_type': 'table',
+                'parent_table_id': parent_table_id
+            })
             
-            for doc_id, doc in docstore._dict.items():
-                metadata = doc.metadata if hasattr(doc, 'metadata') and doc.metadata else {}
-                
-                # 检查是否是目标父表的子表
-                if (metadata.get('chunk_type') == 'table' and 
-                    metadata.get('parent_table_id') == parent_table_id):
-                    
-                    # 转换为标准格式
-                    formatted_result = self._format_search_result(doc)
-                    subtables.append(formatted_result)
+            for doc_id, doc in documents:
+                # 转换为标准格式
+                formatted_result = self._format_search_result(doc)
+                subtables.append(formatted_result)
             
             # 按subtable_index排序
             subtables.sort(key=lambda x: x.get('metadata', {}).get('subtable_index', 0))
@@ -557,7 +637,7 @@ class VectorDBIntegration:
     
     def _merge_subtable_group(self, subtables: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """
-        合并一个子表组
+        现场合并一个子表组（没有预计算的表格展示产物时使用）
         
         :param subtables: 子表列表
         :return: 合并后的结果，失败时返回None
@@ -571,7 +651,7 @@ class VectorDBIntegration:
             
             # 提取所有子表的HTML内容
             subtable_htmls = []
-            for i, subtable in enumerate(subtables):
+            for subtable in subtables:
                 # 优先使用table_html字段，如果没有则使用metadata中的table_body
                 html_content = subtable.get('table_html', '') or subtable.get('metadata', {}).get('table_body', '')
                 if html_content:
@@ -582,198 +662,15 @@ class VectorDBIntegration:
                 return None
             
             # 合并HTML（简单拼接，因为子表之间无重复）
-            merged_html = self._merge_table_htmls(subtable_htmls)
-            
-            # 使用第一个子表的metadata，但更新HTML内容
-            merged_result = dict(subtables[0])  # 复制第一个子表的所有字段
-            
-            # 更新关键字段
-            merged_result['metadata']['table_body'] = merged_html
-            merged_result['metadata']['table_html'] = merged_html
-            merged_result['metadata']['is_subtable'] = False  # 标记为合并后的主表
-            
-            # 同时更新顶级字段（前端直接访问）
-            merged_result['table_html'] = merged_html
-            
-            # 更新表格统计信息
-            merged_result['metadata']['table_rows'] = self._count_table_rows(merged_html)
-            merged_result['metadata']['table_summary'] = self._generate_merged_table_summary(merged_html)
-            
-            return merged_result
+            merged_html = merge_table_htmls(subtable_htmls)
+            return self._apply_merged_table(
+                subtables[0], merged_html, count_table_rows(merged_html), summarize_merged_table(merged_html)
+            )
             
         except Exception as e:
             logger.error(f"合并子表组失败: {e}")
             return None
     
-    def _merge_table_htmls(self, html_list: List[str]) -> str:
-        """
-        合并多个表格HTML
-        
-        :param html_list: HTML列表
-        :return: 合并后的HTML
-        """
-        try:
-            if not html_list:
-                return ""
-            
-            # 直接合并所有表格的内容
-            all_rows = []
-            for i, html in enumerate(html_list):
-                # 提取所有<tr>标签内容
-                tr_matches = re.findall(r'<tr[^>]*>(.*?)</tr>', html, re.DOTALL)
-                
-                for j, tr_content in enumerate(tr_matches):
-                    all_rows.append(f"<tr>{tr_content}</tr>")
-            
-            # 合并HTML（保留完整的表格结构）
-            merged_html = f"<table><tbody>{''.join(all_rows)}</tbody></table>"
-            
-            return merged_html
-            
-        except Exception as e:
-            logger.error(f"HTML合并失败: {e}")
-            return html_list[0] if html_list else ""
-    
-    def _count_table_rows(self, html: str) -> int:
-        """
-        统计表格行数
-        
-        :param html: 表格HTML
-        :return: 行数
-        """
-        try:
-            # 统计<tr>标签数量
-            tr_matches = re.findall(r'<tr[^>]*>', html, re.IGNORECASE)
-            return len(tr_matches)
-        except Exception as e:
-            logger.warning(f"统计表格行数失败: {e}")
-            return 0
-    
-    def _generate_merged_table_summary(self, html: str) -> str:
-        """
-        生成合并后的表格摘要
-        
-        :param html: 表格HTML
-        :return: 表格摘要
-        """
-        try:
-            rows = self._count_table_rows(html)
-            
-            # 提取列数
-            first_row_match = re.search(r'<tr[^>]*>(.*?)</tr>', html, re.IGNORECASE | re.DOTALL)
-            if first_row_match:
-                first_row_html = first_row_match.group(1)
-                columns = len(re.findall(r'<t[dh][^>]*>', first_row_html, re.IGNORECASE))
-            else:
-                columns = 0
-            
-            if rows == 0:
-                return "空表格"
-            
-            return f"合并表格包含 {rows} 行 {columns} 列数据"
-            
-        except Exception as e:
-            logger.warning(f"生成合并表格摘要失败: {e}")
-            return "合并表格"
-    
-    
-    # ==================== HTML修复功能 ====================
-    
-    def _validate_and_fix_table_html(self, table_html: str, metadata: Dict[str, Any]) -> str:
-        """
-        验证和修复表格HTML
-        
-        :param table_html: 表格HTML
-        :param metadata: 元数据
-        :return: 修复后的HTML
-        """
-        try:
-            # 检查HTML是否为空
-            if not table_html or table_html.strip() == "":
-                # 从table_content生成HTML
-                table_content = metadata.get('table_content', '')
-                if table_content:
-                    return self._generate_table_html_from_content(table_content, metadata)
-                else:
-                    return self._generate_empty_table_html(metadata)
-            
-            # 保持原始HTML结构，不添加<thead>标签
-            # 原始数据使用<table><tr><td>...</td></tr></table>结构
-            # 数据库中的表格已经有<tbody>标签，表头是第一行的<td>内容
-            
-            return table_html
-            
-        except Exception as e:
-            logger.warning(f"表格HTML验证失败: {e}")
-            return table_html
-    
-    def _generate_table_html_from_content(self, table_content: str, metadata: Dict[str, Any]) -> str:
-        """
-        从table_content生成HTML表格
-        
-        :param table_content: 表格纯文本内容
-        :param metadata: 元数据
-        :return: 生成的HTML表格
-        """
-        try:
-            headers = metadata.get('table_headers', [])
-            if not headers:
-                # 如果没有表头信息，生成简单表格
-                return f"<table><tbody><tr><td>{table_content}</td></tr></tbody></table>"
-            
-            # 生成完整表格
-            header_html = self._generate_header_html(headers)
-            data_html = f"<tbody><tr><td>{table_content}</td></tr></tbody>"
-            
-            return f"<table>{header_html}{data_html}</table>"
-            
-        except Exception as e:
-            logger.warning(f"从内容生成表格HTML失败: {e}")
-            return f"<table><tbody><tr><td>{table_content}</td></tr></tbody></table>"
-    
-    def _generate_empty_table_html(self, metadata: Dict[str, Any]) -> str:
-        """
-        生成空表格HTML（只有表头）
-        
-        :param metadata: 元数据
-        :return: 空表格HTML
-        """
-        try:
-            headers = metadata.get('table_headers', [])
-            if headers:
-                header_html = self._generate_header_html(headers)
-                return f"<table>{header_html}<tbody></tbody></table>"
-            else:
-                return "<table><tbody></tbody></table>"
-                
-        except Exception as e:
-            logger.warning(f"生成空表格HTML失败: {e}")
-            return "<table><tbody></tbody></table>"
-    
-    def _generate_header_html(self, headers: List[str]) -> str:
-        """
-        生成表头HTML
-        
-        :param headers: 表头列表
-        :return: 表头HTML字符串
-        """
-        if not headers:
-            return ""
-        
-        header_cells = []
-        for header in headers:
-            header_cells.append(f"<th>{header}</th>")
-        
-        return f"<thead><tr>{''.join(header_cells)}</tr></thead>"
-    
-    
-    
-    
-    
-    
-    
-    
-    
     def format_search_results_with_merge(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         合并子表（结果已经是格式化后的）
@@ -801,52 +698,4 @@ class VectorDBIntegration:
         :param metadata: 表格元数据
         :return: 增强的表格信息字符串
         """
-        try:
-            table_parts = []
-            
-            # 1. 表格标题和说明
-            table_caption = metadata.get('table_caption', [])
-            if table_caption:
-                table_parts.append(f"**表格标题**: {', '.join(table_caption)}")
-            
-            table_title = metadata.get('table_title', '')
-            if table_title:
-                table_parts.append(f"**表格名称**: {table_title}")
-            
-            # 2. 表格结构信息
-            table_summary = metadata.get('table_summary', '')
-            if table_summary:
-                table_parts.append(f"**表格结构**: {table_summary}")
-            
-            # 3. 表格内容（优先使用HTML格式）
-            table_body = metadata.get('table_body', '')
-            table_content = metadata.get('table_content', '')
-            
-            if table_body:
-                table_parts.append(f"**表格内容**:\n{table_body}")
-            elif table_content:
-                table_parts.append(f"**表格内容**:\n{table_content}")
-            
-            # 4. 表格脚注
-            table_footnote = metadata.get('table_footnote', [])
-            if table_footnote:
-                table_parts.append(f"**数据来源**: {', '.join(table_footnote)}")
-            
-            # 5. 表格上下文
-            table_context = metadata.get('table_context', '')
-            if table_context:
-                table_parts.append(f"**表格上下文**: {table_context}")
-            
-            # # 6. 子表信息（如果有）
-            # is_subtable = metadata.get('is_subtable', False)
-            # if is_subtable:
-            #     parent_table_id = metadata.get('parent_table_id', '')
-            #     subtable_index = metadata.get('subtable_index', '')
-            #     table_parts.append(f"**子表信息**: 这是第{subtable_index}个子表，父表ID: {parent_table_id}")
-            
-            return "\n\n".join(table_parts)
-            
-        except Exception as e:
-            logger.error(f"构建增强表格信息失败: {e}")
-            # 回退到简单的表格内容
-            return metadata.get('table_content', '')
+        return build_table_content_text(metadata)